@@ -0,0 +1,4 @@
+"""
+Módulos de apoio compartilhados pelos scripts de análise
+(lollapalooza_b3.py, avalairb3.py e main.py).
+"""
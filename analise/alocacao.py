@@ -0,0 +1,199 @@
+import numpy as np
+
+# --- MOTOR DE ALOCAÇÃO EM QUANTIDADES INTEIRAS ---
+# Recebe preços (na ordem do ranking) e o orçamento e devolve quantas ações
+# comprar de cada ativo. Todo o cálculo é feito em centavos inteiros e em
+# lotes (1 ação no mercado fracionário, 100 no lote padrão), então nenhum
+# laço depende do tamanho do orçamento.
+
+MODOS = ('guloso', 'balanceado', 'exato')
+LOTE_FRACIONARIO = 1
+LOTE_PADRAO = 100
+MAX_CELULAS = 1_000_000  # tamanho máximo da tabela do knapsack do modo exato
+
+
+def _centavos(valores):
+    return np.round(np.asarray(valores, dtype=float) * 100).astype(np.int64)
+
+
+def _custos_lote(precos, lote):
+    """Custo de um lote de cada ativo, em centavos."""
+    return _centavos(precos) * int(lote)
+
+
+def alocar_guloso(precos, dinheiro, lote=LOTE_FRACIONARIO):
+    """
+    Modo capital pequeno: percorre o ranking e compra um lote de cada ativo
+    enquanto o saldo permitir (enche o carrinho com o que dá).
+    """
+    custos = _custos_lote(precos, lote)
+    saldo = int(_centavos(dinheiro))
+    lotes = np.zeros(len(custos), dtype=np.int64)
+    for i, custo in enumerate(custos):
+        if 0 < custo <= saldo:
+            lotes[i] = 1
+            saldo -= custo
+    return lotes * int(lote)
+
+
+def alocar_balanceado(precos, dinheiro, lote=LOTE_FRACIONARIO):
+    """
+    Modo capital maior original: a mesma fatia do orçamento para cada ativo
+    e o troco reforçando as posições já compradas, na ordem do ranking. O
+    reforço é calculado por divisão inteira, sem comprar ação por ação.
+    """
+    custos = _custos_lote(precos, lote)
+    orcamento = int(_centavos(dinheiro))
+    if len(custos) == 0:
+        return np.zeros(0, dtype=np.int64)
+    fatia = orcamento // len(custos)
+    lotes = np.where(custos > 0, fatia // np.maximum(custos, 1), 0)
+
+    saldo = orcamento - int(lotes @ custos)
+    for i in np.flatnonzero(lotes > 0):
+        extra = saldo // custos[i]
+        lotes[i] += extra
+        saldo -= extra * custos[i]
+    return lotes * int(lote)
+
+
+def _knapsack_arredondamento(custos, desvios, saldo):
+    """
+    Escolhe quais ativos sobem do piso para o teto do seu alvo (um lote a
+    mais) gastando o máximo possível de 'saldo'. Entre as escolhas que gastam
+    o mesmo valor fica a de menor soma dos quadrados dos desvios em relação
+    aos alvos. Programação dinâmica sobre o saldo, que é menor que a soma de
+    um lote de cada ativo: o custo não cresce com o orçamento.
+    """
+    n = len(custos)
+    escolhidos = np.zeros(n, dtype=bool)
+    if n == 0 or saldo <= 0:
+        return escolhidos
+
+    # Saldos muito grandes (lote padrão com ações caras) são discretizados;
+    # arredondar os custos para cima garante que a escolha nunca estoura o saldo
+    escala = max(1, -(-saldo // MAX_CELULAS))
+    pesos = -(-custos // escala)
+    capacidade = saldo // escala
+
+    # Variação do custo (desvio²) ao trocar o piso pelo teto
+    delta = (custos - desvios).astype(float) ** 2 - desvios.astype(float) ** 2
+
+    melhor = np.full(capacidade + 1, np.inf)
+    melhor[0] = 0.0
+    pegou = np.zeros((n, capacidade + 1), dtype=bool)
+    for i in range(n):
+        p = pesos[i]
+        if p <= 0 or p > capacidade:
+            continue
+        candidato = melhor[:-p] + delta[i]
+        troca = candidato < melhor[p:]
+        pegou[i, p:] = troca
+        melhor[p:] = np.where(troca, candidato, melhor[p:])
+
+    gasto = int(np.flatnonzero(np.isfinite(melhor))[-1])
+    for i in range(n - 1, -1, -1):
+        if pegou[i, gasto]:
+            escolhidos[i] = True
+            gasto -= pesos[i]
+    return escolhidos
+
+
+def alocar_exato(precos, dinheiro, lote=LOTE_FRACIONARIO, pesos=None):
+    """
+    Alocação que minimiza o troco mantendo cada posição perto do alvo
+    (peso igual, ou proporcional a 'pesos', por exemplo o Score).
+
+    Cada ativo começa no piso do seu alvo em lotes; um knapsack sobre o saldo
+    decide quem sobe para o teto, e o que ainda sobrar compra lotes dos
+    ativos mais abaixo do alvo. Resultado em ações (múltiplos de 'lote').
+    """
+    custos = _custos_lote(precos, lote)
+    orcamento = int(_centavos(dinheiro))
+    n = len(custos)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    pesos = np.ones(n) if pesos is None else np.asarray(pesos, dtype=float)
+    pesos = np.where(custos > 0, np.clip(pesos, 0, None), 0)
+    if pesos.sum() <= 0:
+        return np.zeros(n, dtype=np.int64)
+    alvos = np.floor(orcamento * pesos / pesos.sum()).astype(np.int64)
+
+    validos = custos > 0
+    lotes = np.zeros(n, dtype=np.int64)
+    lotes[validos] = alvos[validos] // custos[validos]
+    saldo = orcamento - int(lotes @ custos)
+
+    desvios = alvos - lotes * custos
+    idx = np.flatnonzero(validos & (custos <= saldo))
+    lotes[idx] += _knapsack_arredondamento(custos[idx], desvios[idx], saldo)
+    saldo = orcamento - int(lotes @ custos)
+
+    # Sobra da discretização (ou de quem ficou fora do knapsack): reforça
+    # primeiro quem está mais abaixo do alvo
+    for i in np.argsort(lotes * custos - alvos, kind='stable'):
+        if validos[i] and custos[i] <= saldo:
+            extra = saldo // custos[i]
+            lotes[i] += extra
+            saldo -= extra * custos[i]
+    return lotes * int(lote)
+
+
+def alocar(precos, dinheiro, modo='exato', lote=LOTE_FRACIONARIO, pesos=None):
+    """Quantidades inteiras de ações para cada preço, segundo o modo escolhido."""
+    if modo == 'guloso':
+        return alocar_guloso(precos, dinheiro, lote)
+    if modo == 'balanceado':
+        return alocar_balanceado(precos, dinheiro, lote)
+    if modo == 'exato':
+        return alocar_exato(precos, dinheiro, lote, pesos)
+    raise ValueError(f"Modo de alocação inválido: {modo} (use um de {', '.join(MODOS)})")
+
+
+# --- VÁRIOS ORÇAMENTOS DE UMA VEZ ---
+# Guloso e balanceado percorrem os ativos uma vez com o saldo de todos os
+# orçamentos num vetor; o exato resolve um knapsack por orçamento.
+
+def alocar_guloso_orcamentos(precos, orcamentos, lote=LOTE_FRACIONARIO):
+    """alocar_guloso para cada orçamento: matriz orçamentos x ativos."""
+    custos = _custos_lote(precos, lote)
+    saldos = _centavos(orcamentos).reshape(-1)
+    lotes = np.zeros((len(saldos), len(custos)), dtype=np.int64)
+    for i, custo in enumerate(custos):
+        if custo <= 0:
+            continue
+        compra = custo <= saldos
+        lotes[:, i] = compra
+        saldos = saldos - compra * custo
+    return lotes * int(lote)
+
+
+def alocar_balanceado_orcamentos(precos, orcamentos, lote=LOTE_FRACIONARIO):
+    """alocar_balanceado para cada orçamento: matriz orçamentos x ativos."""
+    custos = _custos_lote(precos, lote)
+    orcamentos = _centavos(orcamentos).reshape(-1)
+    if len(custos) == 0:
+        return np.zeros((len(orcamentos), 0), dtype=np.int64)
+    fatias = orcamentos // len(custos)
+    lotes = np.where(custos > 0, fatias[:, None] // np.maximum(custos, 1), 0)
+
+    saldos = orcamentos - lotes @ custos
+    for i in range(len(custos)):
+        extra = np.where(lotes[:, i] > 0, saldos // max(custos[i], 1), 0)
+        lotes[:, i] += extra
+        saldos -= extra * custos[i]
+    return lotes * int(lote)
+
+
+def alocar_orcamentos(precos, orcamentos, modo='exato', lote=LOTE_FRACIONARIO, pesos=None):
+    """Quantidades de 'alocar' para cada orçamento: matriz orçamentos x ativos."""
+    if modo == 'guloso':
+        return alocar_guloso_orcamentos(precos, orcamentos, lote)
+    if modo == 'balanceado':
+        return alocar_balanceado_orcamentos(precos, orcamentos, lote)
+    if modo == 'exato':
+        orcamentos = np.asarray(orcamentos, dtype=float).reshape(-1)
+        return np.array([alocar_exato(precos, d, lote, pesos) for d in orcamentos],
+                        dtype=np.int64).reshape(len(orcamentos), len(np.asarray(precos)))
+    raise ValueError(f"Modo de alocação inválido: {modo} (use um de {', '.join(MODOS)})")
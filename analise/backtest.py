@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+from analise.compacto import SnapshotsCompactos
+from analise.pontuacao import mascara_graham_permissivo, pontos_ranking
+
+# --- BACKTEST VETORIZADO (LOLLAPALOOZA) ---
+# Reproduz a estratégia do lollapalooza_b3 sobre uma série de snapshots de
+# fundamentos e uma matriz de preços. Filtro do Stage 1, score do Stage 3 e
+# pesos da carteira são calculados para todas as datas de rebalanceamento
+# de uma vez, como matrizes datas x tickers; nenhum laço passa por ticker.
+#
+# Em cada rebalanceamento vale o snapshot mais recente até aquela data (sem
+# olhar o futuro). LPA e VPA vêm do snapshot e os indicadores que dependem do
+# preço (P/L, P/VP, DY, margem de Graham) são recalculados com o fechamento
+# do dia, como se o Fundamentus tivesse sido baixado naquele pregão.
+
+FREQUENCIAS = {'mensal': 'M', 'trimestral': 'Q'}
+PERIODOS_POR_ANO = {'mensal': 12, 'trimestral': 4}
+LIQUIDEZ_MINIMA = 1_000_000
+SCORE_MINIMO = 40  # mesmo corte de montar_carteira_real
+TOP = 15           # máximo de ativos na carteira (modo capital maior)
+COLUNAS_FUNDAMENTOS = ['cotacao', 'pl', 'pvp', 'dy', 'roe', 'c5y', 'liq2m', 'patrim_liq', 'div_bruta', 'ignore_solvencia']
+
+
+def _sem_sufixo(tickers):
+    return pd.Index(tickers).astype(str).str.upper().str.replace('.SA', '', regex=False)
+
+
+def datas_rebalanceamento(datas, frequencia='mensal'):
+    """Último pregão de cada mês (ou trimestre) presente em 'datas'."""
+    if frequencia not in FREQUENCIAS:
+        raise ValueError(f"Frequência inválida: {frequencia} (use um de {', '.join(FREQUENCIAS)})")
+    datas = pd.DatetimeIndex(datas)
+    if datas.empty:
+        return datas
+    ultimos = pd.Series(datas, index=datas).groupby(datas.to_period(FREQUENCIAS[frequencia])).max()
+    return pd.DatetimeIndex(ultimos.to_numpy(), name=datas.name)
+
+
+def painel_fundamentos(snapshots, tickers):
+    """
+    Empilha os snapshots (lista de (data, tabela normalizada), como os de
+    SnapshotStore.todos) em matrizes snapshots x tickers, uma por coluna.
+    Devolve (datas ordenadas, dict coluna -> matriz, máscara de presença).
+    Com SnapshotsCompactos as matrizes saem direto dos arrays guardados.
+    """
+    if isinstance(snapshots, SnapshotsCompactos):
+        return snapshots.painel(COLUNAS_FUNDAMENTOS, tickers, _sem_sufixo)
+    snapshots = sorted(((pd.Timestamp(d), df) for d, df in snapshots), key=lambda s: s[0])
+    bloco = np.zeros((len(COLUNAS_FUNDAMENTOS), len(snapshots), len(tickers)))
+    presente = np.zeros((len(snapshots), len(tickers)), dtype=bool)
+    for i, (_, df) in enumerate(snapshots):
+        pos = tickers.get_indexer(_sem_sufixo(df.index))
+        ok = pos >= 0
+        presente[i, pos[ok]] = True
+        # Colunas ausentes no snapshot ficam 0, como em normalizar_acoes
+        valores = df.reindex(columns=COLUNAS_FUNDAMENTOS).astype(float).fillna(0).to_numpy()
+        bloco[:, i, pos[ok]] = valores[ok].T
+    painel = dict(zip(COLUNAS_FUNDAMENTOS, bloco))
+    return pd.DatetimeIndex([d for d, _ in snapshots]), painel, presente
+
+
+def reprecificar(fundamentos, precos):
+    """
+    Indicadores no formato de obter_dados_base com o preço de cada
+    rebalanceamento: LPA e VPA do snapshot, P/L, P/VP e DY pelo preço novo.
+    """
+    cotacao_snap = fundamentos['cotacao']
+    pl, pvp, dy = fundamentos['pl'], fundamentos['pvp'], fundamentos['dy']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lpa = np.where(pl > 0, cotacao_snap / pl, 0.0)
+        vpa = np.where(pvp > 0, cotacao_snap / pvp, 0.0)
+        dados = dict(fundamentos)
+        dados.update({
+            'cotacao': precos,
+            'lpa': lpa,
+            'vpa': vpa,
+            'pl': np.where(lpa > 0, precos / lpa, pl),
+            'pvp': np.where(vpa > 0, precos / vpa, pvp),
+            'dy': np.where(cotacao_snap > 0, dy * cotacao_snap / precos, dy),
+        })
+    dados['ignore_solvencia'] = fundamentos['ignore_solvencia'] > 0
+    return dados
+
+
+def pesos_carteira(score, precos, elegivel, top=TOP, score_minimo=SCORE_MINIMO, peso_por_score=False):
+    """
+    Pesos de cada rebalanceamento (linhas): os 'top' maiores Scores acima do
+    corte, desempatando pelo menor preço como em stage_3_ranking_final, com
+    peso igual ou proporcional ao Score. Linhas sem aprovados ficam em caixa.
+    """
+    aprovado = elegivel & (score >= score_minimo)
+    chave_score = np.where(aprovado, -score, 1)
+    chave_preco = np.where(aprovado, precos, np.inf)
+    ordem = np.lexsort((chave_preco, chave_score))
+    posicao = np.empty_like(ordem)
+    np.put_along_axis(posicao, ordem, np.arange(ordem.shape[-1]), axis=-1)
+    escolhido = aprovado & (posicao < top)
+
+    base = np.where(escolhido, score if peso_por_score else 1.0, 0.0)
+    total = base.sum(axis=1, keepdims=True)
+    return np.divide(base, total, out=np.zeros_like(base), where=total > 0)
+
+
+class ResultadoBacktest:
+    """
+    Resultado de rodar_backtest: 'periodos' (uma linha por rebalanceamento,
+    com retornos, turnover e dividendos), 'pesos' e 'scores' (datas x
+    tickers) e a frequência usada.
+    """
+
+    def __init__(self, periodos, pesos, scores, frequencia):
+        self.periodos = periodos
+        self.pesos = pesos
+        self.scores = scores
+        self.frequencia = frequencia
+
+    def resumo(self):
+        """Métricas agregadas do período inteiro."""
+        p = self.periodos
+        if p.empty:
+            return {}
+        capital = p['valor_inicio'].iloc[0]
+        anos = max((p['fim'].iloc[-1] - p.index[0]).days / 365.25, 1e-9)
+        valor_final = p['valor_fim'].iloc[-1]
+        pico = np.maximum.accumulate(np.concatenate([[capital], p['valor_fim'].to_numpy()]))
+        drawdown = np.concatenate([[capital], p['valor_fim'].to_numpy()]) / pico - 1
+        return {
+            'inicio': p.index[0].date().isoformat(),
+            'fim': p['fim'].iloc[-1].date().isoformat(),
+            'rebalanceamentos': len(p),
+            'retorno_total': float(valor_final / capital - 1),
+            'cagr': float((valor_final / capital) ** (1 / anos) - 1),
+            'volatilidade': float(p['retorno'].std(ddof=1) * np.sqrt(PERIODOS_POR_ANO[self.frequencia])) if len(p) > 1 else 0.0,
+            'max_drawdown': float(drawdown.min()),
+            'turnover_medio': float(p['turnover'].mean()),
+            'dividendos_total': float(p['dividendos'].sum()),
+            'dividend_yield_anual': float(p['retorno_dividendos'].sum() / anos),
+            'ativos_medio': float(p['ativos'].mean()),
+        }
+
+
+def rodar_backtest(snapshots, fechamentos, dividendos=None, frequencia='mensal', top=TOP,
+                   score_minimo=SCORE_MINIMO, peso_por_score=False, liquidez_minima=LIQUIDEZ_MINIMA,
+                   excluidos=(), custo=0.0, capital=1.0):
+    """
+    Backtest da estratégia Lollapalooza.
+
+    'snapshots' é uma lista de (data, tabela normalizada do Fundamentus);
+    'fechamentos' e 'dividendos' são matrizes datas x tickers de preços
+    brutos (não ajustados) e proventos por ação, como as de
+    HistoricoStore.ler_fechamentos(ajustado=False) e ler_dividendos. Os
+    tickers podem vir com ou sem '.SA'.
+
+    A carteira usa pesos fracionários (sem lotes inteiros); os dividendos
+    ficam em caixa até o próximo rebalanceamento e 'custo' é cobrado sobre o
+    turnover (fração do patrimônio negociada, compra ou venda).
+    """
+    fechamentos = fechamentos.set_axis(_sem_sufixo(fechamentos.columns), axis=1)
+    datas_snap, painel, presente = painel_fundamentos(snapshots, fechamentos.columns)
+
+    # Rebalanceamentos com pelo menos um snapshot disponível
+    reb = datas_rebalanceamento(fechamentos.index, frequencia)
+    qual_snap = np.searchsorted(datas_snap.to_numpy(), reb.to_numpy(), side='right') - 1
+    reb, qual_snap = reb[qual_snap >= 0], qual_snap[qual_snap >= 0]
+    colunas = fechamentos.columns
+    if len(reb) == 0:
+        vazio = pd.DataFrame(index=pd.DatetimeIndex([], name='data'), columns=colunas, dtype=float)
+        return ResultadoBacktest(pd.DataFrame(), vazio, vazio, frequencia)
+
+    # Fim de cada período: o próximo rebalanceamento ou o último pregão
+    linhas = fechamentos.index.get_indexer(reb)
+    fins = np.append(linhas[1:], len(fechamentos) - 1)
+
+    matriz = fechamentos.ffill().to_numpy(dtype=float)
+    precos = matriz[linhas]
+    precos_fim = matriz[fins]
+    if dividendos is None:
+        acumulado = np.zeros_like(matriz)
+    else:
+        dividendos = dividendos.set_axis(_sem_sufixo(dividendos.columns), axis=1)
+        acumulado = dividendos.reindex(index=fechamentos.index, columns=colunas).fillna(0).cumsum().to_numpy(dtype=float)
+    proventos = acumulado[fins] - acumulado[linhas]
+
+    # Stage 1 e Stage 3 para todas as datas de uma vez
+    dados = reprecificar({c: m[qual_snap] for c, m in painel.items()}, precos)
+    negociavel = presente[qual_snap] & np.isfinite(precos) & (precos > 0)
+    negociavel &= dados['liq2m'] > liquidez_minima
+    negociavel &= ~colunas.isin(list(excluidos))
+    with np.errstate(invalid='ignore'):
+        elegivel = negociavel & mascara_graham_permissivo(dados)
+    score = pontos_ranking(dados)
+    pesos = pesos_carteira(score, precos, elegivel, top, score_minimo, peso_por_score)
+
+    # Retornos do período, separando preço e proventos
+    investido = pesos > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_preco = np.where(investido, precos_fim / precos - 1, 0.0)
+        r_prov = np.where(investido, proventos / precos, 0.0)
+    retorno_preco = (pesos * r_preco).sum(axis=1)
+    retorno_prov = (pesos * r_prov).sum(axis=1)
+    bruto = retorno_preco + retorno_prov
+
+    # Turnover: pesos-alvo contra os pesos que derivaram no período anterior
+    # (o caixa entra como mais uma posição, então a compra inicial vale 1)
+    caixa = 1 - pesos.sum(axis=1)
+    alvo = np.column_stack([pesos, caixa])
+    derivado = np.column_stack([pesos * (1 + r_preco), caixa + retorno_prov]) / (1 + bruto)[:, None]
+    anterior = np.vstack([np.eye(1, alvo.shape[1], alvo.shape[1] - 1), derivado[:-1]])
+    turnover = 0.5 * np.abs(alvo - anterior).sum(axis=1)
+
+    retorno = bruto - custo * turnover
+    valor_fim = capital * np.cumprod(1 + retorno)
+    valor_inicio = np.append(capital, valor_fim[:-1])
+
+    periodos = pd.DataFrame({
+        'fim': fechamentos.index[fins],
+        'ativos': investido.sum(axis=1),
+        'retorno': retorno,
+        'retorno_preco': retorno_preco,
+        'retorno_dividendos': retorno_prov,
+        'turnover': turnover,
+        'valor_inicio': valor_inicio,
+        'valor_fim': valor_fim,
+        'dividendos': valor_inicio * retorno_prov,
+    }, index=pd.DatetimeIndex(reb, name='data'))
+    return ResultadoBacktest(
+        periodos,
+        pd.DataFrame(pesos, index=periodos.index, columns=colunas),
+        pd.DataFrame(np.where(elegivel, score, 0), index=periodos.index, columns=colunas),
+        frequencia,
+    )
@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+
+# --- REPRESENTAÇÃO COMPACTA (memória) ---
+# Tabelas do Fundamentus e séries de snapshots com tipos enxutos: textos
+# repetidos (segmento, setor, tipo, perfil) viram categorias, indicadores
+# viram float32 e, nos snapshots empilhados, cada ticker vira um id
+# inteiro. Preços, LPA/VPA, patrimônio e dívida continuam em float64: entram
+# em contas (P/L, Graham, dívida/patrimônio, custo em centavos) em que os ~7
+# dígitos do float32 mudariam resultados. Liquidez e valor de mercado só são
+# comparados com limites e ficam em float32.
+#
+# Limites escritos como float do Python (dy >= 0.06) continuam exatos sobre
+# colunas float32: o NumPy converte o limite para float32 antes de comparar.
+
+CATEGORIAS = ('segmento', 'setor', 'tipo', 'perfil')
+PRECISAO_DUPLA = ('cotacao', 'preco', 'preco_base', 'lpa', 'vpa', 'patrim_liq', 'div_bruta')
+
+
+def _tipo_compacto(coluna, tipo, categorias, precisao_dupla):
+    if coluna in categorias:
+        return None if isinstance(tipo, pd.CategoricalDtype) else 'category'
+    if tipo == np.float64 and coluna not in precisao_dupla:
+        return np.float32
+    return None
+
+
+def como_float(valores):
+    """
+    Array de ponto flutuante sem promover float32 para float64: promovido,
+    0.06 em float32 vira 0.0599999986... e deixa de passar em dy >= 0.06.
+    """
+    valores = np.asarray(valores)
+    return valores if valores.dtype.kind == 'f' else valores.astype(float)
+
+
+def compactar(df, categorias=CATEGORIAS, precisao_dupla=PRECISAO_DUPLA):
+    """
+    Cópia de 'df' com as colunas de texto repetido como categorias e as
+    float64 fora de PRECISAO_DUPLA como float32. Idempotente.
+    """
+    tipos = {}
+    for coluna, tipo in df.dtypes.items():
+        novo = _tipo_compacto(coluna, tipo, categorias, precisao_dupla)
+        if novo is not None:
+            tipos[coluna] = novo
+    return df.astype(tipos) if tipos else df
+
+
+def memoria(df):
+    """Bytes ocupados por um DataFrame, contando o conteúdo das strings."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def formatar_bytes(n):
+    for unidade in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f"{n:.0f} {unidade}" if unidade == 'B' else f"{n:.1f} {unidade}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+class Vocabulario:
+    """Textos <-> ids inteiros, na ordem em que aparecem (só cresce)."""
+
+    def __init__(self, tipo=np.int32):
+        self.tipo = tipo
+        self.indice = pd.Index([], dtype=object)
+
+    def __len__(self):
+        return len(self.indice)
+
+    def ids(self, textos):
+        textos = pd.Index(textos, dtype=object)
+        pos = self.indice.get_indexer(textos)
+        faltando = pos < 0
+        if faltando.any():
+            self.indice = self.indice.append(pd.Index(pd.unique(textos[faltando]), dtype=object))
+            pos = self.indice.get_indexer(textos)
+        return pos.astype(self.tipo)
+
+    def textos(self, ids):
+        return self.indice.to_numpy()[ids]
+
+
+class SnapshotsCompactos:
+    """
+    Vários snapshots da mesma tabela empilhados em arrays contíguos: uma
+    linha por (snapshot, ticker), com o id inteiro do ticker e cada coluna
+    num único array (float32, float64 para PRECISAO_DUPLA, bool, ou códigos
+    int16 para categorias). O snapshot de cada linha sai de onde ele começa.
+
+    Iterar devolve (data, DataFrame compacto) como SnapshotStore.todos, então
+    serve direto para rodar_backtest; painel() monta as matrizes snapshots x
+    tickers sem passar por DataFrames.
+    """
+
+    def __init__(self, snapshots=(), categorias=CATEGORIAS, precisao_dupla=PRECISAO_DUPLA):
+        self.categorias = categorias
+        self.precisao_dupla = precisao_dupla
+        self.tickers = Vocabulario()
+        self.vocabularios = {}
+        self.tipos = {}
+        self.nome_indice = None
+        self.datas = []
+        self._partes = []
+        self._ids = np.zeros(0, dtype=np.int32)
+        self._inicios = np.zeros(1, dtype=np.int64)
+        self._colunas = {}
+        for data, df in snapshots:
+            self.adicionar(data, df)
+
+    def __len__(self):
+        return len(self.datas)
+
+    def adicionar(self, data, df):
+        """Acrescenta um snapshot; as colunas são fixadas pelo primeiro."""
+        if not self.tipos:
+            self.nome_indice = df.index.name
+            for coluna, tipo in df.dtypes.items():
+                if coluna in self.categorias or tipo == object or isinstance(tipo, (pd.CategoricalDtype, pd.StringDtype)):
+                    self.tipos[coluna] = 'category'
+                    self.vocabularios[coluna] = Vocabulario(np.int16)
+                elif tipo == bool:
+                    self.tipos[coluna] = np.dtype(bool)
+                elif coluna in self.precisao_dupla:
+                    self.tipos[coluna] = np.dtype(np.float64)
+                else:
+                    self.tipos[coluna] = np.dtype(np.float32)
+
+        partes = {'__ids__': self.tickers.ids(df.index)}
+        for coluna, tipo in self.tipos.items():
+            if coluna not in df.columns:
+                valores = np.full(len(df), -1 if tipo == 'category' else 0, dtype=np.int16 if tipo == 'category' else tipo)
+            elif tipo == 'category':
+                serie = df[coluna]
+                nulos = serie.isna().to_numpy()
+                valores = np.full(len(df), -1, dtype=np.int16)
+                valores[~nulos] = self.vocabularios[coluna].ids(serie[~nulos].astype(object))
+            else:
+                valores = df[coluna].to_numpy(dtype=tipo, na_value=0 if tipo == bool else np.nan)
+            partes[coluna] = valores
+        self._partes.append(partes)
+        self.datas.append(pd.Timestamp(data))
+
+    def _consolidar(self):
+        """Junta os snapshots acrescentados aos arrays contíguos."""
+        if not self._partes:
+            return
+        tamanhos = [len(p['__ids__']) for p in self._partes]
+        self._ids = np.concatenate([self._ids] + [p['__ids__'] for p in self._partes])
+        self._inicios = np.append(self._inicios, self._inicios[-1] + np.cumsum(tamanhos))
+        for coluna in self.tipos:
+            anteriores = self._colunas.get(coluna, np.zeros(0, dtype=self._partes[0][coluna].dtype))
+            self._colunas[coluna] = np.concatenate([anteriores] + [p[coluna] for p in self._partes])
+        self._partes = []
+
+    def memoria(self):
+        """Bytes dos arrays (ids, inícios e colunas) e dos vocabulários."""
+        self._consolidar()
+        arrays = [self._ids, self._inicios, *self._colunas.values()]
+        vocabularios = [self.tickers.indice, *(v.indice for v in self.vocabularios.values())]
+        return sum(a.nbytes for a in arrays) + sum(v.memory_usage(deep=True) for v in vocabularios)
+
+    def quadro(self, i):
+        """Snapshot i como DataFrame compacto (índice = tickers)."""
+        self._consolidar()
+        trecho = slice(self._inicios[i], self._inicios[i + 1])
+        colunas = {}
+        for coluna, tipo in self.tipos.items():
+            valores = self._colunas[coluna][trecho]
+            if tipo == 'category':
+                vocabulario = self.vocabularios[coluna]
+                valores = pd.Categorical.from_codes(valores, categories=vocabulario.indice.astype(str))
+            colunas[coluna] = valores
+        indice = pd.Index(self.tickers.textos(self._ids[trecho]), name=self.nome_indice)
+        return pd.DataFrame(colunas, index=indice)
+
+    def __iter__(self):
+        for i, data in enumerate(self.datas):
+            yield data, self.quadro(i)
+
+    def painel(self, colunas, tickers, normalizar=None):
+        """
+        (datas ordenadas, dict coluna -> matriz snapshots x tickers,
+        presença), no formato de backtest.painel_fundamentos. 'normalizar'
+        transforma os nomes guardados antes de casar com 'tickers'.
+        Colunas ausentes ficam 0; as matrizes mantêm o tipo guardado.
+        """
+        self._consolidar()
+        ordem = np.argsort(np.array(self.datas, dtype='datetime64[ns]'), kind='stable')
+        linha_do_snapshot = np.empty(len(ordem), dtype=np.int64)
+        linha_do_snapshot[ordem] = np.arange(len(ordem))
+
+        nomes = self.tickers.indice if normalizar is None else normalizar(self.tickers.indice)
+        coluna_do_ticker = pd.Index(tickers).get_indexer(nomes)
+        j = coluna_do_ticker[self._ids]
+        ok = j >= 0
+        snapshot = np.repeat(np.arange(len(self.datas)), np.diff(self._inicios))
+        i = linha_do_snapshot[snapshot[ok]]
+        j = j[ok]
+
+        forma = (len(self.datas), len(tickers))
+        presente = np.zeros(forma, dtype=bool)
+        presente[i, j] = True
+        painel = {}
+        for coluna in colunas:
+            tipo = self.tipos.get(coluna)
+            if tipo is None or tipo == 'category':
+                painel[coluna] = np.zeros(forma)
+                continue
+            matriz = np.zeros(forma, dtype=tipo)
+            valores = self._colunas[coluna][ok]
+            matriz[i, j] = valores if tipo == bool else np.where(np.isnan(valores), 0, valores)
+            painel[coluna] = matriz
+        datas = pd.DatetimeIndex(np.array(self.datas, dtype='datetime64[ns]')[ordem])
+        return datas, painel, presente
@@ -0,0 +1,310 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from analise import rastro
+from analise.compacto import compactar
+
+# --- FUNDAMENTOS DETALHADOS (séries anuais por empresa) ---
+# fundamentus.get_resultado() só tem o resumo de um período; as métricas de
+# vários anos da especificação (ROE/ROIC médios, anos de lucro seguidos,
+# dívida líquida/EBITDA) saem dos demonstrativos anuais de cada empresa.
+#
+# Cada demonstrativo fica guardado no SQLite por (ticker, data do balanço) e
+# nada é apagado: o histórico cresce a cada balanço novo, além da janela que
+# a fonte devolve. Um ticker só volta à fonte quando nunca foi consultado ou
+# quando o próximo balanço anual já deveria ter saído (e a última consulta
+# tem mais de REVERIFICAR dias). As consultas rodam num pool pequeno de
+# threads, espaçadas por um limitador de taxa e com novas tentativas em
+# caso de erro de rede; a gravação no SQLite fica na thread principal.
+
+ARQUIVO_PADRAO = os.path.join('dados', 'detalhes.sqlite')
+MAX_TRABALHADORES = 4         # consultas simultâneas
+REQUISICOES_POR_SEGUNDO = 2.0  # teto de requisições à fonte, somando todas as threads
+TENTATIVAS = 3                 # tentativas por ticker antes de desistir nesta execução
+ESPERA_BASE = 1.0              # segundos antes da 2ª tentativa (dobra a cada uma)
+PRAZO_BALANCO = 365 + 90       # dias depois do último balanço anual em que o próximo já deve existir
+REVERIFICAR = 7                # dias entre consultas de quem está com o balanço atrasado
+ANOS_MEDIA = 5
+ALIQUOTA_IR = 0.34             # IR + CSLL, para o NOPAT do ROIC
+
+CAMPOS = ['lucro_liquido', 'patrimonio', 'ebit', 'ebitda', 'capital_investido', 'divida_bruta', 'caixa',
+          'ativo_circulante', 'passivo_circulante']
+METRICAS = ['roe_medio_5a', 'roic_medio_5a', 'anos_lucro_consecutivos', 'anos_balancos', 'divida_liquida_ebitda',
+            'divida_liquida', 'liquidez_corrente']
+
+# Linhas dos demonstrativos do Yahoo (chaves sem formatação) -> campo
+LINHAS_YAHOO = {
+    'NetIncome': 'lucro_liquido',
+    'EBIT': 'ebit',
+    'EBITDA': 'ebitda',
+    'StockholdersEquity': 'patrimonio',
+    'InvestedCapital': 'capital_investido',
+    'TotalDebt': 'divida_bruta',
+    'CashAndCashEquivalents': 'caixa',
+    'CurrentAssets': 'ativo_circulante',
+    'CurrentLiabilities': 'passivo_circulante',
+}
+# Erros de programação não melhoram tentando de novo
+SEM_NOVA_TENTATIVA = (AttributeError, TypeError, KeyError, ValueError, NotImplementedError)
+
+
+class LimitadorTaxa:
+    """Espaça as requisições de todas as threads em pelo menos 1/por_segundo segundos."""
+
+    def __init__(self, por_segundo=REQUISICOES_POR_SEGUNDO):
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0.0
+        self._proxima = 0.0
+        self._trava = threading.Lock()
+
+    def esperar(self):
+        with self._trava:
+            agora = time.monotonic()
+            vez = max(agora, self._proxima)
+            self._proxima = vez + self.intervalo
+        if vez > agora:
+            time.sleep(vez - agora)
+
+
+def com_tentativas(funcao, *args, tentativas=TENTATIVAS, espera_base=ESPERA_BASE):
+    """
+    Chama funcao(*args) até 'tentativas' vezes, esperando espera_base * 2^k
+    (com variação aleatória de ±50%) entre elas. A última falha é relançada.
+    """
+    for k in range(tentativas):
+        try:
+            return funcao(*args)
+        except SEM_NOVA_TENTATIVA:
+            raise
+        except Exception:
+            if k == tentativas - 1:
+                raise
+            time.sleep(espera_base * 2 ** k * random.uniform(0.5, 1.5))
+
+
+def _anual(demonstrativo):
+    """Demonstrativo (linhas x datas) do Yahoo como DataFrame datas x CAMPOS presentes."""
+    if demonstrativo is None or demonstrativo.empty:
+        return pd.DataFrame()
+    linhas = demonstrativo.reindex([l for l in LINHAS_YAHOO if l in demonstrativo.index])
+    df = linhas.rename(index=LINHAS_YAHOO).T
+    df.index = pd.to_datetime(df.index)
+    return df.apply(pd.to_numeric, errors='coerce')
+
+
+def baixar_yahoo(ticker, limitador):
+    """
+    Demonstrativos anuais (DRE e balanço) de um ticker da B3 no Yahoo, como
+    DataFrame indexado pela data do balanço com as colunas de CAMPOS.
+    """
+    import yfinance as yf
+
+    empresa = yf.Ticker(f"{ticker}.SA")
+    limitador.esperar()
+    dre = _anual(empresa.get_income_stmt(as_dict=False, pretty=False, freq='yearly'))
+    limitador.esperar()
+    balanco = _anual(empresa.get_balance_sheet(as_dict=False, pretty=False, freq='yearly'))
+    return dre.combine_first(balanco).reindex(columns=CAMPOS).sort_index()
+
+
+def calcular_metricas(anual):
+    """
+    Métricas de vários anos a partir dos demonstrativos guardados (colunas
+    ticker, data e CAMPOS), uma linha por ticker, em fração como a base:
+    roe_medio_5a e roic_medio_5a (média dos até ANOS_MEDIA balanços mais
+    recentes com dado), anos_lucro_consecutivos (do último balanço para trás,
+    dentro do histórico guardado), anos_balancos (quantos balanços anuais
+    estão guardados, o teto de anos_lucro_consecutivos), divida_liquida_ebitda,
+    divida_liquida e liquidez_corrente do último balanço.
+    """
+    anual = anual.dropna(subset=CAMPOS, how='all')
+    if anual.empty:
+        return pd.DataFrame(columns=METRICAS, dtype=float)
+    # Colunas pela idade do balanço (0 = mais recente): empresas com anos
+    # fiscais diferentes ficam alinhadas pelo último balanço de cada uma
+    idade = anual.groupby('ticker').cumcount(ascending=False)
+    painel = anual.assign(idade=idade).pivot(index='ticker', columns='idade')
+    matriz = {c: painel[c].to_numpy(dtype=float) for c in CAMPOS}
+    recentes = np.arange(matriz['lucro_liquido'].shape[1]) < ANOS_MEDIA
+
+    lucro, patrimonio, capital = matriz['lucro_liquido'], matriz['patrimonio'], matriz['capital_investido']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        roe = np.where(patrimonio > 0, lucro / patrimonio, np.nan)[:, recentes]
+        roic = np.where(capital > 0, matriz['ebit'] * (1 - ALIQUOTA_IR) / capital, np.nan)[:, recentes]
+
+    # Anos de lucro seguidos: até o primeiro prejuízo (ou ano sem lucro informado)
+    com_lucro = np.nan_to_num(lucro, nan=-1) > 0
+    anos_lucro = np.where(com_lucro.all(axis=1), com_lucro.shape[1], np.argmin(com_lucro, axis=1))
+    balancos = anual.groupby('ticker').size().reindex(painel.index).to_numpy(dtype=float)
+
+    divida_liquida = matriz['divida_bruta'][:, 0] - np.nan_to_num(matriz['caixa'][:, 0])
+    ebitda = matriz['ebitda'][:, 0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # EBITDA zero ou negativo com dívida líquida positiva: alavancagem sem limite
+        divida_ebitda = np.where(ebitda > 0, divida_liquida / ebitda, np.where(divida_liquida > 0, np.inf, 0.0))
+    divida_ebitda = np.where(np.isnan(ebitda) | np.isnan(divida_liquida), np.nan, divida_ebitda)
+
+    passivo = matriz['passivo_circulante'][:, 0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        liquidez = np.where(passivo > 0, matriz['ativo_circulante'][:, 0] / passivo, np.nan)
+
+    def media(valores):
+        validos = ~np.isnan(valores)
+        quantos = validos.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(quantos > 0, np.where(validos, valores, 0).sum(axis=1) / quantos, np.nan)
+
+    return pd.DataFrame({
+        'roe_medio_5a': media(roe),
+        'roic_medio_5a': media(roic),
+        'anos_lucro_consecutivos': anos_lucro.astype(float),
+        'anos_balancos': balancos,
+        'divida_liquida_ebitda': divida_ebitda,
+        'divida_liquida': divida_liquida,
+        'liquidez_corrente': liquidez,
+    }, index=pd.Index(painel.index, name='papel'))
+
+
+class DetalhesStore:
+    """
+    Cache local dos demonstrativos anuais por (ticker, data do balanço),
+    com o horário da última consulta de cada ticker.
+    """
+
+    def __init__(self, caminho=ARQUIVO_PADRAO, baixar=baixar_yahoo, trabalhadores=MAX_TRABALHADORES,
+                 por_segundo=REQUISICOES_POR_SEGUNDO, tentativas=TENTATIVAS, espera_base=ESPERA_BASE):
+        self.caminho = caminho
+        self.baixar = baixar
+        self.trabalhadores = trabalhadores
+        self.limitador = LimitadorTaxa(por_segundo)
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute(f"""
+                CREATE TABLE IF NOT EXISTS anual (
+                    ticker TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    {', '.join(f'{c} REAL' for c in CAMPOS)},
+                    PRIMARY KEY (ticker, data)
+                )
+            """)
+            # Cache de uma versão com menos CAMPOS: colunas novas e todos os
+            # tickers de volta à fonte para preenchê-las
+            existentes = {linha[1] for linha in con.execute("PRAGMA table_info(anual)")}
+            novos = [c for c in CAMPOS if c not in existentes]
+            for c in novos:
+                con.execute(f"ALTER TABLE anual ADD COLUMN {c} REAL")
+            if novos:
+                con.execute("DROP TABLE IF EXISTS consultas")
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS consultas (
+                    ticker TEXT PRIMARY KEY,
+                    consultado_em REAL NOT NULL
+                )
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho)
+
+    def _pendentes(self, tickers, agora):
+        """Tickers que precisam ir à fonte: nunca consultados ou com balanço anual novo esperado."""
+        with self._conectar() as con:
+            linhas = con.execute(
+                f"SELECT c.ticker, c.consultado_em, MAX(a.data) FROM consultas c LEFT JOIN anual a ON a.ticker = c.ticker "
+                f"WHERE c.ticker IN ({','.join('?' * len(tickers))}) GROUP BY c.ticker",
+                list(tickers),
+            ).fetchall()
+        conhecidos = {t: (consultado, ultimo) for t, consultado, ultimo in linhas}
+        pendentes = []
+        for t in tickers:
+            if t not in conhecidos:
+                pendentes.append(t)
+                continue
+            consultado, ultimo = conhecidos[t]
+            esperado = pd.Timestamp(ultimo).timestamp() + PRAZO_BALANCO * 86400 if ultimo else 0
+            if agora >= esperado and agora - consultado > REVERIFICAR * 86400:
+                pendentes.append(t)
+        return pendentes
+
+    def _gravar(self, t, anual, agora):
+        registros = [
+            (t, d.strftime('%Y-%m-%d'), *(None if pd.isna(v) else float(v) for v in valores))
+            for d, valores in zip(anual.index, anual.reindex(columns=CAMPOS).to_numpy())
+        ]
+        with self._conectar() as con:
+            con.executemany(f"INSERT OR REPLACE INTO anual VALUES ({', '.join('?' * (len(CAMPOS) + 2))})", registros)
+            con.execute("INSERT OR REPLACE INTO consultas VALUES (?, ?)", (t, agora))
+
+    def _consultar(self, t):
+        return com_tentativas(self.baixar, t, self.limitador, tentativas=self.tentativas, espera_base=self.espera_base)
+
+    def atualizar(self, tickers):
+        """
+        Consulta a fonte para os tickers pendentes (ver _pendentes) e grava
+        os balanços recebidos. Ticker que falhou em todas as tentativas não é
+        marcado como consultado: volta na próxima execução. Devolve quantos
+        tickers foram consultados com sucesso.
+        """
+        agora = time.time()
+        pendentes = self._pendentes(list(tickers), agora)
+        rastro.contar('detalhes', acerto=True, n=len(tickers) - len(pendentes))
+        rastro.contar('detalhes', acerto=False, n=len(pendentes))
+        if not pendentes:
+            return 0
+
+        print(f"📑 Buscando demonstrativos de {len(pendentes)} empresas ({self.trabalhadores} conexões)...")
+        feitos = 0
+        with rastro.etapa('detalhes.baixar', linhas=len(pendentes), conexoes=self.trabalhadores) as e:
+            with ThreadPoolExecutor(max_workers=self.trabalhadores) as pool:
+                futuros = {pool.submit(self._consultar, t): t for t in pendentes}
+                for futuro in as_completed(futuros):
+                    t = futuros[futuro]
+                    try:
+                        anual = futuro.result()
+                    except Exception as erro:
+                        print(f"❌ Erro nos demonstrativos de {t}: {erro}")
+                        continue
+                    self._gravar(t, anual, agora)
+                    feitos += 1
+            e.saida(feitos)
+        return feitos
+
+    def ler(self, tickers):
+        """Demonstrativos guardados dos tickers (colunas ticker, data e CAMPOS)."""
+        tickers = list(tickers)
+        with self._conectar() as con:
+            df = pd.read_sql(
+                f"SELECT * FROM anual WHERE ticker IN ({','.join('?' * len(tickers))}) ORDER BY ticker, data",
+                con, params=tickers,
+            )
+        df['data'] = pd.to_datetime(df['data'])
+        return df
+
+    def metricas(self, tickers):
+        """
+        Métricas de METRICAS para os tickers (índice sem .SA, como a base),
+        buscando antes só o que estiver pendente. Ticker sem demonstrativos
+        fica com NaN, e quem usa as métricas cai na aproximação de um período.
+        """
+        tickers = list(tickers)
+        if not tickers:
+            return pd.DataFrame(columns=METRICAS, dtype=np.float32)
+        self.atualizar(tickers)
+        with rastro.etapa('detalhes.metricas', linhas=len(tickers)) as e:
+            metricas = calcular_metricas(self.ler(tickers)).reindex(pd.Index(tickers, name='papel'))
+            e.saida(int(metricas.notna().any(axis=1).sum()))
+        return compactar(metricas)
+
+
+def obter_detalhes(tickers, store=None):
+    store = store or DetalhesStore()
+    return store.metricas(tickers)
@@ -0,0 +1,154 @@
+import math
+
+import pandas as pd
+
+from analise import rastro
+from analise.compacto import compactar
+from analise.rede import cliente_padrao, requests_pelo_cliente
+from analise.snapshots import SnapshotStore
+
+# fundamentus, requests e o parser da tabela de FIIs (lxml) só são importados
+# quando um download acontece de fato: com snapshot válido nenhum deles carrega.
+#
+# As duas páginas passam pelo cliente HTTP compartilhado (analise/rede.py).
+# Com o snapshot vencido, mas guardado, a página é pedida de forma
+# condicional: se não mudou (304), o snapshot anterior é reaproveitado sem
+# baixar nem ler a tabela de novo.
+
+URL_ACOES = 'http://www.fundamentus.com.br/resultado.php'  # a mesma que o fundamentus.get_resultado usa
+URL_FIIS = 'https://www.fundamentus.com.br/fii_resultado.php'
+
+# --- NORMALIZAÇÃO DA TABELA DE AÇÕES (Fundamentus) ---
+MAPA_COLUNAS = {
+    'cotacao': 'cotacao', 'pl': 'pl', 'pvp': 'pvp',
+    'dy': 'dy', 'divyield': 'dy',
+    'liq2': 'liq2m', 'liq2m': 'liq2m',
+    'patrimliq': 'patrim_liq',
+    'divbrut': 'div_bruta_ratio',
+    'mrgliq': 'mrgliq', 'roe': 'roe', 'roic': 'roic', 'cresc': 'c5y'
+}
+
+def limpar_coluna(col_name):
+    return col_name.lower().replace('.', '').replace(' ', '').replace('/', '').replace('_', '')
+
+def normalizar_acoes(df):
+    """
+    Mapeamento de colunas, conversão numérica, ajuste de escala e
+    recuperação de patrimônio/dívida sobre a tabela crua do Fundamentus.
+    Não aplica filtros: é a tabela que vai para o snapshot.
+    """
+    novos_nomes = {}
+    for col in df.columns:
+        col_limpa = limpar_coluna(col)
+        for chave, valor in MAPA_COLUNAS.items():
+            if chave in col_limpa:
+                novos_nomes[col] = valor
+                break
+
+    df = df.rename(columns=novos_nomes)
+
+    for col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    # Ajuste de Escala
+    for col in ['dy', 'roe', 'roic', 'mrgliq', 'c5y', 'div_bruta_ratio']:
+        if col in df.columns and df[col].mean() > 5.0:
+            df[col] = df[col] / 100
+
+    # Recuperação de Dados
+    if 'patrim_liq' not in df.columns:
+        df['patrim_liq'] = 1.0
+        df['ignore_solvencia'] = True
+    else:
+        df['ignore_solvencia'] = False
+
+    if 'div_bruta_ratio' in df.columns:
+        df['div_bruta'] = df['div_bruta_ratio'] * df['patrim_liq']
+    else:
+        df['div_bruta'] = 0
+
+    return df
+
+def baixar_acoes(se_mudou=False):
+    """
+    Tabela normalizada de ações. Com se_mudou=True devolve None quando a
+    página do Fundamentus não mudou desde o último download.
+    """
+    import fundamentus
+    rastro.instrumentar_http()
+
+    cliente = cliente_padrao()
+    resposta = cliente.obter(URL_ACOES)
+    if se_mudou and resposta.nao_modificado:
+        return None
+    resposta.content  # lê (e guarda) a página inteira
+    # O get_resultado chama requests.get: desviado para o cliente, que
+    # entrega a página recém-guardada sem voltar à rede
+    with rastro.etapa('fundamentus.get_resultado') as e, requests_pelo_cliente(cliente):
+        bruto = fundamentus.get_resultado()
+        e.saida(len(bruto))
+    return normalizar_acoes(bruto)
+
+# --- FUNÇÃO MANUAL PARA FIIs (CORREÇÃO DO ERRO) ---
+def ler_fiis(conteudo):
+    """Tabela de FIIs padronizada a partir do HTML de fii_resultado.php."""
+    from analise.tabela_fiis import ler_tabela_fiis
+
+    # Parser dedicado: linha a linha e já com colunas tipadas,
+    # inclusive as porcentagens "10,5%" e os números "1.234,56"
+    df = ler_tabela_fiis(conteudo)
+    if df.empty:
+        return df
+
+    df['P_VP'] = df['P_VP'] / 100 if df['P_VP'].max() > 100 else df['P_VP'] # Ajuste se vier sem escala
+    
+    # Ajusta índice para ser igual ao da biblioteca (Ticker)
+    df.set_index('Papel', inplace=True)
+    
+    # Renomeia para padronizar com o código principal
+    df.rename(columns={
+        'Cotacao': 'cotacao', 
+        'Liquidez': 'liquidez', 
+        'DY': 'dy', 
+        'P_VP': 'p_vp',
+        'Segmento': 'segmento'
+    }, inplace=True)
+    
+    # Segmento como categoria e indicadores em float32 (ver analise/compacto.py)
+    return compactar(df)
+
+def listar_fiis_manual(se_mudou=False):
+    """
+    Busca a tabela de FIIs diretamente do site Fundamentus,
+    já que a biblioteca oficial falhou. Com se_mudou=True devolve None
+    quando a página não mudou desde o último download.
+    """
+    try:
+        # A tabela é lida enquanto a página chega, em pedaços de 64 KB
+        with rastro.etapa('fiis.download_e_leitura') as e, cliente_padrao().obter(URL_FIIS) as r:
+            r.raise_for_status()
+            if se_mudou and r.nao_modificado:
+                e.saida(0)
+                return None
+            df = ler_fiis(r.iter_content(chunk_size=64 * 1024))
+            e.saida(len(df))
+            return df
+        
+    except Exception as e:
+        print(f"⚠️ Erro ao buscar FIIs manualmente: {e}")
+        return pd.DataFrame()
+
+# --- ACESSO VIA SNAPSHOT LOCAL ---
+def _obter(tabela, baixar, store, forcar):
+    store = store or SnapshotStore()
+    # Só dá para aproveitar um 304 se existe snapshot anterior (de qualquer idade)
+    se_mudou = not forcar and store.ultimo(tabela, ttl=math.inf) is not None
+    return store.obter(tabela, lambda: baixar(se_mudou=se_mudou), forcar=forcar)
+
+def obter_acoes(store=None, forcar=False):
+    """Tabela normalizada de ações, do snapshot local se ainda estiver no TTL."""
+    return _obter('acoes', baixar_acoes, store, forcar)
+
+def obter_fiis(store=None, forcar=False):
+    """Tabela de FIIs de listar_fiis_manual, do snapshot local se ainda estiver no TTL."""
+    return _obter('fiis', listar_fiis_manual, store, forcar)
@@ -0,0 +1,317 @@
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise import rastro
+
+# --- CONFIGURAÇÕES ---
+ARQUIVO_PADRAO = os.path.join('dados', 'precos.sqlite')
+TTL_PADRAO = 60 * 60  # segundos sem voltar ao Yahoo para o mesmo ticker
+LOTE_PRAZO = 50       # tickers por download quando há prazo (lotes pequenos podem ser copiados e refeitos)
+MAX_CONEXOES = 8      # downloads simultâneos quando há prazo
+COLUNAS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+VAZIO = pd.DataFrame(columns=COLUNAS, index=pd.DatetimeIndex([], name='Date'), dtype=float)
+
+
+def separar_historicos(dados, tickers):
+    """
+    Quebra o DataFrame de yf.download(..., group_by='ticker') em um
+    histórico por ticker, sem as datas em que o ticker não negociou.
+    """
+    historicos = {}
+    for t in tickers:
+        if isinstance(dados.columns, pd.MultiIndex):
+            if t not in dados.columns.get_level_values(0):
+                continue
+            hist = dados[t]
+        else:
+            hist = dados
+        historicos[t] = hist.dropna(how='all')
+    return historicos
+
+
+def inicio_do_periodo(period, hoje=None):
+    """Converte o 'period' do Yahoo ('6mo', '1y', '5d', 'ytd', 'max') numa data inicial."""
+    hoje = pd.Timestamp(hoje or pd.Timestamp.today()).normalize()
+    if period == 'max':
+        return pd.Timestamp('1900-01-01')
+    if period == 'ytd':
+        return pd.Timestamp(year=hoje.year, month=1, day=1)
+    for sufixo, unidade in (('mo', 'months'), ('wk', 'weeks'), ('d', 'days'), ('y', 'years')):
+        if period.endswith(sufixo):
+            return hoje - pd.DateOffset(**{unidade: int(period[:-len(sufixo)])})
+    raise ValueError(f"Período não suportado: {period}")
+
+
+def ajustar_proventos(hist):
+    """
+    Reproduz o auto_adjust do Yahoo a partir das barras brutas: cada
+    dividendo desconta (1 - D / fechamento anterior) de todas as barras
+    anteriores à data ex. Desdobramentos já vêm aplicados no 'Close' bruto.
+    """
+    if hist.empty:
+        return hist[['Open', 'High', 'Low', 'Close', 'Volume']]
+    close = hist['Close'].to_numpy(dtype=float)
+    div = hist['Dividends'].fillna(0).to_numpy(dtype=float)
+    fator_evento = np.ones(len(hist))
+    eventos = np.flatnonzero(div[1:] > 0) + 1
+    fator_evento[eventos] = 1 - div[eventos] / close[eventos - 1]
+    # Fator da barra t = produto dos eventos estritamente posteriores a t
+    acumulado = np.cumprod(fator_evento[::-1])[::-1]
+    fator = np.append(acumulado[1:], 1.0)
+
+    ajustado = hist[['Open', 'High', 'Low', 'Close', 'Volume']].copy()
+    for col in ['Open', 'High', 'Low', 'Close']:
+        ajustado[col] = ajustado[col] * fator
+    return ajustado
+
+
+def ajustar_fechamentos(fechamentos, dividendos):
+    """
+    Mesmo ajuste de ajustar_proventos, feito de uma vez sobre matrizes
+    datas x tickers (NaN onde o ticker não negociou).
+    """
+    dividendos = dividendos.reindex_like(fechamentos).fillna(0)
+    anterior = fechamentos.ffill().shift(1)
+    eventos = (dividendos > 0) & anterior.notna()
+    fator_evento = (1 - dividendos / anterior).where(eventos, 1.0)
+    # Fator da barra t = produto dos eventos estritamente posteriores a t
+    acumulado = fator_evento.iloc[::-1].cumprod().iloc[::-1]
+    return fechamentos * acumulado.shift(-1).fillna(1.0)
+
+
+class HistoricoStore:
+    """
+    Cache local de barras diárias (OHLCV + proventos) por ticker e data.
+
+    Guarda os preços brutos e aplica o ajuste por proventos na leitura, para
+    que barras antigas e novas possam ser mescladas sem misturar bases de
+    ajuste. A cada execução só as barras posteriores à última data gravada
+    são pedidas ao Yahoo.
+    """
+
+    def __init__(self, caminho=ARQUIVO_PADRAO, ttl=TTL_PADRAO):
+        self.caminho = caminho
+        self.ttl = ttl
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS precos (
+                    ticker TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    dividends REAL, splits REAL,
+                    PRIMARY KEY (ticker, data)
+                )
+            """)
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS cobertura (
+                    ticker TEXT PRIMARY KEY,
+                    inicio TEXT NOT NULL,
+                    fim TEXT NOT NULL,
+                    buscado_em REAL NOT NULL
+                )
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho)
+
+    def _cobertura(self, tickers):
+        with self._conectar() as con:
+            linhas = con.execute(
+                f"SELECT ticker, inicio, fim, buscado_em FROM cobertura WHERE ticker IN ({','.join('?' * len(tickers))})",
+                list(tickers),
+            ).fetchall()
+        return {t: (pd.Timestamp(i), pd.Timestamp(f), b) for t, i, f, b in linhas}
+
+    def _gravar(self, t, hist, inicio, substituir=False):
+        hist = hist.reindex(columns=COLUNAS).dropna(subset=['Close'])
+        registros = [
+            (t, d.strftime('%Y-%m-%d'), *(None if pd.isna(v) else float(v) for v in valores))
+            for d, valores in zip(hist.index, hist.to_numpy())
+        ]
+        fim = hist.index.max() if registros else inicio
+        cobertura = (t, inicio.strftime('%Y-%m-%d'), fim.strftime('%Y-%m-%d'), time.time())
+        with self._conectar() as con:
+            con.executemany("INSERT OR REPLACE INTO precos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", registros)
+            if substituir:
+                con.execute("INSERT OR REPLACE INTO cobertura VALUES (?, ?, ?, ?)", cobertura)
+            else:
+                con.execute(
+                    "INSERT INTO cobertura VALUES (?, ?, ?, ?) ON CONFLICT(ticker) DO UPDATE SET "
+                    "fim = MAX(fim, excluded.fim), buscado_em = excluded.buscado_em",
+                    cobertura,
+                )
+
+    def _baixar(self, tickers, inicio):
+        import yfinance as yf  # só carrega quando há algo a baixar
+        rastro.instrumentar_http()
+
+        with rastro.etapa('yf.download', linhas=len(tickers)) as e:
+            dados = yf.download(
+                tickers, start=inicio.strftime('%Y-%m-%d'), group_by='ticker',
+                auto_adjust=False, actions=True, threads=True, progress=False,
+            )
+            historicos = {} if dados is None or dados.empty else separar_historicos(dados, tickers)
+            e.saida(len(historicos))
+        return historicos
+
+    def _gravar_completos(self, tickers, baixados, inicio):
+        # Download que falhou por inteiro não marca nada como coberto;
+        # ticker ausente num lote que funcionou (ex.: deslistado) fica registrado vazio
+        for t in tickers if baixados else []:
+            self._gravar(t, baixados.get(t, VAZIO), inicio, substituir=True)
+
+    def _gravar_incrementais(self, incrementais, baixados, cobertura):
+        for t, ultima in incrementais.items() if baixados else []:
+            hist = baixados.get(t, VAZIO)
+            novos = hist[hist.index >= ultima]
+            splits = novos.loc[novos.index > ultima].get('Stock Splits')
+            if splits is not None and (splits.fillna(0) > 0).any():
+                # Desdobramento muda a escala das barras antigas: rebaixa tudo
+                desde = cobertura[t][0]
+                self._gravar(t, self._baixar([t], desde).get(t, novos), desde, substituir=True)
+            else:
+                self._gravar(t, novos, cobertura[t][0])
+
+    def atualizar(self, tickers, period="1y", prazo=None, max_conexoes=MAX_CONEXOES):
+        """
+        Traz para o disco o que falta para cobrir 'period' em cada ticker:
+        download completo para quem não tem histórico suficiente e só as
+        barras novas (a partir da última data gravada) para o resto. Com
+        'prazo' (analise/prazo.py), os downloads saem em lotes de
+        LOTE_PRAZO tickers e só os lotes que chegam a tempo são gravados.
+        """
+        inicio = inicio_do_periodo(period)
+        agora = time.time()
+        cobertura = self._cobertura(tickers)
+
+        completos, incrementais = [], {}
+        for t in tickers:
+            if t not in cobertura or cobertura[t][0] > inicio:
+                completos.append(t)
+            elif agora - cobertura[t][2] > self.ttl:
+                incrementais[t] = cobertura[t][1]
+        rastro.contar('precos', acerto=True, n=len(tickers) - len(completos) - len(incrementais))
+        rastro.contar('precos', acerto=False, n=len(completos) + len(incrementais))
+
+        if prazo is not None:
+            self._atualizar_com_prazo(completos, incrementais, inicio, cobertura, prazo, max_conexoes)
+            return
+
+        if completos:
+            self._gravar_completos(completos, self._baixar(completos, inicio), inicio)
+
+        if incrementais:
+            # Um único download a partir da última barra mais antiga do grupo;
+            # a última barra gravada é pedida de novo porque pode ter sido parcial
+            self._gravar_incrementais(incrementais, self._baixar(list(incrementais), min(incrementais.values())), cobertura)
+
+    def _atualizar_com_prazo(self, completos, incrementais, inicio, cobertura, prazo, max_conexoes):
+        from analise.prazo import coletar
+
+        pendentes = list(incrementais)
+        lotes = [(True, tuple(completos[i:i + LOTE_PRAZO]), inicio) for i in range(0, len(completos), LOTE_PRAZO)]
+        lotes += [
+            (False, tuple(pendentes[i:i + LOTE_PRAZO]), min(incrementais[t] for t in pendentes[i:i + LOTE_PRAZO]))
+            for i in range(0, len(pendentes), LOTE_PRAZO)
+        ]
+        if not lotes:
+            return
+
+        # Cada lote é gravado assim que chega, enquanto os outros ainda estão a caminho.
+        # Lote que não chegou fica como estava: sem histórico ou com o do cache, vencido
+        def gravar(pedido, baixados):
+            completo, lote, _ = pedido
+            if completo:
+                self._gravar_completos(lote, baixados, inicio)
+            else:
+                self._gravar_incrementais({t: incrementais[t] for t in lote}, baixados, cobertura)
+
+        coletar(lotes, lambda lote: self._baixar(list(lote[1]), lote[2]), prazo, max_conexoes, ao_chegar=gravar)
+
+    def defasados(self, tickers):
+        """Tickers sem histórico gravado ou buscados no Yahoo há mais que o TTL."""
+        cobertura = self._cobertura(list(tickers))
+        limite = time.time() - self.ttl
+        return [t for t in tickers if t not in cobertura or cobertura[t][2] < limite]
+
+    def ler(self, tickers, period="1y", ajustado=True):
+        """Históricos do disco a partir do início de 'period', um DataFrame por ticker."""
+        inicio = inicio_do_periodo(period).strftime('%Y-%m-%d')
+        with self._conectar() as con:
+            df = pd.read_sql(
+                f"SELECT * FROM precos WHERE ticker IN ({','.join('?' * len(tickers))}) AND data >= ? ORDER BY ticker, data",
+                con, params=[*tickers, inicio],
+            )
+        df.columns = ['ticker', 'Date', *COLUNAS]
+        df['Date'] = pd.to_datetime(df['Date'])
+
+        historicos = {}
+        for t, hist in df.groupby('ticker', sort=False):
+            hist = hist.drop(columns='ticker').set_index('Date')
+            historicos[t] = ajustar_proventos(hist) if ajustado else hist
+        return historicos
+
+    def ler_fechamentos(self, tickers, period="1y", ajustado=True):
+        """Matriz datas x tickers de fechamentos, montada direto do disco."""
+        inicio = inicio_do_periodo(period).strftime('%Y-%m-%d')
+        with self._conectar() as con:
+            df = pd.read_sql(
+                f"SELECT ticker, data, close, dividends FROM precos WHERE ticker IN ({','.join('?' * len(tickers))}) AND data >= ?",
+                con, params=[*tickers, inicio],
+            )
+        df['data'] = pd.to_datetime(df['data'])
+        fechamentos = df.pivot(index='data', columns='ticker', values='close').reindex(columns=tickers)
+        fechamentos = fechamentos.rename_axis(index='Date', columns=None)
+        if ajustado:
+            dividendos = df.pivot(index='data', columns='ticker', values='dividends')
+            fechamentos = ajustar_fechamentos(fechamentos, dividendos.rename_axis(index='Date', columns=None))
+        return fechamentos
+
+    def ler_dividendos(self, tickers, period="1y"):
+        """Matriz datas x tickers de proventos por ação (0 nos dias sem evento)."""
+        inicio = inicio_do_periodo(period).strftime('%Y-%m-%d')
+        with self._conectar() as con:
+            df = pd.read_sql(
+                f"SELECT ticker, data, dividends FROM precos WHERE ticker IN ({','.join('?' * len(tickers))}) AND data >= ?",
+                con, params=[*tickers, inicio],
+            )
+        df['data'] = pd.to_datetime(df['data'])
+        dividendos = df.pivot(index='data', columns='ticker', values='dividends').reindex(columns=tickers)
+        return dividendos.rename_axis(index='Date', columns=None).fillna(0)
+
+    def fechamentos(self, tickers, period="1y", ajustado=True, prazo=None):
+        """Atualiza o que falta (até o 'prazo') e devolve a matriz de fechamentos servida do disco."""
+        tickers = list(dict.fromkeys(tickers))
+        self.atualizar(tickers, period, prazo)
+        with rastro.etapa('precos.ler_fechamentos', linhas=len(tickers)) as e:
+            fechamentos = self.ler_fechamentos(tickers, period, ajustado)
+            e.saida(fechamentos.shape[1])
+        return fechamentos
+
+    def historicos(self, tickers, period="1y", ajustado=True, prazo=None):
+        """Atualiza o que falta (até o 'prazo') e devolve os históricos servidos do disco."""
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+        self.atualizar(tickers, period, prazo)
+        with rastro.etapa('precos.ler', linhas=len(tickers)) as e:
+            historicos = self.ler(tickers, period, ajustado)
+            e.saida(len(historicos))
+        return historicos
+
+
+def baixar_historicos(tickers, period="1y", store=None):
+    """Histórico diário (ajustado) de vários tickers, servido pelo cache local."""
+    return (store or HistoricoStore()).historicos(tickers, period)
+
+
+def baixar_fechamentos(tickers, period="1y", store=None, prazo=None):
+    """Matriz datas x tickers de fechamentos (ajustados), servida pelo cache local."""
+    return (store or HistoricoStore()).fechamentos(tickers, period, prazo=prazo)
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from analise import rastro
+
+# --- CACHE DE METADADOS EM DOIS NÍVEIS ---
+# O .info do Yahoo é das chamadas mais lentas, e a carteira só usa quatro
+# campos dele. Os estáticos (setor e quoteType, e daí FII x ACAO) quase
+# nunca mudam: a classificação fica no SQLite por semanas e o .info só é
+# chamado para ticker novo ou com a classificação vencida. Os voláteis
+# (preço e DY) saem do histórico que já vem em lote: último fechamento e
+# proventos dos últimos 12 meses sobre esse preço.
+
+ARQUIVO_PADRAO = os.path.join('dados', 'metadados.sqlite')
+TTL_ESTATICO = 21 * 24 * 60 * 60  # segundos: setor e tipo mudam muito raramente
+
+
+def classificar(ticker, info):
+    """Tipo (FII/ACAO), setor e quoteType a partir do .info do Yahoo."""
+    quote_type = info.get('quoteType') or ''
+    tipo = 'FII' if '11' in ticker and ('EQUITY' not in quote_type and 'ETF' not in quote_type) else 'ACAO'
+    return {'tipo': tipo, 'setor': (info.get('sector') or 'Outros').title(), 'quote_type': quote_type}
+
+
+def volateis(hist, dividendos=None):
+    """
+    (preço, DY) do histórico diário: último fechamento e soma dos proventos
+    dos últimos 12 meses dividida por ele. 'dividendos' é a série de
+    proventos do ticker quando o histórico veio ajustado (sem a coluna).
+    """
+    preco = float(hist['Close'].iloc[-1])
+    if dividendos is None:
+        dividendos = hist['Dividends'] if 'Dividends' in hist else pd.Series(dtype=float)
+    inicio = hist.index[-1] - pd.DateOffset(years=1)
+    proventos = float(dividendos[dividendos.index > inicio].sum())
+    return preco, (proventos / preco if preco > 0 else 0.0)
+
+
+class MetadadosStore:
+    """
+    Classificação estática dos tickers num SQLite local, válida por 'ttl'
+    segundos. Só entra no cache o .info que trouxe quoteType: resposta vazia
+    classifica a execução atual e é tentada de novo na próxima.
+    """
+
+    def __init__(self, caminho=ARQUIVO_PADRAO, ttl=TTL_ESTATICO):
+        self.caminho = caminho
+        self.ttl = ttl
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS estaticos (
+                    ticker TEXT PRIMARY KEY,
+                    tipo TEXT NOT NULL,
+                    setor TEXT NOT NULL,
+                    quote_type TEXT NOT NULL,
+                    buscado_em REAL NOT NULL
+                )
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho)
+
+    def ler(self, tickers, ttl=None):
+        """{ticker: classificação} dos tickers com entrada mais nova que 'ttl'."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._conectar() as con:
+            linhas = con.execute(
+                f"SELECT ticker, tipo, setor, quote_type FROM estaticos "
+                f"WHERE ticker IN ({','.join('?' * len(tickers))}) AND buscado_em >= ?",
+                [*tickers, time.time() - ttl],
+            ).fetchall()
+        return {t: {'tipo': tipo, 'setor': setor, 'quote_type': qt} for t, tipo, setor, qt in linhas}
+
+    def _gravar(self, classificacoes):
+        agora = time.time()
+        with self._conectar() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO estaticos VALUES (?, ?, ?, ?, ?)",
+                [(t, c['tipo'], c['setor'], c['quote_type'], agora) for t, c in classificacoes.items()],
+            )
+
+    def classificacoes(self, tickers, buscar_info, max_conexoes=1, prazo=None):
+        """
+        Classificação de cada ticker: do cache quando dentro do TTL, senão
+        via buscar_info(ticker) -> .info, até max_conexoes em paralelo. Se a
+        busca falhar (ou não responder até o 'prazo', ver analise/prazo.py),
+        vale a classificação vencida que houver no cache.
+        Devolve (classificações, {ticker: latência}, {ticker: erro}) das buscas.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}, {}, {}
+        classificacoes = self.ler(tickers)
+        pendentes = [t for t in tickers if t not in classificacoes]
+        rastro.contar('metadados', acerto=True, n=len(tickers) - len(pendentes))
+        rastro.contar('metadados', acerto=False, n=len(pendentes))
+
+        def buscar(t):
+            t0 = time.perf_counter()
+            try:
+                return buscar_info(t), None, time.perf_counter() - t0
+            except Exception as e:
+                return None, e, time.perf_counter() - t0
+
+        latencias, erros, novas = {}, {}, {}
+        if pendentes:
+            with rastro.etapa('yf.info', linhas=len(pendentes), conexoes=max_conexoes) as e:
+                if prazo is not None:
+                    respostas = self._buscar_com_prazo(pendentes, buscar_info, max_conexoes, prazo)
+                else:
+                    with ThreadPoolExecutor(max_workers=max(1, min(max_conexoes, len(pendentes)))) as pool:
+                        respostas = dict(zip(pendentes, pool.map(buscar, pendentes)))
+                e.saida(sum(1 for _, erro, _ in respostas.values() if erro is None))
+
+            for t, (info, erro, latencia) in respostas.items():
+                latencias[t] = latencia
+                if erro is not None:
+                    erros[t] = erro
+                    continue
+                classificacoes[t] = classificar(t, info or {})
+                if (info or {}).get('quoteType'):
+                    novas[t] = classificacoes[t]
+            if novas:
+                self._gravar(novas)
+            if erros:
+                classificacoes.update(self.ler(list(erros), ttl=float('inf')))
+        return classificacoes, latencias, erros
+
+    @staticmethod
+    def _buscar_com_prazo(pendentes, buscar_info, max_conexoes, prazo):
+        """Mesmas respostas (info, erro, latência) de classificacoes, com cópias e refeitos até o prazo."""
+        from analise.prazo import coletar
+
+        coleta = coletar(pendentes, buscar_info, prazo, max_conexoes)
+        respostas = {}
+        for t in pendentes:
+            if t in coleta.resultados:
+                respostas[t] = coleta.resultados[t], None, coleta.latencias[t]
+            else:
+                erro = coleta.erros.get(t) or TimeoutError("sem resposta dentro do prazo")
+                respostas[t] = None, erro, coleta.latencias.get(t, 0.0)
+        return respostas
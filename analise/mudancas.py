@@ -0,0 +1,195 @@
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise import rastro
+from analise.vigia import descrever
+
+# --- MUDANÇAS ENTRE EXECUÇÕES ---
+# Cada execução guarda o ranking inteiro (ticker, posição, score, perfil)
+# num SQLite local, e o ranking novo é comparado com o da execução anterior
+# de mesmo nome: os dois são alinhados pelo ticker com um get_indexer
+# (tabela hash, tempo linear) e entradas, saídas, mudanças de score e de
+# perfil e saltos de posição saem de máscaras sobre os arrays. O que sobra
+# é uma lista curta de eventos no formato do modo vigia (analise/vigia.py),
+# que pode ir para um JSON pequeno em vez do relatório inteiro.
+
+ARQUIVO_PADRAO = os.path.join('dados', 'rankings.sqlite')
+LIMITE_POSICOES = 3  # saltos de posição menores que isso não viram evento
+LIMITE_SCORE = 0.0   # variações de score até esse valor não viram evento
+
+
+def normalizar(tickers, score, perfil=None):
+    """
+    Ranking na forma guardada e comparada: índice = ticker (na ordem do
+    ranking, repetidos descartados), posicao (1 = topo), score e perfil.
+    """
+    tickers = pd.Index(np.asarray(tickers).astype(str), name='ticker')
+    perfil = np.full(len(tickers), '', dtype=object) if perfil is None else np.asarray(perfil).astype(str)
+    ranking = pd.DataFrame({
+        'posicao': np.arange(1, len(tickers) + 1),
+        'score': np.asarray(score, dtype=float),
+        'perfil': perfil,
+    }, index=tickers)
+    return ranking[~tickers.duplicated()]
+
+
+def comparar(antes, depois, limite_posicoes=LIMITE_POSICOES, limite_score=LIMITE_SCORE):
+    """
+    Eventos entre dois rankings de normalizar(): 'entrou' (na ordem do
+    ranking novo), 'saiu' (na ordem do anterior) e, para quem ficou,
+    'perfil', 'score' (variação acima de 'limite_score') e 'posicao'
+    (salto de pelo menos 'limite_posicoes').
+    """
+    onde = antes.index.get_indexer(depois.index)
+    ficou = onde >= 0
+    saiu = np.ones(len(antes), dtype=bool)
+    saiu[onde[ficou]] = False
+
+    novos = depois.index.to_numpy()
+    posicao, score, perfil = depois['posicao'].to_numpy(), depois['score'].to_numpy(), depois['perfil'].to_numpy()
+    anterior = onde[ficou]
+    posicao_antes = antes['posicao'].to_numpy()[anterior]
+    score_antes = antes['score'].to_numpy()[anterior]
+    perfil_antes = antes['perfil'].to_numpy()[anterior]
+
+    eventos = [
+        {'evento': 'entrou', 'ticker': novos[i], 'score': float(score[i]), 'perfil': perfil[i], 'posicao': int(posicao[i])}
+        for i in np.flatnonzero(~ficou)
+    ]
+    eventos += [
+        {'evento': 'saiu', 'ticker': t, 'score': float(s)}
+        for t, s in zip(antes.index[saiu], antes['score'].to_numpy()[saiu])
+    ]
+
+    # Só quem ficou: as três comparações em máscaras alinhadas pelo ranking novo
+    ficaram = np.flatnonzero(ficou)
+    novo_perfil = perfil[ficaram] != perfil_antes
+    novo_score = np.abs(score[ficaram] - score_antes) > limite_score
+    salto = np.abs(posicao[ficaram] - posicao_antes) >= limite_posicoes
+    for k in np.flatnonzero(novo_perfil | novo_score | salto):
+        t = novos[ficaram[k]]
+        if novo_perfil[k]:
+            eventos.append({'evento': 'perfil', 'ticker': t, 'de': perfil_antes[k], 'para': perfil[ficaram[k]]})
+        if novo_score[k]:
+            eventos.append({'evento': 'score', 'ticker': t, 'de': float(score_antes[k]), 'para': float(score[ficaram[k]])})
+        if salto[k]:
+            eventos.append({'evento': 'posicao', 'ticker': t, 'de': int(posicao_antes[k]), 'para': int(posicao[ficaram[k]])})
+    return eventos
+
+
+class RankingStore:
+    """
+    Rankings de cada execução num SQLite local, por nome lógico
+    ('lollapalooza', 'avalairb3:300', ...). Nada é apagado: a comparação
+    usa a execução mais recente, e as anteriores ficam para consulta.
+    """
+
+    def __init__(self, caminho=ARQUIVO_PADRAO):
+        self.caminho = caminho
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS execucoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    nome TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    linhas INTEGER NOT NULL
+                )
+            """)
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS posicoes (
+                    execucao INTEGER NOT NULL,
+                    ticker TEXT NOT NULL,
+                    posicao INTEGER NOT NULL,
+                    score REAL NOT NULL,
+                    perfil TEXT NOT NULL,
+                    PRIMARY KEY (execucao, ticker)
+                )
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho)
+
+    def salvar(self, nome, ranking, criado_em=None):
+        """Grava o ranking (de normalizar) como nova execução de 'nome' e devolve o id."""
+        criado_em = time.time() if criado_em is None else criado_em
+        with self._conectar() as con:
+            execucao = con.execute(
+                "INSERT INTO execucoes (nome, criado_em, linhas) VALUES (?, ?, ?)", (nome, criado_em, len(ranking)),
+            ).lastrowid
+            con.executemany(
+                "INSERT INTO posicoes VALUES (?, ?, ?, ?, ?)",
+                zip([execucao] * len(ranking), ranking.index, ranking['posicao'].tolist(),
+                    ranking['score'].tolist(), ranking['perfil'].tolist()),
+            )
+        return execucao
+
+    def ultimo(self, nome):
+        """(id, criado_em) da execução mais recente de 'nome', ou None."""
+        with self._conectar() as con:
+            return con.execute(
+                "SELECT id, criado_em FROM execucoes WHERE nome = ? ORDER BY id DESC LIMIT 1", (nome,),
+            ).fetchone()
+
+    def carregar(self, execucao):
+        """Ranking de uma execução, na forma de normalizar()."""
+        with self._conectar() as con:
+            df = pd.read_sql(
+                "SELECT ticker, posicao, score, perfil FROM posicoes WHERE execucao = ? ORDER BY posicao",
+                con, params=(execucao,),
+            )
+        return df.set_index('ticker')
+
+
+def registrar(nome, ranking, store=None, limite_posicoes=LIMITE_POSICOES, limite_score=LIMITE_SCORE):
+    """
+    Compara 'ranking' (de normalizar) com a última execução guardada de
+    'nome' e guarda o novo. Devolve o delta: nome, horário das duas
+    execuções (a anterior None na primeira vez), linhas e eventos.
+    """
+    store = store or RankingStore()
+    with rastro.etapa('mudancas', linhas=len(ranking)) as e:
+        ultimo = store.ultimo(nome)
+        eventos = comparar(store.carregar(ultimo[0]), ranking, limite_posicoes, limite_score) if ultimo else []
+        criado_em = time.time()
+        store.salvar(nome, ranking, criado_em)
+        e.saida(len(eventos))
+    return {
+        'ranking': nome,
+        'anterior': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(ultimo[1])) if ultimo else None,
+        'atual': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(criado_em)),
+        'linhas': len(ranking),
+        'eventos': eventos,
+    }
+
+
+def apresentar(delta, caminho=None):
+    """Imprime as mudanças de um delta de registrar() e, com 'caminho', grava o delta em JSON."""
+    if delta['anterior'] is None:
+        print(f"\n🗂️ {delta['ranking']}: primeira execução guardada ({delta['linhas']} ativos); mudanças a partir da próxima.")
+    elif not delta['eventos']:
+        print(f"\n🗂️ {delta['ranking']}: nenhuma mudança desde {delta['anterior']}.")
+    else:
+        print(f"\n🗂️ {delta['ranking']}: {len(delta['eventos'])} mudança(s) desde {delta['anterior']}")
+        for evento in delta['eventos']:
+            print(f"   {descrever(evento)}")
+    if caminho:
+        with open(caminho, 'w') as f:
+            json.dump(delta, f, indent=2, ensure_ascii=False)
+        print(f"💾 Mudanças gravadas em {caminho}")
+
+
+# --- LINHA DE COMANDO ---
+def adicionar_argumentos(parser, ativo=False):
+    parser.add_argument('--mudancas', action='store_true', default=ativo,
+                        help="guarda o ranking desta execução e mostra o que mudou desde a anterior")
+    parser.add_argument('--delta', metavar='JSON', help="mudanças: grava só as mudanças em JSON, para alertas (implica --mudancas)")
+    parser.add_argument('--posicoes', type=int, default=LIMITE_POSICOES,
+                        help=f"mudanças: salto mínimo de posição avisado (padrão: {LIMITE_POSICOES})")
@@ -0,0 +1,268 @@
+import contextlib
+import functools
+import glob
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from analise import rastro
+
+# --- EXECUTOR DE ESTÁGIOS (DAG com memorização) ---
+# Os pipelines dos scripts são sequências fixas de funções, e cada execução
+# refazia todas, mesmo com as entradas iguais às da execução anterior. Aqui
+# cada estágio declara de quais outros depende e a configuração que usa, e
+# o executor:
+#
+# - roda em paralelo os estágios cujas dependências já terminaram (ações e
+#   FIIs ao mesmo tempo, por exemplo);
+# - estágios externos (os que buscam dados: Fundamentus, Yahoo) rodam
+#   sempre, servidos pelos próprios caches, e o que sai deles é resumido num
+#   hash do conteúdo; com 'validade', o resultado de um externo é
+#   reaproveitado enquanto for mais novo que ela (o TTL da fonte);
+# - os demais são funções puras das entradas: a chave é o hash do nome, do
+#   código (o do estágio, o do módulo dele e o de todo o pacote analise), da
+#   configuração e das chaves das entradas, e o resultado fica em disco.
+#   Chave conhecida = resultado lido em vez de recalculado.
+#
+# Mudar só o orçamento muda só a chave da alocação; o resto é reaproveitado.
+
+PASTA_PADRAO = os.path.join('dados', 'estagios')
+MAX_PARALELO = 4   # estágios rodando ao mesmo tempo
+MANTER = 8         # resultados guardados por estágio (os mais antigos são apagados)
+FORMATO = 2        # versão do que vai em cada arquivo: arquivo de outra versão é recalculado
+
+
+def resumir(objeto, h=None):
+    """Hash do conteúdo de DataFrames, Series, arrays e estruturas simples (hex de 32 dígitos)."""
+    raiz = h is None
+    h = h or hashlib.blake2b(digest_size=16)
+    if isinstance(objeto, (pd.DataFrame, pd.Series)):
+        h.update(type(objeto).__name__.encode())
+        tipos = objeto.dtypes.items() if isinstance(objeto, pd.DataFrame) else [(objeto.name, objeto.dtype)]
+        h.update(repr([(str(c), str(t)) for c, t in tipos]).encode())
+        h.update(repr(objeto.index.names).encode())
+        h.update(pd.util.hash_pandas_object(objeto, index=True).to_numpy().tobytes())
+    elif isinstance(objeto, np.ndarray):
+        h.update(f"{objeto.dtype}{objeto.shape}".encode())
+        h.update(np.ascontiguousarray(objeto).tobytes() if objeto.dtype != object else pickle.dumps(objeto.tolist()))
+    elif isinstance(objeto, dict):
+        h.update(b'{')
+        for chave in sorted(objeto, key=repr):
+            h.update(repr(chave).encode())
+            resumir(objeto[chave], h)
+        h.update(b'}')
+    elif isinstance(objeto, (list, tuple)):
+        h.update(f"{type(objeto).__name__}{len(objeto)}".encode())
+        for item in objeto:
+            resumir(item, h)
+    else:
+        h.update(repr(objeto).encode())
+    return h.hexdigest() if raiz else h
+
+
+@functools.lru_cache(maxsize=None)
+def _versao_do_codigo(modulo):
+    """
+    Hash do código-fonte do módulo 'modulo' e de todo o pacote analise: o
+    estágio é só uma casca, a conta de verdade está nos auxiliares que ele
+    chama (pontuacao, alocacao, refino...).
+    """
+    arquivos = set(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py')))
+    arquivo = getattr(sys.modules.get(modulo), '__file__', None)
+    if arquivo:
+        arquivos.add(os.path.abspath(arquivo))
+    h = hashlib.blake2b(digest_size=16)
+    for caminho in sorted(arquivos):
+        h.update(os.path.basename(caminho).encode())
+        with open(caminho, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _versao(funcao):
+    """
+    Código-fonte da função (ou o nome, sem fonte) e a versão do código de
+    que ela depende: mudar o estágio ou um auxiliar invalida os resultados.
+    """
+    try:
+        fonte = inspect.getsource(funcao)
+    except (OSError, TypeError):
+        fonte = f"{getattr(funcao, '__module__', '')}.{getattr(funcao, '__qualname__', repr(funcao))}"
+    return fonte + _versao_do_codigo(getattr(funcao, '__module__', None))
+
+
+class Estagio:
+    """
+    Um passo do pipeline: funcao(*saídas de 'entradas', **config). Estágio
+    'externo' busca dados fora: sem 'validade' (segundos) roda sempre, com
+    ela é memorizado como os outros, mas só vale por esse tempo.
+    """
+
+    def __init__(self, nome, funcao, entradas=(), config=None, externo=False, validade=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = list(entradas)
+        self.config = dict(config or {})
+        self.externo = externo
+        self.validade = validade
+
+    def chave(self, chaves_entradas, contexto=''):
+        return resumir([FORMATO, self.nome, _versao(self.funcao), self.config, chaves_entradas, contexto])
+
+
+def repassar_vazio(funcao):
+    """Estágio que devolve a primeira entrada sem chamar 'funcao' quando ela vem vazia (None ou tabela vazia)."""
+    @functools.wraps(funcao)
+    def estagio(entrada, *resto, **config):
+        if entrada is None or (isinstance(entrada, (pd.DataFrame, pd.Series)) and entrada.empty):
+            return entrada
+        return funcao(entrada, *resto, **config)
+    return estagio
+
+
+class ResultadoPipeline:
+    """Saídas por estágio, com o estado de cada um ('externo', 'rodou' ou 'memorizado') e o tempo."""
+
+    def __init__(self, saidas, estados, tempos):
+        self.saidas = saidas
+        self.estados = estados
+        self.tempos = tempos
+
+    def __getitem__(self, nome):
+        return self.saidas[nome]
+
+    def rodaram(self):
+        """Estágios não externos que precisaram ser calculados."""
+        return [nome for nome, estado in self.estados.items() if estado == 'rodou']
+
+    def resumo(self):
+        marcas = {'externo': '🌐', 'rodou': '⚙️', 'memorizado': '♻️'}
+        return " | ".join(f"{marcas[estado]} {nome} {self.tempos[nome]:.2f}s" for nome, estado in self.estados.items())
+
+
+class Pipeline:
+    """
+    DAG de Estagio. A ordem da lista não importa; dependência desconhecida
+    ou ciclo é ValueError na montagem. 'contexto' é a configuração global
+    que os estágios leem por dentro (o CONFIG do script): entra na chave de
+    todos, e mudar qualquer valor dela refaz tudo.
+    """
+
+    def __init__(self, estagios, contexto=None, pasta=PASTA_PADRAO, max_paralelo=MAX_PARALELO):
+        self.estagios = {e.nome: e for e in estagios}
+        self.contexto = resumir(contexto or {})
+        self.pasta = pasta
+        self.max_paralelo = max_paralelo
+        self._memoria = {}  # chave -> saída, para várias execuções no mesmo processo
+        for e in estagios:
+            faltam = [d for d in e.entradas if d not in self.estagios]
+            if faltam:
+                raise ValueError(f"Estágio '{e.nome}' depende de estágio inexistente: {', '.join(faltam)}")
+        self._ordem_topologica()
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+    def _ordem_topologica(self):
+        feitos, ordem = set(), []
+        restantes = dict(self.estagios)
+        while restantes:
+            prontos = [n for n, e in restantes.items() if all(d in feitos for d in e.entradas)]
+            if not prontos:
+                raise ValueError(f"Ciclo entre os estágios: {', '.join(restantes)}")
+            for n in prontos:
+                feitos.add(n)
+                ordem.append(n)
+                del restantes[n]
+        return ordem
+
+    def _arquivo(self, nome, chave):
+        return os.path.join(self.pasta, f"{nome}-{chave}.pkl")
+
+    def _ler(self, nome, chave, validade=None):
+        """(achou, chave da saída, saída); resultado mais velho que 'validade' não conta."""
+        guardado = self._memoria.get(chave)
+        if guardado is None and self.pasta and os.path.exists(self._arquivo(nome, chave)):
+            try:
+                with open(self._arquivo(nome, chave), 'rb') as f:
+                    formato, *guardado = pickle.load(f)
+                if formato != FORMATO:
+                    raise ValueError(f"formato {formato}")
+                criado_em, _, _ = guardado
+                float(criado_em)
+            except Exception:
+                guardado = None  # arquivo corrompido ou de outra versão: recalcula e some com ele
+                with contextlib.suppress(OSError):
+                    os.remove(self._arquivo(nome, chave))
+            else:
+                os.utime(self._arquivo(nome, chave))  # usado agora: fica entre os MANTER mais recentes
+                self._memoria[chave] = guardado
+        if guardado is None or (validade is not None and time.time() - guardado[0] > validade):
+            return False, None, None
+        return True, guardado[1], guardado[2]
+
+    def _guardar(self, nome, chave, chave_saida, saida):
+        guardado = [time.time(), chave_saida, saida]
+        self._memoria[chave] = guardado
+        if not self.pasta:
+            return
+        caminho = self._arquivo(nome, chave)
+        with open(caminho + '.tmp', 'wb') as f:
+            pickle.dump((FORMATO, *guardado), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(caminho + '.tmp', caminho)
+        antigos = sorted(
+            (os.path.join(self.pasta, a) for a in os.listdir(self.pasta) if a.startswith(f"{nome}-") and a.endswith('.pkl')),
+            key=os.path.getmtime, reverse=True,
+        )
+        for a in antigos[MANTER:]:
+            os.remove(a)
+
+    def _rodar_estagio(self, estagio, entradas, chaves_entradas):
+        """(saída, chave da saída, estado, segundos) de um estágio."""
+        inicio = time.perf_counter()
+        if estagio.externo and estagio.validade is None:
+            with rastro.etapa(f'pipeline.{estagio.nome}', estado='externo'):
+                saida = estagio.funcao(*entradas, **estagio.config)
+            return saida, resumir(saida), 'externo', time.perf_counter() - inicio
+
+        chave = estagio.chave(chaves_entradas, self.contexto)
+        achou, chave_saida, saida = self._ler(estagio.nome, chave, estagio.validade)
+        rastro.contar('estagios', acerto=achou)
+        if achou:
+            return saida, chave_saida, 'memorizado', time.perf_counter() - inicio
+        estado = 'externo' if estagio.externo else 'rodou'
+        with rastro.etapa(f'pipeline.{estagio.nome}', estado=estado):
+            saida = estagio.funcao(*entradas, **estagio.config)
+        # A saída de um externo depende da fonte, não só das entradas: os seguintes usam o hash do conteúdo
+        chave_saida = resumir(saida) if estagio.externo else chave
+        self._guardar(estagio.nome, chave, chave_saida, saida)
+        return saida, chave_saida, estado, time.perf_counter() - inicio
+
+    def rodar(self):
+        """Roda o DAG inteiro e devolve o ResultadoPipeline (estados na ordem em que terminaram)."""
+        pendentes = dict(self.estagios)
+        saidas, chaves, estados, tempos = {}, {}, {}, {}
+        with ThreadPoolExecutor(max_workers=self.max_paralelo) as pool:
+            rodando = {}
+            while pendentes or rodando:
+                for nome in [n for n, e in pendentes.items() if all(d in saidas for d in e.entradas)]:
+                    e = pendentes.pop(nome)
+                    tarefa = pool.submit(self._rodar_estagio, e, [saidas[d] for d in e.entradas], [chaves[d] for d in e.entradas])
+                    rodando[tarefa] = nome
+                terminadas, _ = wait(rodando, return_when=FIRST_COMPLETED)
+                for tarefa in terminadas:
+                    nome = rodando.pop(tarefa)
+                    saidas[nome], chaves[nome], estados[nome], tempos[nome] = tarefa.result()
+        return ResultadoPipeline(saidas, estados, tempos)
+
+
+# --- LINHA DE COMANDO ---
+def adicionar_argumentos(parser):
+    parser.add_argument('--incremental', action='store_true',
+                        help="roda pelo executor de estágios: só refaz o que teve entradas ou configuração alteradas")
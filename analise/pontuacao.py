@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+
+from analise.compacto import como_float
+
+# --- MOTOR DE PONTUAÇÃO COLUNAR (LOLLAPALOOZA) ---
+# Mesmas regras de stage_1_graham_permissivo e stage_3_ranking_final,
+# mas aplicadas à coluna inteira de uma vez (sem iterrows).
+#
+# As máscaras e os pontos aceitam tanto o DataFrame de obter_dados_base
+# quanto um dict nome -> array de qualquer formato (ex.: matrizes datas x
+# tickers do backtest), e devolvem arrays no mesmo formato.
+#
+# Quando os fundamentos detalhados (analise/detalhes.py) foram juntados à
+# base, ROE médio de 5 anos e dívida líquida/EBITDA substituem, linha a
+# linha, o ROE do último período e a dívida bruta/patrimônio; onde a
+# métrica detalhada é NaN (empresa sem demonstrativos) vale a aproximação.
+# Só com os detalhes entram também as regras de ROIC médio de 5 anos,
+# liquidez corrente e anos de lucro seguidos (com a mesma aproximação
+# linha a linha): sem eles, as regras de sempre.
+
+ALAVANCAGEM_MAXIMA = 3.5         # dívida bruta / patrimônio (aproximação)
+ALAVANCAGEM_MAXIMA_EBITDA = 3.0  # dívida líquida / EBITDA (especificação)
+PL_MAXIMO = 25                   # regras de entrada Graham e Bazin
+PL_MAXIMO_QUALIDADE = 15         # regra de entrada Qualidade
+ROE_MINIMO = 0.20                # regra de entrada Qualidade
+ROIC_MINIMO = 0.12               # detalhes: regra de entrada Qualidade e pontos (WACC Brasil ~11-13%)
+LIQUIDEZ_CORRENTE_MINIMA = 1.0   # detalhes: solvência (especificação)
+ANOS_LUCRO_MINIMO = 5            # detalhes: consistência de lucros, até o histórico guardado
+DY_ENTRADA = 0.06                # regra de entrada Bazin
+
+
+def _formato(dados):
+    if isinstance(dados, pd.DataFrame):
+        return (len(dados),)
+    return np.shape(next(iter(dados.values())))
+
+
+def _coluna(dados, nome, padrao):
+    """Equivalente colunar de row.get(nome, padrao)."""
+    if nome in dados:
+        return como_float(dados[nome])
+    return np.full(_formato(dados), padrao, dtype=float)
+
+
+def _preferida(dados, nome, aproximacao, padrao):
+    """Métrica detalhada 'nome' onde existe (não NaN); no resto, a coluna 'aproximacao'."""
+    aproximada = _coluna(dados, aproximacao, padrao)
+    if nome not in dados:
+        return aproximada
+    detalhada = _coluna(dados, nome, np.nan)
+    return np.where(np.isnan(detalhada), aproximada, detalhada)
+
+
+def _so_detalhada(dados, nome, aproximacao, padrao):
+    """_preferida quando a métrica detalhada foi juntada à base; sem ela, NaN (regra desligada)."""
+    if nome not in dados:
+        return np.full(_formato(dados), np.nan)
+    return _preferida(dados, nome, aproximacao, padrao)
+
+
+def _lucros_consistentes(dados):
+    """
+    (consistente, inconsistente) pelos anos de lucro seguidos: o mínimo é
+    ANOS_LUCRO_MINIMO ou o histórico guardado do ticker, se menor (o Yahoo
+    devolve uns 4 balanços anuais). Sem demonstrativos (NaN), nenhum dos dois.
+    """
+    anos = _coluna(dados, 'anos_lucro_consecutivos', np.nan)
+    exigido = np.fmin(ANOS_LUCRO_MINIMO, _coluna(dados, 'anos_balancos', np.nan))
+    with np.errstate(invalid='ignore'):
+        return anos >= exigido, anos < exigido
+
+
+def valor_graham(lpa, vpa):
+    """Raiz(22.5 * LPA * VPA) onde LPA e VPA são positivos, 0 no resto."""
+    lpa = np.asarray(lpa, dtype=float)
+    vpa = np.asarray(vpa, dtype=float)
+    validos = (lpa > 0) & (vpa > 0)
+    vi = np.zeros(lpa.shape)
+    vi[validos] = np.sqrt(22.5 * lpa[validos] * vpa[validos])
+    return vi
+
+
+def indicadores_graham(dados):
+    """
+    Solvência, consistência de lucros e indicadores das regras de entrada
+    do Stage 1 (margem sobre o valor de Graham, DY, P/L, ROE e ROIC), que
+    não dependem dos limites.
+    """
+    forma = _formato(dados)
+
+    # Solvência (só quando o patrimônio veio do Fundamentus)
+    ignora = np.asarray(dados['ignore_solvencia'], dtype=bool) if 'ignore_solvencia' in dados else np.zeros(forma, dtype=bool)
+    patrim = _coluna(dados, 'patrim_liq', 0)
+    divida = _coluna(dados, 'div_bruta', 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alavancado = (patrim > 1) & ((divida / patrim) > ALAVANCAGEM_MAXIMA)
+    if 'divida_liquida_ebitda' in dados:
+        divida_ebitda = _coluna(dados, 'divida_liquida_ebitda', np.nan)
+        alavancado = np.where(np.isnan(divida_ebitda), alavancado, divida_ebitda > ALAVANCAGEM_MAXIMA_EBITDA)
+    # Liquidez corrente 0: não informada (bancos e seguradoras no Fundamentus)
+    liquidez = _so_detalhada(dados, 'liquidez_corrente', 'liqc', 0)
+    iliquido = (liquidez > 0) & (liquidez < LIQUIDEZ_CORRENTE_MINIMA)
+    insolvente = ((patrim <= 0) & (patrim != 1.0)) | alavancado | iliquido
+    solvente = ignora | ~insolvente
+
+    # Margem sobre o valor de Graham (999 quando não há valor intrínseco)
+    vi = valor_graham(_coluna(dados, 'lpa', 0), _coluna(dados, 'vpa', 0))
+    margem = np.full(forma, 999.0)
+    np.divide(_coluna(dados, 'cotacao', 0), vi, out=margem, where=vi > 0)
+
+    return {
+        'solvente': solvente,
+        'margem': margem,
+        'dy': _coluna(dados, 'dy', 0),
+        'pl': _coluna(dados, 'pl', 99),
+        'roe': _preferida(dados, 'roe_medio_5a', 'roe', 0),
+        'roic': _so_detalhada(dados, 'roic_medio_5a', 'roic', np.nan),
+        'lucros': ~_lucros_consistentes(dados)[1],
+    }
+
+
+def roic_suficiente(roic):
+    """ROIC acima de ROIC_MINIMO; 0 (não informado, ex.: bancos) e NaN não reprovam."""
+    roic = np.asarray(roic, dtype=float)
+    with np.errstate(invalid='ignore'):
+        return ~((roic != 0) & (roic < ROIC_MINIMO))
+
+
+def mascara_graham_permissivo(dados, pl_maximo=PL_MAXIMO, roe_minimo=ROE_MINIMO):
+    """
+    Máscara booleana do Stage 1: solvência + consistência de lucros +
+    regras de entrada (Graham, Bazin ou Qualidade).
+    """
+    ind = indicadores_graham(dados)
+    margem, dy, pl, roe = ind['margem'], ind['dy'], ind['pl'], ind['roe']
+    entrada = (
+        ((margem <= 1.0) & (pl < pl_maximo))
+        | ((dy >= DY_ENTRADA) & (pl < pl_maximo))
+        | ((roe > roe_minimo) & roic_suficiente(ind['roic']) & (pl < PL_MAXIMO_QUALIDADE))
+    )
+    return ind['solvente'] & ind['lucros'] & entrada
+
+
+def filtrar_graham_permissivo(df):
+    """Aplica o Stage 1 e devolve uma cópia com os aprovados, na ordem original."""
+    return df[mascara_graham_permissivo(df)].copy()
+
+
+def _motivo(mascara, textos):
+    """Fragmento ', texto' onde a máscara é verdadeira e '' no resto."""
+    parte = np.full(len(mascara), '', dtype=object)
+    if mascara.any():
+        textos = np.broadcast_to(np.asarray(textos, dtype=object), parte.shape)
+        parte[mascara] = ', ' + textos[mascara]
+    return parte
+
+
+def _formatar(valores, mascara, formato):
+    """Formata só as posições que vão aparecer no texto (cada valor distinto uma vez)."""
+    textos = np.full(len(valores), '', dtype=object)
+    if mascara.any():
+        codigos, unicos = pd.factorize(valores[mascara])
+        formatados = np.array([formato.format(v) for v in unicos], dtype=object)
+        textos[mascara] = formatados[codigos]
+    return textos
+
+
+def _regras_ranking(dados):
+    """(máscara, pontos, texto) de cada regra do Stage 3."""
+    roe = _preferida(dados, 'roe_medio_5a', 'roe', 0)
+    roic = _so_detalhada(dados, 'roic_medio_5a', 'roic', 0)
+    cagr = _coluna(dados, 'c5y', 0)
+    pl = _coluna(dados, 'pl', 0)
+    dy = _coluna(dados, 'dy', 0)
+    cotacao = np.asarray(dados['cotacao'], dtype=float)
+    vi = valor_graham(np.asarray(dados['lpa'], dtype=float), np.asarray(dados['vpa'], dtype=float))
+
+    return [
+        (roe > 0.15, 10, "ROE>15%"),
+        (roe > 0.25, 10, "Rentabilidade Top (ROE>25%)"),
+        (cagr > 0.10, 10, None),
+        ((pl < 10) & (pl > 0), 10, "P/L Baixo"),
+        (dy > 0.06, 10, None),
+        (dy > 0.10, 5, "Yield Explosivo"),
+        ((vi > 0) & (cotacao < 0.7 * vi), 15, "Desconto Graham (>30%)"),
+        (roic > ROIC_MINIMO, 10, "ROIC>12%"),
+        (_lucros_consistentes(dados)[0], 5, "Lucro Consistente"),
+    ]
+
+
+def pontos_ranking(dados):
+    """Score do Stage 3 sem os textos de motivo, no formato das colunas de entrada."""
+    score = np.zeros(_formato(dados), dtype=np.int64)
+    for mascara, pontos, _ in _regras_ranking(dados):
+        score += mascara * pontos
+    return score
+
+
+def pontuar_ranking(df):
+    """
+    Stage 3 colunar: pontos de ROE, CAGR, P/L, DY, desconto de Graham,
+    ROIC e lucro consistente, com a string 'Motivo' montada a partir das
+    mesmas máscaras.
+    """
+    regras = _regras_ranking(df)
+    cagr = _coluna(df, 'c5y', 0)
+    dy = _coluna(df, 'dy', 0)
+    cotacao = df['cotacao'].to_numpy(dtype=float)
+    # Textos com valor formatado (mesmo formato das f-strings originais)
+    dinamicos = {
+        2: _formatar(cagr, regras[2][0], "Crescimento ({:.0%})"),
+        4: _formatar(dy, regras[4][0], "Dividendos ({:.1%})"),
+    }
+
+    score = np.zeros(len(df), dtype=np.int64)
+    motivo = np.full(len(df), '', dtype=object)
+    for i, (mascara, pontos, texto) in enumerate(regras):
+        score += mascara * pontos
+        motivo = motivo + _motivo(mascara, dinamicos.get(i, texto))
+
+    resultado = pd.DataFrame({
+        'Ticker': df.index.to_numpy(),
+        'Preco': cotacao,
+        'Score': score,
+        'Motivo': [m[2:] for m in motivo],  # remove o ', ' inicial
+    })
+
+    # Ordena: Maior Score primeiro, depois Menor Preço (para facilitar compras pequenas)
+    return resultado.sort_values(by=['Score', 'Preco'], ascending=[False, True])
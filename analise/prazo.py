@@ -0,0 +1,202 @@
+import itertools
+import math
+import queue
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from analise import rastro
+
+# --- ORÇAMENTO DE LATÊNCIA (--prazo) ---
+# Com o Yahoo lento, um yf.download grande ou meia dúzia de chamadas
+# atrasadas seguravam o relatório inteiro. Com um prazo total para a
+# execução, coletar() manda cada pedido numa thread própria e:
+#
+# - abandona o pedido que passa de TIMEOUT_PEDIDO e faz outro no lugar;
+# - manda uma cópia (hedge) do pedido que demora mais que o quantil
+#   QUANTIL_HEDGE das latências já vistas: vale a primeira resposta;
+# - refaz o que falhou, até TENTATIVAS pedidos extras por item;
+# - no fim do prazo devolve o que chegou e a lista do que ficou faltando.
+#
+# Quem chama usa o que chegou e marca o resto: sem dado (fora do ranking) ou
+# com o dado defasado do cache local. As threads são daemon, então um pedido
+# abandonado não segura o fim do processo.
+
+TIMEOUT_PEDIDO = 20.0  # segundos: pedido mais lento que isso é abandonado e refeito
+HEDGE_APOS = 2.0       # segundos até a cópia, enquanto não há latências medidas
+HEDGE_MINIMO = 0.25    # piso da espera adaptativa até a cópia
+QUANTIL_HEDGE = 0.9    # a cópia sai quando o pedido passa desse quantil das latências vistas
+TENTATIVAS = 2         # pedidos extras por item (cópias e refeitos), além do primeiro
+MAX_CONEXOES = 8
+MARCA_DEFASADO = '⏳ defasado'
+
+
+class Prazo:
+    """Prazo total de uma execução, contado a partir da criação. Sem 'segundos', nunca acaba."""
+
+    def __init__(self, segundos=None):
+        self.segundos = segundos
+        self.fim = None if segundos is None else time.monotonic() + segundos
+
+    def restante(self):
+        return math.inf if self.fim is None else max(0.0, self.fim - time.monotonic())
+
+    def esgotado(self):
+        return self.restante() <= 0
+
+
+class Coleta:
+    """
+    Resultado de coletar(): respostas e erros por item, os itens sem
+    resposta no fim do prazo (na ordem pedida), a latência de cada item e
+    quantas cópias e pedidos refeitos saíram.
+    """
+
+    def __init__(self, resultados, erros, faltando, latencias, copias, refeitos):
+        self.resultados = resultados
+        self.erros = erros
+        self.faltando = faltando
+        self.latencias = latencias
+        self.copias = copias
+        self.refeitos = refeitos
+
+    @property
+    def completa(self):
+        return not self.erros and not self.faltando
+
+
+def _espera_hedge(medidas, hedge):
+    if hedge is not None:
+        return hedge
+    if len(medidas) < 3:
+        return HEDGE_APOS
+    return max(HEDGE_MINIMO, float(np.quantile(medidas, QUANTIL_HEDGE)))
+
+
+def coletar(itens, buscar, prazo, max_conexoes=MAX_CONEXOES, timeout=TIMEOUT_PEDIDO, hedge=None,
+            tentativas=TENTATIVAS, ao_chegar=None):
+    """
+    buscar(item) para cada item (hashable), até max_conexoes pedidos no ar,
+    sem passar do 'prazo' (um Prazo). 'hedge' fixa em segundos a espera até
+    a cópia de um pedido lento; None usa o quantil das latências medidas.
+    ao_chegar(item, resposta) roda nesta thread assim que cada resposta
+    chega, enquanto as outras ainda estão a caminho.
+    """
+    itens = list(dict.fromkeys(itens))
+    respostas = queue.Queue()
+    fila = deque(itens)
+    abertos = set(itens)
+    no_ar = {}  # pedido -> (item, início)
+    pedidos = dict.fromkeys(itens, 0)
+    primeiro = {}
+    resultados, erros, latencias, medidas = {}, {}, {}, []
+    copias = refeitos = 0
+    numeros = itertools.count()
+
+    def disparar(item):
+        pedido = next(numeros)
+        pedidos[item] += 1
+        no_ar[pedido] = (item, time.monotonic())
+        primeiro.setdefault(item, time.monotonic())
+
+        def rodar():
+            inicio = time.perf_counter()
+            try:
+                resposta, erro = buscar(item), None
+            except Exception as e:
+                resposta, erro = None, e
+            respostas.put((pedido, item, resposta, erro, time.perf_counter() - inicio))
+
+        threading.Thread(target=rodar, daemon=True).start()
+
+    def no_ar_de(item):
+        return sum(1 for i, _ in no_ar.values() if i == item)
+
+    def desistir_ou_refazer(item, erro):
+        nonlocal refeitos
+        if pedidos[item] <= tentativas:
+            fila.appendleft(item)
+            refeitos += 1
+        else:
+            erros[item] = erro
+            abertos.discard(item)
+
+    with rastro.etapa('prazo.coletar', linhas=len(itens), conexoes=max_conexoes) as e:
+        while abertos and not prazo.esgotado():
+            agora = time.monotonic()
+            for pedido, (item, inicio) in list(no_ar.items()):
+                if agora - inicio >= timeout:
+                    del no_ar[pedido]
+                    if item in abertos and not no_ar_de(item):
+                        desistir_ou_refazer(item, TimeoutError(f"sem resposta em {timeout:g}s"))
+
+            while fila and len(no_ar) < max_conexoes:
+                disparar(fila.popleft())
+
+            # Cópias só com a fila vazia: os primeiros pedidos de todos têm a vez
+            espera = _espera_hedge(medidas, hedge)
+            proximo = [prazo.restante(), 1.0]
+            if not fila:
+                por_item = Counter(item for item, _ in no_ar.values())
+                for item, inicio in sorted(no_ar.values(), key=lambda x: x[1]):
+                    if por_item[item] > 1 or pedidos[item] > tentativas:
+                        continue
+                    if agora - inicio < espera:
+                        proximo.append(inicio + espera - agora)
+                    elif len(no_ar) < max_conexoes:
+                        disparar(item)
+                        por_item[item] += 1
+                        copias += 1
+            proximo += [inicio + timeout - agora for _, inicio in no_ar.values()]
+
+            try:
+                pedido, item, resposta, erro, latencia = respostas.get(timeout=max(min(proximo), 0.005))
+            except queue.Empty:
+                continue
+            no_ar.pop(pedido, None)
+            if item not in abertos:
+                continue  # a outra cópia já respondeu
+            if erro is None:
+                resultados[item] = resposta
+                latencias[item] = latencia
+                medidas.append(latencia)
+                abertos.discard(item)
+                if ao_chegar is not None:
+                    ao_chegar(item, resposta)
+            elif not no_ar_de(item):
+                latencias[item] = latencia
+                desistir_ou_refazer(item, erro)
+        e.saida(len(resultados))
+
+    faltando = [i for i in itens if i in abertos]
+    fim = time.monotonic()
+    for item in faltando:
+        latencias[item] = fim - primeiro[item] if item in primeiro else 0.0
+    rastro.contar('prazo', acerto=True, n=len(resultados))
+    rastro.contar('prazo', acerto=False, n=len(faltando) + len(erros))
+    return Coleta(resultados, erros, faltando, latencias, copias, refeitos)
+
+
+def avisar(prazo, faltando, defasados, mostrar=10):
+    """Aviso do que ficou sem dado ou com o dado defasado do cache quando o prazo acabou."""
+    def lista(tickers):
+        nomes = [str(t).replace('.SA', '') for t in tickers]
+        return ", ".join(nomes[:mostrar]) + (f" e mais {len(nomes) - mostrar}" if len(nomes) > mostrar else "")
+
+    if not faltando and not defasados:
+        print(f"⏱️ Prazo de {prazo.segundos:g}s: todos os dados chegaram a tempo.")
+        return
+    print(f"⏱️ Prazo de {prazo.segundos:g}s: relatório com os dados que chegaram a tempo.")
+    if faltando:
+        print(f"   ❌ Sem dados ({len(faltando)}), fora da análise: {lista(faltando)}")
+    if defasados:
+        print(f"   {MARCA_DEFASADO} ({len(defasados)}), com o último dado do cache local: {lista(defasados)}")
+
+
+# --- LINHA DE COMANDO ---
+def adicionar_argumentos(parser):
+    parser.add_argument('--prazo', type=float, metavar='SEGUNDOS',
+                        help="prazo total da coleta no Yahoo: pedidos lentos são copiados ou refeitos e, no fim do "
+                             "prazo, a análise usa o que chegou e marca o que faltou ou ficou defasado")
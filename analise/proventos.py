@@ -0,0 +1,237 @@
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise import rastro
+from analise.historico import inicio_do_periodo, separar_historicos
+
+# --- HISTÓRICO DE PROVENTOS ---
+# O 'dy' do Fundamentus é um número só, de um instante: não diz se o
+# pagamento se repete nem se veio de um provento extraordinário. Aqui os
+# eventos de pagamento (data ex, valor por ação) de todo o universo ficam
+# num SQLite local, e DY dos últimos 12 meses, regularidade e volatilidade
+# do yield saem de uma matriz anos x tickers montada de uma vez.
+#
+# O Yahoo não tem consulta só de proventos em lote: vem do mesmo
+# yf.download das barras (actions=True), em lotes de tickers, e só os dias
+# com pagamento são guardados. Depois da primeira carga, cada ticker só
+# volta à fonte vencido o TTL, e só a partir da última data coberta.
+
+ARQUIVO_PADRAO = os.path.join('dados', 'proventos.sqlite')
+TTL_PADRAO = 24 * 60 * 60  # segundos: proventos novos saem no máximo uma vez por dia
+ANOS = 5                   # janela da regularidade e da volatilidade do yield
+LOTE = 200                 # tickers por yf.download
+SUFIXO = '.SA'
+METRICAS = ['dy_12m', 'regularidade', 'dy_volatilidade', 'anos_cobertos']
+
+
+def medir(eventos, cotacoes, inicios, hoje=None, anos=ANOS):
+    """
+    Métricas de renda de cada ticker de 'cotacoes' (Series ticker -> preço)
+    a partir de 'eventos' (colunas ticker, data, valor) e do início do
+    histórico guardado de cada ticker ('inicios', Series ticker -> data):
+
+    - dy_12m: proventos dos últimos 12 meses sobre o preço;
+    - regularidade: fração dos anos cobertos (janelas de 12 meses até
+      hoje, no máximo 'anos') com algum pagamento;
+    - dy_volatilidade: desvio padrão do yield de cada ano coberto, sobre o
+      preço atual (NaN com menos de dois anos);
+    - anos_cobertos.
+
+    Ticker sem histórico guardado fica com NaN.
+    """
+    tickers = cotacoes.index
+    n = len(tickers)
+    hoje = pd.Timestamp(hoje or pd.Timestamp.today()).normalize()
+    # Bordas das janelas, da mais antiga à mais recente: a janela j vai de bordas[j] (exclusive) a bordas[j+1]
+    bordas = pd.DatetimeIndex([hoje - pd.DateOffset(years=anos - j) for j in range(anos)]).to_numpy()
+
+    anual = np.zeros((anos, n))
+    if len(eventos):
+        coluna = tickers.get_indexer(eventos['ticker'])
+        janela = np.searchsorted(bordas, pd.to_datetime(eventos['data']).to_numpy(), side='left') - 1
+        validos = (coluna >= 0) & (janela >= 0)
+        np.add.at(anual, (janela[validos], coluna[validos]), eventos['valor'].to_numpy(dtype=float)[validos])
+
+    inicio = pd.to_datetime(inicios.reindex(tickers)).to_numpy()
+    guardado = ~pd.isna(inicio)
+    cobertos = (bordas[:, None] >= inicio[None, :]) & guardado
+    # A janela mais recente vale mesmo para quem foi listado há menos de um ano
+    cobertos[-1] = guardado
+    n_anos = cobertos.sum(axis=0)
+
+    preco = cotacoes.to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        yields = np.where(preco > 0, anual / preco, np.nan)
+        media = np.where(cobertos, yields, 0).sum(axis=0) / n_anos
+        variancia = np.where(cobertos, (yields - media) ** 2, 0).sum(axis=0) / n_anos
+        regularidade = ((anual > 0) & cobertos).sum(axis=0) / n_anos
+    return pd.DataFrame({
+        'dy_12m': np.where(guardado, yields[-1], np.nan),
+        'regularidade': np.where(guardado, regularidade, np.nan),
+        'dy_volatilidade': np.where(n_anos >= 2, np.sqrt(variancia), np.nan),
+        'anos_cobertos': n_anos,
+    }, index=tickers)
+
+
+class ProventosStore:
+    """
+    Eventos de pagamento por ticker e data ex num SQLite local, com a
+    janela coberta por ticker. Tickers sem pagamento também ficam
+    registrados na cobertura: zero proventos é resultado, não falta de dado.
+    """
+
+    def __init__(self, caminho=ARQUIVO_PADRAO, ttl=TTL_PADRAO):
+        self.caminho = caminho
+        self.ttl = ttl
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS proventos (
+                    ticker TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    valor REAL NOT NULL,
+                    PRIMARY KEY (ticker, data)
+                )
+            """)
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS cobertura (
+                    ticker TEXT PRIMARY KEY,
+                    inicio TEXT NOT NULL,
+                    fim TEXT NOT NULL,
+                    buscado_em REAL NOT NULL
+                )
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho)
+
+    def _cobertura(self, tickers):
+        with self._conectar() as con:
+            linhas = con.execute(
+                f"SELECT ticker, inicio, fim, buscado_em FROM cobertura WHERE ticker IN ({','.join('?' * len(tickers))})",
+                list(tickers),
+            ).fetchall()
+        return {t: (pd.Timestamp(i), pd.Timestamp(f), b) for t, i, f, b in linhas}
+
+    def _baixar(self, tickers, inicio):
+        import yfinance as yf  # só carrega quando há algo a baixar
+        rastro.instrumentar_http()
+
+        historicos = {}
+        for k in range(0, len(tickers), LOTE):
+            lote = tickers[k:k + LOTE]
+            with rastro.etapa('proventos.download', linhas=len(lote)) as e:
+                dados = yf.download(
+                    lote, start=inicio.strftime('%Y-%m-%d'), group_by='ticker',
+                    auto_adjust=False, actions=True, threads=True, progress=False,
+                )
+                if dados is not None and not dados.empty:
+                    historicos.update(separar_historicos(dados, lote))
+                e.saida(len(historicos))
+        return historicos
+
+    def _gravar(self, historicos, tickers, inicios):
+        """Grava os dias com pagamento e estende a cobertura de cada ticker baixado."""
+        agora = time.time()
+        registros, cobertura = [], []
+        for t in tickers:
+            hist = historicos.get(t)
+            if hist is None or 'Dividends' not in hist:
+                hist = pd.DataFrame({'Dividends': []}, index=pd.DatetimeIndex([]))
+            pagos = hist['Dividends'].fillna(0)
+            pagos = pagos[pagos > 0]
+            registros.extend((t, d.strftime('%Y-%m-%d'), float(v)) for d, v in pagos.items())
+            fim = hist.index.max() if len(hist) else inicios[t]
+            cobertura.append((t, inicios[t].strftime('%Y-%m-%d'), fim.strftime('%Y-%m-%d'), agora))
+        with self._conectar() as con:
+            con.executemany("INSERT OR REPLACE INTO proventos VALUES (?, ?, ?)", registros)
+            con.executemany(
+                "INSERT INTO cobertura VALUES (?, ?, ?, ?) ON CONFLICT(ticker) DO UPDATE SET "
+                "inicio = MIN(inicio, excluded.inicio), fim = MAX(fim, excluded.fim), buscado_em = excluded.buscado_em",
+                cobertura,
+            )
+
+    def atualizar(self, tickers, anos=ANOS):
+        """
+        Traz para o disco o que falta para cobrir 'anos' em cada ticker:
+        carga completa para quem não tem a janela e só os dias desde a
+        última data coberta (vencido o TTL) para o resto.
+        """
+        inicio = inicio_do_periodo(f"{anos}y")
+        agora = time.time()
+        cobertura = self._cobertura(tickers)
+
+        completos, incrementais = [], {}
+        for t in tickers:
+            if t not in cobertura or cobertura[t][0] > inicio:
+                completos.append(t)
+            elif agora - cobertura[t][2] > self.ttl:
+                incrementais[t] = cobertura[t][1]
+        rastro.contar('proventos', acerto=True, n=len(tickers) - len(completos) - len(incrementais))
+        rastro.contar('proventos', acerto=False, n=len(completos) + len(incrementais))
+
+        if completos:
+            baixados = self._baixar(completos, inicio)
+            # Download que falhou por inteiro não marca nada como coberto
+            if baixados:
+                self._gravar(baixados, completos, dict.fromkeys(completos, inicio))
+        if incrementais:
+            baixados = self._baixar(list(incrementais), min(incrementais.values()))
+            if baixados:
+                self._gravar(baixados, list(incrementais), {t: cobertura[t][0] for t in incrementais})
+
+    def ler(self, tickers, anos=ANOS):
+        """(eventos ticker/data/valor desde o início da janela, Series ticker -> início coberto)."""
+        inicio = inicio_do_periodo(f"{anos}y").strftime('%Y-%m-%d')
+        marcadores = ','.join('?' * len(tickers))
+        with self._conectar() as con:
+            eventos = pd.read_sql(
+                f"SELECT ticker, data, valor FROM proventos WHERE ticker IN ({marcadores}) AND data >= ?",
+                con, params=[*tickers, inicio],
+            )
+            cobertura = pd.read_sql(
+                f"SELECT ticker, inicio FROM cobertura WHERE ticker IN ({marcadores})", con, params=list(tickers),
+            )
+        eventos['data'] = pd.to_datetime(eventos['data'])
+        return eventos, pd.to_datetime(cobertura.set_index('ticker')['inicio'])
+
+    def metricas(self, cotacoes, anos=ANOS):
+        """
+        Métricas de medir() para 'cotacoes' (Series ticker do Fundamentus ->
+        preço, sem o sufixo do Yahoo), atualizando antes o que falta.
+        """
+        if cotacoes.empty:
+            return pd.DataFrame(columns=METRICAS, index=cotacoes.index, dtype=float)
+        yahoo = cotacoes.index.astype(str) + SUFIXO
+        tickers = list(dict.fromkeys(yahoo))
+        self.atualizar(tickers, anos)
+        with rastro.etapa('proventos.medir', linhas=len(tickers)) as e:
+            eventos, inicios = self.ler(tickers, anos)
+            precos = pd.Series(cotacoes.to_numpy(), index=yahoo)
+            resultado = medir(eventos, precos[~precos.index.duplicated()], inicios, anos=anos)
+            e.saida(int(resultado['dy_12m'].notna().sum()))
+        return resultado.reindex(yahoo).set_axis(cotacoes.index)
+
+
+def com_dy_medido(df, anos=ANOS, store=None):
+    """
+    Cópia de uma tabela do Fundamentus (índice = ticker, com 'cotacao' e
+    'dy') com o DY dos proventos dos últimos 12 meses no lugar do 'dy' onde
+    há histórico guardado, o valor original em 'dy_fundamentus' e as
+    colunas 'regularidade' e 'dy_volatilidade'. Sem histórico vale o 'dy'
+    da tabela.
+    """
+    metricas = (store or ProventosStore()).metricas(df['cotacao'], anos)
+    df = df.copy()
+    df['dy_fundamentus'] = df['dy']
+    medido = metricas['dy_12m'].to_numpy()
+    df['dy'] = np.where(np.isnan(medido), df['dy'].to_numpy(dtype=float), medido)
+    df['regularidade'] = metricas['regularidade'].to_numpy()
+    df['dy_volatilidade'] = metricas['dy_volatilidade'].to_numpy()
+    return df
@@ -0,0 +1,291 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de memória no rastro
+    resource = None
+
+# --- RASTRO DE EXECUÇÃO (instrumentação) ---
+# Mede cada etapa do pipeline (tempo de parede, requisições HTTP e bytes,
+# linhas que entram e saem, pico de memória) e os acertos/faltas dos caches:
+# snapshots, preços e as respostas condicionais do cliente HTTP
+# (analise/rede.py). No fim da execução grava um JSON e, se pedido, imprime uma
+# tabela-resumo.
+#
+# Desligado (o padrão), etapa() devolve sempre o mesmo objeto vazio e
+# contar()/instrumentar_http() retornam na primeira linha. requests e
+# curl_cffi só são instrumentados quando o próprio código que baixa dados
+# chama instrumentar_http(), logo depois de importá-los.
+
+_ATIVO = None
+
+
+class _EtapaNula:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def saida(self, linhas):
+        pass
+
+
+_NULA = _EtapaNula()
+
+
+def _memoria_pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024  # bytes no macOS, KB no Linux
+
+
+class _Etapa:
+    def __init__(self, rastro, nome, linhas, dados):
+        self.rastro = rastro
+        self.registro = {'etapa': nome, 'linhas_entrada': linhas, 'linhas_saida': None, **dados}
+
+    def saida(self, linhas):
+        self.registro['linhas_saida'] = int(linhas)
+
+    def __enter__(self):
+        pilha = self.rastro.pilha()
+        self.registro['pai'] = pilha[-1].registro['etapa'] if pilha else None
+        pilha.append(self)
+        self._http = self.rastro.totais_http()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, erro, tb):
+        duracao = time.perf_counter() - self._inicio
+        self.rastro.pilha().pop()
+        requisicoes, bytes_ = self.rastro.totais_http()
+        self.registro.update({
+            'inicio': round(self._inicio - self.rastro.inicio, 6),
+            'segundos': round(duracao, 6),
+            'http_requisicoes': requisicoes - self._http[0],
+            'http_bytes': bytes_ - self._http[1],
+            'memoria_pico_mb': _memoria_pico_mb(),
+        })
+        if tipo is not None:
+            self.registro['erro'] = f"{tipo.__name__}: {erro}"
+        with self.rastro.trava:
+            self.rastro.etapas.append(self.registro)
+        return False
+
+
+class Rastro:
+    """Coletor de uma execução: etapas, contadores de cache e HTTP por host."""
+
+    def __init__(self, caminho=None, resumo=False):
+        self.caminho = caminho
+        self.resumo = resumo
+        self.inicio = time.perf_counter()
+        self.criado_em = time.time()
+        self.etapas = []
+        self.caches = {}
+        self.http = {}
+        self.trava = threading.Lock()
+        self._local = threading.local()
+
+    def pilha(self):
+        if not hasattr(self._local, 'pilha'):
+            self._local.pilha = []
+        return self._local.pilha
+
+    def totais_http(self):
+        with self.trava:
+            return (
+                sum(h['requisicoes'] for h in self.http.values()),
+                sum(h['bytes'] for h in self.http.values()),
+            )
+
+    def registrar_http(self, url, segundos, bytes_=0, do_cache=False):
+        host = urlsplit(url).netloc or url
+        with self.trava:
+            h = self.http.setdefault(host, {'requisicoes': 0, 'bytes': 0, 'segundos': 0.0, 'cache_acertos': 0})
+            if do_cache:
+                h['cache_acertos'] += 1
+            else:
+                h['requisicoes'] += 1
+                h['bytes'] += bytes_
+                h['segundos'] += segundos
+        if do_cache is not None:
+            self.contar('http_cache.sqlite', acerto=do_cache)
+
+    def somar_bytes(self, url, bytes_):
+        host = urlsplit(url).netloc or url
+        with self.trava:
+            self.http[host]['bytes'] += bytes_
+
+    def contar(self, cache, acerto, n=1):
+        with self.trava:
+            c = self.caches.setdefault(cache, {'acertos': 0, 'faltas': 0})
+            c['acertos' if acerto else 'faltas'] += n
+
+    def como_dict(self):
+        return {
+            'comando': sys.argv,
+            'criado_em': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.criado_em)),
+            'segundos': round(time.perf_counter() - self.inicio, 6),
+            'memoria_pico_mb': _memoria_pico_mb(),
+            'etapas': sorted(self.etapas, key=lambda e: e['inicio']),
+            'caches': self.caches,
+            'http': self.http,
+        }
+
+    def tabela(self):
+        """Resumo legível das etapas, caches e hosts."""
+        dados = self.como_dict()
+        linhas = [f"{'ETAPA':<34} {'TEMPO':>8} {'HTTP':>5} {'KB':>9} {'LINHAS':>15} {'MEM MB':>7}"]
+        profundidade = {}
+        for e in dados['etapas']:
+            profundidade[e['etapa']] = profundidade.get(e['pai'], -1) + 1
+            nome = '  ' * profundidade[e['etapa']] + e['etapa']
+            entrada, saida = e['linhas_entrada'], e['linhas_saida']
+            fluxo = f"{entrada if entrada is not None else '-'} -> {saida if saida is not None else '-'}" if entrada is not None or saida is not None else ''
+            memoria = f"{e['memoria_pico_mb']:.0f}" if e['memoria_pico_mb'] is not None else '-'
+            linhas.append(f"{nome[:34]:<34} {e['segundos']:>7.2f}s {e['http_requisicoes']:>5} {e['http_bytes'] / 1024:>9.1f} {fluxo:>15} {memoria:>7}")
+        linhas.append(f"{'TOTAL':<34} {dados['segundos']:>7.2f}s")
+        for nome, c in sorted(dados['caches'].items()):
+            linhas.append(f"cache {nome}: {c['acertos']} acertos, {c['faltas']} faltas")
+        for host, h in sorted(dados['http'].items()):
+            linhas.append(f"http {host}: {h['requisicoes']} requisições, {h['bytes'] / 1024:.1f} KB, {h['segundos']:.2f}s, {h['cache_acertos']} do cache")
+        return "\n".join(linhas)
+
+    def finalizar(self):
+        if self.caminho:
+            pasta = os.path.dirname(self.caminho)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            with open(self.caminho, 'w') as f:
+                json.dump(self.como_dict(), f, indent=2, ensure_ascii=False)
+            print(f"🧭 Rastro gravado em {self.caminho}")
+        if self.resumo:
+            print("\n" + self.tabela())
+
+
+def ativar(caminho=None, resumo=False):
+    """Liga o rastro para o resto do processo; grava/imprime ao sair."""
+    global _ATIVO
+    if _ATIVO is None:
+        _ATIVO = Rastro(caminho, resumo)
+        atexit.register(_ATIVO.finalizar)
+    return _ATIVO
+
+
+def desativar():
+    """Desliga o rastro e devolve o coletor (sem gravar nada)."""
+    global _ATIVO
+    rastro, _ATIVO = _ATIVO, None
+    if rastro is not None:
+        atexit.unregister(rastro.finalizar)
+    return rastro
+
+
+def ativo():
+    return _ATIVO
+
+
+def etapa(nome, linhas=None, **dados):
+    """
+    Mede o bloco como uma etapa. 'linhas' é o tamanho da entrada; chame
+    .saida(n) no objeto devolvido para registrar o tamanho da saída.
+    """
+    if _ATIVO is None:
+        return _NULA
+    return _Etapa(_ATIVO, nome, None if linhas is None else int(linhas), dados)
+
+
+def contar(cache, acerto, n=1):
+    """Registra acertos (acerto=True) ou faltas de um cache."""
+    if _ATIVO is None or not n:
+        return
+    _ATIVO.contar(cache, acerto, n)
+
+
+# --- HTTP ---
+_INSTRUMENTADOS = set()
+
+
+def _contar_stream(rastro, url, resposta):
+    """Conta os bytes de respostas com stream=True à medida que são lidas."""
+    original = resposta.iter_content
+
+    def iter_content(*args, **kwargs):
+        for parte in original(*args, **kwargs):
+            rastro.somar_bytes(url, len(parte))
+            yield parte
+    resposta.iter_content = iter_content
+
+
+def _envolver(classe):
+    original = classe.request
+
+    def request(self, method, url, *args, **kwargs):
+        rastro = _ATIVO
+        if rastro is None:
+            return original(self, method, url, *args, **kwargs)
+        inicio = time.perf_counter()
+        resposta = original(self, method, url, *args, **kwargs)
+        segundos = time.perf_counter() - inicio
+        do_cache = getattr(resposta, 'from_cache', None)  # só sessões do requests_cache têm
+        if kwargs.get('stream') and not do_cache:
+            rastro.registrar_http(url, segundos, 0, do_cache)
+            _contar_stream(rastro, url, resposta)
+        else:
+            rastro.registrar_http(url, segundos, len(resposta.content or b''), do_cache)
+        return resposta
+
+    classe.request = request
+
+
+def instrumentar_http():
+    """
+    Passa a contar as requisições de requests (inclusive as do
+    requests_cache) e do curl_cffi usado pelo yfinance. Só olha os módulos
+    já importados e só age com o rastro ligado.
+    """
+    if _ATIVO is None:
+        return
+    alvos = []
+    if 'requests_cache' in sys.modules:
+        # Dentro de requests_cache.enabled() requests.Session é a CachedSession;
+        # a original (que ela estende) continua em requests_cache.session
+        import requests_cache.session
+        alvos.append(requests_cache.session.OriginalSession)
+    elif 'requests' in sys.modules:
+        import requests.sessions
+        alvos.append(requests.sessions.Session)
+    if 'curl_cffi' in sys.modules:
+        import curl_cffi.requests
+        alvos.append(curl_cffi.requests.Session)
+    for classe in alvos:
+        if classe not in _INSTRUMENTADOS:
+            _INSTRUMENTADOS.add(classe)
+            _envolver(classe)
+
+
+# --- LINHA DE COMANDO ---
+def adicionar_argumentos(parser):
+    parser.add_argument('--trace', metavar='JSON', help="grava o rastro da execução (tempo por etapa, HTTP, caches, memória)")
+    parser.add_argument('--resumo', action='store_true', help="imprime a tabela-resumo do rastro no fim")
+
+
+def instalar_pelos_argumentos(args):
+    """
+    Liga o rastro se --trace/--resumo foram passados ou se ANALISE_TRACE
+    (caminho do JSON) estiver definida. Usado pelos scripts no início.
+    """
+    caminho = getattr(args, 'trace', None) or os.environ.get('ANALISE_TRACE')
+    resumo = getattr(args, 'resumo', False)
+    if caminho or resumo:
+        return ativar(caminho, resumo)
+    return None
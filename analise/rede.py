@@ -0,0 +1,301 @@
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from analise import rastro
+
+# --- CLIENTE HTTP COMPARTILHADO ---
+# Uma única requests.Session para o processo: conexões reaproveitadas
+# (keep-alive) num pool por host, timeout em toda chamada, novas tentativas
+# limitadas com espera exponencial e variação aleatória (erros de conexão e
+# 429/5xx), gzip, e requisições condicionais: o corpo de cada URL fica no
+# SQLite com o ETag/Last-Modified, e a próxima consulta manda
+# If-None-Match/If-Modified-Since. Página sem mudança custa um 304 e o
+# corpo sai do disco. Cada host tem contadores de requisições, 304,
+# tentativas extras, erros, bytes e latência (ver por_host()).
+#
+# O fundamentus chama requests.get por conta própria; requests_pelo_cliente()
+# desvia essas chamadas para o cliente durante o bloco (só as da thread do
+# bloco e só as que o cliente sabe atender). O yfinance já mantém
+# uma sessão curl_cffi única por processo e fica de fora.
+
+ARQUIVO_PADRAO = os.path.join('dados', 'http.sqlite')
+TIMEOUT = (5, 30)          # segundos: (conexão, leitura)
+TENTATIVAS = 3             # novas tentativas além da primeira
+ESPERA_BASE = 0.5          # segundos; dobra a cada tentativa
+VARIACAO = 0.5             # até meio segundo aleatório somado a cada espera
+CONEXOES_POR_HOST = 8
+STATUS_REPETIR = (429, 500, 502, 503, 504)
+CABECALHOS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+
+class RespostaHTTP:
+    """
+    Resposta do cliente: o corpo vem da rede (200) ou do cache em disco (304
+    ou ainda dentro de max_idade). iter_content lê em pedaços enquanto a
+    página chega e grava o corpo no cache quando a leitura termina.
+    """
+
+    def __init__(self, url, status_code, headers, corpo=None, pedacos=None, ao_terminar=None, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.from_cache = from_cache
+        self._corpo = corpo
+        self._pedacos = pedacos
+        self._ao_terminar = ao_terminar
+
+    @property
+    def nao_modificado(self):
+        """A página não mudou desde a última vez (corpo do cache)."""
+        return self.from_cache
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} para {self.url}")
+
+    def iter_content(self, chunk_size=64 * 1024):
+        if self._corpo is not None:
+            for i in range(0, len(self._corpo), chunk_size):
+                yield self._corpo[i:i + chunk_size]
+            return
+        lidos = []
+        for parte in self._pedacos(chunk_size):
+            lidos.append(parte)
+            yield parte
+        self._corpo = b''.join(lidos)
+        if self._ao_terminar:
+            self._ao_terminar(self._corpo)
+
+    @property
+    def content(self):
+        if self._corpo is None:
+            for _ in self.iter_content():
+                pass
+        return self._corpo
+
+    @property
+    def text(self):
+        return self.content.decode('latin-1')
+
+
+class ClienteHTTP:
+    """Sessão com pool, tentativas e cache condicional em disco (ver o topo do módulo)."""
+
+    def __init__(self, caminho=ARQUIVO_PADRAO, timeout=TIMEOUT, tentativas=TENTATIVAS,
+                 espera_base=ESPERA_BASE, conexoes=CONEXOES_POR_HOST):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.caminho = caminho
+        self.timeout = timeout
+        repetir = Retry(
+            total=tentativas, connect=tentativas, read=tentativas, status=tentativas,
+            backoff_factor=espera_base, backoff_jitter=VARIACAO, status_forcelist=STATUS_REPETIR,
+            allowed_methods=frozenset({'GET', 'HEAD'}), respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=conexoes, pool_maxsize=conexoes, max_retries=repetir)
+        self.sessao.mount('http://', adaptador)
+        self.sessao.mount('https://', adaptador)
+        self.sessao.headers.update(CABECALHOS)
+
+        self._trava = threading.Lock()
+        self._hosts = defaultdict(lambda: {'requisicoes': 0, 'nao_modificadas': 0, 'tentativas_extras': 0,
+                                           'erros': 0, 'bytes': 0, 'segundos': 0.0, 'segundos_max': 0.0})
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS paginas (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    modificado_em TEXT,
+                    corpo BLOB NOT NULL,
+                    validado_em REAL NOT NULL
+                )
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho)
+
+    # --- cache em disco ---
+    def _guardado(self, url):
+        with self._conectar() as con:
+            return con.execute(
+                "SELECT etag, modificado_em, corpo, validado_em FROM paginas WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _guardar(self, url, etag, modificado_em, corpo):
+        with self._conectar() as con:
+            con.execute("INSERT OR REPLACE INTO paginas VALUES (?, ?, ?, ?, ?)",
+                        (url, etag, modificado_em, corpo, time.time()))
+
+    def _revalidar(self, url):
+        with self._conectar() as con:
+            con.execute("UPDATE paginas SET validado_em = ? WHERE url = ?", (time.time(), url))
+
+    # --- contadores ---
+    def _contar(self, url, segundos, status=None, tentativas=0, erro=False):
+        host = urlsplit(url).netloc or url
+        with self._trava:
+            c = self._hosts[host]
+            c['requisicoes'] += 1
+            c['nao_modificadas'] += status == 304
+            c['tentativas_extras'] += tentativas
+            c['erros'] += erro or (status is not None and status >= 400)
+            c['segundos'] += segundos
+            c['segundos_max'] = max(c['segundos_max'], segundos)
+
+    def _somar_bytes(self, url, bytes_):
+        with self._trava:
+            self._hosts[urlsplit(url).netloc or url]['bytes'] += bytes_
+
+    def por_host(self):
+        """Contadores por host: requisições, 304, tentativas extras, erros, bytes e latência."""
+        with self._trava:
+            linhas = {host: dict(c) for host, c in self._hosts.items()}
+        df = pd.DataFrame.from_dict(linhas, orient='index')
+        if df.empty:
+            return df
+        df['latencia_media'] = df['segundos'] / df['requisicoes']
+        df.index.name = 'host'
+        return df
+
+    # --- requisições ---
+    def _enviar(self, url, headers):
+        # Sempre em stream: quem lê decide entre iter_content (em pedaços) e .content
+        return self.sessao.get(url, headers=headers, stream=True, timeout=self.timeout)
+
+    def obter(self, url, headers=None, max_idade=0):
+        """
+        GET condicional de 'url'. Com o corpo no cache, pede só se mudou; se
+        a última validação tem menos de 'max_idade' segundos, nem vai à rede.
+        Erros HTTP não são lançados (ver raise_for_status).
+        """
+        guardado = self._guardado(url)
+        if guardado and time.time() - guardado[3] < max_idade:
+            rastro.contar('http.condicional', acerto=True)
+            return RespostaHTTP(url, 200, {}, corpo=guardado[2], from_cache=True)
+
+        cabecalhos = dict(headers or {})
+        if guardado:
+            etag, modificado_em, _, _ = guardado
+            if etag:
+                cabecalhos['If-None-Match'] = etag
+            if modificado_em:
+                cabecalhos['If-Modified-Since'] = modificado_em
+
+        inicio = time.perf_counter()
+        try:
+            resposta = self._enviar(url, cabecalhos)
+        except Exception:
+            self._contar(url, time.perf_counter() - inicio, erro=True)
+            raise
+        segundos = time.perf_counter() - inicio
+        retries = getattr(getattr(resposta, 'raw', None), 'retries', None)
+        tentativas = len(retries.history) if retries is not None else 0
+        self._contar(url, segundos, resposta.status_code, tentativas)
+
+        if resposta.status_code == 304 and guardado:
+            resposta.close()
+            rastro.contar('http.condicional', acerto=True)
+            self._revalidar(url)
+            return RespostaHTTP(url, 200, resposta.headers, corpo=guardado[2], from_cache=True)
+
+        rastro.contar('http.condicional', acerto=False)
+        validadores = resposta.headers.get('ETag'), resposta.headers.get('Last-Modified')
+
+        def ao_terminar(corpo):
+            self._somar_bytes(url, len(corpo))
+            # Guardado mesmo sem validadores: serve a max_idade (ex.: requests_pelo_cliente)
+            if resposta.status_code == 200:
+                self._guardar(url, *validadores, corpo)
+
+        return RespostaHTTP(url, resposta.status_code, resposta.headers,
+                            pedacos=lambda tamanho: resposta.iter_content(chunk_size=tamanho),
+                            ao_terminar=ao_terminar)
+
+    def get(self, url, headers=None, max_idade=0, **kwargs):
+        """Assinatura de requests.get (stream, timeout e afins são ignorados)."""
+        return self.obter(url, headers=headers, max_idade=max_idade)
+
+
+_CLIENTE = None
+_TRAVA_CLIENTE = threading.Lock()
+
+
+def cliente_padrao():
+    """O ClienteHTTP do processo (criado na primeira chamada)."""
+    global _CLIENTE
+    with _TRAVA_CLIENTE:
+        if _CLIENTE is None:
+            _CLIENTE = ClienteHTTP()
+            rastro.instrumentar_http()
+        return _CLIENTE
+
+
+# Desvio de requests.get: instalado pelo primeiro bloco e desfeito pelo
+# último, com a pilha de clientes de cada thread
+_TRAVA_DESVIO = threading.Lock()
+_DESVIO = {'usos': 0, 'original': None}
+_BLOCOS = threading.local()
+
+
+def _get_desviado(url, *args, **kwargs):
+    """requests.get pelo cliente do bloco desta thread; o resto vai ao requests.get original."""
+    pilha = getattr(_BLOCOS, 'clientes', None)
+    # Parâmetros, timeout, stream e afins o cliente não atende
+    if not pilha or args or kwargs.keys() - {'headers'}:
+        return _DESVIO['original'](url, *args, **kwargs)
+    cliente, max_idade = pilha[-1]
+    return cliente.get(url, headers=kwargs.get('headers'), max_idade=max_idade)
+
+
+@contextlib.contextmanager
+def requests_pelo_cliente(cliente=None, max_idade=60):
+    """
+    Durante o bloco, requests.get(url, headers=...) chamado nesta thread
+    passa pelo cliente (pool, tentativas e cache condicional). Para
+    bibliotecas que chamam requests.get direto, como o fundamentus;
+    'max_idade' evita revalidar uma página que acabou de ser conferida.
+    Blocos podem se sobrepor, em threads diferentes ou aninhados.
+    """
+    import requests
+
+    cliente = cliente or cliente_padrao()
+    with _TRAVA_DESVIO:
+        if _DESVIO['usos'] == 0:
+            _DESVIO['original'] = requests.get
+            requests.get = _get_desviado
+        _DESVIO['usos'] += 1
+    pilha = _BLOCOS.__dict__.setdefault('clientes', [])
+    pilha.append((cliente, max_idade))
+    try:
+        yield cliente
+    finally:
+        pilha.pop()
+        with _TRAVA_DESVIO:
+            _DESVIO['usos'] -= 1
+            if _DESVIO['usos'] == 0:
+                requests.get = _DESVIO['original']
+                _DESVIO['original'] = None
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+from analise.compacto import como_float
+
+# --- REFINO COLUNAR (avalairb3) ---
+# Momentum, volatilidade e score de todos os candidatos de uma vez, sobre a
+# matriz datas x tickers de fechamentos. Os textos de justificativa só são
+# montados para quem passa no corte de score.
+
+SCORE_MINIMO = 2
+COMPRA_FORTE = 3.0
+JOIA_RARA = 4.5
+COLUNAS_RESULTADO = [
+    'ticker', 'tipo', 'setor', 'preco', 'dy', 'p_vp', 'momentum', 'volatilidade',
+    'score', 'perfil', 'justificativa_tecnica', 'premissas_negocio',
+]
+
+
+def matriz_fechamentos(historicos, tickers):
+    """
+    Fechamentos alinhados por data (colunas na ordem de 'tickers') a partir
+    de um dict ticker -> DataFrame com a coluna 'Close'.
+    """
+    tickers = list(tickers)
+    series = [(j, historicos[t]['Close']) for j, t in enumerate(tickers) if t in historicos and not historicos[t].empty]
+    if not series:
+        return pd.DataFrame(columns=tickers, dtype=float)
+
+    # União das datas uma vez só e cada série escrita direto na sua coluna
+    datas = np.unique(np.concatenate([s.index.to_numpy() for _, s in series]))
+    matriz = np.full((len(datas), len(tickers)), np.nan)
+    for j, s in series:
+        matriz[np.searchsorted(datas, s.index.to_numpy()), j] = s.to_numpy(dtype=float)
+    return pd.DataFrame(matriz, index=pd.DatetimeIndex(datas, name='Date'), columns=tickers)
+
+
+def metricas_de_preco(fechamentos):
+    """
+    Último preço, preço inicial, momentum e volatilidade anualizada por
+    ticker. Os buracos da matriz (datas em que o ticker não negociou) não
+    entram nos retornos, como se cada série fosse tratada sozinha.
+    """
+    preenchido = fechamentos.ffill()
+    retornos = preenchido.pct_change(fill_method=None).where(fechamentos.notna())
+    atual = preenchido.iloc[-1] if len(fechamentos) else pd.Series(np.nan, index=fechamentos.columns)
+    inicial = fechamentos.bfill().iloc[0] if len(fechamentos) else pd.Series(np.nan, index=fechamentos.columns)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        momentum = atual / inicial - 1
+    return pd.DataFrame({
+        'preco': atual,
+        'preco_inicial': inicial,
+        'momentum': momentum,
+        'volatilidade': retornos.std() * (252**0.5),  # Volatilidade Anualizada
+    })
+
+
+def pontuar(dy, pvp, momentum, tipo, setor):
+    """Score de DY, P/VP, momentum e bônus setorial de FIIs, em arrays."""
+    dy = como_float(dy)
+    pvp = como_float(pvp)
+    momentum = como_float(momentum)
+
+    # --- ANÁLISE DE DIVIDENDOS ---
+    score = np.select([dy > 0.12, dy >= 0.08, dy >= 0.06], [2.5, 2.0, 1.0], 0.0)
+
+    # --- ANÁLISE DE VALUATION (P/VP) ---
+    score += np.select([(pvp > 0) & (pvp < 0.85), (pvp > 0) & (pvp < 1.0), pvp > 1.20], [2.0, 1.0, -0.5], 0.0)
+
+    # --- ANÁLISE DE MOMENTUM E TENDÊNCIA ---
+    score += np.select([momentum > 0.05, momentum < -0.10], [1.5, -1.0], 0.0)
+
+    # --- FATORES QUALITATIVOS (Setor) ---
+    fii = np.asarray(tipo) == 'FII'
+    setor = pd.Series(setor)
+    papel = fii & setor.str.contains('Recebíveis|Papel', na=False).to_numpy(dtype=bool)
+    logistica = fii & ~papel & setor.str.contains('Logística', regex=False, na=False).to_numpy(dtype=bool)
+    score += np.where(papel & (dy > 0.10) & (pvp < 1.05), 1.0, 0.0)
+    score += np.where(logistica, 0.5, 0.0)
+    return score
+
+
+def perfil(score, joia_rara=JOIA_RARA, compra_forte=COMPRA_FORTE):
+    return np.select([score >= joia_rara, score >= compra_forte], ["💎 JOIA RARA", "✅ COMPRA FORTE"], "NEUTRO")
+
+
+def justificar(dy, pvp, momentum, tipo, setor):
+    """Textos de justificativa técnica e premissas de negócio de um ativo."""
+    analise_tecnica = []
+    premissas_negocio = []
+
+    if dy > 0.12:
+        analise_tecnica.append(f"Dividend Yield Excepcional ({dy:.1%}) indica forte fluxo de caixa ou desvalorização excessiva.")
+    elif dy >= 0.08:
+        analise_tecnica.append(f"Dividend Yield Atrativo ({dy:.1%}), acima da Selic real esperada.")
+    elif dy >= 0.06:
+        analise_tecnica.append(f"Dividend Yield Base ({dy:.1%}) compõe renda passiva mínima.")
+
+    if pvp > 0:
+        if pvp < 0.85:
+            premissas_negocio.append(f"Desconto Patrimonial Severo (P/VP {pvp:.2f}): O mercado precifica o ativo abaixo do custo de reposição.")
+        elif pvp < 1.0:
+            premissas_negocio.append(f"Negociado Abaixo do Patrimonial (P/VP {pvp:.2f}): Margem de segurança teórica.")
+        elif pvp > 1.20:
+            premissas_negocio.append(f"Ágio sobre Patrimônio (P/VP {pvp:.2f}): Mercado paga prêmio pela qualidade ou crescimento esperado.")
+
+    if momentum > 0.05:
+        analise_tecnica.append(f"Tendência de Alta de Curto Prazo (+{momentum:.1%} em 6m): Interesse comprador ativo.")
+    elif momentum < -0.10:
+        analise_tecnica.append(f"Tendência de Baixa (-{abs(momentum):.1%} em 6m): Cuidado com 'faca caindo' (momentum negativo).")
+
+    if tipo == 'FII' and isinstance(setor, str):
+        if any(x in setor for x in ['Recebíveis', 'Papel']):
+            if dy > 0.10 and pvp < 1.05:
+                premissas_negocio.append("Setor de Papel/Recebíveis beneficia-se de juros altos, convertendo indexadores em dividendos rápidos.")
+        elif any(x in setor for x in ['Logística']):
+            premissas_negocio.append("Setor Logístico resiliente com demanda por e-commerce e vacância controlada.")
+
+    return " ".join(analise_tecnica), " ".join(premissas_negocio)
+
+
+def refinar_candidatos(df_candidatos, fechamentos, dinheiro, score_minimo=SCORE_MINIMO):
+    """
+    Stage de refino do avalairb3 sobre todos os candidatos de uma vez.
+    'fechamentos' é a matriz datas x tickers (ver HistoricoStore.fechamentos
+    ou matriz_fechamentos); tickers sem coluna ficam de fora.
+    """
+    if df_candidatos.empty:
+        return pd.DataFrame(columns=COLUNAS_RESULTADO)
+
+    tickers = df_candidatos['ticker'].to_numpy()
+    precos = metricas_de_preco(fechamentos).reindex(tickers)
+
+    # Preço Atual e Validação (sem histórico, preço ausente, caro demais ou base zero ficam de fora)
+    validos = (
+        precos['preco'].notna() & (precos['preco'] <= dinheiro) & (precos['preco_inicial'] != 0)
+    ).to_numpy()
+
+    base = df_candidatos[validos]
+    precos = precos[validos]
+    pvp = como_float(base['p_vp']) if 'p_vp' in base.columns else np.zeros(len(base))
+    score = pontuar(base['dy_base'], pvp, precos['momentum'], base['tipo'], base['setor'])
+
+    aprovados = score >= score_minimo
+    base = base[aprovados]
+    precos = precos[aprovados]
+    score = score[aprovados]
+    pvp = pvp[aprovados]
+
+    textos = [
+        justificar(dy, p, m, tipo, setor)
+        for dy, p, m, tipo, setor in zip(base['dy_base'], pvp, precos['momentum'], base['tipo'], base['setor'])
+    ]
+
+    resultado = pd.DataFrame({
+        'ticker': base['ticker'].str.replace('.SA', '').to_numpy(),
+        'tipo': base['tipo'].to_numpy(),
+        'setor': base['setor'].to_numpy(),
+        'preco': precos['preco'].to_numpy(),
+        'dy': base['dy_base'].to_numpy(),
+        'p_vp': pvp,
+        'momentum': precos['momentum'].to_numpy(),
+        'volatilidade': precos['volatilidade'].to_numpy(),
+        'score': score,
+        'perfil': perfil(score),
+        'justificativa_tecnica': [t[0] for t in textos],
+        'premissas_negocio': [t[1] for t in textos],
+    }, columns=COLUNAS_RESULTADO)
+    return resultado.sort_values(by='score', ascending=False)
@@ -0,0 +1,551 @@
+import ast
+import copy
+import re
+
+import numpy as np
+import pandas as pd
+
+from analise.compacto import como_float
+from analise.pontuacao import valor_graham
+
+# --- MOTOR DE REGRAS DA ESPECIFICAÇÃO (Para fazer com ia.txt) ---
+# Lê a especificação declarativa do Lollapalooza (filtros globais, critérios
+# de cada stage com limites min/max, expressões 'logic' e o sistema de
+# pontuação) e compila cada critério uma vez numa função que devolve a
+# máscara booleana da coluna inteira. As máscaras ficam guardadas por
+# assinatura no Contexto do DataFrame, então várias variantes da estratégia
+# avaliadas sobre a mesma base só calculam cada critério distinto uma vez.
+
+ARQUIVO_PADRAO = 'Para fazer com ia.txt'
+PONTOS_BONUS = 10  # critérios com weight: "bonus" (a especificação não diz quanto)
+
+# Nome usado na especificação -> coluna de obter_dados_base
+METRICAS = {
+    'liquidez_diaria_media_30d': 'liq2m',  # o Fundamentus só tem a média de 2 meses
+    'segmento_listagem': 'segmento_listagem',
+    'divida_liquida_ebitda': 'divida_liquida_ebitda',
+    'liquidez_corrente': 'liquidez_corrente',
+    'anos_lucro_consecutivos': 'anos_lucro_consecutivos',
+    'roe_medio_5a': 'roe_medio_5a',
+    'roic_medio_5a': 'roic_medio_5a',
+    'margem_liquida_atual': 'mrgliq',
+    'recompra_acoes_ultimos_2a': 'recompra_acoes_ultimos_2a',
+    'capex_sobre_fluxo_caixa_operacional': 'capex_sobre_fluxo_caixa_operacional',
+    'preco_atual': 'cotacao',
+    'p/l': 'pl',
+    'p/vp': 'pvp',
+    'roe': 'roe',
+    'roic': 'roic',
+    'dy': 'dy',
+    'divida_liquida': 'divida_liquida',
+    'cagr_lucros_5a': 'c5y',
+}
+# Aproximações de um período só, usadas quando a série histórica não existe
+PROXIES = {
+    'roe_medio_5a': 'roe',
+    'roic_medio_5a': 'roic',
+    'liquidez_corrente': 'liqc',
+}
+# Métricas calculadas a partir de outras colunas
+DERIVADAS = {
+    'valor_intrinseco_graham': lambda df: valor_graham(df['lpa'], df['vpa']),
+}
+# Métricas contadas dentro do histórico guardado -> coluna com o tamanho
+# dele: o Yahoo devolve uns 4 balanços anuais, então o mínimo exigido vai
+# até o histórico de cada ticker (lucro em todos os anos guardados passa)
+HISTORICO = {
+    'anos_lucro_consecutivos': 'anos_balancos',
+}
+# Métricas que a especificação escreve em % (15.0) e a base guarda como fração (0.15)
+PERCENTUAIS = {'roe_medio_5a', 'roic_medio_5a', 'margem_liquida_atual', 'roe', 'roic', 'dy', 'cagr_lucros_5a'}
+
+
+# --- LEITURA DA ESPECIFICAÇÃO (subconjunto de YAML usado no arquivo) ---
+def _sem_comentario(linha):
+    aspas = None
+    for i, c in enumerate(linha):
+        if c in '"\'':
+            aspas = c if aspas is None else (None if aspas == c else aspas)
+        elif c == '#' and aspas is None and (i == 0 or linha[i - 1] in ' \t'):
+            return linha[:i].rstrip()
+    return linha.rstrip()
+
+
+def _dividir(texto, separador):
+    """Divide 'texto' em 'separador' fora de aspas, chaves e colchetes."""
+    partes, atual, nivel, aspas = [], [], 0, None
+    for c in texto:
+        if aspas:
+            aspas = None if c == aspas else aspas
+        elif c in '"\'':
+            aspas = c
+        elif c in '{[':
+            nivel += 1
+        elif c in '}]':
+            nivel -= 1
+        elif c == separador and nivel == 0:
+            partes.append(''.join(atual))
+            atual = []
+            continue
+        atual.append(c)
+    partes.append(''.join(atual))
+    return partes
+
+
+def _chave_valor(texto):
+    """('chave', 'resto') se a linha for 'chave: resto', senão None."""
+    aspas = None
+    for i, c in enumerate(texto):
+        if aspas:
+            aspas = None if c == aspas else aspas
+        elif c in '"\'':
+            aspas = c
+        elif c == ':' and (i + 1 == len(texto) or texto[i + 1] == ' '):
+            return _escalar(texto[:i]), texto[i + 1:].strip()
+        elif c in '{[':
+            return None
+    return None
+
+
+def _escalar(texto):
+    texto = texto.strip()
+    if not texto:
+        return None
+    if texto[0] in '"\'' and texto[-1] == texto[0] and len(texto) > 1:
+        return texto[1:-1]
+    if texto[0] == '{' and texto[-1] == '}':
+        pares = (_chave_valor(parte.strip()) for parte in _dividir(texto[1:-1], ',') if parte.strip())
+        return {chave: _escalar(valor) for chave, valor in pares}
+    if texto[0] == '[' and texto[-1] == ']':
+        return [_escalar(parte) for parte in _dividir(texto[1:-1], ',') if parte.strip()]
+    if texto in ('true', 'false'):
+        return texto == 'true'
+    if texto in ('null', '~'):
+        return None
+    for tipo in (int, float):
+        try:
+            return tipo(texto)
+        except ValueError:
+            pass
+    return texto
+
+
+def _bloco(linhas, i, recuo):
+    """Lê o bloco (lista ou mapa) que começa na linha i com o recuo dado."""
+    if linhas[i][1].startswith('- '):
+        lista = []
+        while i < len(linhas) and linhas[i][0] == recuo and linhas[i][1].startswith('- '):
+            conteudo = linhas[i][1][2:].lstrip()
+            recuo_item = recuo + len(linhas[i][1]) - len(conteudo)
+            if _chave_valor(conteudo):
+                # Item que é um mapa: a primeira chave vem na linha do '-'
+                linhas[i] = (recuo_item, conteudo)
+                item, i = _bloco(linhas, i, recuo_item)
+            else:
+                item, i = _escalar(conteudo), i + 1
+            lista.append(item)
+        return lista, i
+
+    mapa = {}
+    while i < len(linhas) and linhas[i][0] == recuo and not linhas[i][1].startswith('- '):
+        chave, resto = _chave_valor(linhas[i][1])
+        i += 1
+        if resto:
+            mapa[chave] = _escalar(resto)
+        elif i < len(linhas) and (linhas[i][0] > recuo or (linhas[i][0] == recuo and linhas[i][1].startswith('- '))):
+            mapa[chave], i = _bloco(linhas, i, linhas[i][0])
+        else:
+            mapa[chave] = None
+    return mapa, i
+
+
+def ler_spec(texto):
+    """Especificação em dicts e listas a partir do texto no formato YAML do arquivo."""
+    linhas = []
+    for bruta in texto.splitlines():
+        linha = _sem_comentario(bruta)
+        if linha.strip():
+            linhas.append((len(linha) - len(linha.lstrip()), linha.strip()))
+    if not linhas:
+        return {}
+    spec, _ = _bloco(linhas, 0, linhas[0][0])
+    return spec
+
+
+def carregar_spec(caminho=ARQUIVO_PADRAO):
+    with open(caminho, encoding='utf-8') as f:
+        return ler_spec(f.read())
+
+
+# --- COMPILAÇÃO DAS EXPRESSÕES 'logic' E 'if' ---
+# Apelidos com '/' ('p/l') viram identificadores Python; só esses voltam
+# ao nome original (capex_sobre_fluxo_caixa_operacional é um nome de verdade)
+SANEADOS = {alias.replace('/', '_sobre_'): alias for alias in METRICAS if '/' in alias}
+
+
+def _nome_metrica(nome):
+    return str(nome).strip().lower()
+
+
+def _nome_original(identificador):
+    """Nome da métrica de um identificador de _preparar."""
+    nome = _nome_metrica(identificador)
+    return SANEADOS.get(nome, nome)
+
+
+def _preparar(expressao):
+    """Troca a notação da especificação ('P/L', '10%', ' e ') por Python válido."""
+    texto = re.sub(r'(\d+(?:\.\d+)?)\s*%', r'_pct(\1)', expressao)
+    for saneado, alias in sorted(SANEADOS.items(), key=lambda par: len(par[1]), reverse=True):
+        texto = re.sub(re.escape(alias), saneado, texto, flags=re.IGNORECASE)
+    texto = re.sub(r'\be\b', ' and ', texto)
+    return re.sub(r'\bou\b', ' or ', texto)
+
+
+def _compilar_expressao(expressao):
+    """
+    Compila uma expressão da especificação numa função contexto -> array.
+    Devolve (função, métricas usadas). Só aceita comparações, aritmética,
+    'e'/'ou'/'not', números, porcentagens e nomes de métricas.
+    """
+    arvore = ast.parse(_preparar(expressao), mode='eval').body
+    usadas = set()
+
+    def nome_de(no):
+        if isinstance(no, ast.Name):
+            return _nome_original(no.id)
+        return None
+
+    def escalar_para(no, outro):
+        # 'ROE > 20' compara a fração guardada com 20%: o número vira 0.20
+        if isinstance(no, ast.Constant) and nome_de(outro) in PERCENTUAIS:
+            return float(no.value) / 100
+        return None
+
+    def compilar(no):
+        if isinstance(no, ast.BoolOp):
+            partes = [compilar(v) for v in no.values]
+            juntar = np.logical_and.reduce if isinstance(no.op, ast.And) else np.logical_or.reduce
+            return lambda ctx: juntar([p(ctx) for p in partes])
+        if isinstance(no, ast.UnaryOp):
+            valor = compilar(no.operand)
+            if isinstance(no.op, ast.Not):
+                return lambda ctx: ~valor(ctx)
+            if isinstance(no.op, ast.USub):
+                return lambda ctx: -valor(ctx)
+        if isinstance(no, ast.Compare):
+            operandos = [no.left, *no.comparators]
+            funcoes = []
+            for k, op in enumerate(no.ops):
+                esq, dir_ = operandos[k], operandos[k + 1]
+                a = escalar_para(esq, dir_)
+                b = escalar_para(dir_, esq)
+                fa = (lambda v: lambda ctx: v)(a) if a is not None else compilar(esq)
+                fb = (lambda v: lambda ctx: v)(b) if b is not None else compilar(dir_)
+                funcoes.append(_comparacao(op, fa, fb))
+            return lambda ctx: np.logical_and.reduce([f(ctx) for f in funcoes])
+        if isinstance(no, ast.BinOp) and isinstance(no.op, (ast.Add, ast.Sub, ast.Mult, ast.Div)):
+            esq, dir_ = compilar(no.left), compilar(no.right)
+            operador = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}[type(no.op)]
+            return lambda ctx: operador(esq(ctx), dir_(ctx))
+        if isinstance(no, ast.Call) and isinstance(no.func, ast.Name) and no.func.id == '_pct':
+            valor = float(no.args[0].value) / 100
+            return lambda ctx: valor
+        if isinstance(no, ast.Constant) and isinstance(no.value, (int, float)):
+            valor = float(no.value)
+            return lambda ctx: valor
+        if isinstance(no, ast.Name):
+            nome = nome_de(no)
+            usadas.add(nome)
+            return lambda ctx: ctx.metrica(nome)
+        raise ValueError(f"Expressão não suportada na especificação: {expressao!r}")
+
+    return compilar(arvore), usadas
+
+
+def _comparacao(op, esq, dir_):
+    operador = {
+        ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+        ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+    }.get(type(op))
+    if operador is None:
+        raise ValueError(f"Comparação não suportada: {ast.dump(op)}")
+
+    def comparar(ctx):
+        with np.errstate(invalid='ignore'):
+            return operador(esq(ctx), dir_(ctx))
+    return comparar
+
+
+def _limites(nome, limites):
+    """Função da máscara 'min <= métrica <= max', com os limites na unidade da base."""
+    escala = 100 if nome in PERCENTUAIS else 1
+    minimo = limites.get('min', limites.get('min_value'))
+    maximo = limites.get('max', limites.get('max_value'))
+
+    def mascara(ctx):
+        valores = ctx.metrica(nome)
+        resultado = np.ones(ctx.n, dtype=bool)
+        if valores is None:
+            return resultado  # métrica sem dados num critério de várias métricas
+        with np.errstate(invalid='ignore'):
+            if minimo is not None:
+                exigido = minimo / escala
+                guardados = ctx.metrica(HISTORICO[nome]) if nome in HISTORICO else None
+                if guardados is not None:
+                    exigido = np.fmin(exigido, guardados)
+                resultado &= valores >= exigido
+            if maximo is not None:
+                resultado &= valores <= maximo / escala
+        return resultado
+    return mascara
+
+
+# --- CRITÉRIOS COMPILADOS ---
+class Criterio:
+    """
+    Um critério compilado: 'tipo' é 'filtro' (remove quem reprova),
+    'preferencia' (só informado), 'bonus' ou 'pontuacao' (somam 'pontos').
+    'assinatura' identifica critérios iguais entre variantes.
+    """
+
+    def __init__(self, etapa, nome, tipo, funcao, metricas, assinatura, pontos=0):
+        self.etapa = etapa
+        self.nome = nome
+        self.tipo = tipo
+        self.funcao = funcao
+        self.metricas = metricas
+        self.assinatura = assinatura
+        self.pontos = pontos
+
+
+def _compilar_criterio(etapa, criterio):
+    nome = criterio.get('name', etapa)
+    tipo = 'bonus' if criterio.get('weight') == 'bonus' else 'filtro'
+    pontos = PONTOS_BONUS if tipo == 'bonus' else 0
+
+    if 'logic' in criterio:
+        funcao, metricas = _compilar_expressao(criterio['logic'])
+        return Criterio(etapa, nome, tipo, funcao, metricas, ('logic', criterio['logic']), pontos)
+
+    if 'metrics' in criterio:
+        partes, metricas = [], set()
+        for item in criterio['metrics']:
+            for metrica, limites in item.items():
+                metricas.add(_nome_metrica(metrica))
+                partes.append(_limites(_nome_metrica(metrica), limites))
+        funcao = lambda ctx: np.logical_and.reduce([p(ctx) for p in partes])
+        return Criterio(etapa, nome, tipo, funcao, metricas, ('metrics', repr(criterio['metrics'])), pontos)
+
+    metrica = _nome_metrica(criterio['metric'])
+    if criterio.get('condition') == 'existente':
+        funcao = lambda ctx: np.nan_to_num(ctx.metrica(metrica), nan=0.0) > 0
+        return Criterio(etapa, nome, tipo, funcao, {metrica}, ('existente', metrica), pontos)
+    limites = {k: criterio[k] for k in ('min_value', 'max_value') if k in criterio}
+    return Criterio(etapa, nome, tipo, _limites(metrica, limites), {metrica}, ('limites', metrica, repr(limites)), pontos)
+
+
+def _compilar_globais(filtros):
+    criterios = []
+    for nome, regra in (filtros or {}).items():
+        if isinstance(regra, list):
+            # Exclusões: tickers vão direto pelo índice, descrições pela coluna 'setor'
+            tickers = tuple(x.upper() for x in regra if re.fullmatch(r'[A-Z]{4}\d{1,2}', x.upper()))
+            setores = tuple(x for x in regra if x.upper() not in tickers)
+
+            def excluir(ctx, tickers=tickers, setores=setores):
+                fora = np.asarray(ctx.df.index.isin(tickers))
+                if setores:
+                    setor = ctx.texto('setor')
+                    if setor is not None:
+                        fora |= setor.isin(setores).to_numpy()
+                return ~fora
+            metricas = {'setor'} if setores else set()
+            criterios.append(Criterio('global_filters', nome, 'filtro', excluir, metricas, ('exclusao', repr(regra))))
+        elif 'preferred' in regra:
+            metrica = _nome_metrica(regra['metric'])
+            preferidos = tuple(regra['preferred'])
+
+            def preferir(ctx, metrica=metrica, preferidos=preferidos):
+                return ctx.texto(metrica).isin(preferidos).to_numpy()
+            criterios.append(Criterio('global_filters', nome, 'preferencia', preferir, {metrica}, ('preferencia', metrica, preferidos)))
+        else:
+            criterios.append(_compilar_criterio('global_filters', {'name': nome, **regra}))
+    return criterios
+
+
+def _compilar_pontuacao(sistema):
+    criterios = []
+    for modificador in (sistema or {}).get('modifiers', []):
+        funcao, metricas = _compilar_expressao(modificador['if'])
+        pontos = int(re.match(r'\s*(-?\d+)', str(modificador['add'])).group(1))
+        criterios.append(Criterio('scoring_system', modificador['if'], 'pontuacao', funcao, metricas, ('logic', modificador['if']), pontos))
+    return criterios
+
+
+class Contexto:
+    """
+    Colunas de um DataFrame de obter_dados_base em arrays, mais os caches de
+    métricas e de máscaras (por assinatura) compartilhados entre variantes.
+    """
+
+    def __init__(self, df, usar_proxies=True):
+        self.df = df
+        self.n = len(df)
+        self.usar_proxies = usar_proxies
+        self.origens = {}
+        self._metricas = {}
+        self._mascaras = {}
+
+    def _coluna(self, nome):
+        """(array, origem) da métrica: 'coluna', 'proxy:<col>', 'coluna+proxy:<col>', 'derivada' ou 'indisponivel'."""
+        coluna = METRICAS.get(nome, nome)
+        proxy = PROXIES.get(nome) if self.usar_proxies else None
+        if coluna in self.df.columns:
+            valores = como_float(pd.to_numeric(self.df[coluna], errors='coerce'))
+            faltando = np.isnan(valores)
+            if proxy in self.df.columns and faltando.any():
+                # Série histórica só de parte dos tickers (analise/detalhes.py): o resto usa a aproximação
+                return np.where(faltando, como_float(self.df[proxy]), valores), f"coluna+proxy:{proxy}"
+            return valores, 'coluna'
+        if self.usar_proxies and nome in PROXIES and PROXIES[nome] in self.df.columns:
+            return como_float(self.df[PROXIES[nome]]), f"proxy:{PROXIES[nome]}"
+        if nome in DERIVADAS and {'lpa', 'vpa'} <= set(self.df.columns):
+            return np.asarray(DERIVADAS[nome](self.df), dtype=float), 'derivada'
+        return None, 'indisponivel'
+
+    def metrica(self, nome):
+        if nome not in self._metricas:
+            valores, origem = self._coluna(nome)
+            self._metricas[nome] = valores
+            self.origens[nome] = origem
+        return self._metricas[nome]
+
+    def texto(self, nome):
+        coluna = METRICAS.get(nome, nome)
+        self.origens[nome] = 'coluna' if coluna in self.df.columns else 'indisponivel'
+        return self.df[coluna].astype(str) if coluna in self.df.columns else None
+
+    def disponivel(self, criterio):
+        for nome in criterio.metricas:
+            if nome not in self.origens:
+                if criterio.assinatura[0] in ('preferencia', 'exclusao'):
+                    self.texto(nome)
+                else:
+                    self.metrica(nome)
+        # Critério de várias métricas ('metrics') roda com as que existirem
+        basta = any if criterio.assinatura[0] == 'metrics' else all
+        return basta(self.origens[nome] != 'indisponivel' for nome in criterio.metricas)
+
+    def status(self, criterio):
+        if not self.disponivel(criterio):
+            return 'indisponivel'
+        origens = [self.origens[n] for n in criterio.metricas]
+        partes = ['parcial'] if 'indisponivel' in origens else []
+        partes += sorted({o for o in origens if 'proxy' in o})
+        return ', '.join(partes) or 'ok'
+
+    def mascara(self, criterio):
+        """
+        Máscara do critério, calculada uma vez por assinatura. Sem dados, um
+        filtro aprova todos e um bônus ou modificador de score não pontua ninguém.
+        """
+        chave = (criterio.assinatura, criterio.tipo in ('filtro', 'preferencia'))
+        if chave not in self._mascaras:
+            if self.disponivel(criterio):
+                self._mascaras[chave] = np.broadcast_to(np.asarray(criterio.funcao(self), dtype=bool), (self.n,))
+            else:
+                self._mascaras[chave] = np.full(self.n, chave[1])
+        return self._mascaras[chave]
+
+
+class ResultadoRegras:
+    """Aprovados, score, ranking e relatório por critério de uma estratégia."""
+
+    def __init__(self, aprovados, score, ranking, relatorio):
+        self.aprovados = aprovados
+        self.score = score
+        self.ranking = ranking
+        self.relatorio = relatorio
+
+
+class Estrategia:
+    """Especificação compilada: filtros globais, critérios dos stages e pontuação."""
+
+    def __init__(self, spec, usar_proxies=True):
+        self.nome = spec.get('algorithm_name', 'estrategia')
+        self.usar_proxies = usar_proxies
+        self.criterios = _compilar_globais(spec.get('global_filters'))
+        for stage in spec.get('stages') or []:
+            etapa = next(k for k in stage if k.startswith('stage'))
+            self.criterios += [_compilar_criterio(etapa, c) for c in stage.get('criteria') or []]
+        pontuacao = spec.get('scoring_system') or {}
+        self.criterios += _compilar_pontuacao(pontuacao)
+        self.score_base = pontuacao.get('base_score', 0) or 0
+        self.limite = (spec.get('execution') or {}).get('top_pick_limit')
+
+    def avaliar(self, df, contexto=None):
+        """
+        Aplica a estratégia ao DataFrame (ou ao Contexto já montado para ele,
+        reaproveitando as máscaras de outras variantes).
+        """
+        ctx = contexto or Contexto(df, self.usar_proxies)
+        restantes = np.ones(ctx.n, dtype=bool)
+        score = np.full(ctx.n, float(self.score_base))
+        linhas = []
+        for c in self.criterios:
+            mascara = ctx.mascara(c)
+            status = ctx.status(c)
+            removidos = 0
+            if c.tipo == 'filtro':
+                removidos = int((restantes & ~mascara).sum())
+                restantes = restantes & mascara
+            else:
+                score += np.where(mascara, c.pontos, 0)
+            linhas.append({
+                'etapa': c.etapa, 'criterio': c.nome, 'tipo': c.tipo, 'status': status,
+                'reprovados': int((~mascara).sum()), 'removidos': removidos, 'restantes': int(restantes.sum()),
+            })
+
+        ranking = pd.DataFrame({
+            'Ticker': ctx.df.index[restantes].to_numpy(),
+            'Preco': ctx.df['cotacao'].to_numpy(dtype=float)[restantes] if 'cotacao' in ctx.df.columns else np.nan,
+            'Score': score[restantes],
+        }).sort_values(by=['Score', 'Preco'], ascending=[False, True])
+        if self.limite:
+            ranking = ranking.head(self.limite)
+        return ResultadoRegras(restantes, score, ranking, pd.DataFrame(linhas))
+
+
+def avaliar_variantes(specs, df, usar_proxies=True):
+    """
+    Avalia várias especificações (nome -> spec ou Estrategia) sobre o mesmo
+    DataFrame, compartilhando as máscaras dos critérios iguais.
+    """
+    contextos = {}
+    resultados = {}
+    for nome, spec in specs.items():
+        estrategia = spec if isinstance(spec, Estrategia) else Estrategia(spec, usar_proxies)
+        if estrategia.usar_proxies not in contextos:
+            contextos[estrategia.usar_proxies] = Contexto(df, estrategia.usar_proxies)
+        resultados[nome] = estrategia.avaliar(df, contextos[estrategia.usar_proxies])
+    return resultados
+
+
+def com_limite(spec, criterio, metrica, **limites):
+    """
+    Cópia da especificação com novos limites (min/max) para uma métrica de
+    um critério pelo nome, para montar variantes sem editar o arquivo.
+    """
+    nova = copy.deepcopy(spec)
+    for stage in nova.get('stages') or []:
+        for c in stage.get('criteria') or []:
+            if c.get('name') != criterio:
+                continue
+            if 'metrics' in c:
+                for item in c['metrics']:
+                    if metrica in item:
+                        item[metrica].update(limites)
+            elif c.get('metric') == metrica:
+                c.update({f"{k}_value": v for k, v in limites.items()})
+    return nova
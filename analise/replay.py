@@ -0,0 +1,294 @@
+import contextlib
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from analise.historico import COLUNAS, ajustar_proventos, inicio_do_periodo
+
+# --- GRAVAÇÃO E REPRODUÇÃO DAS FONTES EXTERNAS ---
+# Intercepta fundamentus.get_resultado, requests.get, o envio do cliente HTTP
+# (analise/rede.py), yf.download e yf.Ticker.
+# Em modo 'gravar' as chamadas reais acontecem e as respostas vão para a pasta
+# de fixtures; em modo 'reproduzir' tudo sai da pasta, sem rede.
+#
+# Layout da pasta:
+#   resultado.pkl            -> fundamentus.get_resultado()
+#   http/<sha1 da url>.html  -> corpo de requests.get(url) / ClienteHTTP.obter(url)
+#   precos/<ticker>.pkl      -> barras brutas (OHLCV + Dividends/Stock Splits)
+#   info/<ticker>.json       -> yf.Ticker(ticker).info
+#   demonstrativos/<ticker>.<dre|balanco>.pkl -> get_income_stmt / get_balance_sheet
+#
+# As barras são guardadas brutas e por ticker; downloads com qualquer
+# start/period e com ou sem auto_adjust são remontados a partir delas.
+#
+# fundamentus, requests e yfinance só são importados quando o replay é
+# ligado, então importar este módulo não custa nada aos scripts.
+
+PASTA_PADRAO = 'fixtures'
+
+
+def _arquivo_http(pasta, url):
+    return os.path.join(pasta, 'http', hashlib.sha1(url.encode()).hexdigest() + '.html')
+
+
+def _arquivo_precos(pasta, ticker):
+    return os.path.join(pasta, 'precos', f"{ticker}.pkl")
+
+
+def _arquivo_info(pasta, ticker):
+    return os.path.join(pasta, 'info', f"{ticker}.json")
+
+
+def _arquivo_demonstrativo(pasta, ticker, tipo):
+    return os.path.join(pasta, 'demonstrativos', f"{ticker}.{tipo}.pkl")
+
+
+def _escrever(caminho, conteudo, modo='wb'):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, modo) as f:
+        f.write(conteudo)
+
+
+class RespostaGravada:
+    """O suficiente de requests.Response para quem lê a página."""
+
+    def __init__(self, url, conteudo, status_code=200):
+        self.url = url
+        self.content = conteudo
+        self.status_code = status_code
+        self.headers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text(self):
+        return self.content.decode('latin-1')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} (gravado) para {self.url}")
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+
+def _recortar(barras, start=None, end=None, period=None, auto_adjust=True, actions=False):
+    """Aplica a janela e as opções de yf.download sobre as barras brutas gravadas."""
+    if start is not None:
+        barras = barras[barras.index >= pd.Timestamp(start)]
+    elif period is not None:
+        barras = barras[barras.index >= inicio_do_periodo(period)]
+    if end is not None:
+        barras = barras[barras.index < pd.Timestamp(end)]
+    if auto_adjust:
+        resultado = ajustar_proventos(barras)
+    else:
+        resultado = barras[['Open', 'High', 'Low', 'Close', 'Volume']].copy()
+        resultado.insert(4, 'Adj Close', ajustar_proventos(barras)['Close'])
+    if actions:
+        resultado[['Dividends', 'Stock Splits']] = barras[['Dividends', 'Stock Splits']]
+    return resultado
+
+
+class Fontes:
+    """
+    Guarda as funções originais e instala as versões de gravação ou de
+    reprodução no lugar delas (ver ativar()).
+    """
+
+    def __init__(self, modo, pasta=PASTA_PADRAO):
+        if modo not in ('gravar', 'reproduzir'):
+            raise ValueError(f"Modo de replay inválido: {modo}")
+        import fundamentus
+        import requests
+        import yfinance as yf
+
+        from analise.rede import ClienteHTTP
+
+        self.modo = modo
+        self.pasta = pasta
+        self.modulos = {'fundamentus': fundamentus, 'requests': requests, 'yf': yf, 'ClienteHTTP': ClienteHTTP}
+        self.originais = {
+            'get_resultado': fundamentus.get_resultado,
+            'requests_get': requests.get,
+            'enviar': ClienteHTTP._enviar,
+            'download': yf.download,
+            'Ticker': yf.Ticker,
+        }
+
+    # --- Fundamentus ---
+    def get_resultado(self):
+        caminho = os.path.join(self.pasta, 'resultado.pkl')
+        if self.modo == 'gravar':
+            df = self.originais['get_resultado']()
+            os.makedirs(self.pasta, exist_ok=True)
+            df.to_pickle(caminho)
+            return df
+        return pd.read_pickle(caminho)
+
+    # --- requests.get (página de FIIs) ---
+    def requests_get(self, url, *args, **kwargs):
+        caminho = _arquivo_http(self.pasta, url)
+        if self.modo == 'gravar':
+            kwargs.pop('stream', None)
+            resposta = self.originais['requests_get'](url, *args, **kwargs)
+            _escrever(caminho, resposta.content)
+            return RespostaGravada(url, resposta.content, resposta.status_code)
+        if not os.path.exists(caminho):
+            return RespostaGravada(url, b'', 404)
+        with open(caminho, 'rb') as f:
+            return RespostaGravada(url, f.read())
+
+    # --- Cliente HTTP: o envio vira requests_get, sem cabeçalhos condicionais
+    # (um 304 gravaria a página vazia) ---
+    def enviar(self, cliente, url, headers):
+        headers = {k: v for k, v in (headers or {}).items() if k not in ('If-None-Match', 'If-Modified-Since')}
+        return self.requests_get(url, headers=headers)
+
+    # --- Yahoo: barras ---
+    def _barras(self, ticker):
+        caminho = _arquivo_precos(self.pasta, ticker)
+        return pd.read_pickle(caminho) if os.path.exists(caminho) else None
+
+    def _gravar_barras(self, tickers, start=None, end=None, period=None):
+        janela = {'start': start, 'end': end} if start else {'period': period or '1mo'}
+        dados = self.originais['download'](
+            tickers, group_by='ticker', auto_adjust=False, actions=True,
+            threads=True, progress=False, **janela,
+        )
+        if dados is None or dados.empty:
+            return
+        for t in tickers:
+            if isinstance(dados.columns, pd.MultiIndex):
+                if t not in dados.columns.get_level_values(0):
+                    continue
+                novas = dados[t]
+            else:
+                novas = dados
+            novas = novas.dropna(subset=['Close']).reindex(columns=COLUNAS)
+            antigas = self._barras(t)
+            if antigas is not None:
+                novas = novas.combine_first(antigas)
+            os.makedirs(os.path.dirname(_arquivo_precos(self.pasta, t)), exist_ok=True)
+            novas.to_pickle(_arquivo_precos(self.pasta, t))
+
+    def download(self, tickers, start=None, end=None, period=None, group_by='column',
+                 auto_adjust=True, actions=False, **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        if self.modo == 'gravar':
+            self._gravar_barras(tickers, start, end, period)
+
+        quadros = {}
+        for t in tickers:
+            barras = self._barras(t)
+            if barras is not None:
+                quadros[t] = _recortar(barras, start, end, period, auto_adjust, actions)
+        if not quadros:
+            return pd.DataFrame()
+        dados = pd.concat(quadros, axis=1, names=['Ticker', 'Price'])
+        if group_by != 'ticker':
+            dados = dados.swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+        return dados
+
+    # --- Yahoo: Ticker ---
+    def Ticker(self, ticker, *args, **kwargs):
+        return TickerGravado(self, ticker)
+
+    def instalar(self):
+        self.modulos['fundamentus'].get_resultado = self.get_resultado
+        self.modulos['requests'].get = self.requests_get
+        self.modulos['ClienteHTTP']._enviar = lambda cliente, url, headers: self.enviar(cliente, url, headers)
+        self.modulos['yf'].download = self.download
+        self.modulos['yf'].Ticker = self.Ticker
+
+    def desinstalar(self):
+        self.modulos['fundamentus'].get_resultado = self.originais['get_resultado']
+        self.modulos['requests'].get = self.originais['requests_get']
+        self.modulos['ClienteHTTP']._enviar = self.originais['enviar']
+        self.modulos['yf'].download = self.originais['download']
+        self.modulos['yf'].Ticker = self.originais['Ticker']
+
+
+class TickerGravado:
+    """yf.Ticker com .info, .history e os demonstrativos anuais servidos (ou gravados) pela pasta de fixtures."""
+
+    def __init__(self, fontes, ticker):
+        self.fontes = fontes
+        self.ticker = ticker
+
+    @property
+    def info(self):
+        caminho = _arquivo_info(self.fontes.pasta, self.ticker)
+        if self.fontes.modo == 'gravar':
+            info = self.fontes.originais['Ticker'](self.ticker).info
+            _escrever(caminho, json.dumps(info, default=str), 'w')
+            return info
+        if not os.path.exists(caminho):
+            return {}
+        with open(caminho) as f:
+            return json.load(f)
+
+    def history(self, period="1mo", start=None, end=None, auto_adjust=True, actions=True, **kwargs):
+        if self.fontes.modo == 'gravar':
+            self.fontes._gravar_barras([self.ticker], start, end, period)
+        barras = self.fontes._barras(self.ticker)
+        if barras is None:
+            return pd.DataFrame()
+        return _recortar(barras, start, end, None if start else period, auto_adjust, actions)
+
+    def _demonstrativo(self, tipo, metodo, **kwargs):
+        caminho = _arquivo_demonstrativo(self.fontes.pasta, self.ticker, tipo)
+        if self.fontes.modo == 'gravar':
+            df = getattr(self.fontes.originais['Ticker'](self.ticker), metodo)(**kwargs)
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            df.to_pickle(caminho)
+            return df
+        return pd.read_pickle(caminho) if os.path.exists(caminho) else pd.DataFrame()
+
+    def get_income_stmt(self, as_dict=False, pretty=False, freq='yearly'):
+        return self._demonstrativo('dre', 'get_income_stmt', as_dict=False, pretty=pretty, freq=freq)
+
+    def get_balance_sheet(self, as_dict=False, pretty=False, freq='yearly'):
+        return self._demonstrativo('balanco', 'get_balance_sheet', as_dict=False, pretty=pretty, freq=freq)
+
+
+def instalar_pelo_ambiente():
+    """
+    Instala a gravação/reprodução para o resto do processo se ANALISE_REPLAY
+    ('gravar' ou 'reproduzir') estiver definida; a pasta vem de
+    ANALISE_FIXTURES. Usado pelos scripts no início da execução.
+    """
+    modo = os.environ.get('ANALISE_REPLAY')
+    if not modo:
+        return None
+    fontes = Fontes(modo, os.environ.get('ANALISE_FIXTURES', PASTA_PADRAO))
+    fontes.instalar()
+    print(f"📼 Replay: modo '{fontes.modo}' em {fontes.pasta}/")
+    return fontes
+
+
+@contextlib.contextmanager
+def ativar(modo=None, pasta=None):
+    """
+    Liga a gravação/reprodução durante o bloco. Sem argumentos, usa as
+    variáveis de ambiente ANALISE_REPLAY ('gravar' ou 'reproduzir') e
+    ANALISE_FIXTURES; se ANALISE_REPLAY não estiver definida, não faz nada.
+    """
+    modo = modo or os.environ.get('ANALISE_REPLAY')
+    if not modo:
+        yield None
+        return
+    fontes = Fontes(modo, pasta or os.environ.get('ANALISE_FIXTURES', PASTA_PADRAO))
+    fontes.instalar()
+    try:
+        yield fontes
+    finally:
+        fontes.desinstalar()
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+# --- RISCO DA CARTEIRA ---
+# Tudo sai de uma única matriz datas x tickers de retornos diários: a
+# covariância com encolhimento (estável mesmo com centenas de posições e
+# só um ano de pregões), a volatilidade da carteira, a contribuição de
+# cada posição para ela, a correlação entre os ativos e o max drawdown.
+# São só produtos de matrizes e reduções por coluna; nenhum laço percorre
+# pares de ativos.
+
+DIAS_UTEIS = 252
+MIN_OBSERVACOES = 20  # pregões com retorno para o ativo entrar na matriz
+
+
+def matriz_retornos(fechamentos):
+    """
+    Retornos diários alinhados por data (datas x tickers). Os buracos
+    (datas em que o ticker não negociou) ficam NaN, como em metricas_de_preco.
+    """
+    preenchido = fechamentos.ffill()
+    return preenchido.pct_change(fill_method=None).where(fechamentos.notna()).iloc[1:]
+
+
+def covariancia_encolhida(retornos):
+    """
+    Covariância anualizada com encolhimento das covariâncias para zero
+    (alvo diagonal, estimador de Ledoit-Wolf na forma de Schäfer-Strimmer):
+    a variância de cada ativo fica, as covariâncias mal estimadas encolhem.
+    Retornos ausentes contam como a média do ativo (zero depois de centrar).
+    Devolve (covariância, intensidade do encolhimento entre 0 e 1).
+    """
+    x = retornos.to_numpy(dtype=float)
+    t, n = x.shape
+    if t < 2 or n == 0:
+        return pd.DataFrame(np.zeros((n, n)), index=retornos.columns, columns=retornos.columns), 1.0
+    x = np.nan_to_num(x - np.nanmean(x, axis=0))
+    media = x.T @ x / t                      # média de x_ti·x_tj sobre t
+    amostral = media * t / (t - 1)
+    # Variância estimada de cada covariância amostral, só fora da diagonal
+    variancia = ((x ** 2).T @ (x ** 2) - t * media ** 2) * t / (t - 1) ** 3
+    fora = ~np.eye(n, dtype=bool)
+    denominador = np.sum(amostral[fora] ** 2)
+    intensidade = float(np.clip(np.sum(variancia[fora]) / denominador, 0, 1)) if denominador > 0 else 1.0
+
+    cov = np.where(fora, (1 - intensidade) * amostral, amostral) * DIAS_UTEIS
+    return pd.DataFrame(cov, index=retornos.columns, columns=retornos.columns), intensidade
+
+
+def max_drawdown(valores):
+    """Maior queda a partir do pico de cada coluna (série ou matriz de valores)."""
+    v = np.asarray(valores, dtype=float)
+    pico = np.fmax.accumulate(v, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nanmin(np.where(pico > 0, v / pico - 1, np.nan), axis=0)
+
+
+class RiscoCarteira:
+    """
+    Resultado de analisar_risco: volatilidade anual e max drawdown da
+    carteira, 'posicoes' (peso, volatilidade, drawdown, risco marginal,
+    beta para a carteira e contribuição de cada ativo), a correlação entre
+    os ativos e a intensidade do encolhimento usada na covariância.
+    """
+
+    def __init__(self, volatilidade, max_drawdown, posicoes, correlacao, encolhimento):
+        self.volatilidade = volatilidade
+        self.max_drawdown = max_drawdown
+        self.posicoes = posicoes
+        self.correlacao = correlacao
+        self.encolhimento = encolhimento
+
+    def pares_mais_correlacionados(self, n=3):
+        """Os n pares distintos de ativos com maior correlação."""
+        c = self.correlacao.to_numpy()
+        i, j = np.triu_indices(len(c), k=1)
+        ordem = np.argsort(-c[i, j], kind='stable')[:n]
+        nomes = self.correlacao.index
+        return [(nomes[i[k]], nomes[j[k]], float(c[i[k], j[k]])) for k in ordem]
+
+    def resumo(self):
+        """Dicionário para relatórios JSON."""
+        return {
+            'volatilidade': float(self.volatilidade),
+            'max_drawdown': float(self.max_drawdown),
+            'encolhimento': float(self.encolhimento),
+            'posicoes': self.posicoes.reset_index(names='ticker').to_dict('records'),
+            'pares_correlacionados': [
+                {'a': a, 'b': b, 'correlacao': c} for a, b, c in self.pares_mais_correlacionados()
+            ],
+        }
+
+
+def analisar_risco(fechamentos, valores):
+    """
+    Risco da carteira com 'valores' (Series ticker -> valor da posição) e
+    a matriz datas x tickers de fechamentos. Ativos sem histórico
+    suficiente ficam de fora; None se não sobrar nenhum.
+
+    Com covariância Σ e pesos w, a volatilidade é sqrt(w'Σw); o risco
+    marginal de cada ativo é (Σw)_i / σ (quanto σ sobe por unidade de peso
+    a mais nele), o beta é esse valor sobre σ (abaixo de 1, o ativo
+    diversifica) e a contribuição w_i·(Σw)_i/σ soma a volatilidade.
+    """
+    valores = valores[valores > 0]
+    retornos = matriz_retornos(fechamentos.reindex(columns=valores.index))
+    retornos = retornos.loc[:, retornos.notna().sum() >= MIN_OBSERVACOES]
+    if retornos.shape[1] == 0:
+        return None
+
+    valores = valores[retornos.columns]
+    w = (valores / valores.sum()).to_numpy(dtype=float)
+    cov, encolhimento = covariancia_encolhida(retornos)
+    sigma = cov.to_numpy()
+    sigma_w = sigma @ w
+    volatilidade = float(np.sqrt(max(w @ sigma_w, 0.0)))
+
+    desvios = np.sqrt(np.diag(sigma))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlacao = sigma / np.outer(desvios, desvios)
+        marginal = sigma_w / volatilidade if volatilidade > 0 else np.zeros_like(w)
+        beta = marginal / volatilidade if volatilidade > 0 else np.zeros_like(w)
+
+    # Caminho da carteira com os pesos atuais (retorno ausente conta como zero)
+    r = np.nan_to_num(retornos.to_numpy(dtype=float))
+    riqueza = np.cumprod(1 + r @ w)
+    precos = fechamentos[retornos.columns].ffill()
+
+    posicoes = pd.DataFrame({
+        'peso': w,
+        'volatilidade': desvios,
+        'max_drawdown': max_drawdown(precos.to_numpy(dtype=float)),
+        'risco_marginal': marginal,
+        'beta': beta,
+        'contribuicao': w * marginal,
+        'contribuicao_pct': w * marginal / volatilidade if volatilidade > 0 else np.zeros_like(w),
+    }, index=retornos.columns)
+    return RiscoCarteira(
+        volatilidade, float(max_drawdown(np.concatenate([[1.0], riqueza]))), posicoes,
+        pd.DataFrame(correlacao, index=retornos.columns, columns=retornos.columns), encolhimento,
+    )
@@ -0,0 +1,414 @@
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from analise.pontuacao import DY_ENTRADA, PL_MAXIMO_QUALIDADE, indicadores_graham, pontos_ranking, roic_suficiente
+
+# --- SENSIBILIDADE DOS LIMITES ---
+# Quão estáveis são as escolhas quando os limites fixos (liquidez, DY, P/VP
+# dos FIIs, P/L e ROE de entrada, cortes de score) mudam? O universo é
+# baixado e pontuado uma vez só, com os limites no mínimo; o que depende
+# deles vira uma matriz de indicadores (indicadores x ativos, já na ordem
+# do ranking) e cada combinação da grade é só um punhado de comparações
+# sobre ela.
+#
+# A matriz e a grade ficam em memória compartilhada: cada processo do pool
+# se anexa a elas uma vez (initializer) e recebe por tarefa apenas o
+# intervalo de combinações, gravando o resultado num terceiro bloco
+# compartilhado. Nada do universo é serializado por tarefa.
+#
+# Limites comparados com colunas float32 são arredondados para float32
+# linha a linha, como o NumPy faz com 'dy >= 0.06' (ver analise/compacto.py):
+# o resultado de cada combinação é o mesmo de uma execução com aquele limite.
+
+TOP_PADRAO = 10
+FATORES = (0.5, 0.75, 1.0, 1.25, 1.5)  # grade padrão: múltiplos de cada limite atual
+BLOCO = 256  # combinações por tarefa do pool
+
+
+def _lollapalooza(f, g):
+    """Stage 0 (liquidez), Stage 1 (P/L e ROE de entrada) e corte de Score da carteira."""
+    entrada = (
+        ((f['graham_bazin'] > 0) & (f['pl'] < g['pl_maximo']))
+        | ((f['roe'] > g['roe_minimo']) & (f['roic'] > 0) & (f['pl'] < PL_MAXIMO_QUALIDADE))
+    )
+    aprovados = ((f['liq2m'] > g['liquidez_minima']) & (f['solvente'] > 0) & (f['lucros'] > 0) & entrada
+                 & (f['score'] >= g['score_minimo']))
+    return aprovados, {}
+
+
+def _avalairb3(f, g):
+    """Triagem (liquidez, DY, P/VP dos FIIs), corte de score do refino e perfis."""
+    aprovados = (
+        (f['liquidez'] > g['min_liquidez'])
+        & (f['dy'] >= g['min_dy'])
+        & ((f['fii'] == 0) | (f['p_vp'] < g['max_pvp_fii']))
+        & (f['score'] >= g['score_minimo'])
+    )
+    joia = aprovados & (f['score'] >= g['joia_rara'])
+    compra_forte = aprovados & ~joia & (f['score'] >= g['compra_forte'])
+    return aprovados, {'n_joias': joia.sum(axis=1), 'n_compra_forte': compra_forte.sum(axis=1)}
+
+
+MODELOS = {'lollapalooza': _lollapalooza, 'avalairb3': _avalairb3}
+EXTRAS = {'lollapalooza': (), 'avalairb3': ('n_joias', 'n_compra_forte')}
+
+
+class Universo:
+    """
+    Ativos de um pipeline pontuados sem os limites da grade: 'tickers' e
+    'score' na ordem do ranking, 'indicadores' (nome -> array por ativo)
+    comparados com os limites e, para cada parâmetro, as linhas cuja coluna
+    de origem é float32 ('float32': parâmetro -> array booleano).
+    """
+
+    def __init__(self, modelo, tickers, score, indicadores, float32=None):
+        self.modelo = modelo
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.score = np.asarray(score, dtype=float)
+        self.indicadores = {nome: np.asarray(v, dtype=float) for nome, v in indicadores.items()}
+        self.indicadores['score'] = self.score
+        self.float32 = {nome: np.asarray(v, dtype=bool) for nome, v in (float32 or {}).items()}
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def matriz(self):
+        """(nomes, matriz float64 indicadores x ativos), com as marcas de float32."""
+        nomes = list(self.indicadores) + [f"float32:{p}" for p in self.float32]
+        valores = list(self.indicadores.values()) + list(self.float32.values())
+        return nomes, np.vstack(valores).astype(float) if valores else np.zeros((0, len(self)))
+
+
+def _marca_float32(valores, n):
+    return np.full(n, np.asarray(valores).dtype == np.float32)
+
+
+def universo_lollapalooza(base, liquidez=None):
+    """
+    Universo do lollapalooza_b3 a partir de obter_dados_base sem corte de
+    liquidez: solvência, lucros, margem de Graham, DY, P/L, ROE e ROIC do
+    Stage 1 e o Score do Stage 3, que não dependem dos limites. Ordem do
+    ranking (Score decrescente, menor preço primeiro, empates na ordem da
+    base).
+    'liquidez' (ticker -> liq2m) é a coluna da tabela de origem, no tipo em
+    que o Stage 0 a compara; sem ela, a coluna da base.
+    """
+    n = len(base)
+    ind = indicadores_graham(base)
+    score = pontos_ranking(base)
+    preco = base['cotacao'].to_numpy(dtype=float)
+    if liquidez is not None:
+        liquidez = liquidez[~liquidez.index.duplicated()].reindex(base.index).to_numpy()
+    elif 'liq2m' in base.columns:
+        liquidez = base['liq2m'].to_numpy()
+    else:
+        liquidez = np.full(n, np.inf)
+    ordem = np.lexsort((preco, -score))
+    indicadores = {
+        'liq2m': liquidez,
+        'solvente': ind['solvente'],
+        'graham_bazin': (ind['margem'] <= 1.0) | (ind['dy'] >= DY_ENTRADA),
+        'pl': ind['pl'],
+        'roe': ind['roe'],
+        'roic': roic_suficiente(ind['roic']),
+        'lucros': ind['lucros'],
+    }
+    float32 = {
+        'liquidez_minima': _marca_float32(liquidez, n),
+        'pl_maximo': _marca_float32(ind['pl'], n),
+        'roe_minimo': _marca_float32(ind['roe'], n),
+    }
+    return Universo(
+        'lollapalooza', base.index.to_numpy()[ordem], score[ordem],
+        {k: np.asarray(v)[ordem] for k, v in indicadores.items()},
+        {k: v[ordem] for k, v in float32.items()},
+    )
+
+
+def universo_avalairb3(resultado, acoes, fiis):
+    """
+    Universo do avalairb3 a partir do refino sem corte de score
+    (refinar_candidatos com score_minimo=-inf) dos candidatos de uma
+    triagem sem limites. Liquidez, DY e P/VP voltam das tabelas de origem
+    (ações ou FIIs), no tipo em que a triagem os compara. Ordem do ranking
+    (score decrescente, empates na ordem do refino).
+    """
+    resultado = resultado.sort_values('score', ascending=False, kind='stable')
+    fii = (resultado['tipo'] == 'FII').to_numpy()
+    tickers = resultado['ticker'].to_numpy()
+    n = len(resultado)
+
+    indicadores = {'liquidez': np.full(n, np.nan), 'dy': np.full(n, np.nan), 'p_vp': np.full(n, np.nan), 'fii': fii}
+    float32 = {p: np.zeros(n, dtype=bool) for p in ('min_liquidez', 'min_dy', 'max_pvp_fii')}
+    origens = [(~fii, acoes, {'liquidez': 'liq2m', 'dy': 'dy'}), (fii, fiis, {'liquidez': 'liquidez', 'dy': 'dy', 'p_vp': 'p_vp'})]
+    parametro = {'liquidez': 'min_liquidez', 'dy': 'min_dy', 'p_vp': 'max_pvp_fii'}
+    for linhas, tabela, colunas in origens:
+        if not linhas.any() or tabela.empty:
+            continue
+        tabela = tabela[~tabela.index.duplicated()]
+        for nome, coluna in colunas.items():
+            valores = tabela[coluna].reindex(tickers[linhas])
+            indicadores[nome][linhas] = valores.to_numpy(dtype=float)
+            float32[parametro[nome]][linhas] = valores.dtype == np.float32
+    return Universo('avalairb3', tickers, resultado['score'].to_numpy(dtype=float), indicadores, float32)
+
+
+# --- GRADE ---
+def grade_padrao(padroes, fatores=FATORES):
+    """Cada limite atual multiplicado por 'fatores' (os zeros e infinitos ficam fixos)."""
+    return {p: sorted({v * f for f in fatores}) if np.isfinite(v) and v != 0 else [v] for p, v in padroes.items()}
+
+
+def ler_grade(textos, padroes):
+    """
+    Grade a partir de 'param=v1,v2,...' ou 'param=inicio:fim:passo' (fim
+    incluso); parâmetros não citados ficam no valor atual. Sem textos, a
+    grade padrão (grade_padrao).
+    """
+    if not textos:
+        return grade_padrao(padroes)
+    grade = {p: [v] for p, v in padroes.items()}
+    for texto in textos:
+        nome, sep, valores = texto.partition('=')
+        if not sep or nome not in padroes:
+            raise ValueError(f"Parâmetro inválido: {texto} (opções: {', '.join(padroes)})")
+        partes = valores.split(':')
+        if len(partes) == 3:
+            inicio, fim, passo = map(float, partes)
+            if passo <= 0:
+                raise ValueError(f"Passo precisa ser positivo: {texto}")
+            grade[nome] = sorted(set(np.round(np.arange(inicio, fim + passo / 2, passo), 10).tolist()))
+        elif len(partes) == 1:
+            grade[nome] = sorted({float(v) for v in valores.split(',')})
+        else:
+            raise ValueError(f"Faixa inválida: {texto} (use inicio:fim:passo)")
+    return grade
+
+
+def combinacoes(grade, padroes):
+    """Matriz combinações x parâmetros (produto cartesiano), com os valores atuais na linha 0."""
+    nomes = list(padroes)
+    produto = list(itertools.product(*(grade[p] for p in nomes)))
+    return nomes, np.array([tuple(padroes[p] for p in nomes)] + produto, dtype=float).reshape(-1, len(nomes))
+
+
+# --- AVALIAÇÃO ---
+def _limites(grade, nomes, f):
+    """Parâmetro -> limites (combinações x 1), ou combinações x ativos onde há linhas float32."""
+    g = {}
+    for j, nome in enumerate(nomes):
+        v = grade[:, j:j + 1]
+        marca = f.get(f"float32:{nome}")
+        if marca is not None and marca.any():
+            with np.errstate(over='ignore'):
+                v = np.where(marca > 0, v.astype(np.float32).astype(float), v)
+        g[nome] = v
+    return g
+
+
+def _avaliar(modelo, f, grade, nomes, top, saida):
+    """Preenche 'saida' (combinações x [aprovados, extras..., top índices]) para um trecho da grade."""
+    aprovados, extras = MODELOS[modelo](f, _limites(grade, nomes, f))
+    saida[:, 0] = aprovados.sum(axis=1)
+    for k, nome in enumerate(EXTRAS[modelo], start=1):
+        saida[:, k] = extras[nome]
+    # Ativos já na ordem do ranking: os primeiros aprovados de cada linha
+    indices = np.argsort(~aprovados, axis=1, kind='stable')[:, :top]
+    k = 1 + len(EXTRAS[modelo])
+    largura = indices.shape[1]
+    saida[:, k:k + largura] = np.where(np.arange(largura) < saida[:, :1], indices, -1)
+    saida[:, k + largura:] = -1
+
+
+def _compartilhar(array):
+    bloco = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=bloco.buf)[...] = array
+    return bloco
+
+
+# Estado de cada processo do pool: blocos anexados uma vez (initializer)
+_ESTADO = None
+
+
+def _anexar(modelo, nomes_indicadores, nomes, top, blocos):
+    global _ESTADO
+    anexados, arrays = [], []
+    for nome, forma, tipo in blocos:
+        bloco = shared_memory.SharedMemory(name=nome, track=False)
+        anexados.append(bloco)
+        arrays.append(np.ndarray(forma, tipo, buffer=bloco.buf))
+    matriz, grade, saida = arrays
+    f = dict(zip(nomes_indicadores, matriz))
+    _ESTADO = (modelo, f, grade, nomes, top, saida, anexados)
+
+
+def _avaliar_trecho(trecho):
+    modelo, f, grade, nomes, top, saida, _ = _ESTADO
+    inicio, fim = trecho
+    _avaliar(modelo, f, grade[inicio:fim], nomes, top, saida[inicio:fim])
+    return fim - inicio
+
+
+def avaliar_grade(universo, nomes, grade, top=TOP_PADRAO, processos=None):
+    """
+    Avalia todas as combinações (linhas de 'grade', colunas 'nomes') sobre
+    o universo. processos=1 roda no próprio processo; senão, um pool lê o
+    universo e a grade da memória compartilhada. Devolve a matriz
+    combinações x [aprovados, extras..., índices do top] (-1 onde o top não enche).
+    """
+    nomes_indicadores, matriz = universo.matriz()
+    largura = 1 + len(EXTRAS[universo.modelo]) + top
+    if processos == 1 or len(grade) <= BLOCO:
+        saida = np.empty((len(grade), largura), dtype=np.int64)
+        f = dict(zip(nomes_indicadores, matriz))
+        for inicio in range(0, len(grade), BLOCO):
+            _avaliar(universo.modelo, f, grade[inicio:inicio + BLOCO], nomes, top, saida[inicio:inicio + BLOCO])
+        return saida
+
+    saida = np.empty((len(grade), largura), dtype=np.int64)
+    blocos = [_compartilhar(a) for a in (matriz, grade, saida)]
+    try:
+        descritores = [(b.name, a.shape, a.dtype) for b, a in zip(blocos, (matriz, grade, saida))]
+        processos = processos or os.cpu_count() or 1
+        trechos = [(i, min(i + BLOCO, len(grade))) for i in range(0, len(grade), BLOCO)]
+        with ProcessPoolExecutor(max_workers=processos, initializer=_anexar,
+                                 initargs=(universo.modelo, nomes_indicadores, nomes, top, descritores)) as pool:
+            list(pool.map(_avaliar_trecho, trechos))
+        saida[...] = np.ndarray(saida.shape, saida.dtype, buffer=blocos[2].buf)
+    finally:
+        for bloco in blocos:
+            bloco.close()
+            bloco.unlink()
+    return saida
+
+
+# --- RESULTADO ---
+class ResultadoSensibilidade:
+    """
+    Resultado de varrer_limites: 'combinacoes' (uma linha por combinação,
+    a primeira com os limites atuais) com aprovados, o top N, a média do
+    score no top e a semelhança (Jaccard) do top com o atual; 'frequencia'
+    (em quantas combinações cada ativo fica no top) e 'por_parametro'
+    (efeito médio de cada valor de cada parâmetro).
+    """
+
+    def __init__(self, universo, nomes, grade, saida, top):
+        self.universo = universo
+        self.nomes = nomes
+        self.top = top
+        extras = EXTRAS[universo.modelo]
+        indices = saida[:, 1 + len(extras):]
+        validos = indices >= 0
+        score = np.where(validos, universo.score[np.where(validos, indices, 0)], np.nan)
+
+        base = set(indices[0][validos[0]].tolist())
+        membros = np.zeros((len(saida), len(universo)), dtype=bool)
+        linhas = np.broadcast_to(np.arange(len(saida))[:, None], indices.shape)
+        membros[linhas[validos], indices[validos]] = True
+        no_base = np.zeros(len(universo), dtype=bool)
+        no_base[list(base)] = True
+        intersecao = (membros & no_base).sum(axis=1)
+        uniao = membros.sum(axis=1) + len(base) - intersecao
+        contagem = validos.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            jaccard = np.where(uniao > 0, intersecao / uniao, 1.0)
+            score_medio = np.where(contagem > 0, np.nansum(score, axis=1) / contagem, np.nan)
+
+        tabela = pd.DataFrame(grade, columns=nomes)
+        tabela['aprovados'] = saida[:, 0]
+        for k, nome in enumerate(extras, start=1):
+            tabela[nome] = saida[:, k]
+        tabela['score_medio_top'] = score_medio
+        tabela['jaccard_top'] = jaccard
+        tabela['top'] = [universo.tickers[linha[linha >= 0]].tolist() for linha in indices]
+        self.combinacoes = tabela
+        self.frequencia = pd.Series(membros[1:].sum(axis=0), index=universo.tickers, name='combinacoes')
+        self.frequencia = self.frequencia[self.frequencia > 0].sort_values(ascending=False, kind='stable')
+
+    @property
+    def atual(self):
+        return self.combinacoes.iloc[0]
+
+    def por_parametro(self):
+        """Para cada parâmetro e valor: médias de aprovados, Jaccard e score do top nas combinações com ele."""
+        grade = self.combinacoes.iloc[1:]
+        partes = []
+        for nome in self.nomes:
+            if grade[nome].nunique() < 2:
+                continue
+            resumo = grade.groupby(nome).agg(
+                aprovados=('aprovados', 'mean'), jaccard_top=('jaccard_top', 'mean'),
+                score_medio_top=('score_medio_top', 'mean'),
+            )
+            partes.append(resumo.reset_index(names='valor').assign(parametro=nome))
+        if not partes:
+            return pd.DataFrame(columns=['parametro', 'valor', 'aprovados', 'jaccard_top', 'score_medio_top'])
+        return pd.concat(partes, ignore_index=True)[['parametro', 'valor', 'aprovados', 'jaccard_top', 'score_medio_top']]
+
+    def resumo(self):
+        """Dicionário para relatórios JSON."""
+        grade = self.combinacoes.iloc[1:]
+        return {
+            'modelo': self.universo.modelo,
+            'ativos': len(self.universo),
+            'combinacoes': len(grade),
+            'top': self.top,
+            'atual': self._registros(self.combinacoes.iloc[:1])[0],
+            'top_igual_ao_atual': float((grade['jaccard_top'] == 1).mean()) if len(grade) else None,
+            'frequencia_no_top': {t: int(n) for t, n in self.frequencia.items()},
+            'por_parametro': self.por_parametro().to_dict('records'),
+            'grade': self._registros(grade),
+        }
+
+    @staticmethod
+    def _registros(tabela):
+        return tabela.astype(object).where(tabela.notna(), None).to_dict('records')
+
+
+def varrer_limites(universo, padroes, grade, top=TOP_PADRAO, processos=None):
+    """
+    Avalia a grade ('parâmetro -> valores') sobre o universo, mais a
+    combinação atual ('padroes'). Devolve um ResultadoSensibilidade.
+    """
+    nomes, matriz = combinacoes(grade, padroes)
+    saida = avaliar_grade(universo, nomes, matriz, top, processos)
+    return ResultadoSensibilidade(universo, nomes, matriz, saida, top)
+
+
+def apresentar(resultado, caminho=None):
+    """Grava a sensibilidade em JSON ou imprime o resumo."""
+    if caminho:
+        with open(caminho, 'w') as f:
+            json.dump(resultado.resumo(), f, indent=2, ensure_ascii=False)
+        print(f"💾 Sensibilidade de {len(resultado.combinacoes) - 1} combinações gravada em {caminho}")
+        return
+    grade = resultado.combinacoes.iloc[1:]
+    atual = resultado.atual
+    print(f"📏 {len(grade)} combinações sobre {len(resultado.universo)} ativos (top {resultado.top})")
+    print(f"Limites atuais: {', '.join(f'{p}={atual[p]:g}' for p in resultado.nomes)} "
+          f"-> {atual['aprovados']} aprovados, top: {', '.join(atual['top']) or '-'}")
+    if len(grade):
+        print(f"Top igual ao atual em {(grade['jaccard_top'] == 1).mean():.0%} das combinações "
+              f"(Jaccard médio {grade['jaccard_top'].mean():.2f}); aprovados de {grade['aprovados'].min()} a {grade['aprovados'].max()}")
+    print("\nEfeito de cada parâmetro (médias sobre as combinações com aquele valor):")
+    print(resultado.por_parametro().to_string(index=False, formatters={
+        'valor': '{:g}'.format, 'aprovados': '{:,.1f}'.format,
+        'jaccard_top': '{:.2f}'.format, 'score_medio_top': '{:.2f}'.format,
+    }))
+    frequencia = resultado.frequencia.head(2 * resultado.top)
+    if len(frequencia):
+        print(f"\nMais presentes no top ({len(grade)} combinações):")
+        print(", ".join(f"{t} {n / len(grade):.0%}" for t, n in frequencia.items()))
+
+
+def adicionar_argumentos(parser):
+    parser.add_argument('--sensibilidade', nargs='*', metavar='PARAM=VALORES',
+                        help="sensibilidade: grade de limites (pl_maximo=15,25,35 ou inicio:fim:passo; sem valores, a grade padrão)")
+    parser.add_argument('--top', type=int, default=TOP_PADRAO, help=f"sensibilidade: tamanho do top comparado (padrão: {TOP_PADRAO})")
+    parser.add_argument('--processos', type=int, help="sensibilidade: processos do pool (padrão: núcleos da máquina)")
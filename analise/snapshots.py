@@ -0,0 +1,141 @@
+import json
+import math
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from analise import rastro
+from analise.compacto import SnapshotsCompactos
+
+# --- CONFIGURAÇÕES ---
+ARQUIVO_PADRAO = os.path.join('dados', 'snapshots.sqlite')
+TTL_PADRAO = 12 * 60 * 60  # segundos: os dados do Fundamentus mudam uma vez por dia
+
+
+class SnapshotStore:
+    """
+    Guarda fotografias (snapshots) das tabelas baixadas num SQLite local.
+
+    Cada snapshot vira uma tabela própria (snap_<id>) e fica registrado em
+    'snapshots' com nome lógico, horário e tipos das colunas. Nada é apagado:
+    os snapshots antigos continuam disponíveis para análise histórica.
+    """
+
+    def __init__(self, caminho=ARQUIVO_PADRAO, ttl=TTL_PADRAO):
+        self.caminho = caminho
+        self.ttl = ttl
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tabela TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    linhas INTEGER NOT NULL,
+                    indice TEXT,
+                    tipos TEXT NOT NULL
+                )
+            """)
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho)
+
+    def salvar(self, tabela, df, criado_em=None):
+        """Grava um novo snapshot e devolve o id."""
+        criado_em = time.time() if criado_em is None else criado_em
+        tipos = {col: str(tipo) for col, tipo in df.dtypes.items()}
+        with self._conectar() as con:
+            cur = con.execute(
+                "INSERT INTO snapshots (tabela, criado_em, linhas, indice, tipos) VALUES (?, ?, ?, ?, ?)",
+                (tabela, criado_em, len(df), df.index.name, json.dumps(tipos)),
+            )
+            snapshot_id = cur.lastrowid
+            df.to_sql(f"snap_{snapshot_id}", con, index=True, index_label=df.index.name or 'index')
+        return snapshot_id
+
+    def ultimo(self, tabela, ttl=None):
+        """(id, criado_em) do snapshot mais recente dentro do TTL, ou None."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._conectar() as con:
+            linha = con.execute(
+                "SELECT id, criado_em FROM snapshots WHERE tabela = ? AND criado_em >= ? ORDER BY criado_em DESC LIMIT 1",
+                (tabela, time.time() - ttl),
+            ).fetchone()
+        return linha
+
+    def carregar(self, snapshot_id):
+        """Lê um snapshot pelo id, restaurando índice e tipos originais."""
+        with self._conectar() as con:
+            indice, tipos = con.execute(
+                "SELECT indice, tipos FROM snapshots WHERE id = ?", (snapshot_id,)
+            ).fetchone()
+            df = pd.read_sql(f"SELECT * FROM snap_{snapshot_id}", con, index_col=indice or 'index')
+        if indice is None:
+            df.index.name = None
+        return df.astype(json.loads(tipos))
+
+    def obter(self, tabela, baixar, ttl=None, forcar=False):
+        """
+        Devolve o snapshot mais recente de 'tabela' se ainda estiver no TTL;
+        caso contrário chama baixar(), grava o resultado e o devolve. Se
+        baixar() devolver None (fonte sem mudanças), vale o snapshot mais
+        recente de qualquer idade.
+        """
+        if not forcar:
+            encontrado = self.ultimo(tabela, ttl)
+            if encontrado:
+                snapshot_id, criado_em = encontrado
+                print(f"♻️ Usando snapshot '{tabela}' de {time.strftime('%d/%m %H:%M', time.localtime(criado_em))}")
+                rastro.contar(f"snapshots.{tabela}", acerto=True)
+                with rastro.etapa(f"snapshot.carregar.{tabela}") as e:
+                    df = self.carregar(snapshot_id)
+                    e.saida(len(df))
+                return df
+
+        rastro.contar(f"snapshots.{tabela}", acerto=False)
+        df = baixar()
+        if df is None:
+            # A fonte respondeu que nada mudou desde o último download (HTTP 304)
+            snapshot_id, criado_em = self.ultimo(tabela, ttl=math.inf)
+            print(f"♻️ Fonte sem mudanças: reaproveitando snapshot '{tabela}' de {time.strftime('%d/%m %H:%M', time.localtime(criado_em))}")
+            return self.carregar(snapshot_id)
+        if not df.empty:
+            self.salvar(tabela, df)
+        return df
+
+    def todos(self, tabela, compacto=False):
+        """
+        Todos os snapshots de 'tabela' como [(data, DataFrame)], do mais
+        antigo ao mais recente. Com compacto=True devolve SnapshotsCompactos,
+        lendo um snapshot por vez: só a versão compacta fica em memória.
+        """
+        with self._conectar() as con:
+            linhas = con.execute(
+                "SELECT id, criado_em FROM snapshots WHERE tabela = ? ORDER BY criado_em", (tabela,)
+            ).fetchall()
+        if compacto:
+            serie = SnapshotsCompactos()
+            for snapshot_id, criado_em in linhas:
+                serie.adicionar(pd.Timestamp(criado_em, unit='s'), self.carregar(snapshot_id))
+            return serie
+        return [(pd.Timestamp(criado_em, unit='s'), self.carregar(snapshot_id)) for snapshot_id, criado_em in linhas]
+
+    def listar(self, tabela=None):
+        """Todos os snapshots guardados (mais recentes primeiro)."""
+        consulta = "SELECT id, tabela, criado_em, linhas FROM snapshots"
+        parametros = ()
+        if tabela:
+            consulta += " WHERE tabela = ?"
+            parametros = (tabela,)
+        with self._conectar() as con:
+            df = pd.read_sql(consulta + " ORDER BY criado_em DESC", con, params=parametros)
+        df['criado_em'] = pd.to_datetime(df['criado_em'], unit='s')
+        return df
+
+
+if __name__ == "__main__":
+    print(SnapshotStore().listar().to_string(index=False))
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+# --- PARSER DEDICADO DA TABELA DE FIIs (fii_resultado.php) ---
+# Lê só a primeira tabela da página em modo streaming (parser SAX, sem montar
+# a árvore do documento) e converte os números no formato brasileiro coluna a
+# coluna em vez de célula a célula.
+
+COLUNAS = [
+    'Papel', 'Segmento', 'Cotacao', 'FFO_Yield', 'DY', 'P_VP',
+    'Valor_Mercado', 'Liquidez', 'Qtd_Imoveis', 'Preco_m2',
+    'Aluguel_m2', 'Cap_Rate', 'Vacancia'
+]
+TEXTO = {'Papel', 'Segmento'}
+PERCENTUAL = {'FFO_Yield', 'DY', 'Cap_Rate', 'Vacancia'}
+SEPARADOR = '\x1f'
+
+
+def numeros_br(textos, percentual=False):
+    """
+    Converte uma coluna de textos como '1.234,56' ou '10,5%' em float64
+    (percentuais já divididos por 100). Células vazias ou inválidas viram NaN.
+    Toda a coluna é tratada como um único texto, então as trocas de
+    separador rodam uma vez só.
+    """
+    if len(textos) == 0:
+        return np.array([], dtype=float)
+    bloco = SEPARADOR.join(textos).replace('.', '').replace(',', '.')
+    if percentual:
+        bloco = bloco.replace('%', '')
+    valores = pd.to_numeric(pd.Series(bloco.split(SEPARADOR)).str.strip(), errors='coerce').to_numpy(dtype=float)
+    return valores / 100 if percentual else valores
+
+
+class _LeitorTabela:
+    """
+    Alvo de parser SAX do lxml: recebe os eventos de abertura/fechamento de
+    tags e o texto à medida que o HTML chega, guardando só as células das
+    linhas de dados (<td>) da primeira tabela. Nenhuma árvore é montada.
+    """
+
+    def __init__(self):
+        self.colunas = [[] for _ in COLUNAS]
+        self.profundidade = 0
+        self.encerrada = False
+        self.linha = None
+        self.celula = None
+
+    def start(self, tag, attrib):
+        if self.encerrada:
+            return
+        if tag == 'table':
+            self.profundidade += 1
+        elif self.profundidade == 1:
+            if tag == 'tr':
+                self.linha = []
+            elif tag == 'td' and self.linha is not None:
+                self.celula = []
+
+    def end(self, tag):
+        if self.encerrada:
+            return
+        if tag == 'table':
+            self.profundidade -= 1
+            self.encerrada = self.profundidade == 0
+        elif self.profundidade == 1:
+            if tag == 'td' and self.celula is not None:
+                self.linha.append("".join(self.celula).strip())
+                self.celula = None
+            elif tag == 'tr' and self.linha is not None:
+                # Cabeçalho (<th>) e linhas incompletas ficam de fora
+                if len(self.linha) == len(COLUNAS):
+                    for coluna, valor in zip(self.colunas, self.linha):
+                        coluna.append(valor)
+                self.linha = None
+
+    def data(self, texto):
+        if self.celula is not None:
+            self.celula.append(texto)
+
+    def close(self):
+        return self.colunas
+
+
+def _ler_colunas(partes, encoding=None):
+    """Alimenta o parser com os pedaços do HTML e devolve os textos por coluna."""
+    parser = etree.HTMLParser(target=_LeitorTabela(), encoding=encoding)
+    for parte in partes:
+        parser.feed(parte)
+    return parser.close()
+
+
+def ler_tabela_fiis(conteudo, encoding=None):
+    """
+    Tabela de FIIs com colunas já tipadas: 'Papel' e 'Segmento' como texto,
+    percentuais como fração e o resto como número. 'conteudo' pode ser o
+    HTML inteiro (bytes) ou um iterável de pedaços, como o
+    Response.iter_content do requests. DataFrame vazio se a página não
+    tiver a tabela.
+    """
+    partes = [conteudo] if isinstance(conteudo, (bytes, str)) else conteudo
+    colunas = _ler_colunas(partes, encoding)
+    if not colunas[0]:
+        return pd.DataFrame()
+
+    dados = {}
+    for nome, valores in zip(COLUNAS, colunas):
+        if nome in TEXTO:
+            dados[nome] = valores
+        else:
+            dados[nome] = numeros_br(valores, percentual=nome in PERCENTUAL)
+    return pd.DataFrame(dados)
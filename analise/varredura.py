@@ -0,0 +1,101 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# --- VARREDURA DE ORÇAMENTOS ---
+# "O que comprar com R$ 100, 500, 1 mil, 5 mil, 50 mil?" sem rodar o
+# pipeline uma vez por valor: o universo é baixado e pontuado uma vez só,
+# sem teto de preço, e o orçamento entra apenas nos cortes que dependem
+# dele (cotacao <= dinheiro) e na alocação, para todos os valores juntos.
+
+ALTERNATIVAS = 5  # ativos listados por orçamento no avalairb3 (top pick incluso)
+
+
+def ler_orcamentos(textos):
+    """
+    Orçamentos a partir de valores soltos ('500') e faixas
+    'inicio:fim:passo' (fim incluso), em ordem crescente e sem repetição.
+    """
+    valores = []
+    for texto in textos:
+        partes = str(texto).split(':')
+        if len(partes) == 1:
+            valores.append(float(partes[0]))
+            continue
+        if len(partes) != 3:
+            raise ValueError(f"Faixa de orçamentos inválida: {texto} (use inicio:fim:passo)")
+        inicio, fim, passo = map(float, partes)
+        if passo <= 0:
+            raise ValueError(f"Passo precisa ser positivo: {texto}")
+        valores.extend(np.arange(inicio, fim + passo / 2, passo))
+    orcamentos = np.unique(np.round(np.asarray(valores, dtype=float), 2))
+    if (orcamentos <= 0).any():
+        raise ValueError("Orçamentos precisam ser positivos")
+    return orcamentos
+
+
+def varrer_refino(df_candidatos, resultado, orcamentos, alternativas=ALTERNATIVAS):
+    """
+    Top pick e alternativas do avalairb3 para cada orçamento, a partir dos
+    candidatos de buscar_candidatos_fundamentus sem teto de preço e do
+    refino deles (refinar_candidatos com dinheiro infinito). O score não
+    depende do orçamento: cada valor só corta quem custa mais que ele, na
+    cotação do Fundamentus e no último fechamento, numa matriz ativos x
+    orçamentos percorrida de uma vez.
+    """
+    orcamentos = np.asarray(orcamentos, dtype=float)
+    cotacao = (df_candidatos.assign(ticker=df_candidatos['ticker'].str.replace('.SA', ''))
+               .drop_duplicates('ticker').set_index('ticker')['preco_base'])
+    ranking = resultado.sort_values('score', ascending=False, kind='stable')
+    preco = ranking['preco'].to_numpy(dtype=float)
+    base = cotacao.reindex(ranking['ticker']).to_numpy(dtype=float)
+
+    cabe = (preco[:, None] <= orcamentos) & (base[:, None] <= orcamentos)
+    posicao = np.cumsum(cabe, axis=0)
+    primeiro = np.argmax(cabe, axis=0)
+    tem = cabe.any(axis=0)
+
+    tickers = ranking['ticker'].to_numpy()
+    dy = ranking['dy'].to_numpy(dtype=float)
+    linhas = []
+    for j, dinheiro in enumerate(orcamentos):
+        linha = {'orcamento': float(dinheiro), 'aprovados': int(posicao[-1, j]) if len(preco) else 0}
+        if tem[j]:
+            i = primeiro[j]
+            qtd = int(np.floor(dinheiro / preco[i]))
+            investido = qtd * preco[i]
+            linha.update({
+                'top_pick': tickers[i], 'preco': float(preco[i]), 'qtd': qtd,
+                'investido': float(investido), 'sobra': float(dinheiro - investido),
+                'renda_ano': float(investido * dy[i]),
+                'alternativas': tickers[cabe[:, j] & (posicao[:, j] <= alternativas)].tolist(),
+            })
+        linhas.append(linha)
+    tabela = pd.DataFrame(linhas, columns=[
+        'orcamento', 'aprovados', 'top_pick', 'preco', 'qtd', 'investido', 'sobra', 'renda_ano', 'alternativas',
+    ])
+    return tabela.astype({'qtd': 'Int64'})
+
+
+def apresentar(tabela, caminho=None):
+    """Grava a varredura em JSON (lista de registros) ou imprime a tabela."""
+    if caminho:
+        with open(caminho, 'w') as f:
+            json.dump(tabela.astype(object).where(tabela.notna(), None).to_dict('records'),
+                      f, indent=2, ensure_ascii=False)
+        print(f"💾 Varredura de {len(tabela)} orçamentos gravada em {caminho}")
+        return
+    exibida = tabela.astype(object).where(tabela.notna(), None)
+    for c in exibida.columns:
+        if c in ('orcamento', 'preco', 'investido', 'sobra', 'renda_ano', 'troco'):
+            exibida[c] = exibida[c].map(lambda v: '-' if v is None else f"R$ {v:,.2f}")
+        else:
+            exibida[c] = exibida[c].map(lambda v: '-' if v is None else ", ".join(v) if isinstance(v, list) else v)
+    print(exibida.to_string(index=False))
+
+
+def adicionar_argumentos(parser):
+    parser.add_argument('--orcamentos', nargs='+', metavar='VALOR',
+                        help="varredura: vários orçamentos (500 ou faixas inicio:fim:passo) sobre um único universo pontuado")
+    parser.add_argument('--saida', metavar='JSON', help="varredura: grava a tabela em JSON em vez de imprimir")
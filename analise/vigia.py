@@ -0,0 +1,236 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise.backtest import reprecificar
+from analise.compacto import como_float
+from analise.pontuacao import mascara_graham_permissivo, pontos_ranking
+from analise.refino import SCORE_MINIMO, metricas_de_preco, perfil, pontuar
+
+# --- MODO VIGIA (ranking ao vivo) ---
+# Os fundamentos são carregados uma vez; a cada ciclo só as cotações são
+# consultadas. Cada ranking guarda preço, score, aprovação e perfil em
+# arrays e, quando chega um lote de cotações, recalcula apenas as linhas
+# cujo preço mudou (as partes que dependem do preço: momentum, margem de
+# Graham, P/L e DY pelo preço, cotacao <= dinheiro). A ordenação final é
+# um argsort sobre o universo todo, que custa microssegundos.
+
+INTERVALO_PADRAO = 60  # segundos entre consultas de cotação
+TOP_PADRAO = 10        # posições acompanhadas no aviso de mudança do topo
+
+
+def cotacoes_yahoo(tickers):
+    """Último preço de cada ticker (intradiário de 1 minuto), num único download."""
+    import yfinance as yf
+
+    dados = yf.download(list(tickers), period='1d', interval='1m', group_by='ticker',
+                        auto_adjust=False, threads=True, progress=False)
+    if dados is None or dados.empty:
+        return pd.Series(dtype=float)
+    if isinstance(dados.columns, pd.MultiIndex):
+        fechamentos = dados.xs('Close', axis=1, level=1)
+    else:
+        fechamentos = dados[['Close']].set_axis(list(tickers)[:1], axis=1)
+    return fechamentos.ffill().iloc[-1].dropna()
+
+
+class RankingAoVivo:
+    """
+    Ranking mantido em arrays por ticker. 'pontuar_linhas(indices, precos)'
+    devolve (score, aprovado, perfil) só das linhas pedidas; 'desempate_preco'
+    ordena empates pelo menor preço, como o stage_3_ranking_final.
+    """
+
+    def __init__(self, tickers, precos, pontuar_linhas, desempate_preco=False, top=TOP_PADRAO):
+        self.tickers = pd.Index(tickers)
+        self.pontuar_linhas = pontuar_linhas
+        self.desempate_preco = desempate_preco
+        self.top = top
+        n = len(self.tickers)
+        self._nomes = self.tickers.to_numpy()
+        self._indice_cotacoes = None  # índice do último lote e o alinhamento dele com self.tickers
+        self._alinhamento = None
+        self.precos = np.full(n, np.nan)
+        self.score = np.zeros(n)
+        self.aprovado = np.zeros(n, dtype=bool)
+        self.perfil = np.full(n, '', dtype=object)
+        self.ordem = np.zeros(0, dtype=np.intp)
+        self.posicao = np.full(n, -1)
+        self.atualizar(pd.Series(np.asarray(precos, dtype=float), index=self.tickers))
+
+    def _ordenar(self):
+        idx = np.flatnonzero(self.aprovado)
+        chaves = (self.precos[idx], -self.score[idx]) if self.desempate_preco else (-self.score[idx],)
+        ordem = idx[np.lexsort(chaves)]
+        posicao = np.full(len(self.tickers), -1)
+        posicao[ordem] = np.arange(len(ordem))
+        return ordem, posicao
+
+    def _alinhar(self, cotacoes):
+        """Preços do lote na ordem de self.tickers (NaN para quem não veio)."""
+        if cotacoes.empty:
+            return np.full(len(self.tickers), np.nan)
+        indice = cotacoes.index
+        # A fonte costuma repetir as mesmas colunas: o alinhamento é refeito só quando elas mudam
+        if indice is not self._indice_cotacoes and not (self._indice_cotacoes is not None and indice.equals(self._indice_cotacoes)):
+            self._alinhamento = indice.get_indexer(self.tickers)
+        self._indice_cotacoes = indice
+        valores = cotacoes.to_numpy(dtype=float)
+        return np.where(self._alinhamento >= 0, valores[self._alinhamento], np.nan)
+
+    def ranking(self):
+        """Ranking atual dos aprovados (Ticker, Preco, Score, Perfil)."""
+        ordem = self.ordem
+        return pd.DataFrame({
+            'Ticker': self._nomes[ordem],
+            'Preco': self.precos[ordem],
+            'Score': self.score[ordem],
+            'Perfil': self.perfil[ordem],
+        })
+
+    def atualizar(self, cotacoes):
+        """
+        Aplica um lote de cotações (Series ticker -> preço) e devolve a lista
+        de mudanças: entradas, saídas, score, perfil e o topo, se mudou.
+        """
+        novos = self._alinhar(cotacoes)
+        mudou = np.flatnonzero(np.isfinite(novos) & ~(novos == self.precos))
+        if len(mudou) == 0:
+            return []
+
+        score_antes, aprovado_antes, perfil_antes = self.score[mudou], self.aprovado[mudou], self.perfil[mudou]
+        top_antes = self._nomes[self.ordem[:self.top]].tolist()
+
+        self.precos[mudou] = novos[mudou]
+        score, aprovado, perfis = self.pontuar_linhas(mudou, self.precos[mudou])
+        self.score[mudou] = score
+        self.aprovado[mudou] = aprovado
+        self.perfil[mudou] = perfis
+        self.ordem, self.posicao = self._ordenar()
+
+        # Só as linhas com alguma mudança visível viram eventos
+        entrou = aprovado & ~aprovado_antes
+        saiu = aprovado_antes & ~aprovado
+        ficou = aprovado & aprovado_antes
+        novo_perfil = ficou & (perfis != perfil_antes)
+        novo_score = ficou & (score != score_antes)
+        eventos = []
+        for k in np.flatnonzero(entrou | saiu | novo_perfil | novo_score):
+            i = mudou[k]
+            t = self._nomes[i]
+            if entrou[k]:
+                eventos.append({'evento': 'entrou', 'ticker': t, 'score': float(score[k]), 'perfil': perfis[k], 'posicao': int(self.posicao[i]) + 1})
+            elif saiu[k]:
+                eventos.append({'evento': 'saiu', 'ticker': t, 'score': float(score[k])})
+            else:
+                if novo_perfil[k]:
+                    eventos.append({'evento': 'perfil', 'ticker': t, 'de': perfil_antes[k], 'para': perfis[k]})
+                if novo_score[k]:
+                    eventos.append({'evento': 'score', 'ticker': t, 'de': float(score_antes[k]), 'para': float(score[k])})
+        top = self._nomes[self.ordem[:self.top]].tolist()
+        if top != top_antes:
+            eventos.append({'evento': 'top', 'de': top_antes, 'para': top})
+        return eventos
+
+
+# --- PONTUAÇÃO POR LINHA DE CADA ESTRATÉGIA ---
+def ranking_refino(df_candidatos, fechamentos, dinheiro, top=TOP_PADRAO):
+    """
+    Ranking ao vivo do avalairb3 sobre os candidatos de
+    buscar_candidatos_fundamentus. O preço de seis meses atrás vem do
+    histórico e fica fixo; momentum, corte de preço e score mudam com a cotação.
+    """
+    tickers = df_candidatos['ticker'].to_numpy()
+    base = metricas_de_preco(fechamentos).reindex(tickers)
+    inicial = base['preco_inicial'].to_numpy(dtype=float)
+    dy = como_float(df_candidatos['dy_base'])
+    pvp = como_float(df_candidatos['p_vp']) if 'p_vp' in df_candidatos.columns else np.zeros(len(tickers))
+    tipo = df_candidatos['tipo'].to_numpy()
+    setor = df_candidatos['setor'].to_numpy()
+
+    def pontuar_linhas(idx, precos):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            momentum = precos / inicial[idx] - 1
+        score = pontuar(dy[idx], pvp[idx], momentum, tipo[idx], setor[idx])
+        validos = (precos <= dinheiro) & (inicial[idx] != 0)
+        return score, validos & (score >= SCORE_MINIMO), perfil(score)
+
+    return RankingAoVivo(tickers, base['preco'], pontuar_linhas, top=top)
+
+
+def ranking_lollapalooza(df_base, score_minimo=40, top=TOP_PADRAO):
+    """
+    Ranking ao vivo do lollapalooza_b3 sobre o DataFrame de obter_dados_base:
+    LPA e VPA ficam fixos e P/L, DY e a margem de Graham seguem a cotação.
+    """
+    colunas = ['cotacao', 'pl', 'pvp', 'dy', 'roe', 'roic', 'c5y', 'liqc', 'patrim_liq', 'div_bruta', 'ignore_solvencia']
+    # Métricas detalhadas (analise/detalhes.py) só quando juntadas à base; sem elas valem as aproximações
+    colunas += [c for c in ('roe_medio_5a', 'roic_medio_5a', 'anos_lucro_consecutivos', 'anos_balancos',
+                            'divida_liquida_ebitda', 'liquidez_corrente') if c in df_base.columns]
+    fundamentos = {c: como_float(df_base[c]) if c in df_base.columns else np.zeros(len(df_base)) for c in colunas}
+
+    def pontuar_linhas(idx, precos):
+        dados = reprecificar({c: v[idx] for c, v in fundamentos.items()}, precos)
+        aprovado = mascara_graham_permissivo(dados)
+        score = pontos_ranking(dados)
+        return score, aprovado, np.where(score >= score_minimo, 'TOP PICK', '')
+
+    tickers = (df_base.index.astype(str) + '.SA').to_numpy()
+    return RankingAoVivo(tickers, fundamentos['cotacao'], pontuar_linhas, desempate_preco=True, top=top)
+
+
+# --- LAÇO DE CONSULTA ---
+def descrever(evento):
+    """Linha de texto de um evento de RankingAoVivo.atualizar ou de analise/mudancas.py (ou com 'texto' pronto)."""
+    if 'texto' in evento:
+        return evento['texto']
+    tipo = evento['evento']
+    evento = {k: v.replace('.SA', '') if isinstance(v, str) else v for k, v in evento.items()}
+    if tipo == 'entrou':
+        return f"🟢 {evento['ticker']} entrou no ranking em #{evento['posicao']} (score {evento['score']:.1f} {evento['perfil']})".rstrip()
+    if tipo == 'saiu':
+        return f"🔴 {evento['ticker']} saiu do ranking"
+    if tipo == 'perfil':
+        return f"🔁 {evento['ticker']}: {evento['de'] or '-'} -> {evento['para'] or '-'}"
+    if tipo == 'score':
+        return f"↕️ {evento['ticker']}: score {evento['de']:.1f} -> {evento['para']:.1f}"
+    if tipo == 'posicao':
+        return f"{'⬆️' if evento['para'] < evento['de'] else '⬇️'} {evento['ticker']}: #{evento['de']} -> #{evento['para']}"
+    return f"🏆 Novo topo: {', '.join(t.replace('.SA', '') for t in evento['para'])}"
+
+
+def vigiar(rankings, buscar_cotacoes=cotacoes_yahoo, intervalo=INTERVALO_PADRAO, ciclos=None, emitir=print):
+    """
+    Consulta as cotações de todos os tickers dos rankings (nome -> RankingAoVivo)
+    a cada 'intervalo' segundos e emite as mudanças. 'ciclos' limita o número
+    de consultas (None = até Ctrl+C). Devolve quantos ciclos rodaram.
+    """
+    tickers = list(dict.fromkeys(t for r in rankings.values() for t in r.tickers))
+    feitos = 0
+    try:
+        while ciclos is None or feitos < ciclos:
+            inicio = time.perf_counter()
+            cotacoes = buscar_cotacoes(tickers)
+            consulta = time.perf_counter() - inicio
+            for nome, ranking in rankings.items():
+                t0 = time.perf_counter()
+                eventos = ranking.atualizar(cotacoes)
+                latencia = time.perf_counter() - t0
+                for evento in eventos:
+                    emitir(f"[{time.strftime('%H:%M:%S')}] {nome}: {descrever(evento)}")
+                if eventos:
+                    emitir(f"   ⏱️ {nome}: {len(eventos)} mudança(s), recalculado em {latencia * 1000:.1f} ms (cotações em {consulta:.2f}s)")
+            feitos += 1
+            if ciclos is None or feitos < ciclos:
+                time.sleep(max(0.0, intervalo - (time.perf_counter() - inicio)))
+    except KeyboardInterrupt:
+        emitir("⏹️ Vigia encerrado.")
+    return feitos
+
+
+# --- LINHA DE COMANDO ---
+def adicionar_argumentos(parser):
+    parser.add_argument('--vigiar', type=float, nargs='?', const=INTERVALO_PADRAO, metavar='SEG',
+                        help=f"depois do relatório, segue consultando as cotações a cada SEG segundos (padrão: {INTERVALO_PADRAO}) e avisa as mudanças")
+    parser.add_argument('--ciclos', type=int, help="vigia: número de consultas antes de sair (padrão: até Ctrl+C)")
@@ -1,289 +1,387 @@
+import argparse
 import math
 
-import fundamentus
+import numpy as np
 import pandas as pd
-import requests
-import yfinance as yf
+
+from analise import mudancas, rastro, sensibilidade
+from analise.compacto import compactar
+from analise.fontes import obter_acoes, obter_fiis
+from analise.historico import TTL_PADRAO as TTL_PRECOS, HistoricoStore, baixar_fechamentos
+from analise.pipeline import Estagio, Pipeline, adicionar_argumentos as adicionar_argumentos_pipeline, repassar_vazio
+from analise.prazo import MARCA_DEFASADO, Prazo, adicionar_argumentos as adicionar_argumentos_prazo, avisar
+from analise.proventos import com_dy_medido
+from analise.refino import COMPRA_FORTE, JOIA_RARA, SCORE_MINIMO, refinar_candidatos
+from analise.replay import instalar_pelo_ambiente
+from analise.varredura import adicionar_argumentos as adicionar_argumentos_varredura, apresentar, ler_orcamentos, varrer_refino
+from analise.vigia import adicionar_argumentos as adicionar_argumentos_vigia, ranking_refino, vigiar
 
 # --- CONFIGURAÇÕES DE USUÁRIO ---
-DINHEIRO_DISPONIVEL = float(input("Dinheiro disponível: "))
 MIN_LIQUIDEZ = 200_000       # Liquidez mínima
 MIN_DY = 0.06                # 6% ao ano
+MAX_PVP_FII = 1.3            # Aceita até 1.3 de P/VP nos FIIs
+PROVENTOS = False            # DY dos proventos pagos em 12 meses (analise/proventos.py) no lugar do DY do Fundamentus
+MUDANCAS = False             # guarda o ranking e avisa o que mudou desde a execução anterior (analise/mudancas.py)
 
-print("🚀 Iniciando Varredura Global na B3...")
-print(f"💰 Buscando ativos abaixo de R$ {DINHEIRO_DISPONIVEL:.2f}")
-
-# --- FUNÇÃO MANUAL PARA FIIs (CORREÇÃO DO ERRO) ---
-def listar_fiis_manual():
-    """
-    Busca a tabela de FIIs diretamente do site Fundamentus,
-    já que a biblioteca oficial falhou.
-    """
-    url = 'https://www.fundamentus.com.br/fii_resultado.php'
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
-    try:
-        r = requests.get(url, headers=headers)
-        # Lê a tabela HTML
-        df_list = pd.read_html(r.content, decimal=',', thousands='.')
-        if not df_list:
-            return pd.DataFrame()
-            
-        df = df_list[0]
-        
-        # Renomeia colunas para facilitar
-        df.columns = [
-            'Papel', 'Segmento', 'Cotacao', 'FFO_Yield', 'DY', 'P_VP', 
-            'Valor_Mercado', 'Liquidez', 'Qtd_Imoveis', 'Preco_m2', 
-            'Aluguel_m2', 'Cap_Rate', 'Vacancia'
-        ]
-        
-        # Limpeza de dados (Converter strings % e R$ para float)
-        # O Pandas read_html com decimal=',' ajuda, mas porcentagens vêm como string "10,5%"
-        def limpar_percentual(x):
-            if isinstance(x, str):
-                return float(x.replace('%', '').replace('.', '').replace(',', '.')) / 100
-            return x
-
-        df['DY'] = df['DY'].apply(limpar_percentual)
-        df['P_VP'] = df['P_VP'] / 100 if df['P_VP'].max() > 100 else df['P_VP'] # Ajuste se vier sem escala
-        
-        # Ajusta índice para ser igual ao da biblioteca (Ticker)
-        df.set_index('Papel', inplace=True)
-        
-        # Renomeia para padronizar com o código principal
-        df.rename(columns={
-            'Cotacao': 'cotacao', 
-            'Liquidez': 'liquidez', 
-            'DY': 'dy', 
-            'P_VP': 'p_vp',
-            'Segmento': 'segmento'
-        }, inplace=True)
-        
-        return df
-        
-    except Exception as e:
-        print(f"⚠️ Erro ao buscar FIIs manualmente: {e}")
-        return pd.DataFrame()
-
-def buscar_candidatos_fundamentus():
-    candidatos = []
+def _candidatos(df, tipo, setor, pvp):
+    """Candidatos de uma tabela filtrada, coluna a coluna (tickers com .SA)."""
+    return pd.DataFrame({
+        'ticker': (df.index.astype(str) + ".SA").to_numpy(),
+        'tipo': tipo,
+        'setor': setor,
+        'preco_base': df['cotacao'].to_numpy(),
+        'dy_base': df['dy'].to_numpy(),
+        'p_vp': df[pvp].to_numpy(),
+    })
 
-    # --- 1. BUSCAR AÇÕES (Biblioteca funciona bem aqui) ---
-    print("📥 Baixando dados de TODAS as Ações...")
-    try:
-        df_acoes = fundamentus.get_resultado()
-        
-        # Filtros de Ações
+def filtrar_acoes(df_acoes, dinheiro, min_liquidez=MIN_LIQUIDEZ, min_dy=MIN_DY):
+    with rastro.etapa('filtro_acoes', linhas=len(df_acoes)) as e:
         filtro_acoes = (
-            (df_acoes['cotacao'] <= DINHEIRO_DISPONIVEL) &
-            (df_acoes['liq2m'] > MIN_LIQUIDEZ) &
-            (df_acoes['dy'] >= MIN_DY) &
+            (df_acoes['cotacao'] <= dinheiro) &
+            (df_acoes['liq2m'] > min_liquidez) &
+            (df_acoes['dy'] >= min_dy) &
             (df_acoes['pl'] > 0)
         )
         df_acoes_filtrado = df_acoes[filtro_acoes].copy()
-        
-        for ticker, row in df_acoes_filtrado.iterrows():
-            candidatos.append({
-                'ticker': ticker + ".SA",
-                'tipo': 'ACAO',
-                'setor': 'Geral', 
-                'preco_base': row['cotacao'],
-                'dy_base': row['dy'],
-                'p_vp': row['pvp']
-            })
-    except Exception as e:
-        print(f"❌ Erro ao buscar Ações: {e}")
+        e.saida(len(df_acoes_filtrado))
+    return _candidatos(df_acoes_filtrado, 'ACAO', 'Geral', 'pvp')
 
-    # --- 2. BUSCAR FIIS (Usando nossa função manual) ---
-    print("📥 Baixando dados de TODOS os FIIs (Modo Manual)...")
-    df_fiis = listar_fiis_manual()
-    
-    if not df_fiis.empty:
-        # Filtros de FIIs
+def filtrar_fiis(df_fiis, dinheiro, min_liquidez=MIN_LIQUIDEZ, min_dy=MIN_DY, max_pvp_fii=MAX_PVP_FII):
+    with rastro.etapa('filtro_fiis', linhas=len(df_fiis)) as e:
         filtro_fiis = (
-            (df_fiis['cotacao'] <= DINHEIRO_DISPONIVEL) &
-            (df_fiis['liquidez'] > MIN_LIQUIDEZ) &
-            (df_fiis['dy'] >= MIN_DY) &
-            (df_fiis['p_vp'] < 1.3) # Aceita até 1.3 de P/VP
+            (df_fiis['cotacao'] <= dinheiro) &
+            (df_fiis['liquidez'] > min_liquidez) &
+            (df_fiis['dy'] >= min_dy) &
+            (df_fiis['p_vp'] < max_pvp_fii)
         )
         df_fiis_filtrado = df_fiis[filtro_fiis].copy()
+        e.saida(len(df_fiis_filtrado))
+    return _candidatos(df_fiis_filtrado, 'FII', df_fiis_filtrado['segmento'].astype(object).to_numpy(), 'p_vp')
 
-        for ticker, row in df_fiis_filtrado.iterrows():
-            candidatos.append({
-                'ticker': ticker + ".SA",
-                'tipo': 'FII',
-                'setor': row['segmento'],
-                'preco_base': row['cotacao'],
-                'dy_base': row['dy'],
-                'p_vp': row['p_vp']
-            })
+def carregar_acoes(proventos=PROVENTOS):
+    """Tabela de ações (com o DY medido, se 'proventos'), ou None se a busca falhar."""
+    print("📥 Baixando dados de TODAS as Ações...")
+    try:
+        df_acoes = obter_acoes()
+        if proventos:
+            print("💸 Medindo proventos dos últimos 12 meses...")
+            df_acoes = com_dy_medido(df_acoes)
+        return df_acoes
+    except Exception as e:
+        print(f"❌ Erro ao buscar Ações: {e}")
+        return None
 
-    return pd.DataFrame(candidatos)
+def carregar_fiis(proventos=PROVENTOS):
+    """Tabela de FIIs (com o DY medido, se 'proventos'); vazia se a busca falhar."""
+    print("📥 Baixando dados de TODOS os FIIs (Modo Manual)...")
+    df_fiis = obter_fiis()
+    if proventos and not df_fiis.empty:
+        df_fiis = com_dy_medido(df_fiis)
+    return df_fiis
 
-def refinar_com_yfinance(df_candidatos):
-    if df_candidatos.empty:
+def triagem(df_acoes, df_fiis, dinheiro=math.inf, min_liquidez=MIN_LIQUIDEZ, min_dy=MIN_DY, max_pvp_fii=MAX_PVP_FII):
+    """Candidatos das tabelas de carregar_acoes e carregar_fiis."""
+    candidatos = []
+    if df_acoes is not None:
+        try:
+            # Filtros de Ações
+            candidatos.append(filtrar_acoes(df_acoes, dinheiro, min_liquidez, min_dy))
+        except Exception as e:
+            print(f"❌ Erro ao buscar Ações: {e}")
+    if not df_fiis.empty:
+        # Filtros de FIIs
+        candidatos.append(filtrar_fiis(df_fiis, dinheiro, min_liquidez, min_dy, max_pvp_fii))
+
+    if not candidatos:
         return pd.DataFrame()
+    # Tipo e setor como categorias, DY e P/VP em float32 (ver analise/compacto.py)
+    return compactar(pd.concat(candidatos, ignore_index=True))
 
+def buscar_candidatos_fundamentus(dinheiro, min_liquidez=MIN_LIQUIDEZ, min_dy=MIN_DY, max_pvp_fii=MAX_PVP_FII,
+                                  proventos=PROVENTOS):
+    # --- 1. BUSCAR AÇÕES (Biblioteca funciona bem aqui) ---
+    df_acoes = carregar_acoes(proventos)
+    # --- 2. BUSCAR FIIS (Usando nossa função manual) ---
+    df_fiis = carregar_fiis(proventos)
+    return triagem(df_acoes, df_fiis, dinheiro, min_liquidez, min_dy, max_pvp_fii)
+
+def baixar_historicos(df_candidatos, prazo=None):
+    """Matriz de fechamentos de 6 meses dos candidatos, ou None se o Yahoo falhar."""
     print(f"🔬 Refinando {len(df_candidatos)} ativos promissores com dados históricos...")
     
     tickers = df_candidatos['ticker'].tolist()
     
-    # Download em batch otimizado
+    # Download em batch otimizado (só as barras que ainda não estão no cache local)
     try:
-        dados_hist = yf.download(tickers, period="6mo", group_by='ticker', threads=True, progress=True)
+        return baixar_fechamentos(tickers, period="6mo", prazo=prazo)
     except Exception as e:
         print(f"Erro no download do Yahoo: {e}")
+        return None
+
+def refinar(df_candidatos, fechamentos, dinheiro=math.inf, score_minimo=SCORE_MINIMO):
+    if fechamentos is None:
         return pd.DataFrame()
-    
-    resultados_finais = []
+    # Momentum, volatilidade e score de todos os candidatos de uma vez
+    # (matriz datas x tickers); textos só para quem passa no corte de score
+    with rastro.etapa('refino', linhas=len(df_candidatos)) as e:
+        resultado = refinar_candidatos(df_candidatos, fechamentos, dinheiro, score_minimo)
+        e.saida(len(resultado))
+    return resultado
 
-    for index, row in df_candidatos.iterrows():
-        t = row['ticker']
-        try:
-            # Lidar com MultiIndex do Yahoo ou Index simples
-            if len(tickers) > 1:
-                hist = dados_hist[t]
-            else:
-                hist = dados_hist
-            
-            if hist.empty: continue
-
-            # Preço Atual e Validação
-            preco_atual = float(hist['Close'].iloc[-1])
-            if math.isnan(preco_atual) or preco_atual > DINHEIRO_DISPONIVEL: continue
-
-            # Momentum
-            preco_6m = float(hist['Close'].iloc[0])
-            momentum = (preco_atual / preco_6m) - 1
-            volatilidade = hist['Close'].pct_change().std() * (252**0.5) # Volatilidade Anualizada
-
-            # Score System
-            score = 0
-            analise_tecnica = []
-            premissas_negocio = []
-            
-            # --- ANÁLISE DE DIVIDENDOS ---
-            dy_score = 0
-            if row['dy_base'] > 0.12: 
-                score += 2.5
-                analise_tecnica.append(f"Dividend Yield Excepcional ({row['dy_base']:.1%}) indica forte fluxo de caixa ou desvalorização excessiva.")
-            elif row['dy_base'] >= 0.08: 
-                score += 2
-                analise_tecnica.append(f"Dividend Yield Atrativo ({row['dy_base']:.1%}), acima da Selic real esperada.")
-            elif row['dy_base'] >= 0.06:
-                score += 1
-                analise_tecnica.append(f"Dividend Yield Base ({row['dy_base']:.1%}) compõe renda passiva mínima.")
-
-            # --- ANÁLISE DE VALUATION (P/VP) ---
-            pvp = row.get('p_vp', 0)
-            if pvp > 0:
-                if pvp < 0.85:
-                    score += 2
-                    premissas_negocio.append(f"Desconto Patrimonial Severo (P/VP {pvp:.2f}): O mercado precifica o ativo abaixo do custo de reposição.")
-                elif pvp < 1.0:
-                    score += 1
-                    premissas_negocio.append(f"Negociado Abaixo do Patrimonial (P/VP {pvp:.2f}): Margem de segurança teórica.")
-                elif pvp > 1.20:
-                    score -= 0.5
-                    premissas_negocio.append(f"Ágio sobre Patrimônio (P/VP {pvp:.2f}): Mercado paga prêmio pela qualidade ou crescimento esperado.")
-
-            # --- ANÁLISE DE MOMENTUM E TENDÊNCIA ---
-            if momentum > 0.05: 
-                score += 1.5
-                analise_tecnica.append(f"Tendência de Alta de Curto Prazo (+{momentum:.1%} em 6m): Interesse comprador ativo.")
-            elif momentum < -0.10:
-                score -= 1 
-                analise_tecnica.append(f"Tendência de Baixa (-{abs(momentum):.1%} em 6m): Cuidado com 'faca caindo' (momentum negativo).")
-            
-            # --- FATORES QUALITATIVOS (Setor) ---
-            # Bonus Setor FII
-            if row['tipo'] == 'FII' and isinstance(row['setor'], str):
-                 if any(x in row['setor'] for x in ['Recebíveis', 'Papel']):
-                    if row['dy_base'] > 0.10 and pvp < 1.05:
-                        score += 1
-                        premissas_negocio.append("Setor de Papel/Recebíveis beneficia-se de juros altos, convertendo indexadores em dividendos rápidos.")
-                 elif any(x in row['setor'] for x in ['Logística']):
-                    score += 0.5
-                    premissas_negocio.append("Setor Logístico resiliente com demanda por e-commerce e vacância controlada.")
-
-            # Perfil
-            perfil = "NEUTRO"
-            if score >= 4.5: perfil = "💎 JOIA RARA"
-            elif score >= 3.0: perfil = "✅ COMPRA FORTE"
-            
-            if score >= 2:
-                resultados_finais.append({
-                    'ticker': t.replace('.SA', ''),
-                    'tipo': row['tipo'],
-                    'setor': row['setor'],
-                    'preco': preco_atual,
-                    'dy': row['dy_base'],
-                    'p_vp': pvp,
-                    'momentum': momentum,
-                    'volatilidade': volatilidade,
-                    'score': score,
-                    'perfil': perfil,
-                    'justificativa_tecnica': " ".join(analise_tecnica),
-                    'premissas_negocio': " ".join(premissas_negocio)
-                })
-
-        except Exception:
-            continue
-
-    return pd.DataFrame(resultados_finais).sort_values(by='score', ascending=False)
+def refinar_com_yfinance(df_candidatos, dinheiro, score_minimo=SCORE_MINIMO, prazo=None):
+    """
+    Refino com o histórico do Yahoo. Com 'prazo' (analise/prazo.py) só
+    entra o que chegou a tempo: quem ficou sem preço sai da análise, e quem
+    ficou com o preço do cache vencido ganha a coluna 'dados' marcada.
+    """
+    if df_candidatos.empty:
+        return pd.DataFrame()
+    fechamentos = baixar_historicos(df_candidatos, prazo)
+    resultado = refinar(df_candidatos, fechamentos, dinheiro, score_minimo)
+    if prazo is not None and fechamentos is not None:
+        resultado = marcar_prazo(df_candidatos, fechamentos, resultado, prazo)
+    return resultado
+
+def marcar_prazo(df_candidatos, fechamentos, resultado, prazo):
+    """Avisa quem ficou sem preço ou com preço defasado no fim do prazo e marca os defasados no resultado."""
+    tickers = df_candidatos['ticker'].tolist()
+    com_preco = fechamentos.reindex(columns=tickers).notna().any()
+    faltando = [t for t in tickers if not com_preco[t]]
+    defasados = [t for t in HistoricoStore().defasados(tickers) if com_preco[t]]
+    avisar(prazo, faltando, defasados)
+    resultado = resultado.copy()
+    resultado['dados'] = np.where((resultado['ticker'] + '.SA').isin(defasados), MARCA_DEFASADO, '')
+    return resultado
+
+def cortar_orcamento(df_candidatos, resultado, dinheiro):
+    """
+    O refinar_com_yfinance de 'dinheiro' a partir da triagem e do refino
+    sem teto de preço: o score não depende do dinheiro, então basta tirar
+    quem não cabe nele (na cotação do Fundamentus e no último fechamento)
+    e ordenar de novo, a partir da ordem em que o refino recebeu os ativos.
+    """
+    if resultado.empty:
+        return resultado
+    cotacao = (df_candidatos.assign(ticker=df_candidatos['ticker'].str.replace('.SA', ''))
+               .drop_duplicates('ticker').set_index('ticker')['preco_base'])
+    em_ordem = resultado.sort_index()
+    cabe = (em_ordem['preco'].to_numpy(dtype=float) <= dinheiro) & (cotacao.reindex(em_ordem['ticker']).to_numpy(dtype=float) <= dinheiro)
+    return em_ordem[cabe].reset_index(drop=True).sort_values(by='score', ascending=False)
+
+def pipeline_avalairb3(dinheiro, proventos=PROVENTOS):
+    """
+    Triagem e refino como DAG do executor de estágios (ver
+    analise/pipeline.py): ações e FIIs são buscados em paralelo, triagem e
+    refino rodam sem teto de preço e só o corte final depende de
+    'dinheiro'. As tabelas do Fundamentus são lidas sempre (do snapshot,
+    dentro do TTL); a matriz de preços vale pelo TTL do cache de preços, e
+    o resto só é recalculado quando a entrada muda.
+    """
+    return Pipeline([
+        Estagio('acoes', carregar_acoes, config={'proventos': proventos}, externo=True),
+        Estagio('fiis', carregar_fiis, config={'proventos': proventos}, externo=True),
+        Estagio('triagem', triagem, ['acoes', 'fiis'], {'min_liquidez': MIN_LIQUIDEZ, 'min_dy': MIN_DY, 'max_pvp_fii': MAX_PVP_FII}),
+        Estagio('historicos', repassar_vazio(baixar_historicos), ['triagem'], externo=True, validade=TTL_PRECOS),
+        Estagio('refino', repassar_vazio(refinar), ['triagem', 'historicos'], {'score_minimo': SCORE_MINIMO}),
+        Estagio('orcamento', repassar_vazio(cortar_orcamento), ['triagem', 'refino'], {'dinheiro': dinheiro}),
+    ])
+
+def refinar_incremental(dinheiro, proventos=PROVENTOS):
+    """
+    (candidatos até 'dinheiro', resultado do refino) pelo
+    pipeline_avalairb3, com os estágios reaproveitados de execuções
+    anteriores quando nada mudou; um 'dinheiro' novo refaz só o corte.
+    """
+    resultado = pipeline_avalairb3(dinheiro, proventos).rodar()
+    candidatos = resultado['triagem']
+    if not candidatos.empty:
+        candidatos = candidatos[candidatos['preco_base'] <= dinheiro]
+    print(f"🧩 Estágios: {resultado.resumo()}")
+    return candidatos, resultado['orcamento']
+
+def vigiar_ranking(df_candidatos, dinheiro, intervalo, ciclos=None):
+    """
+    Modo vigia: os fundamentos da triagem e o histórico de 6 meses ficam
+    fixos e só as cotações são consultadas; cada mudança no ranking é avisada.
+    O corte cotacao <= dinheiro é reaplicado a cada cotação nova.
+    """
+    fechamentos = baixar_fechamentos(df_candidatos['ticker'].tolist(), period="6mo")
+    ranking = ranking_refino(df_candidatos, fechamentos, dinheiro)
+    print(f"\n👀 Vigiando {len(ranking.tickers)} ativos a cada {intervalo:.0f}s (Ctrl+C para sair)...")
+    vigiar({'avalairb3': ranking}, intervalo=intervalo, ciclos=ciclos)
+
+def varrer_orcamentos(orcamentos, caminho=None, proventos=PROVENTOS):
+    """
+    Top pick e alternativas para vários orçamentos: triagem e refino rodam
+    uma vez sem teto de preço e cada orçamento só corta quem não cabe nele
+    (ver analise/varredura.py). Devolve a tabela, também impressa ou gravada em 'caminho'.
+    """
+    print(f"🚀 Varredura de {len(orcamentos)} orçamentos (R$ {orcamentos[0]:,.2f} a R$ {orcamentos[-1]:,.2f})...")
+    df_bruto = buscar_candidatos_fundamentus(math.inf, proventos=proventos)
+    if df_bruto.empty:
+        print("❌ Nenhum ativo encontrado com esses filtros iniciais.")
+        return pd.DataFrame()
+    df_final = refinar_com_yfinance(df_bruto, math.inf)
+    if df_final.empty:
+        print("⚠️ Ativos encontrados na triagem bruta, mas reprovados na análise fina (Score insuficiente).")
+        return pd.DataFrame()
+    with rastro.etapa('varredura', linhas=len(df_final), orcamentos=len(orcamentos)) as e:
+        tabela = varrer_refino(df_bruto, df_final, orcamentos)
+        e.saida(len(tabela))
+    apresentar(tabela, caminho)
+    return tabela
+
+def limites_atuais():
+    """Limites da triagem e do refino que a sensibilidade varia, com os valores em uso."""
+    return {
+        'min_liquidez': MIN_LIQUIDEZ, 'min_dy': MIN_DY, 'max_pvp_fii': MAX_PVP_FII,
+        'score_minimo': SCORE_MINIMO, 'compra_forte': COMPRA_FORTE, 'joia_rara': JOIA_RARA,
+    }
+
+def varrer_sensibilidade(grade=None, dinheiro=math.inf, top=sensibilidade.TOP_PADRAO, processos=None, caminho=None,
+                         proventos=PROVENTOS):
+    """
+    Sensibilidade dos limites da triagem e do refino (ver
+    analise/sensibilidade.py): triagem sem limites e refino sem corte de
+    score rodam uma vez e cada combinação da grade ('parâmetro -> valores',
+    padrão: grade_padrao) é avaliada sobre esse universo. Devolve o
+    ResultadoSensibilidade, também impresso ou gravado em 'caminho'.
+    """
+    padroes = limites_atuais()
+    grade = grade or sensibilidade.grade_padrao(padroes)
+    df_bruto = buscar_candidatos_fundamentus(dinheiro, -math.inf, -math.inf, math.inf, proventos)
+    if df_bruto.empty:
+        print("❌ Nenhum ativo encontrado na triagem.")
+        return None
+    df_final = refinar_com_yfinance(df_bruto, dinheiro, score_minimo=-math.inf)
+    acoes, fiis = obter_acoes(), obter_fiis()
+    if proventos:
+        # Mesmo DY que a triagem comparou (métricas servidas do cache de proventos)
+        acoes, fiis = com_dy_medido(acoes), com_dy_medido(fiis) if not fiis.empty else fiis
+    universo = sensibilidade.universo_avalairb3(df_final, acoes, fiis)
+    with rastro.etapa('sensibilidade', linhas=len(universo)) as e:
+        resultado = sensibilidade.varrer_limites(universo, padroes, grade, top, processos)
+        e.saida(len(resultado.combinacoes) - 1)
+    sensibilidade.apresentar(resultado, caminho)
+    return resultado
+
+def registrar_mudancas(df_final, dinheiro, caminho=None, limite_posicoes=mudancas.LIMITE_POSICOES):
+    """
+    Guarda o ranking do refino e imprime (ou grava em 'caminho') o que
+    mudou desde a execução anterior com o mesmo dinheiro: o teto de preço
+    muda quem entra, então cada valor tem o seu histórico.
+    """
+    ranking = mudancas.normalizar(df_final['ticker'], df_final['score'], df_final['perfil'])
+    delta = mudancas.registrar(f"avalairb3:{dinheiro:g}", ranking, limite_posicoes=limite_posicoes)
+    mudancas.apresentar(delta, caminho)
+    return delta
+
+def imprimir_relatorio(df_final, dinheiro):
+    """Relatório do melhor ativo e das alternativas, sobre o resultado do refino."""
+    top_pick = df_final.iloc[0]
+    qtd_compra = math.floor(dinheiro / top_pick['preco'])
+    investimento_total = qtd_compra * top_pick['preco']
+    sobra = dinheiro - investimento_total
+    renda_estimada_ano = investimento_total * top_pick['dy']
+    renda_estimada_mes = renda_estimada_ano / 12
+
+    print("\n" + "="*60)
+    print(f"🏆 RELATÓRIO DE RECOMENDAÇÃO: {top_pick['ticker']}")
+    print("="*60)
+
+    print(f"\n📊 DADOS GERAIS")
+    print(f"• Setor:        {top_pick['setor']}")
+    print(f"• Preço Atual:  R$ {top_pick['preco']:.2f}")
+    print(f"• P/VP:         {top_pick['p_vp']:.2f}")
+    print(f"• Score:        {top_pick['score']:.1f}/10 ({top_pick['perfil']})")
+    if top_pick.get('dados'):
+        print(f"• Dados:        {top_pick['dados']} (preço do cache local, o Yahoo não respondeu a tempo)")
+
+    print(f"\n💡 JUSTIFICATIVA TÉCNICA")
+    print(f"{top_pick['justificativa_tecnica']}")
+
+    print(f"\n🏢 PREMISSAS DE NEGÓCIO")
+    print(f"{top_pick['premissas_negocio']}")
+
+    print(f"\n📈 MÉTRICAS DE IMPACTO (Projeção)")
+    print(f"• Aporte Sugerido:    R$ {investimento_total:.2f} ({qtd_compra} cotas)")
+    print(f"• Dividend Yield:     {top_pick['dy']:.1%}")
+    print(f"• Renda Anual Est.:   R$ {renda_estimada_ano:.2f}")
+    print(f"• Renda Mensal Est.:  R$ {renda_estimada_mes:.2f}")
+    print(f"• Retorno Potencial:  A combinação de DY + Correção de P/VP sugere upside atrativo.")
+
+    print("\n" + "-"*60)
+    print("📜 TOP 5 ALTERNATIVAS (Ranking de Força)")
+    print("-"*60)
+    display_cols = ['ticker', 'preco', 'dy', 'p_vp', 'score', 'perfil'] + (['dados'] if 'dados' in df_final.columns else [])
+    print(df_final[display_cols].head(5).to_string(index=False, formatters={
+        'preco': 'R$ {:,.2f}'.format,
+        'dy': '{:,.1%}'.format,
+        'p_vp': '{:,.2f}'.format,
+        'score': '{:,.1f}'.format
+    }))
+    print("\n⚠️ Aviso Legal: Este relatório é gerado automaticamente por algoritmos quantitativos. Não constitui recomendação de compra. Analise seus riscos.")
 
 # --- EXECUÇÃO ---
-df_bruto = buscar_candidatos_fundamentus()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Varredura da B3 por ações e FIIs que cabem no seu dinheiro.")
+    parser.add_argument('--dinheiro', type=float, help="dinheiro disponível em R$ (perguntado se omitido)")
+    parser.add_argument('--proventos', action='store_true', default=PROVENTOS,
+                        help="DY medido nos proventos pagos em 12 meses (histórico local) no lugar do DY do Fundamentus")
+    adicionar_argumentos_varredura(parser)
+    sensibilidade.adicionar_argumentos(parser)
+    adicionar_argumentos_vigia(parser)
+    mudancas.adicionar_argumentos(parser, MUDANCAS)
+    adicionar_argumentos_pipeline(parser)
+    adicionar_argumentos_prazo(parser)
+    rastro.adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    prazo = Prazo(args.prazo) if args.prazo is not None else None
+
+    instalar_pelo_ambiente()
+    rastro.instalar_pelos_argumentos(args)
+    if args.sensibilidade is not None:
+        try:
+            grade = sensibilidade.ler_grade(args.sensibilidade, limites_atuais())
+        except ValueError as e:
+            parser.error(str(e))
+        dinheiro = args.dinheiro if args.dinheiro is not None else math.inf
+        varrer_sensibilidade(grade, dinheiro, args.top, args.processos, args.saida, args.proventos)
+        return
+    if args.orcamentos:
+        try:
+            orcamentos = ler_orcamentos(args.orcamentos)
+        except ValueError as e:
+            parser.error(str(e))
+        varrer_orcamentos(orcamentos, args.saida, args.proventos)
+        return
+    dinheiro = args.dinheiro if args.dinheiro is not None else float(input("Dinheiro disponível: "))
 
-if df_bruto.empty:
-    print("❌ Nenhum ativo encontrado com esses filtros iniciais.")
-else:
-    df_final = refinar_com_yfinance(df_bruto)
+    print("🚀 Iniciando Varredura Global na B3...")
+    print(f"💰 Buscando ativos abaixo de R$ {dinheiro:.2f}")
+
+    # Com --prazo o refino vai pelo caminho completo: os estágios memorizados não cortam a coleta
+    if args.incremental and prazo is None:
+        df_bruto, df_final = refinar_incremental(dinheiro, args.proventos)
+    else:
+        df_bruto = buscar_candidatos_fundamentus(dinheiro, proventos=args.proventos)
+        df_final = refinar_com_yfinance(df_bruto, dinheiro, prazo=prazo)
+
+    if df_bruto.empty:
+        print("❌ Nenhum ativo encontrado com esses filtros iniciais.")
+        return
 
     if not df_final.empty:
-        top_pick = df_final.iloc[0]
-        qtd_compra = math.floor(DINHEIRO_DISPONIVEL / top_pick['preco'])
-        investimento_total = qtd_compra * top_pick['preco']
-        sobra = DINHEIRO_DISPONIVEL - investimento_total
-        renda_estimada_ano = investimento_total * top_pick['dy']
-        renda_estimada_mes = renda_estimada_ano / 12
-
-        print("\n" + "="*60)
-        print(f"🏆 RELATÓRIO DE RECOMENDAÇÃO: {top_pick['ticker']}")
-        print("="*60)
-        
-        print(f"\n📊 DADOS GERAIS")
-        print(f"• Setor:        {top_pick['setor']}")
-        print(f"• Preço Atual:  R$ {top_pick['preco']:.2f}")
-        print(f"• P/VP:         {top_pick['p_vp']:.2f}")
-        print(f"• Score:        {top_pick['score']:.1f}/10 ({top_pick['perfil']})")
-
-        print(f"\n💡 JUSTIFICATIVA TÉCNICA")
-        print(f"{top_pick['justificativa_tecnica']}")
-
-        print(f"\n🏢 PREMISSAS DE NEGÓCIO")
-        print(f"{top_pick['premissas_negocio']}")
-
-        print(f"\n📈 MÉTRICAS DE IMPACTO (Projeção)")
-        print(f"• Aporte Sugerido:    R$ {investimento_total:.2f} ({qtd_compra} cotas)")
-        print(f"• Dividend Yield:     {top_pick['dy']:.1%}")
-        print(f"• Renda Anual Est.:   R$ {renda_estimada_ano:.2f}")
-        print(f"• Renda Mensal Est.:  R$ {renda_estimada_mes:.2f}")
-        print(f"• Retorno Potencial:  A combinação de DY + Correção de P/VP sugere upside atrativo.")
-
-        print("\n" + "-"*60)
-        print("📜 TOP 5 ALTERNATIVAS (Ranking de Força)")
-        print("-"*60)
-        display_cols = ['ticker', 'preco', 'dy', 'p_vp', 'score', 'perfil']
-        print(df_final[display_cols].head(5).to_string(index=False, formatters={
-            'preco': 'R$ {:,.2f}'.format,
-            'dy': '{:,.1%}'.format,
-            'p_vp': '{:,.2f}'.format,
-            'score': '{:,.1f}'.format
-        }))
-        print("\n⚠️ Aviso Legal: Este relatório é gerado automaticamente por algoritmos quantitativos. Não constitui recomendação de compra. Analise seus riscos.")
+        imprimir_relatorio(df_final, dinheiro)
+        if args.mudancas or args.delta:
+            registrar_mudancas(df_final, dinheiro, args.delta, args.posicoes)
     else:
-        print("⚠️ Ativos encontrados na triagem bruta, mas reprovados na análise fina (Score insuficiente).")
\ No newline at end of file
+        print("⚠️ Ativos encontrados na triagem bruta, mas reprovados na análise fina (Score insuficiente).")
+
+    if args.vigiar is not None:
+        # Sem o teto de preço na triagem: quem ficar abaixo do dinheiro durante o pregão entra no ranking
+        universo = buscar_candidatos_fundamentus(math.inf, proventos=args.proventos)
+        vigiar_ranking(universo, dinheiro, args.vigiar, args.ciclos)
+
+if __name__ == "__main__":
+    main()
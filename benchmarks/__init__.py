@@ -0,0 +1,6 @@
+"""
+Benchmarks dos estágios do pipeline.
+
+Rodar a partir da raiz do projeto, por exemplo:
+    python -m benchmarks.bench_pontuacao
+"""
@@ -0,0 +1,68 @@
+"""
+Compara o troco original de montar_carteira_real (ação por ação) com o
+motor de alocação inteira, em tempo e em troco deixado no caixa.
+
+    python -m benchmarks.bench_alocacao [orçamentos...]
+
+Cada orçamento roda sobre REPETICOES cestas sintéticas de 15 ativos; os
+números são médias. 'exato/100' usa o lote padrão de 100 ações.
+"""
+import sys
+import time
+
+import numpy as np
+
+from analise.alocacao import LOTE_PADRAO, alocar
+from benchmarks import legado
+
+ORCAMENTOS = [1_500, 25_000, 1_000_000, 50_000_000]
+REPETICOES = 20
+
+
+def cestas(n, seed=13):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        # Mistura de ações baratas (R$ 0,50) e caras (R$ 400), com centavos
+        yield np.round(np.exp(rng.uniform(np.log(0.5), np.log(400), 15)), 2)
+
+
+def medir(func, precos_lista):
+    tempos, trocos, desvios = [], [], []
+    for precos in precos_lista:
+        inicio = time.perf_counter()
+        qtds, saldo = func(precos)
+        tempos.append(time.perf_counter() - inicio)
+        trocos.append(saldo)
+        gasto = np.asarray(qtds) * precos
+        desvios.append(np.abs(gasto - gasto.sum() / len(precos)).max() / max(gasto.sum(), 1e-9))
+    return np.mean(tempos), np.mean(trocos), np.mean(desvios)
+
+
+def main(orcamentos):
+    precos_lista = list(cestas(REPETICOES))
+    print(f"{'orçamento':>12} | {'modo':<12} | {'tempo (ms)':>10} | {'troco médio':>12} | desvio máx. do peso igual")
+    for dinheiro in orcamentos:
+        def original(precos):
+            carteira, saldo = legado.troco_balanceado(list(precos), dinheiro)
+            qtds = {item['Preco']: item['Qtd'] for item in carteira}
+            return [qtds.get(p, 0) for p in precos], saldo
+
+        def motor(modo, lote=1):
+            def rodar(precos):
+                qtds = alocar(precos, dinheiro, modo=modo, lote=lote)
+                return qtds, dinheiro - float(qtds @ precos)
+            return rodar
+
+        for nome, func in (
+            ('original', original),
+            ('balanceado', motor('balanceado')),
+            ('exato', motor('exato')),
+            ('exato/100', motor('exato', LOTE_PADRAO)),
+        ):
+            tempo, troco, desvio = medir(func, precos_lista)
+            print(f"{dinheiro:>12,} | {nome:<12} | {tempo * 1000:>10.3f} | {troco:>12,.2f} | {desvio:>6.1%}")
+        print("-" * 80)
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or ORCAMENTOS)
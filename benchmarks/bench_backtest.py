@@ -0,0 +1,99 @@
+"""
+Backtest da estratégia Lollapalooza: laço data a data com o Stage 1 /
+Stage 3 originais (iterrows) contra o motor vetorizado de analise/backtest.py.
+
+    python -m benchmarks.bench_backtest [--anos 10] [--tickers 500 2000] [--frequencia mensal]
+
+Universo sintético com um snapshot de fundamentos por mês e pregões diários
+com proventos. O laço original só roda até LIMITE_LEGADO tickers; nesses
+tamanhos a carteira de cada data é comparada com a do motor vetorizado.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise.backtest import rodar_backtest
+from benchmarks import legado
+from benchmarks.sintetico import base_acoes
+
+ANOS = 10
+TICKERS = [500, 2_000]
+LIMITE_LEGADO = 500
+
+
+def universo(n, anos, seed=5):
+    """(snapshots mensais, fechamentos brutos, dividendos) sintéticos."""
+    rng = np.random.default_rng(seed)
+    base = base_acoes(n)
+    base['liq2m'] = np.maximum(base['liq2m'], 2_000_000)
+    datas = pd.bdate_range(end='2026-10-16', periods=252 * anos, name='Date')
+    retornos = rng.normal(0.0003, 0.018, (len(datas), n))
+    fechamentos = pd.DataFrame(
+        np.round(base['cotacao'].to_numpy() * np.exp(np.cumsum(retornos, axis=0)), 2) + 0.01,
+        index=datas, columns=base.index + '.SA',
+    )
+    # Proventos trimestrais de ~1/4 do DY de cada empresa
+    eventos = (rng.random(fechamentos.shape) < 4 / 252) & (base['dy'].to_numpy() > 0)
+    dividendos = fechamentos.where(eventos, 0.0) * base['dy'].to_numpy() / 4
+
+    snapshots = []
+    for data in datas.to_series().groupby(datas.to_period('M')).min():
+        snap = base.copy()
+        snap['cotacao'] = fechamentos.loc[data].to_numpy()
+        for col in ['pl', 'pvp', 'dy', 'roe', 'c5y']:
+            snap[col] = np.round(snap[col] * rng.normal(1, 0.1, n), 4)
+        snapshots.append((data, snap.drop(columns=['lpa', 'vpa'])))
+    return snapshots, fechamentos, dividendos
+
+
+def backtest_legado(snapshots, fechamentos, datas_reb, top=15):
+    """Carteira de cada data montada com os estágios originais, linha a linha."""
+    datas_snap = pd.DatetimeIndex([d for d, _ in snapshots])
+    carteiras = {}
+    for data in datas_reb:
+        snap = snapshots[datas_snap.searchsorted(data, side='right') - 1][1].copy()
+        preco = fechamentos.loc[data].to_numpy()
+        lpa = np.where(snap['pl'] > 0, snap['cotacao'] / snap['pl'].where(snap['pl'] > 0, 1), 0)
+        vpa = np.where(snap['pvp'] > 0, snap['cotacao'] / snap['pvp'].where(snap['pvp'] > 0, 1), 0)
+        snap['dy'] = np.where(snap['cotacao'] > 0, snap['dy'] * snap['cotacao'] / preco, snap['dy'])
+        snap['pl'] = np.where(lpa > 0, preco / np.where(lpa > 0, lpa, 1), snap['pl'])
+        snap['pvp'] = np.where(vpa > 0, preco / np.where(vpa > 0, vpa, 1), snap['pvp'])
+        snap['cotacao'], snap['lpa'], snap['vpa'] = preco, lpa, vpa
+        ranking = legado.stage_3_ranking_final(legado.stage_1_graham_permissivo(snap))
+        carteiras[data] = set(ranking[ranking['Score'] >= 40].head(top)['Ticker'])
+    return carteiras
+
+
+def cronometrar(func, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = func(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def main(anos, tamanhos, frequencia):
+    print(f"{'tickers':>8} | {'datas':>5} | {'legado (s)':>11} | {'vetorizado (s)':>14} | {'ganho':>7} | iguais | CAGR")
+    for n in tamanhos:
+        snapshots, fechamentos, dividendos = universo(n, anos)
+        resultado, t_novo = cronometrar(rodar_backtest, snapshots, fechamentos, dividendos, frequencia)
+        datas = resultado.periodos.index
+        resumo = resultado.resumo()
+
+        if n <= LIMITE_LEGADO:
+            carteiras, t_antigo = cronometrar(backtest_legado, snapshots, fechamentos, datas)
+            pesos = resultado.pesos
+            iguais = all(set(pesos.columns[pesos.loc[d].to_numpy() > 0]) == carteiras[d] for d in datas)
+            assert iguais, "carteiras diferentes entre o laço original e o motor vetorizado"
+            print(f"{n:>8,} | {len(datas):>5} | {t_antigo:>11.2f} | {t_novo:>14.3f} | {t_antigo / t_novo:>6.0f}x | sim    | {resumo['cagr']:.1%}")
+        else:
+            print(f"{n:>8,} | {len(datas):>5} | {'-':>11} | {t_novo:>14.3f} | {'-':>7} | -      | {resumo['cagr']:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--anos', type=int, default=ANOS)
+    parser.add_argument('--tickers', type=int, nargs='+', default=TICKERS)
+    parser.add_argument('--frequencia', default='mensal')
+    args = parser.parse_args()
+    main(args.anos, args.tickers, args.frequencia)
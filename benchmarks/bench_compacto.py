@@ -0,0 +1,106 @@
+"""
+Memória da representação compacta (analise/compacto.py) contra os
+DataFrames float64/object originais:
+
+- tabela de obter_dados_base e de candidatos do avalairb3 (antes uma lista
+  de dicts por candidato);
+- anos de snapshots diários guardados em memória (lista de DataFrames de
+  SnapshotStore.todos contra SnapshotsCompactos), com o backtest rodando
+  sobre os dois e as carteiras comparadas.
+
+    python -m benchmarks.bench_compacto [--linhas 1000 100000] [--anos 5] [--tickers 1000]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from analise.backtest import rodar_backtest
+from analise.compacto import SnapshotsCompactos, compactar, formatar_bytes, memoria
+from benchmarks.bench_backtest import universo
+from benchmarks.sintetico import base_acoes, candidatos
+
+LINHAS = [1_000, 100_000]
+ANOS = 5
+TICKERS = 1_000
+
+
+def lista_de_dicts(df):
+    """Candidatos como o laço original montava: um dict por linha."""
+    return [{
+        'ticker': row['ticker'], 'tipo': row['tipo'], 'setor': row['setor'],
+        'preco_base': row['preco_base'], 'dy_base': row['dy_base'], 'p_vp': row['p_vp'],
+    } for _, row in df.iterrows()]
+
+
+def medir_alocacao(func, *args):
+    """(resultado, bytes alocados que continuam vivos)."""
+    tracemalloc.start()
+    resultado = func(*args)
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, atual
+
+
+def linha(nome, antes, depois):
+    print(f"{nome:<38} | {formatar_bytes(antes):>10} | {formatar_bytes(depois):>10} | {antes / depois:>5.1f}x")
+
+
+def tabelas(tamanhos):
+    for n in tamanhos:
+        base = base_acoes(n)
+        base.index = base.index.astype(object)
+        linha(f"obter_dados_base ({n:,} linhas)", memoria(base), memoria(compactar(base)))
+
+        df = candidatos(n).astype({'ticker': object, 'tipo': object, 'setor': object})
+        dicts, bytes_dicts = medir_alocacao(lista_de_dicts, df)
+        compacto = compactar(df)
+        linha(f"candidatos ({n:,}, lista de dicts)", bytes_dicts, memoria(compacto))
+        linha(f"candidatos ({n:,}, DataFrame object)", memoria(df), memoria(compacto))
+        del dicts
+
+
+def snapshots(anos, n):
+    diarios, fechamentos, dividendos = universo(n, anos)
+    # Um snapshot por pregão (universo() gera um por mês): repete o mensal a cada dia
+    datas = fechamentos.index
+    mensais = pd.DatetimeIndex([d for d, _ in diarios])
+    lista = []
+    for data in datas:
+        df = diarios[mensais.searchsorted(data, side='right') - 1][1].copy()
+        df.index = df.index.astype(object)
+        lista.append((data, df))
+
+    antes = sum(memoria(df) for _, df in lista)
+    inicio = time.perf_counter()
+    serie = SnapshotsCompactos(lista)
+    depois = serie.memoria()
+    t_montar = time.perf_counter() - inicio
+    linha(f"{len(lista):,} snapshots x {n:,} tickers", antes, depois)
+
+    inicio = time.perf_counter()
+    esperado = rodar_backtest(lista, fechamentos, dividendos)
+    t_lista = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    resultado = rodar_backtest(serie, fechamentos, dividendos)
+    t_serie = time.perf_counter() - inicio
+    assert np.array_equal(esperado.pesos.to_numpy(), resultado.pesos.to_numpy()), "carteiras diferentes"
+    assert np.allclose(esperado.periodos['retorno'], resultado.periodos['retorno']), "retornos diferentes"
+    print(f"backtest: lista {t_lista:.2f}s | compacto {t_serie:.2f}s (+{t_montar:.2f}s para montar) | carteiras iguais")
+
+
+def main(tamanhos, anos, n):
+    print(f"{'estrutura':<38} | {'antes':>10} | {'depois':>10} | ganho")
+    tabelas(tamanhos)
+    snapshots(anos, n)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--linhas', type=int, nargs='+', default=LINHAS)
+    parser.add_argument('--anos', type=int, default=ANOS)
+    parser.add_argument('--tickers', type=int, default=TICKERS)
+    args = parser.parse_args()
+    main(args.linhas, args.anos, args.tickers)
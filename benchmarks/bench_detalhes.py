@@ -0,0 +1,125 @@
+"""
+Busca dos fundamentos detalhados (analise/detalhes.py) contra uma fonte
+falsa com latência e falhas ocasionais:
+
+- cache frio, uma empresa por vez (como um laço simples faria) contra o
+  pool de threads com o limitador de taxa;
+- execução seguinte, com tudo no cache (nenhuma requisição);
+- execução depois do prazo do próximo balanço, em que só as empresas com
+  balanço novo esperado voltam à fonte.
+
+    python -m benchmarks.bench_detalhes [--empresas 200] [--latencia 0.05] [--por-segundo 40] [--atrasadas 0.1]
+
+As métricas do pool são comparadas com as da busca sequencial.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise.detalhes import CAMPOS, DetalhesStore, MAX_TRABALHADORES
+from benchmarks.sintetico import tickers_sinteticos
+
+EMPRESAS = 200
+LATENCIA = 0.05      # segundos por requisição
+POR_SEGUNDO = 40.0   # teto do limitador no benchmark
+ATRASADAS = 0.1      # fração de empresas com o próximo balanço já esperado
+FALHAS = 0.05        # chance de erro de rede por requisição
+
+
+class FonteFalsa:
+    """Demonstrativos sintéticos servidos com latência, contando requisições."""
+
+    def __init__(self, tickers, latencia, atrasadas, falhas, seed=3):
+        rng = np.random.default_rng(seed)
+        hoje = pd.Timestamp.today().normalize()
+        self.latencia = latencia
+        self.falhas = falhas
+        self.requisicoes = 0
+        self._trava = threading.Lock()
+        self._rng = np.random.default_rng(seed + 1)
+        self.anual = {}
+        for t in tickers:
+            # Quem está atrasado publicou o último balanço há mais de PRAZO_BALANCO dias
+            fim = hoje - pd.DateOffset(years=2 if rng.random() < atrasadas else 0) - pd.offsets.YearEnd(1)
+            datas = pd.DatetimeIndex([fim - pd.DateOffset(years=k) for k in range(3, -1, -1)])
+            patrimonio = rng.lognormal(21, 1.5) * np.cumprod(rng.uniform(0.9, 1.1, 4))
+            self.anual[t] = pd.DataFrame({
+                'lucro_liquido': patrimonio * rng.normal(0.12, 0.08, 4),
+                'patrimonio': patrimonio,
+                'ebit': patrimonio * rng.normal(0.18, 0.05, 4),
+                'ebitda': patrimonio * rng.normal(0.22, 0.05, 4),
+                'capital_investido': patrimonio * rng.uniform(1.2, 2.0, 4),
+                'divida_bruta': patrimonio * rng.uniform(0.1, 1.5, 4),
+                'caixa': patrimonio * rng.uniform(0.05, 0.4, 4),
+                'ativo_circulante': patrimonio * rng.uniform(0.3, 1.2, 4),
+                'passivo_circulante': patrimonio * rng.uniform(0.2, 1.0, 4),
+            }, index=datas)[CAMPOS]
+
+    def _requisitar(self, limitador):
+        limitador.esperar()
+        with self._trava:
+            self.requisicoes += 1
+            falhou = self._rng.random() < self.falhas
+        time.sleep(self.latencia)
+        if falhou:
+            raise ConnectionError("falha simulada")
+
+    def baixar(self, ticker, limitador):
+        self._requisitar(limitador)  # DRE
+        self._requisitar(limitador)  # balanço
+        return self.anual[ticker]
+
+
+def envelhecer_consultas(caminho, dias):
+    """Finge que a última consulta de cada ticker foi 'dias' atrás."""
+    with sqlite3.connect(caminho) as con:
+        con.execute("UPDATE consultas SET consultado_em = consultado_em - ?", (dias * 86400,))
+
+
+def rodar(nome, store, fonte, tickers):
+    antes = fonte.requisicoes
+    inicio = time.perf_counter()
+    metricas = store.metricas(tickers)
+    segundos = time.perf_counter() - inicio
+    print(f"{nome:<34} | {segundos:>8.2f} | {fonte.requisicoes - antes:>12,} | {int(metricas.notna().any(axis=1).sum()):>9,}")
+    return metricas, segundos
+
+
+def main(n, latencia, por_segundo, atrasadas):
+    tickers = list(tickers_sinteticos(n))
+    print(f"{n:,} empresas, {latencia * 1000:.0f} ms por requisição, limite {por_segundo:.0f} req/s, {FALHAS:.0%} de falhas\n")
+    print(f"{'execução':<34} | {'tempo (s)':>8} | {'requisições':>12} | {'com dados':>9}")
+    with tempfile.TemporaryDirectory() as pasta:
+        fonte = FonteFalsa(tickers, latencia, atrasadas, FALHAS)
+        sequencial = DetalhesStore(os.path.join(pasta, 'seq.sqlite'), baixar=fonte.baixar, trabalhadores=1,
+                                   por_segundo=por_segundo, espera_base=0.01)
+        esperado, t_seq = rodar("cache frio, sequencial", sequencial, fonte, tickers)
+
+        fonte = FonteFalsa(tickers, latencia, atrasadas, FALHAS)
+        caminho = os.path.join(pasta, 'pool.sqlite')
+        pool = DetalhesStore(caminho, baixar=fonte.baixar, trabalhadores=MAX_TRABALHADORES,
+                             por_segundo=por_segundo, espera_base=0.01)
+        metricas, t_pool = rodar(f"cache frio, pool de {MAX_TRABALHADORES}", pool, fonte, tickers)
+        pd.testing.assert_frame_equal(metricas, esperado)
+
+        rodar("cache quente", pool, fonte, tickers)
+        envelhecer_consultas(caminho, 8)
+        metricas, _ = rodar("uma semana depois (só atrasadas)", pool, fonte, tickers)
+        pd.testing.assert_frame_equal(metricas, esperado)
+    print(f"\npool {t_seq / t_pool:.1f}x mais rápido que o sequencial; métricas iguais")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--empresas', type=int, default=EMPRESAS)
+    parser.add_argument('--latencia', type=float, default=LATENCIA)
+    parser.add_argument('--por-segundo', type=float, default=POR_SEGUNDO)
+    parser.add_argument('--atrasadas', type=float, default=ATRASADAS)
+    args = parser.parse_args()
+    main(args.empresas, args.latencia, args.por_segundo, args.atrasadas)
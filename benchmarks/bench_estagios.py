@@ -0,0 +1,105 @@
+"""
+Executor de estágios (analise/pipeline.py) contra os pipelines rodados
+inteiros a cada execução, nos dois scripts, numa sequência de execuções
+em que só o orçamento muda:
+
+- lollapalooza_b3: Stages 0, 1 e 3 e a carteira (pipeline_lollapalooza);
+- avalairb3: triagem, histórico, refino e corte pelo dinheiro
+  (pipeline_avalairb3).
+
+    python -m benchmarks.bench_estagios [--acoes 5000] [--fiis 1500]
+
+Roda sobre fixtures sintéticas no modo de reprodução, com snapshots e
+preços já no cache local. A primeira execução incremental calcula e grava
+todos os estágios; nas seguintes só a carteira (ou o corte) roda de novo.
+Carteira e relatório de cada orçamento são comparados com os do caminho
+de sempre.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from analise.replay import ativar
+from benchmarks import fixtures
+
+ACOES = 5_000
+FIIS = 1_500
+ORCAMENTOS = [5_000.0, 5_000.0, 800.0, 20_000.0, 300.0]
+
+
+def silencioso(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def lolla_completo(lolla, dinheiro):
+    ranking = lolla.stage_3_ranking_final(lolla.stage_1_graham_permissivo(lolla.obter_dados_base()))
+    return lolla.calcular_carteira(ranking, dinheiro)[0]
+
+
+def lolla_incremental(lolla, dinheiro):
+    resultado = lolla.pipeline_lollapalooza(dinheiro).rodar()
+    return resultado['carteira'][0], resultado.rodaram()
+
+
+def avalia_completo(avalia, dinheiro):
+    return avalia.refinar_com_yfinance(avalia.buscar_candidatos_fundamentus(dinheiro), dinheiro).reset_index(drop=True)
+
+
+def avalia_incremental(avalia, dinheiro):
+    resultado = avalia.pipeline_avalairb3(dinheiro).rodar()
+    return resultado['orcamento'].reset_index(drop=True), resultado.rodaram()
+
+
+def comparar(nome, modulo, completo, incremental):
+    total_completo = total_incremental = 0.0
+    for dinheiro in ORCAMENTOS:
+        inicio = time.perf_counter()
+        esperado = silencioso(completo, modulo, dinheiro)
+        t_completo = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        obtido, rodaram = silencioso(incremental, modulo, dinheiro)
+        t_incremental = time.perf_counter() - inicio
+        pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False, check_categorical=False)
+        total_completo += t_completo
+        total_incremental += t_incremental
+        print(f"{nome:<13} | R$ {dinheiro:>9,.0f} | {t_completo * 1000:>13.0f} | {t_incremental * 1000:>16.0f} | "
+              f"{', '.join(rodaram) or '-'}")
+    print(f"{nome:<13} | {'total':>12} | {total_completo * 1000:>13.0f} | {total_incremental * 1000:>16.0f} | "
+          f"{total_completo / total_incremental:.1f}x")
+
+
+def main(acoes, fiis):
+    import avalairb3
+    import lollapalooza_b3
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        fixtures.gerar(os.path.join(pasta, 'fixtures'), n_acoes=acoes, n_fiis=fiis)
+        os.chdir(pasta)
+        try:
+            with ativar('reproduzir', os.path.join(pasta, 'fixtures')):
+                # Snapshots e preços aquecidos: a diferença é só o que é recalculado
+                silencioso(avalia_completo, avalairb3, float('inf'))
+                silencioso(lolla_completo, lollapalooza_b3, ORCAMENTOS[0])
+
+                print(f"{acoes} ações, {fiis} FIIs; caches locais aquecidos\n")
+                print(f"{'pipeline':<13} | {'orçamento':>12} | {'completo (ms)':>13} | {'incremental (ms)':>16} | estágios recalculados")
+                comparar('lollapalooza', lollapalooza_b3, lolla_completo, lolla_incremental)
+                comparar('avalairb3', avalairb3, avalia_completo, avalia_incremental)
+        finally:
+            os.chdir(origem)
+    print("\ncarteiras e relatórios iguais aos do caminho completo")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--acoes', type=int, default=ACOES)
+    parser.add_argument('--fiis', type=int, default=FIIS)
+    args = parser.parse_args()
+    main(args.acoes, args.fiis)
@@ -0,0 +1,122 @@
+"""
+Cliente HTTP compartilhado (analise/rede.py) contra requests.get solto,
+num servidor local que imita o custo de abrir conexão (handshake TLS) e
+responde com ETag e gzip:
+
+- várias requisições pequenas: conexão nova a cada requests.get contra o
+  pool com keep-alive;
+- página de FIIs sem mudança: download e leitura completos contra o 304
+  com o corpo do cache em disco;
+- endpoint instável (503 nas primeiras respostas): novas tentativas.
+
+    python -m benchmarks.bench_http [--requisicoes 50] [--fiis 5000] [--handshake 0.02]
+
+No fim imprime os contadores por host do cliente.
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from analise.fontes import ler_fiis
+from analise.rede import ClienteHTTP
+from benchmarks.sintetico import pagina_fiis
+
+REQUISICOES = 50
+FIIS = 5_000
+HANDSHAKE = 0.02  # segundos a cada conexão nova
+FALHAS_INICIAIS = 2
+
+
+def servidor(pagina, handshake):
+    """Servidor HTTP/1.1 local em thread; devolve (url base, servidor)."""
+    etag = '"' + hashlib.sha1(pagina).hexdigest() + '"'
+    compactada = gzip.compress(pagina)
+    falhas = {'restantes': FALHAS_INICIAIS}
+
+    class Tratador(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # cabeçalho e corpo saem em escritas separadas
+
+        def setup(self):
+            time.sleep(handshake)
+            super().setup()
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status, corpo=b'', cabecalhos=()):
+            self.send_response(status)
+            for nome, valor in cabecalhos:
+                self.send_header(nome, valor)
+            self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_GET(self):
+            if self.path == '/fiis':
+                if self.headers.get('If-None-Match') == etag:
+                    return self._responder(304, cabecalhos=[('ETag', etag)])
+                gz = 'gzip' in self.headers.get('Accept-Encoding', '')
+                corpo = compactada if gz else pagina
+                cabecalhos = [('ETag', etag), ('Content-Type', 'text/html; charset=latin-1')]
+                return self._responder(200, corpo, cabecalhos + ([('Content-Encoding', 'gzip')] if gz else []))
+            if self.path == '/instavel' and falhas['restantes'] > 0:
+                falhas['restantes'] -= 1
+                return self._responder(503, b'tente de novo')
+            self._responder(200, b'ok')
+
+    http = ThreadingHTTPServer(('127.0.0.1', 0), Tratador)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{http.server_address[1]}", http
+
+
+def cronometrar(func, n=1):
+    inicio = time.perf_counter()
+    for _ in range(n):
+        resultado = func()
+    return resultado, (time.perf_counter() - inicio) / n
+
+
+def main(n, n_fiis, handshake):
+    pagina = pagina_fiis(n_fiis)
+    base, http = servidor(pagina, handshake)
+    with tempfile.TemporaryDirectory() as pasta:
+        cliente = ClienteHTTP(os.path.join(pasta, 'http.sqlite'), espera_base=0.01)
+        print(f"{'caso':<44} | {'antes (ms)':>10} | {'depois (ms)':>11} | ganho")
+
+        # 1. Requisições pequenas: conexão nova por chamada x pool com keep-alive
+        _, solto = cronometrar(lambda: requests.get(f"{base}/pequena", timeout=5).content, n)
+        _, pool = cronometrar(lambda: cliente.obter(f"{base}/pequena").content, n)
+        print(f"{f'{n} GETs pequenos (por requisição)':<44} | {solto * 1000:>10.1f} | {pool * 1000:>11.1f} | {solto / pool:>4.1f}x")
+
+        # 2. Página de FIIs: download + leitura x 304 com o corpo do disco
+        esperado, completo = cronometrar(lambda: ler_fiis(requests.get(f"{base}/fiis", timeout=5).content))
+        primeira = cliente.obter(f"{base}/fiis")
+        assert ler_fiis(primeira.iter_content(64 * 1024)).equals(esperado), "tabela diferente"
+        resposta, condicional = cronometrar(lambda: cliente.obter(f"{base}/fiis"))
+        assert resposta.nao_modificado and resposta.content == pagina, "304 não reaproveitou o corpo"
+        print(f"{f'página de {n_fiis:,} FIIs sem mudança':<44} | {completo * 1000:>10.1f} | {condicional * 1000:>11.1f} | {completo / condicional:>4.0f}x")
+
+        # 3. Endpoint instável: as falhas viram tentativas extras, não erro
+        resposta = cliente.obter(f"{base}/instavel")
+        assert resposta.status_code == 200, "tentativas não recuperaram o 503"
+
+        print(f"\nPágina: {len(pagina) / 1024:,.0f} KB ({len(gzip.compress(pagina)) / 1024:,.0f} KB com gzip)")
+        print(cliente.por_host().to_string(float_format=lambda v: f"{v:.4f}"))
+    http.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requisicoes', type=int, default=REQUISICOES)
+    parser.add_argument('--fiis', type=int, default=FIIS)
+    parser.add_argument('--handshake', type=float, default=HANDSHAKE)
+    args = parser.parse_args()
+    main(args.requisicoes, args.fiis, args.handshake)
@@ -0,0 +1,71 @@
+"""
+Custo de inicialização (interpretador + imports) dos scripts e de comandos
+que só leem dados já guardados em disco.
+
+    python -m benchmarks.bench_inicializacao [repeticoes]
+
+Cada comando roda num processo novo; o tempo é a mediana das repetições.
+A coluna 'carregados' lista quais das bibliotecas pesadas de rede
+(yfinance, fundamentus, requests, lxml) foram importadas pelo comando.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from analise.fontes import ler_fiis, normalizar_acoes
+from analise.snapshots import ARQUIVO_PADRAO, SnapshotStore
+from benchmarks.fixtures import resultado_fundamentus
+from benchmarks.sintetico import pagina_fiis
+
+REPETICOES = 5
+PESADOS = ['yfinance', 'fundamentus', 'requests', 'lxml']
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMANDOS = [
+    ("python vazio", "pass"),
+    ("import pandas", "import pandas"),
+    ("imports de rede (como antes)", "import pandas, yfinance, fundamentus, requests, lxml.etree"),
+    ("import lollapalooza_b3", "import lollapalooza_b3"),
+    ("import avalairb3", "import avalairb3"),
+    ("import main", "import main"),
+    ("snapshots em cache", "from analise.fontes import obter_acoes, obter_fiis; obter_acoes(); obter_fiis()"),
+    ("python -m analise.snapshots", "import runpy; runpy.run_module('analise.snapshots', run_name='__main__')"),
+]
+
+
+def preparar_cache(pasta):
+    """Snapshots frescos de ações e FIIs, como depois de uma execução normal."""
+    store = SnapshotStore(os.path.join(pasta, ARQUIVO_PADRAO))
+    store.salvar('acoes', normalizar_acoes(resultado_fundamentus(1_000)))
+    store.salvar('fiis', ler_fiis(pagina_fiis(400)))
+
+
+def medir(codigo, pasta, repeticoes):
+    sonda = f"\nimport sys; print('\\x1f' + ','.join(m for m in {PESADOS!r} if m in sys.modules))"
+    ambiente = {**os.environ, 'PYTHONPATH': RAIZ}
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = subprocess.run(
+            [sys.executable, '-c', codigo + sonda], cwd=pasta, env=ambiente,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), saida.rsplit('\x1f', 1)[-1].strip()
+
+
+def main(repeticoes):
+    with tempfile.TemporaryDirectory() as pasta:
+        preparar_cache(pasta)
+        print(f"{'comando':<32} | {'tempo (s)':>9} | carregados")
+        print("-" * 80)
+        for nome, codigo in COMANDOS:
+            tempo, carregados = medir(codigo, pasta, repeticoes)
+            print(f"{nome:<32} | {tempo:>9.3f} | {carregados or '-'}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else REPETICOES)
@@ -0,0 +1,109 @@
+"""
+Rebalanceamento de N carteiras: uma execução completa por carteira (como
+rodar main.py N vezes) contra o modo lote, que busca e pontua a união dos
+tickers uma vez e planeja as carteiras num pool de processos.
+
+    python -m benchmarks.bench_lote [--carteiras 10 50 200] [--latencia 0.05]
+
+Roda sobre fixtures sintéticas no modo de reprodução; --latencia soma um
+atraso fixo (segundos) a cada chamada ao Yahoo para simular a rede.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from analise.replay import ativar
+from benchmarks import fixtures
+
+CARTEIRAS = [10, 50, 200]
+ATIVOS_POR_CARTEIRA = 15
+UNIVERSO = 300
+APORTE = 1_000.0
+
+
+@contextlib.contextmanager
+def latencia_simulada(fontes, segundos):
+    """Atrasa cada yf.Ticker(...).info e cada yf.download do replay."""
+    import yfinance as yf
+
+    if not segundos:
+        yield
+        return
+
+    def ticker(t, *args, **kwargs):
+        time.sleep(segundos)
+        return fontes.Ticker(t)
+
+    def download(*args, **kwargs):
+        time.sleep(segundos)
+        return fontes.download(*args, **kwargs)
+
+    yf.Ticker, yf.download = ticker, download
+    try:
+        yield
+    finally:
+        fontes.instalar()
+
+
+def sortear_carteiras(universo, n, seed=21):
+    rng = np.random.default_rng(seed)
+    tickers = list(universo)
+    return {
+        f"cliente_{i:04d}": {str(t): int(rng.integers(1, 100)) for t in rng.choice(tickers, ATIVOS_POR_CARTEIRA, replace=False)}
+        for i in range(n)
+    }
+
+
+def uma_por_vez(carteiras):
+    import main
+    for carteira in carteiras.values():
+        analista = main.AnaliseFundamentalista(carteira)
+        analista.buscar_dados_concorrente()
+        main.RebalanceadorCarteira(APORTE).planejar(analista.aplicar_regras())
+
+
+def em_lote(carteiras, pasta, processos):
+    import main
+    main.rebalancear_lote(carteiras, {nome: APORTE for nome in carteiras}, pasta, processos)
+
+
+def cronometrar(func, *args):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+    return time.perf_counter() - inicio
+
+
+def main(tamanhos, latencia):
+    nucleos = os.cpu_count() or 1
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        universo = fixtures.gerar(os.path.join(pasta, 'fixtures'), n_acoes=400, n_fiis=200, n_carteira=UNIVERSO)
+        os.chdir(pasta)
+        try:
+            with ativar('reproduzir', os.path.join(pasta, 'fixtures')) as fontes, latencia_simulada(fontes, latencia):
+                # Aquece o cache local de preços para todas as medições partirem do mesmo estado
+                cronometrar(uma_por_vez, {'aquecimento': {t: 1 for t in universo}})
+
+                print(f"{'carteiras':>9} | {'uma por vez (s)':>15} | {'lote 1 proc (s)':>15} | {f'lote {nucleos} proc (s)':>16} | ganho")
+                for n in tamanhos:
+                    carteiras = sortear_carteiras(universo, n)
+                    t_seq = cronometrar(uma_por_vez, carteiras)
+                    t_lote1 = cronometrar(em_lote, carteiras, 'relatorios', 1)
+                    t_loten = cronometrar(em_lote, carteiras, 'relatorios', nucleos)
+                    print(f"{n:>9,} | {t_seq:>15.2f} | {t_lote1:>15.2f} | {t_loten:>16.2f} | {t_seq / min(t_lote1, t_loten):>4.0f}x")
+        finally:
+            os.chdir(origem)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--carteiras', type=int, nargs='+', default=CARTEIRAS)
+    parser.add_argument('--latencia', type=float, default=0.0)
+    args = parser.parse_args()
+    main(args.carteiras, args.latencia)
@@ -0,0 +1,101 @@
+"""
+Coleta da carteira (main.buscar_dados_concorrente) com o cache de
+metadados em dois níveis (analise/metadados.py):
+
+- primeira execução: .info de todos os tickers para a classificação;
+- execuções seguintes: classificação do cache, preço e DY do histórico em
+  lote, nenhum .info;
+- depois do TTL: a classificação volta a ser buscada.
+
+    python -m benchmarks.bench_metadados [--ativos 60] [--latencia 0.3] [--conexoes 8]
+
+Roda sobre fixtures sintéticas no modo de reprodução; --latencia soma um
+atraso fixo (segundos) a cada .info para simular o Yahoo. Tipo e setor
+são comparados entre as execuções.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+from analise.metadados import ARQUIVO_PADRAO, TTL_ESTATICO
+from analise.replay import ativar
+from benchmarks import fixtures
+
+ATIVOS = 60
+LATENCIA = 0.3  # segundos por .info
+CONEXOES = 8
+
+
+class InfoLento:
+    """yf.Ticker do replay com atraso no .info, contando as chamadas."""
+
+    def __init__(self, fontes, latencia):
+        self.fontes = fontes
+        self.latencia = latencia
+        self.chamadas = 0
+
+    def __call__(self, t, *args, **kwargs):
+        ticker = self.fontes.Ticker(t)
+        medidor = self
+
+        class Lento:
+            @property
+            def info(self):
+                medidor.chamadas += 1
+                time.sleep(medidor.latencia)
+                return ticker.info
+
+            def __getattr__(self, nome):
+                return getattr(ticker, nome)
+
+        return Lento()
+
+
+def rodar(nome, carteira, contador, conexoes):
+    import main
+    antes = contador.chamadas
+    analista = main.AnaliseFundamentalista(carteira)
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analista.buscar_dados_concorrente(conexoes)
+    segundos = time.perf_counter() - inicio
+    print(f"{nome:<34} | {segundos:>9.2f} | {contador.chamadas - antes:>6,} | {len(analista.dados):>6,}")
+    return {t: (d['type'], d['sector']) for t, d in analista.dados.items()}, segundos
+
+
+def main(n, latencia, conexoes):
+    import yfinance as yf
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        carteira = fixtures.gerar(os.path.join(pasta, 'fixtures'), n_acoes=max(50, n), n_fiis=max(30, n // 2), n_carteira=n)
+        os.chdir(pasta)
+        try:
+            with ativar('reproduzir', os.path.join(pasta, 'fixtures')) as fontes:
+                contador = InfoLento(fontes, latencia)
+                yf.Ticker = contador
+                print(f"{len(carteira)} ativos, {latencia * 1000:.0f} ms por .info, {conexoes} conexões\n")
+                print(f"{'execução':<34} | {'tempo (s)':>9} | {'.info':>6} | {'ativos':>6}")
+                esperado, t_frio = rodar("primeira (cache vazio)", carteira, contador, conexoes)
+                classes, t_quente = rodar("seguinte (classificação em cache)", carteira, contador, conexoes)
+                assert classes == esperado, "classificação mudou entre execuções"
+                with sqlite3.connect(ARQUIVO_PADRAO) as con:
+                    con.execute("UPDATE estaticos SET buscado_em = buscado_em - ?", (TTL_ESTATICO + 1,))
+                classes, _ = rodar("depois do TTL", carteira, contador, conexoes)
+                assert classes == esperado, "classificação mudou depois do TTL"
+        finally:
+            os.chdir(origem)
+    print(f"\nexecução com cache {t_frio / t_quente:.0f}x mais rápida; tipo e setor iguais nas três")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ativos', type=int, default=ATIVOS)
+    parser.add_argument('--latencia', type=float, default=LATENCIA)
+    parser.add_argument('--conexoes', type=int, default=CONEXOES)
+    args = parser.parse_args()
+    main(args.ativos, args.latencia, args.conexoes)
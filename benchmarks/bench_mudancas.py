@@ -0,0 +1,92 @@
+"""
+Mudanças entre execuções (analise/mudancas.py): comparar() alinhando os
+dois rankings pelo ticker de uma vez, contra o laço que procura cada
+ticker do ranking novo na lista do anterior; e o tamanho do delta em JSON
+contra o ranking inteiro que um alerta teria de reler.
+
+    python -m benchmarks.bench_mudancas [tickers...]
+
+Rankings sintéticos em que, entre uma execução e a outra, 0,5% dos
+tickers entram, 0,5% saem e 3% sobem ou descem meio ponto de score (e daí
+mudam de perfil e de posição). Os eventos das duas formas são comparados.
+"""
+import json
+import sys
+import time
+
+import numpy as np
+
+from analise.mudancas import LIMITE_POSICOES, comparar, normalizar
+from benchmarks.sintetico import tickers_sinteticos
+
+TICKERS = [500, 2_000, 10_000]
+
+
+def perfis(score):
+    return np.select([score >= 4.5, score >= 3.0], ["💎 JOIA RARA", "✅ COMPRA FORTE"], "NEUTRO")
+
+
+def execucoes(n, seed=9):
+    """Dois rankings consecutivos de um universo de n tickers (mais os que entram)."""
+    rng = np.random.default_rng(seed)
+    tickers = tickers_sinteticos(n + n // 200)
+    score = np.round(rng.uniform(0, 6, len(tickers)) * 2) / 2
+
+    def ranking(presentes, score):
+        ordem = presentes[np.argsort(-score[presentes], kind='stable')]
+        return normalizar(tickers[ordem], score[ordem], perfis(score[ordem]))
+
+    antes = ranking(np.arange(n), score)
+    mudam = rng.random(len(tickers)) < 0.03
+    score = np.where(mudam, score + rng.choice([-0.5, 0.5], len(tickers)), score)
+    presentes = np.concatenate([np.flatnonzero(rng.random(n) >= 0.005), np.arange(n, len(tickers))])
+    return antes, ranking(presentes, score)
+
+
+def comparar_em_laco(antes, depois, limite_posicoes=LIMITE_POSICOES):
+    """Mesmos eventos de comparar(), procurando cada ticker numa lista de linhas."""
+    linhas_antes = [(t, int(p), float(s), str(f)) for t, p, s, f in
+                    zip(antes.index, antes['posicao'], antes['score'], antes['perfil'])]
+    linhas_depois = [(t, int(p), float(s), str(f)) for t, p, s, f in
+                     zip(depois.index, depois['posicao'], depois['score'], depois['perfil'])]
+    tickers_antes = [linha[0] for linha in linhas_antes]
+    tickers_depois = [linha[0] for linha in linhas_depois]
+
+    entradas, mudancas = [], []
+    for t, p, s, f in linhas_depois:
+        if t not in tickers_antes:
+            entradas.append({'evento': 'entrou', 'ticker': t, 'score': s, 'perfil': f, 'posicao': p})
+            continue
+        _, p0, s0, f0 = linhas_antes[tickers_antes.index(t)]
+        if f != f0:
+            mudancas.append({'evento': 'perfil', 'ticker': t, 'de': f0, 'para': f})
+        if s != s0:
+            mudancas.append({'evento': 'score', 'ticker': t, 'de': s0, 'para': s})
+        if abs(p - p0) >= limite_posicoes:
+            mudancas.append({'evento': 'posicao', 'ticker': t, 'de': p0, 'para': p})
+    saidas = [{'evento': 'saiu', 'ticker': t, 'score': s} for t, _, s, _ in linhas_antes if t not in tickers_depois]
+    return entradas + saidas + mudancas
+
+
+def main(tamanhos):
+    print(f"{'tickers':>8} | {'laço (ms)':>10} | {'comparar (ms)':>13} | {'ganho':>7} | {'eventos':>7} | "
+          f"{'ranking JSON':>12} | {'delta JSON':>10}")
+    for n in tamanhos:
+        antes, depois = execucoes(n)
+        inicio = time.perf_counter()
+        esperado = comparar_em_laco(antes, depois)
+        t_laco = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        eventos = comparar(antes, depois)
+        t_vetor = time.perf_counter() - inicio
+
+        assert json.loads(json.dumps(eventos)) == json.loads(json.dumps(esperado)), f"{n}: eventos diferentes"
+        completo = len(depois.reset_index().to_json(orient='records', force_ascii=False).encode())
+        delta = len(json.dumps(eventos, ensure_ascii=False).encode())
+        print(f"{n:>8,} | {t_laco * 1000:>10.1f} | {t_vetor * 1000:>13.1f} | {t_laco / t_vetor:>6.0f}x | "
+              f"{len(eventos):>7,} | {completo / 1024:>9.0f} KB | {delta / 1024:>7.0f} KB")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or TICKERS)
@@ -0,0 +1,136 @@
+"""
+Benchmark ponta a ponta dos três pipelines, sem rede (modo de reprodução
+sobre fixtures sintéticas), em vários tamanhos de universo.
+
+    python -m benchmarks.bench_pipelines [--tamanhos 500 2000 ...] [--json saida.json]
+
+Cada tamanho roda duas vezes: 'frio' (caches locais vazios) e 'quente'
+(snapshot e histórico de preços já em disco). Para cada estágio são
+registrados o tempo de parede e quanto o pico de memória residente (RSS)
+do processo subiu acima do RSS do início do estágio.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import tempfile
+import time
+
+from analise.replay import ativar
+from benchmarks import fixtures
+
+TAMANHOS = [500, 2_000, 5_000]
+ORCAMENTO = 5_000.0
+APORTE = 1_000.0
+
+
+def _rss_kb(campo):
+    with open('/proc/self/status') as f:
+        for linha in f:
+            if linha.startswith(campo):
+                return int(linha.split()[1])
+    return 0
+
+
+def _zerar_pico():
+    """Zera o pico de RSS (VmHWM) do processo; só existe no Linux."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class Medidor:
+    """Cronometra estágios e guarda tempo e pico de memória de cada um."""
+
+    def __init__(self):
+        self.registros = []
+        self.contexto = {}
+
+    def medir(self, estagio, func, *args, **kwargs):
+        linux = _zerar_pico()
+        antes = _rss_kb('VmRSS:') if linux else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            resultado = func(*args, **kwargs)
+        tempo = time.perf_counter() - inicio
+        depois = _rss_kb('VmHWM:') if linux else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.registros.append({
+            **self.contexto,
+            'estagio': estagio,
+            'tempo_s': round(tempo, 4),
+            'pico_mib': round(max(0, depois - antes) / 1024, 1),
+            'linhas': len(resultado) if hasattr(resultado, '__len__') else None,
+        })
+        return resultado
+
+
+def lollapalooza(m):
+    import lollapalooza_b3 as lolla
+    df = m.medir('obter_dados_base', lolla.obter_dados_base)
+    df = m.medir('stage_1_graham_permissivo', lolla.stage_1_graham_permissivo, df)
+    ranking = m.medir('stage_3_ranking_final', lolla.stage_3_ranking_final, df)
+    m.medir('montar_carteira_real', lolla.montar_carteira_real, ranking, ORCAMENTO)
+
+
+def avalia(m):
+    import avalairb3
+    candidatos = m.medir('buscar_candidatos_fundamentus', avalairb3.buscar_candidatos_fundamentus, ORCAMENTO)
+    m.medir('refinar_com_yfinance', avalairb3.refinar_com_yfinance, candidatos, ORCAMENTO)
+
+
+def carteira(m, posicoes):
+    import main
+    analista = main.AnaliseFundamentalista(posicoes)
+    m.medir('buscar_dados', analista.buscar_dados_concorrente)
+    df = m.medir('aplicar_regras', analista.aplicar_regras)
+    m.medir('diagnosticar_e_sugerir', main.RebalanceadorCarteira(APORTE).diagnosticar_e_sugerir, df)
+
+
+def rodar(tamanhos):
+    m = Medidor()
+    origem = os.getcwd()
+    for n in tamanhos:
+        with tempfile.TemporaryDirectory() as pasta:
+            posicoes = fixtures.gerar(
+                os.path.join(pasta, 'fixtures'), n_acoes=int(n * 0.6), n_fiis=int(n * 0.4),
+                n_carteira=max(13, n // 20),
+            )
+            # Os caches locais (dados/) ficam dentro da pasta temporária
+            os.chdir(pasta)
+            try:
+                with ativar('reproduzir', os.path.join(pasta, 'fixtures')):
+                    for estado in ('frio', 'quente'):
+                        for nome, pipeline in (('lollapalooza', lollapalooza), ('avalairb3', avalia)):
+                            m.contexto = {'tamanho': n, 'cache': estado, 'pipeline': nome}
+                            pipeline(m)
+                        m.contexto = {'tamanho': n, 'cache': estado, 'pipeline': f'main ({len(posicoes)} ativos)'}
+                        carteira(m, posicoes)
+            finally:
+                os.chdir(origem)
+    return m.registros
+
+
+def imprimir(registros):
+    print(f"{'n':>6} | {'cache':>6} | {'pipeline':<20} | {'estágio':<30} | {'tempo (s)':>9} | {'pico (MiB)':>10}")
+    print("-" * 98)
+    for r in registros:
+        print(f"{r['tamanho']:>6,} | {r['cache']:>6} | {r['pipeline']:<20} | {r['estagio']:<30} | "
+              f"{r['tempo_s']:>9.3f} | {r['pico_mib']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS)
+    parser.add_argument('--json', help="grava os registros também neste arquivo")
+    args = parser.parse_args()
+
+    registros = rodar(args.tamanhos)
+    imprimir(registros)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(registros, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,141 @@
+"""
+Compara o Stage 1 / Stage 3 originais (iterrows) com o motor colunar.
+
+    python -m benchmarks.bench_pontuacao [tamanhos...]
+
+A versão original só roda até LIMITE_LEGADO linhas (acima disso leva minutos);
+nos tamanhos em que ambas rodam, os resultados são comparados célula a célula.
+Sobre a base com as métricas do --detalhes, o motor é comparado com
+stage_1_com_detalhes / stage_3_com_detalhes, a referência linha a linha das
+regras que só valem com elas (o laço original não as conhece).
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise.pontuacao import filtrar_graham_permissivo, pontuar_ranking
+from benchmarks import legado
+from benchmarks.sintetico import base_acoes
+
+TAMANHOS = [10_000, 100_000, 1_000_000]
+LIMITE_LEGADO = 100_000
+
+
+def _preferida(row, nome, aproximacao, padrao):
+    valor = row.get(nome, np.nan)
+    return row.get(aproximacao, padrao) if pd.isna(valor) else valor
+
+
+def _anos_exigidos(row):
+    guardados = row.get('anos_balancos', np.nan)
+    return guardados if guardados < 5 else 5
+
+
+def stage_1_com_detalhes(df):
+    """Stage 1 linha a linha com ROE/ROIC médios, dívida líquida/EBITDA, liquidez corrente e anos de lucro."""
+    candidatos = []
+    for ticker, row in df.iterrows():
+        if not row['ignore_solvencia']:
+            patrim = row['patrim_liq']
+            if patrim <= 0 and patrim != 1.0: continue
+            divida_ebitda = row.get('divida_liquida_ebitda', np.nan)
+            if pd.isna(divida_ebitda):
+                if patrim > 1 and (row.get('div_bruta', 0) / patrim) > 3.5: continue
+            elif divida_ebitda > 3.0: continue
+            liquidez = _preferida(row, 'liquidez_corrente', 'liqc', 0)
+            if 0 < liquidez < 1.0: continue
+
+        if row.get('anos_lucro_consecutivos', np.nan) < _anos_exigidos(row): continue
+
+        vi_graham = np.sqrt(22.5 * row['lpa'] * row['vpa']) if (row['lpa'] > 0 and row['vpa'] > 0) else 0
+        margem = row['cotacao'] / vi_graham if vi_graham > 0 else 999
+        dy = row.get('dy', 0)
+        pl = row.get('pl', 99)
+        roe = _preferida(row, 'roe_medio_5a', 'roe', 0)
+        roic = _preferida(row, 'roic_medio_5a', 'roic', np.nan)
+        roic_ok = not (roic != 0 and roic < 0.12)
+
+        if (margem <= 1.0 and pl < 25) or (dy >= 0.06 and pl < 25) or (roe > 0.20 and roic_ok and pl < 15):
+            candidatos.append(ticker)
+
+    return df.loc[candidatos].copy()
+
+
+def stage_3_com_detalhes(df):
+    """Stage 3 linha a linha com ROE/ROIC médios e anos de lucro (pontos e Motivo)."""
+    resultados = []
+    for ticker, row in df.iterrows():
+        score = 0
+        factors = []
+        roe = _preferida(row, 'roe_medio_5a', 'roe', 0)
+        if roe > 0.15:
+            score += 10
+            factors.append("ROE>15%")
+        if roe > 0.25:
+            score += 10
+            factors.append("Rentabilidade Top (ROE>25%)")
+        cagr = row.get('c5y', 0)
+        if cagr > 0.10:
+            score += 10
+            factors.append(f"Crescimento ({cagr:.0%})")
+        pl = row.get('pl', 0)
+        if pl < 10 and pl > 0:
+            score += 10
+            factors.append("P/L Baixo")
+        dy = row.get('dy', 0)
+        if dy > 0.06:
+            score += 10
+            factors.append(f"Dividendos ({dy:.1%})")
+        if dy > 0.10:
+            score += 5
+            factors.append("Yield Explosivo")
+        vi = np.sqrt(22.5 * row['lpa'] * row['vpa']) if row['lpa'] > 0 else 0
+        if vi > 0 and row['cotacao'] < (0.7 * vi):
+            score += 15
+            factors.append("Desconto Graham (>30%)")
+        if _preferida(row, 'roic_medio_5a', 'roic', 0) > 0.12:
+            score += 10
+            factors.append("ROIC>12%")
+        if row.get('anos_lucro_consecutivos', np.nan) >= _anos_exigidos(row):
+            score += 5
+            factors.append("Lucro Consistente")
+        resultados.append({'Ticker': ticker, 'Preco': row['cotacao'], 'Score': score, 'Motivo': ", ".join(factors)})
+
+    return pd.DataFrame(resultados).sort_values(by=['Score', 'Preco'], ascending=[False, True])
+
+
+def cronometrar(func, *args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def main(tamanhos):
+    print(f"{'base':<13} | {'linhas':>10} | {'legado (s)':>11} | {'colunar (s)':>11} | {'ganho':>8} | iguais")
+    for n in tamanhos:
+        for nome, detalhes, stage_1, stage_3 in (
+            ('fundamentus', False, legado.stage_1_graham_permissivo, legado.stage_3_ranking_final),
+            ('com detalhes', True, stage_1_com_detalhes, stage_3_com_detalhes),
+        ):
+            df = base_acoes(n, detalhes=detalhes)
+
+            def colunar():
+                return pontuar_ranking(filtrar_graham_permissivo(df))
+
+            novo, t_novo = cronometrar(colunar)
+
+            if n <= LIMITE_LEGADO:
+                def original():
+                    return stage_3(stage_1(df))
+
+                antigo, t_antigo = cronometrar(original)
+                pd.testing.assert_frame_equal(novo, antigo)
+                print(f"{nome:<13} | {n:>10,} | {t_antigo:>11.3f} | {t_novo:>11.3f} | {t_antigo / t_novo:>7.0f}x | sim")
+            else:
+                print(f"{nome:<13} | {n:>10,} | {'-':>11} | {t_novo:>11.3f} | {'-':>8} | -")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or TAMANHOS)
@@ -0,0 +1,151 @@
+"""
+Coleta com prazo (analise/prazo.py) contra a coleta que espera todo mundo,
+com o Yahoo respondendo com cauda longa (a maioria rápida, alguns pedidos
+muito lentos):
+
+- avalairb3: refinar_com_yfinance com o cache de preços vazio e vencido,
+  um yf.download único contra lotes com cópias e refeitos até o prazo;
+- main.py: buscar_dados_concorrente (o caminho do main(), yf.download em
+  lote e .info em paralelo) sem e com --prazo, caches vazios.
+
+    python -m benchmarks.bench_prazo [--execucoes 10] [--prazo 3] [--lenta 10] [--fracao 0.1]
+
+Roda sobre fixtures sintéticas no modo de reprodução. Cada chamada ao
+Yahoo leva 'rapida' segundos (mais um tanto por ticker pedido) ou, com
+probabilidade 'fracao', 'lenta'. Para cada forma: mediana e pior tempo das
+execuções e quantos ativos ficaram sem dado ou com o dado defasado.
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from analise.historico import HistoricoStore
+from analise.prazo import Prazo
+from analise.replay import ativar
+from benchmarks import fixtures
+
+EXECUCOES = 10
+PRAZO = 3.0
+RAPIDA = 0.05
+LENTA = 10.0
+FRACAO = 0.1
+ACOES = 300
+FIIS = 200
+POR_TICKER = 0.002  # segundos a mais por ticker de um yf.download
+
+
+@contextlib.contextmanager
+def latencia_cauda(fontes, lenta, fracao, seed=5):
+    """Atrasa cada yf.Ticker(...) e cada yf.download do replay: 'lenta' com probabilidade 'fracao'."""
+    import yfinance as yf
+
+    sorteio = random.Random(seed)
+
+    def atraso(n=1):
+        time.sleep((lenta if sorteio.random() < fracao else RAPIDA) + POR_TICKER * n)
+
+    def ticker(t, *args, **kwargs):
+        atraso()
+        return fontes.Ticker(t)
+
+    def download(tickers, *args, **kwargs):
+        atraso(len(tickers) if isinstance(tickers, (list, tuple)) else 1)
+        return fontes.download(tickers, *args, **kwargs)
+
+    yf.Ticker, yf.download = ticker, download
+    try:
+        yield
+    finally:
+        fontes.instalar()
+
+
+def silencioso(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def linha(nome, tempos, sem_dados, defasados, total):
+    print(f"{nome:<34} | {np.median(tempos):>7.2f} | {max(tempos):>6.2f} | "
+          f"{np.mean(sem_dados):>5.1f}/{total:<4} | {np.mean(defasados):>5.1f}")
+
+
+def refino(avalia, candidatos, execucoes, prazo, vencido):
+    """Execuções de refinar_com_yfinance com o cache de preços vazio ou vencido a cada uma."""
+    tickers = candidatos['ticker'].tolist()
+    for nome, segundos in (("um yf.download", None), (f"lotes, prazo de {prazo:g}s", prazo)):
+        tempos, sem_dados, defasados = [], [], []
+        for _ in range(execucoes):
+            store = HistoricoStore()
+            if vencido:
+                silencioso(store.atualizar, tickers, "6mo")
+                with sqlite3.connect(store.caminho) as con:
+                    con.execute("UPDATE cobertura SET buscado_em = buscado_em - ?", (store.ttl + 1,))
+            else:
+                os.remove(store.caminho)
+                store = HistoricoStore()
+            inicio = time.perf_counter()
+            silencioso(avalia.refinar_com_yfinance, candidatos, math.inf,
+                       prazo=Prazo(segundos) if segundos else None)
+            tempos.append(time.perf_counter() - inicio)
+            com_preco = store.ler_fechamentos(tickers, "6mo").notna().any()
+            sem_dados.append(int((~com_preco).sum()))
+            defasados.append(sum(1 for t in store.defasados(tickers) if com_preco[t]))
+        linha(f"{'vencido' if vencido else 'vazio'}: {nome}", tempos, sem_dados, defasados, len(tickers))
+
+
+def carteira(principal, carteira_dict, execucoes, prazo):
+    """Execuções de buscar_dados_concorrente com os caches de preços e de classificações vazios a cada uma."""
+    conexoes = principal.CONFIG['MAX_CONEXOES']
+    for nome, segundos in (("carteira", None), (f"carteira, prazo de {prazo:g}s", prazo)):
+        tempos, sem_dados, defasados = [], [], []
+        for _ in range(execucoes):
+            for caminho in (HistoricoStore().caminho, os.path.join('dados', 'metadados.sqlite')):
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+            analista = principal.AnaliseFundamentalista(carteira_dict)
+            inicio = time.perf_counter()
+            silencioso(analista.buscar_dados_concorrente, conexoes, Prazo(segundos) if segundos else None)
+            tempos.append(time.perf_counter() - inicio)
+            sem_dados.append(len(analista.tickers) - len(analista.dados))
+            defasados.append(len(analista.defasados))
+        linha(nome, tempos, sem_dados, defasados, len(carteira_dict))
+
+
+def main(execucoes, prazo, lenta, fracao):
+    import avalairb3
+    import main as principal
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        carteira_dict = fixtures.gerar(os.path.join(pasta, 'fixtures'), n_acoes=ACOES, n_fiis=FIIS)
+        os.chdir(pasta)
+        try:
+            with ativar('reproduzir', os.path.join(pasta, 'fixtures')) as fontes:
+                candidatos = silencioso(avalairb3.buscar_candidatos_fundamentus, math.inf)
+                print(f"{execucoes} execuções; chamadas ao Yahoo de {RAPIDA:g}s "
+                      f"(+{POR_TICKER * 1000:g} ms por ticker) ou {lenta:g}s em {fracao:.0%} delas\n")
+                print(f"{'coleta':<34} | {'mediana':>7} | {'pior':>6} | {'sem dados':>10} | {'defasados':>5}")
+                with latencia_cauda(fontes, lenta, fracao):
+                    refino(avalairb3, candidatos, execucoes, prazo, vencido=False)
+                    refino(avalairb3, candidatos, execucoes, prazo, vencido=True)
+                    carteira(principal, carteira_dict, execucoes, prazo)
+        finally:
+            os.chdir(origem)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--execucoes', type=int, default=EXECUCOES)
+    parser.add_argument('--prazo', type=float, default=PRAZO)
+    parser.add_argument('--lenta', type=float, default=LENTA)
+    parser.add_argument('--fracao', type=float, default=FRACAO)
+    args = parser.parse_args()
+    main(args.execucoes, args.prazo, args.lenta, args.fracao)
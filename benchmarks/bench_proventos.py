@@ -0,0 +1,112 @@
+"""
+Histórico de proventos (analise/proventos.py) contra a busca por ticker:
+
+- coleta: um yf.Ticker(t).history de 5 anos por ticker contra o
+  ProventosStore (downloads em lote na primeira execução, nada nas
+  seguintes e só os dias novos depois do TTL);
+- métricas: DY de 12 meses, regularidade e volatilidade do yield num laço
+  por ticker contra a matriz anos x tickers de medir().
+
+    python -m benchmarks.bench_proventos [--ativos 600] [--latencia 0.05]
+
+Roda sobre fixtures sintéticas no modo de reprodução; --latencia soma um
+atraso fixo a cada chamada ao Yahoo (por ticker ou por lote). As métricas
+das duas formas são comparadas.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise.proventos import ANOS, ProventosStore, medir
+from analise.replay import ativar
+from benchmarks import fixtures
+from benchmarks.bench_lote import latencia_simulada
+
+ATIVOS = 600
+LATENCIA = 0.05
+
+
+def metricas_em_laco(historicos, cotacoes, hoje, anos=ANOS):
+    """Mesmas métricas de medir(), um ticker e uma janela de 12 meses por vez."""
+    linhas = {}
+    for t, preco in cotacoes.items():
+        hist = historicos.get(t)
+        if hist is None:
+            linhas[t] = [np.nan, np.nan, np.nan, 0]
+            continue
+        pagos = hist['Dividends'][hist['Dividends'] > 0]
+        yields = []
+        for j in range(anos):
+            inicio = hoje - pd.DateOffset(years=j + 1)
+            fim = hoje - pd.DateOffset(years=j)
+            janela = pagos[(pagos.index > inicio) & ((pagos.index <= fim) if j else True)]
+            yields.append(janela.sum() / preco)
+        yields = np.array(yields)
+        linhas[t] = [yields[0], float((yields > 0).mean()), float(yields.std()), anos]
+    return pd.DataFrame.from_dict(linhas, orient='index', columns=['dy_12m', 'regularidade', 'dy_volatilidade', 'anos_cobertos'])
+
+
+def cronometrar(func, *args):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = func(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def por_ticker(tickers):
+    import yfinance as yf
+    return {t: yf.Ticker(t).history(period=f"{ANOS}y", actions=True) for t in tickers}
+
+
+def main(n, latencia):
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        fixtures.gerar(os.path.join(pasta, 'fixtures'), n_acoes=n, n_fiis=0, dias=5 * 252 + 20)
+        os.chdir(pasta)
+        try:
+            with ativar('reproduzir', os.path.join(pasta, 'fixtures')) as fontes, latencia_simulada(fontes, latencia):
+                resultado = pd.read_pickle(os.path.join(pasta, 'fixtures', 'resultado.pkl'))
+                cotacoes = resultado['cotacao'].astype(float)
+                yahoo = cotacoes.set_axis(cotacoes.index + '.SA')
+                store = ProventosStore()
+
+                print(f"{n} ações, {latencia * 1000:.0f} ms por chamada ao Yahoo\n")
+                print(f"{'coleta':<30} | {'tempo (s)':>9}")
+                historicos, t_ticker = cronometrar(por_ticker, list(yahoo.index))
+                print(f"{'um history por ticker':<30} | {t_ticker:>9.2f}")
+                for nome in ("ProventosStore (cache vazio)", "ProventosStore (em cache)"):
+                    _, t = cronometrar(store.metricas, cotacoes)
+                    print(f"{nome:<30} | {t:>9.2f}")
+                with sqlite3.connect(store.caminho) as con:
+                    con.execute("UPDATE cobertura SET buscado_em = buscado_em - ?", (store.ttl + 1,))
+                _, t = cronometrar(store.metricas, cotacoes)
+                print(f"{'ProventosStore (depois do TTL)':<30} | {t:>9.2f}")
+
+                hoje = pd.Timestamp.today().normalize()
+                inicio = time.perf_counter()
+                esperado = metricas_em_laco(historicos, yahoo, hoje)
+                t_laco = time.perf_counter() - inicio
+                eventos, inicios = store.ler(list(yahoo.index))
+                inicio = time.perf_counter()
+                obtido = medir(eventos, yahoo, inicios, hoje)
+                t_matriz = time.perf_counter() - inicio
+        finally:
+            os.chdir(origem)
+
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False, check_names=False, rtol=1e-9)
+    print(f"\nmétricas: laço {t_laco * 1000:.0f} ms, matriz {t_matriz * 1000:.1f} ms ({t_laco / t_matriz:.0f}x), iguais")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ativos', type=int, default=ATIVOS)
+    parser.add_argument('--latencia', type=float, default=LATENCIA)
+    args = parser.parse_args()
+    main(args.ativos, args.latencia)
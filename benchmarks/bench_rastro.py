@@ -0,0 +1,68 @@
+"""
+Custo da instrumentação (analise/rastro.py): etapa() e contar() com o rastro
+desligado e ligado, e os três estágios colunares do lollapalooza sem e com
+rastro.
+
+    python -m benchmarks.bench_rastro [--chamadas 1000000] [--linhas 100000]
+"""
+import argparse
+import time
+
+from analise import rastro
+from analise.pontuacao import filtrar_graham_permissivo, pontuar_ranking
+from benchmarks.sintetico import base_acoes
+
+CHAMADAS = 1_000_000
+LINHAS = 100_000
+REPETICOES = 20
+
+
+def por_chamada(n):
+    inicio = time.perf_counter()
+    for _ in range(n):
+        with rastro.etapa('x', linhas=1) as e:
+            e.saida(1)
+        rastro.contar('cache', acerto=True)
+    return (time.perf_counter() - inicio) / n
+
+
+def pipeline(df):
+    with rastro.etapa('stage_1', linhas=len(df)) as e:
+        aprovados = filtrar_graham_permissivo(df)
+        e.saida(len(aprovados))
+    with rastro.etapa('stage_3', linhas=len(aprovados)) as e:
+        ranking = pontuar_ranking(aprovados)
+        e.saida(len(ranking))
+
+
+def melhor_de(func, *args):
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        func(*args)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def main(chamadas, linhas):
+    rastro.desativar()
+    desligado = por_chamada(chamadas)
+    rastro.ativar()
+    ligado = por_chamada(chamadas // 10)
+    rastro.desativar()
+    print(f"etapa()+contar() por chamada: desligado {desligado * 1e9:,.0f} ns | ligado {ligado * 1e9:,.0f} ns")
+
+    df = base_acoes(linhas)
+    sem = melhor_de(pipeline, df)
+    rastro.ativar()
+    com = melhor_de(pipeline, df)
+    rastro.desativar()
+    print(f"stages 1+3 sobre {linhas:,} linhas: sem rastro {sem * 1000:.1f} ms | com rastro {com * 1000:.1f} ms ({(com / sem - 1):+.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chamadas', type=int, default=CHAMADAS)
+    parser.add_argument('--linhas', type=int, default=LINHAS)
+    args = parser.parse_args()
+    main(args.chamadas, args.linhas)
@@ -0,0 +1,45 @@
+"""
+Compara o laço original do refinar_com_yfinance com o refino colunar.
+
+    python -m benchmarks.bench_refino [tamanhos...]
+
+O download fica de fora: os dois lados recebem os mesmos históricos
+sintéticos (6 meses de pregões, com buracos) e o resultado é comparado.
+O lado colunar recebe a matriz datas x tickers, que no pipeline real sai
+pronta do cache de preços (HistoricoStore.fechamentos); a montagem dela a
+partir do dict aparece numa coluna separada.
+"""
+import sys
+import time
+
+import pandas as pd
+
+from analise.refino import matriz_fechamentos, refinar_candidatos
+from benchmarks import legado
+from benchmarks.sintetico import candidatos, historicos
+
+TAMANHOS = [500, 5_000]
+DINHEIRO = 40.0
+
+
+def cronometrar(func, *args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def main(tamanhos):
+    print(f"{'tickers':>8} | {'legado (s)':>11} | {'colunar (s)':>11} | {'ganho':>7} | {'matriz (s)':>10} | aprovados")
+    for n in tamanhos:
+        df = candidatos(n)
+        hist = historicos(df['ticker'])
+
+        matriz, t_matriz = cronometrar(matriz_fechamentos, hist, df['ticker'])
+        novo, t_novo = cronometrar(refinar_candidatos, df, matriz, DINHEIRO)
+        antigo, t_antigo = cronometrar(legado.refinar_com_yfinance, df, hist, DINHEIRO)
+        pd.testing.assert_frame_equal(novo, antigo, check_dtype=False)
+        print(f"{n:>8,} | {t_antigo:>11.3f} | {t_novo:>11.3f} | {t_antigo / t_novo:>6.0f}x | {t_matriz:>10.3f} | {len(novo)}")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or TAMANHOS)
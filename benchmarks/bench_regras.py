@@ -0,0 +1,142 @@
+"""
+Avaliação de variantes da especificação declarativa: interpretação linha a
+linha (cada critério reavaliado para cada ticker) contra o motor de regras
+compilado, que calcula cada máscara distinta uma vez por base.
+
+    python -m benchmarks.bench_regras [--linhas 1000 100000] [--variantes 50]
+
+As variantes mudam os limites de ROE, ROIC e margem líquida da
+especificação original. O interpretador só roda até LIMITE_LEGADO linhas;
+nesses tamanhos os aprovados e os scores são comparados.
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise.pontuacao import valor_graham
+from analise.regras import (
+    HISTORICO, METRICAS, PERCENTUAIS, PROXIES, _nome_metrica, _nome_original, _preparar, avaliar_variantes,
+    carregar_spec, com_limite,
+)
+from benchmarks.sintetico import base_acoes
+
+LINHAS = [1_000, 100_000]
+VARIANTES = 50
+LIMITE_LEGADO = 1_000
+
+
+def variantes(spec, n, seed=3):
+    rng = np.random.default_rng(seed)
+    specs = {'original': spec}
+    for i in range(1, n):
+        nova = com_limite(spec, 'Rentabilidade_Elite', 'roe_medio_5a', min=float(rng.choice([10, 12, 15, 18])))
+        nova = com_limite(nova, 'Rentabilidade_Elite', 'roic_medio_5a', min=float(rng.choice([8, 10, 12])))
+        nova = com_limite(nova, 'Margem_Liquida', 'margem_liquida_atual', min=float(rng.choice([5, 10, 15])))
+        specs[f"v{i:03d}"] = nova
+    return specs
+
+
+def _valor(linha, nome):
+    coluna = METRICAS.get(nome, nome)
+    # Detalhe que falta no ticker (NaN) cai na aproximação, como no motor
+    if coluna in linha and not (nome in PROXIES and PROXIES[nome] in linha and pd.isna(linha[coluna])):
+        return linha[coluna]
+    if nome in PROXIES and PROXIES[nome] in linha:
+        return linha[PROXIES[nome]]
+    if nome == 'valor_intrinseco_graham':
+        return float(valor_graham([linha['lpa']], [linha['vpa']])[0])
+    return None
+
+
+def _expressao(linha, texto):
+    """Avalia a expressão para uma linha (None se faltar alguma métrica)."""
+    codigo = _preparar(texto)
+    nomes = {}
+    for token in set(re.findall(r'[A-Za-z_][A-Za-z0-9_]*', codigo)) - {'and', 'or', 'not', '_pct'}:
+        nome = _nome_original(token)
+        valor = _valor(linha, nome)
+        if valor is None:
+            return None
+        nomes[token] = valor
+    # Número comparado direto com métrica em % ('ROE > 20') vale 20%
+    for token in nomes:
+        if _nome_original(token) in PERCENTUAIS:
+            codigo = re.sub(rf"({token}\s*[<>]=?\s*)(\d+(?:\.\d+)?)(?![\d.(])", lambda m: f"{m.group(1)}({m.group(2)}/100)", codigo)
+    return bool(eval(codigo, {'_pct': lambda v: v / 100}, nomes))
+
+
+def interpretar(spec, df):
+    """Referência linha a linha: (aprovados, scores) por ticker."""
+    aprovados, scores = [], []
+    for _, row in df.iterrows():
+        linha = row.to_dict()
+        ok = linha.get('liq2m', 0) >= spec['global_filters']['liquidity_check']['min_value']
+        for stage in spec['stages']:
+            for c in stage['criteria']:
+                if not ok or c.get('weight') == 'bonus':
+                    continue
+                if 'logic' in c:
+                    r = _expressao(linha, c['logic'])
+                    ok = ok and (r is None or r)
+                    continue
+                itens = c['metrics'] if 'metrics' in c else [{c['metric']: {'min': c.get('min_value'), 'max': c.get('max_value')}}]
+                for item in itens:
+                    for metrica, limites in item.items():
+                        nome = _nome_metrica(metrica)
+                        valor = _valor(linha, nome)
+                        if valor is None:
+                            continue
+                        escala = 100 if nome in PERCENTUAIS else 1
+                        if limites.get('min') is not None:
+                            minimo = limites['min'] / escala
+                            # Mínimo até o tamanho do histórico guardado
+                            guardados = _valor(linha, HISTORICO[nome]) if nome in HISTORICO else None
+                            if guardados is not None and guardados < minimo:
+                                minimo = guardados
+                            if not valor >= minimo:
+                                ok = False
+                        if limites.get('max') is not None and not valor <= limites['max'] / escala:
+                            ok = False
+        score = 0.0
+        for m in spec['scoring_system']['modifiers']:
+            if _expressao(linha, m['if']):
+                score += int(str(m['add']).split()[0])
+        aprovados.append(ok)
+        scores.append(score)
+    return np.array(aprovados), np.array(scores)
+
+
+def cronometrar(func, *args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def main(tamanhos, n_variantes):
+    specs = variantes(carregar_spec(), n_variantes)
+    print(f"{'linhas':>8} | {'variantes':>9} | {'linha a linha (s)':>17} | {'compilado (s)':>13} | {'ganho':>7} | iguais")
+    for n in tamanhos:
+        df = base_acoes(n, detalhes=True)
+        resultados, t_novo = cronometrar(avaliar_variantes, specs, df)
+
+        if n <= LIMITE_LEGADO:
+            t_antigo = 0.0
+            for nome, spec in specs.items():
+                (aprovados, scores), t = cronometrar(interpretar, spec, df)
+                t_antigo += t
+                assert (aprovados == resultados[nome].aprovados).all(), f"aprovados diferentes em {nome}"
+                assert np.allclose(scores, resultados[nome].score), f"scores diferentes em {nome}"
+            print(f"{n:>8,} | {len(specs):>9} | {t_antigo:>17.2f} | {t_novo:>13.3f} | {t_antigo / t_novo:>6.0f}x | sim")
+        else:
+            print(f"{n:>8,} | {len(specs):>9} | {'-':>17} | {t_novo:>13.3f} | {'-':>7} | -")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--linhas', type=int, nargs='+', default=LINHAS)
+    parser.add_argument('--variantes', type=int, default=VARIANTES)
+    args = parser.parse_args()
+    main(args.linhas, args.variantes)
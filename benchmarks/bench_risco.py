@@ -0,0 +1,85 @@
+"""
+Motor de risco da carteira (analise/risco.py) contra o mesmo cálculo
+feito como um laço simples faria: covariância par a par sobre as séries
+de cada dupla, contribuição e drawdown ativo por ativo.
+
+    python -m benchmarks.bench_risco [posições...]
+
+Carteiras sintéticas com um ano de pregões, um fator de mercado comum e
+alguns buracos nas séries; volatilidade, contribuições e drawdowns das
+duas formas são comparados.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise.risco import DIAS_UTEIS, analisar_risco, matriz_retornos
+from benchmarks.sintetico import tickers_sinteticos
+
+POSICOES = [10, 100, 300, 600]
+PREGOES = 250
+
+
+def carteira(n, seed=5):
+    rng = np.random.default_rng(seed)
+    mercado = rng.normal(0.0003, 0.012, (PREGOES, 1))
+    retornos = mercado * rng.uniform(0.4, 1.6, n) + rng.normal(0, 0.015, (PREGOES, n)) * rng.uniform(0.5, 2, n)
+    precos = 20 * np.cumprod(1 + retornos, axis=0)
+    precos[rng.random(precos.shape) < 0.01] = np.nan  # dias sem negócio
+    tickers = [f"{t}.SA" for t in tickers_sinteticos(n)]
+    fechamentos = pd.DataFrame(precos, index=pd.bdate_range('2025-01-02', periods=PREGOES), columns=tickers)
+    return fechamentos, pd.Series(rng.uniform(500, 20_000, n), index=tickers)
+
+
+def risco_em_laco(fechamentos, valores):
+    """Mesmas fórmulas de analisar_risco, uma dupla de ativos por vez."""
+    retornos = matriz_retornos(fechamentos)
+    tickers = list(retornos.columns)
+    n, t = len(tickers), len(retornos)
+    series = {a: np.nan_to_num(retornos[a].to_numpy() - np.nanmean(retornos[a].to_numpy())) for a in tickers}
+    amostral, variancia = np.zeros((n, n)), np.zeros((n, n))
+    for i, a in enumerate(tickers):
+        for j, b in enumerate(tickers):
+            produtos = series[a] * series[b]
+            amostral[i, j] = produtos.sum() / (t - 1)
+            variancia[i, j] = ((produtos - produtos.mean()) ** 2).sum() * t / (t - 1) ** 3
+    fora = ~np.eye(n, dtype=bool)
+    intensidade = min(1.0, variancia[fora].sum() / (amostral[fora] ** 2).sum())
+    cov = np.where(fora, (1 - intensidade) * amostral, amostral) * DIAS_UTEIS
+
+    w = (valores / valores.sum()).to_numpy()
+    volatilidade = float(np.sqrt(w @ cov @ w))
+    contribuicao = [w[i] * sum(cov[i, j] * w[j] for j in range(n)) / volatilidade for i in range(n)]
+    drawdowns = []
+    for a in tickers:
+        pico, pior = -np.inf, 0.0
+        for p in fechamentos[a].ffill().dropna():
+            pico = max(pico, p)
+            pior = min(pior, p / pico - 1)
+        drawdowns.append(pior)
+    return volatilidade, np.array(contribuicao), np.array(drawdowns)
+
+
+def main(tamanhos):
+    print(f"{'posições':>8} | {'laço (ms)':>10} | {'matricial (ms)':>14} | {'ganho':>7} | volatilidade")
+    for n in tamanhos:
+        fechamentos, valores = carteira(n)
+        inicio = time.perf_counter()
+        vol, contribuicao, drawdowns = risco_em_laco(fechamentos, valores)
+        t_laco = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        risco = analisar_risco(fechamentos, valores)
+        t_matriz = time.perf_counter() - inicio
+
+        np.testing.assert_allclose(risco.volatilidade, vol, rtol=1e-9)
+        np.testing.assert_allclose(risco.posicoes['contribuicao'], contribuicao, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(risco.posicoes['max_drawdown'], drawdowns, rtol=1e-9)
+        print(f"{n:>8,} | {t_laco * 1000:>10.1f} | {t_matriz * 1000:>14.1f} | {t_laco / t_matriz:>6.0f}x | "
+              f"{risco.volatilidade:.1%} (encolhimento {risco.encolhimento:.2f})")
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or POSICOES)
@@ -0,0 +1,124 @@
+"""
+Sensibilidade dos limites (analise/sensibilidade.py) contra o pipeline
+rodado uma vez por combinação da grade, nos dois scripts:
+
+- lollapalooza_b3: obter_dados_base, Stage 1 e ranking com os limites de
+  cada combinação contra a base pontuada uma vez e a grade sobre ela;
+- avalairb3: triagem e refino com os limites de cada combinação contra
+  uma triagem sem limites, um refino sem corte de score e a grade.
+
+    python -m benchmarks.bench_sensibilidade [--amostra 40] [--processos 4]
+
+Roda sobre fixtures sintéticas no modo de reprodução, com os caches locais
+aquecidos. O pipeline por combinação roda numa amostra da grade e o tempo
+é extrapolado para a grade inteira; na amostra, aprovados e top são
+comparados (no avalairb3, os scores do top e as contagens por perfil: a
+ordenação do refino não é estável entre empatados).
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from analise import sensibilidade
+from analise.pontuacao import mascara_graham_permissivo, pontuar_ranking
+from analise.refino import perfil
+from analise.replay import ativar
+from benchmarks import fixtures
+
+AMOSTRA = 40
+TOP = 10
+
+
+def silencioso(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def lolla_combinacao(lolla, p, top):
+    base = lolla.obter_dados_base(p['liquidez_minima'])
+    ranking = pontuar_ranking(base[mascara_graham_permissivo(base, p['pl_maximo'], p['roe_minimo'])])
+    aprovados = ranking[ranking['Score'] >= p['score_minimo']]
+    return len(aprovados), aprovados['Ticker'].head(top).tolist()
+
+
+def avalia_combinacao(avalia, p, top):
+    candidatos = avalia.buscar_candidatos_fundamentus(math.inf, p['min_liquidez'], p['min_dy'], p['max_pvp_fii'])
+    resultado = avalia.refinar_com_yfinance(candidatos, math.inf, p['score_minimo'])
+    if resultado.empty:
+        return 0, [], 0, 0
+    perfis = perfil(resultado['score'].to_numpy(), p['joia_rara'], p['compra_forte'])
+    return (len(resultado), sorted(resultado['score'].nlargest(top).tolist()),
+            int((perfis == "💎 JOIA RARA").sum()), int((perfis == "✅ COMPRA FORTE").sum()))
+
+
+def esperado_da_varredura(modelo, linha, universo, top):
+    if modelo == 'lollapalooza':
+        return linha['aprovados'], linha['top']
+    score = dict(zip(universo.tickers, universo.score))
+    return linha['aprovados'], sorted(score[t] for t in linha['top'][:top]), linha['n_joias'], linha['n_compra_forte']
+
+
+def comparar(nome, modulo, universo, por_combinacao, amostra, processos):
+    padroes = modulo.limites_atuais()
+    grade = sensibilidade.grade_padrao(padroes)
+
+    inicio = time.perf_counter()
+    resultado = sensibilidade.varrer_limites(universo, padroes, grade, TOP, processos=1)
+    t_um = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    paralelo = sensibilidade.varrer_limites(universo, padroes, grade, TOP, processos=processos)
+    t_pool = time.perf_counter() - inicio
+    assert paralelo.combinacoes.equals(resultado.combinacoes), f"{nome}: pool diferente do processo único"
+
+    tabela = resultado.combinacoes
+    escolhidas = np.random.default_rng(3).choice(len(tabela), size=min(amostra, len(tabela)), replace=False)
+    inicio = time.perf_counter()
+    for i in escolhidas:
+        linha = tabela.iloc[i]
+        # Limites como float do Python, como nos scripts (ver analise/compacto.py)
+        obtido = silencioso(por_combinacao, modulo, {p: float(linha[p]) for p in padroes}, TOP)
+        assert obtido == esperado_da_varredura(universo.modelo, linha, universo, TOP), \
+            f"{nome}: combinação {i} diferente do pipeline ({obtido})"
+    t_laco = (time.perf_counter() - inicio) / len(escolhidas) * len(tabela)
+    print(f"{nome:<13} | {len(tabela) - 1:>12,} | {t_laco:>20.1f} | {t_um:>14.2f} | {t_pool:>8.2f} | {t_laco / t_pool:>6.0f}x")
+
+
+def main(amostra, processos):
+    import avalairb3
+    import lollapalooza_b3
+
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        fixtures.gerar(os.path.join(pasta, 'fixtures'), n_acoes=800, n_fiis=400)
+        os.chdir(pasta)
+        try:
+            with ativar('reproduzir', os.path.join(pasta, 'fixtures')):
+                # Universos pontuados uma vez (e caches de snapshots e preços aquecidos)
+                lolla = silencioso(lambda: sensibilidade.universo_lollapalooza(
+                    lollapalooza_b3.obter_dados_base(None), lollapalooza_b3.obter_acoes()['liq2m']))
+                bruto = silencioso(avalairb3.buscar_candidatos_fundamentus, math.inf, -math.inf, -math.inf, math.inf)
+                refino = silencioso(avalairb3.refinar_com_yfinance, bruto, math.inf, -math.inf)
+                avalia = sensibilidade.universo_avalairb3(refino, avalairb3.obter_acoes(), avalairb3.obter_fiis())
+
+                print(f"top {TOP}, {processos or os.cpu_count()} processos; pipeline em {amostra} combinações sorteadas\n")
+                print(f"{'pipeline':<13} | {'combinações':>12} | {'uma a uma (s, est.)':>20} | {'1 processo (s)':>14} | "
+                      f"{'pool (s)':>8} | ganho")
+                comparar('lollapalooza', lollapalooza_b3, lolla, lolla_combinacao, amostra, processos)
+                comparar('avalairb3', avalairb3, avalia, avalia_combinacao, amostra, processos)
+        finally:
+            os.chdir(origem)
+    print("\nresultados iguais aos do pipeline com os mesmos limites")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--amostra', type=int, default=AMOSTRA)
+    parser.add_argument('--processos', type=int)
+    args = parser.parse_args()
+    main(args.amostra, args.processos)
@@ -0,0 +1,46 @@
+"""
+Compara o pd.read_html + limpar_percentual original com o parser dedicado
+da tabela de FIIs: tempo e pico de memória. Que o resultado bate é
+conferido em tests/test_tabela_fiis.py.
+
+    python -m benchmarks.bench_tabela_fiis                  # páginas sintéticas
+    python -m benchmarks.bench_tabela_fiis fii_resultado.html  # cópia salva da página real
+"""
+import sys
+import time
+import tracemalloc
+
+from analise.fontes import ler_fiis
+from benchmarks import legado
+from benchmarks.sintetico import pagina_fiis
+
+TAMANHOS = [500, 5_000, 50_000]
+
+
+def medir(func, conteudo):
+    """Tempo numa execução limpa e pico de memória numa segunda, com tracemalloc."""
+    inicio = time.perf_counter()
+    resultado = func(conteudo)
+    tempo = time.perf_counter() - inicio
+    tracemalloc.start()
+    func(conteudo)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resultado, tempo, pico / 2**20
+
+
+def main(paginas):
+    print(f"{'página':>16} | {'linhas':>7} | {'read_html (s / MiB)':>20} | {'parser (s / MiB)':>17} | {'ganho':>6}")
+    for nome, conteudo in paginas:
+        antigo, t_antigo, m_antigo = medir(legado.ler_fiis_read_html, conteudo)
+        novo, t_novo, m_novo = medir(ler_fiis, conteudo)
+        print(f"{nome:>16} | {len(novo):>7,} | {t_antigo:>9.3f} / {m_antigo:>7.1f} | "
+              f"{t_novo:>7.3f} / {m_novo:>6.1f} | {t_antigo / t_novo:>5.1f}x")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:]:
+        paginas = [(caminho[-16:], open(caminho, 'rb').read()) for caminho in sys.argv[1:]]
+    else:
+        paginas = [(f"sintética {n:,}", pagina_fiis(n)) for n in TAMANHOS]
+    main(paginas)
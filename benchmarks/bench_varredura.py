@@ -0,0 +1,118 @@
+"""
+Varredura de orçamentos (analise/varredura.py) contra uma execução
+completa por orçamento, nos dois scripts:
+
+- avalairb3: triagem + refino por valor contra uma triagem sem teto de
+  preço, um refino e o corte por orçamento numa matriz;
+- lollapalooza_b3: ranking + montar_carteira_real por valor contra um
+  ranking e alocar_orcamentos para todos os valores.
+
+    python -m benchmarks.bench_varredura [--orcamentos 100 500 1000 5000 50000] [--latencia 0.05]
+
+Roda sobre fixtures sintéticas no modo de reprodução, com os caches
+locais aquecidos; --latencia soma um atraso fixo a cada download em lote
+para simular o Yahoo. Os resultados de cada orçamento são comparados
+(no avalairb3, aprovados e score do top pick).
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import tempfile
+import time
+
+from analise.alocacao import alocar
+from analise.replay import ativar
+from analise.varredura import ler_orcamentos, varrer_refino
+from benchmarks import fixtures
+from benchmarks.bench_lote import latencia_simulada
+
+ORCAMENTOS = ['100', '500', '1000', '5000', '50000', '200:2000:200']
+LATENCIA = 0.05
+
+
+def cronometrar(func, *args):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = func(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def avalia_por_orcamento(orcamentos):
+    import avalairb3
+    tops = {}
+    for dinheiro in orcamentos:
+        df_final = avalairb3.refinar_com_yfinance(avalairb3.buscar_candidatos_fundamentus(dinheiro), dinheiro)
+        tops[dinheiro] = (len(df_final), df_final['score'].iloc[0] if not df_final.empty else None)
+    return tops
+
+
+def avalia_varredura(orcamentos):
+    import avalairb3
+    df_bruto = avalairb3.buscar_candidatos_fundamentus(math.inf)
+    df_final = avalairb3.refinar_com_yfinance(df_bruto, math.inf)
+    tabela = varrer_refino(df_bruto, df_final, orcamentos)
+    # Score do top pick (o ticker pode variar entre empatados: a ordenação do refino não é estável)
+    score = df_final.set_index('ticker')['score']
+    return {d: (n, score[t] if isinstance(t, str) else None)
+            for d, n, t in zip(tabela['orcamento'], tabela['aprovados'], tabela['top_pick'])}
+
+
+def _ranking():
+    import lollapalooza_b3 as lolla
+    return lolla.stage_3_ranking_final(lolla.stage_1_graham_permissivo(lolla.obter_dados_base()))
+
+
+def lolla_por_orcamento(orcamentos):
+    import lollapalooza_b3 as lolla
+    carteiras = {}
+    for dinheiro in orcamentos:
+        ranking = _ranking()
+        top_picks = ranking[ranking['Score'] >= 40]
+        modo = 'guloso' if dinheiro < 1000 else lolla.CONFIG["MODO_ALOCACAO"]
+        top_picks = top_picks if dinheiro < 1000 else top_picks.head(15)
+        qtds = alocar(top_picks['Preco'], dinheiro, modo=modo, lote=lolla.CONFIG["LOTE"])
+        carteiras[dinheiro] = [f"{q}x {t}" for t, q in zip(top_picks['Ticker'], qtds) if q > 0]
+    return carteiras
+
+
+def lolla_varredura(orcamentos):
+    import lollapalooza_b3 as lolla
+    tabela = lolla.varrer_carteiras(_ranking(), orcamentos)
+    return dict(zip(tabela['orcamento'], tabela['compras']))
+
+
+def main(textos, latencia):
+    orcamentos = ler_orcamentos(textos)
+    origem = os.getcwd()
+    with tempfile.TemporaryDirectory() as pasta:
+        fixtures.gerar(os.path.join(pasta, 'fixtures'), n_acoes=800, n_fiis=400)
+        os.chdir(pasta)
+        try:
+            with ativar('reproduzir', os.path.join(pasta, 'fixtures')) as fontes, latencia_simulada(fontes, latencia):
+                # Aquece snapshots e preços para as duas formas partirem do mesmo estado
+                cronometrar(avalia_varredura, orcamentos)
+                cronometrar(lolla_varredura, orcamentos)
+
+                print(f"{len(orcamentos)} orçamentos (R$ {orcamentos[0]:,.0f} a R$ {orcamentos[-1]:,.0f})\n")
+                print(f"{'pipeline':<16} | {'um por orçamento (s)':>20} | {'varredura (s)':>13} | ganho")
+                for nome, um_a_um, varredura in (
+                    ('avalairb3', avalia_por_orcamento, avalia_varredura),
+                    ('lollapalooza', lolla_por_orcamento, lolla_varredura),
+                ):
+                    esperado, t_um = cronometrar(um_a_um, orcamentos)
+                    obtido, t_varredura = cronometrar(varredura, orcamentos)
+                    assert obtido == esperado, f"{nome}: resultado diferente da execução por orçamento"
+                    print(f"{nome:<16} | {t_um:>20.2f} | {t_varredura:>13.2f} | {t_um / t_varredura:>4.0f}x")
+        finally:
+            os.chdir(origem)
+    print("\nresultados iguais aos de uma execução por orçamento")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orcamentos', nargs='+', default=ORCAMENTOS)
+    parser.add_argument('--latencia', type=float, default=LATENCIA)
+    args = parser.parse_args()
+    main(args.orcamentos, args.latencia)
@@ -0,0 +1,104 @@
+"""
+Latência do modo vigia (analise/vigia.py): cada lote de cotações recalcula
+só as linhas cujo preço mudou, contra rodar o refino do avalairb3 e os
+stages 1+3 do lollapalooza inteiros de novo a cada consulta.
+
+    python -m benchmarks.bench_vigia [--tickers 5000 50000] [--mudam 0.05 1.0] [--ticks 20]
+
+Depois de cada tick o ranking incremental é comparado com o recalculado do zero.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analise.backtest import reprecificar
+from analise.pontuacao import mascara_graham_permissivo, pontos_ranking
+from analise.refino import matriz_fechamentos, refinar_candidatos
+from analise.vigia import ranking_lollapalooza, ranking_refino
+from benchmarks.sintetico import base_acoes, candidatos, historicos
+
+TICKERS = [5_000, 50_000]
+MUDAM = [0.05, 1.0]
+TICKS = 20
+DINHEIRO = 40.0
+
+
+def ticks(precos, fracao, n, seed=5):
+    """Lotes de cotações em que 'fracao' dos tickers muda até 2% por tick."""
+    rng = np.random.default_rng(seed)
+    atuais = precos.copy()
+    for _ in range(n):
+        mudam = rng.random(len(atuais)) < fracao
+        atuais = atuais.where(~mudam, np.round(atuais * rng.normal(1, 0.02, len(atuais)), 2))
+        yield atuais
+
+
+def refino_do_zero(df, fechamentos, cotacoes):
+    """Refino completo com as cotações como último pregão da matriz."""
+    ultimo = pd.DataFrame([cotacoes.reindex(fechamentos.columns).to_numpy()], columns=fechamentos.columns,
+                          index=[fechamentos.index[-1] + pd.Timedelta(days=1)])
+    return refinar_candidatos(df, pd.concat([fechamentos, ultimo]), DINHEIRO)
+
+
+def lollapalooza_do_zero(base, cotacoes):
+    colunas = ['cotacao', 'pl', 'pvp', 'dy', 'roe', 'roic', 'c5y', 'liqc', 'patrim_liq', 'div_bruta', 'ignore_solvencia',
+               'roe_medio_5a', 'roic_medio_5a', 'anos_lucro_consecutivos', 'anos_balancos', 'divida_liquida_ebitda',
+               'liquidez_corrente']
+    dados = reprecificar({c: base[c].to_numpy(dtype=float) for c in colunas}, cotacoes.to_numpy())
+    aprovado = mascara_graham_permissivo(dados)
+    score = pontos_ranking(dados)
+    ordem = np.lexsort((cotacoes.to_numpy()[aprovado], -score[aprovado]))
+    return pd.DataFrame({'Ticker': cotacoes.index[aprovado][ordem], 'Score': score[aprovado][ordem]})
+
+
+def rodar(nome, ranking, do_zero, conferir, precos, fracao, n_ticks):
+    t_inc = t_zero = 0.0
+    eventos = 0
+    for cotacoes in ticks(precos, fracao, n_ticks):
+        inicio = time.perf_counter()
+        eventos += len(ranking.atualizar(cotacoes))
+        t_inc += time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        esperado = do_zero(cotacoes)
+        t_zero += time.perf_counter() - inicio
+        conferir(ranking.ranking(), esperado)
+    print(f"{nome:<13} | {len(ranking.tickers):>8,} | {fracao:>6.0%} | {t_zero / n_ticks * 1000:>13.1f} | "
+          f"{t_inc / n_ticks * 1000:>16.1f} | {t_zero / t_inc:>6.1f}x | {eventos / n_ticks:>9.0f}")
+
+
+def conferir_refino(atual, esperado):
+    # refinar_candidatos ordena com sort_values (instável): empates podem vir em qualquer ordem
+    assert np.allclose(atual['Score'], esperado['score']), "ordem de score do refino diferente"
+    atual = dict(zip(atual['Ticker'].str.replace('.SA', ''), atual['Score']))
+    assert atual == dict(zip(esperado['ticker'], esperado['score'])), "ranking do refino diferente"
+
+
+def conferir_lollapalooza(atual, esperado):
+    assert atual['Ticker'].tolist() == esperado['Ticker'].tolist(), "ranking do lollapalooza diferente"
+    assert (atual['Score'].to_numpy() == esperado['Score'].to_numpy()).all(), "score do lollapalooza diferente"
+
+
+def main(tamanhos, fracoes, n_ticks):
+    print(f"{'ranking':<13} | {'tickers':>8} | {'mudam':>6} | {'do zero (ms)':>13} | {'incremental (ms)':>16} | {'ganho':>7} | eventos/tick")
+    for n in tamanhos:
+        df = candidatos(n)
+        fechamentos = matriz_fechamentos(historicos(df['ticker']), df['ticker'])
+        precos = fechamentos.ffill().iloc[-1]
+        base = base_acoes(n, detalhes=True)
+        cotacoes = pd.Series(base['cotacao'].to_numpy(), index=base.index + '.SA')
+        for fracao in fracoes:
+            rodar('avalairb3', ranking_refino(df, fechamentos, DINHEIRO),
+                  lambda c: refino_do_zero(df, fechamentos, c), conferir_refino, precos, fracao, n_ticks)
+            rodar('lollapalooza', ranking_lollapalooza(base),
+                  lambda c: lollapalooza_do_zero(base, c), conferir_lollapalooza, cotacoes, fracao, n_ticks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tickers', type=int, nargs='+', default=TICKERS)
+    parser.add_argument('--mudam', type=float, nargs='+', default=MUDAM)
+    parser.add_argument('--ticks', type=int, default=TICKS)
+    args = parser.parse_args()
+    main(args.tickers, args.mudam, args.ticks)
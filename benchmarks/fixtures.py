@@ -0,0 +1,131 @@
+"""
+Fixtures sintéticas para o modo de reprodução (analise/replay.py): mesmo
+layout de pasta que uma gravação real, com o tamanho de universo pedido.
+
+    python -m benchmarks.fixtures PASTA [n_acoes] [n_fiis] [n_carteira]
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from analise.fontes import URL_FIIS
+from analise.replay import _arquivo_demonstrativo, _arquivo_http, _arquivo_info, _arquivo_precos
+from benchmarks.sintetico import pagina_fiis, tickers_sinteticos
+
+COLUNAS_RESULTADO = [
+    'cotacao', 'pl', 'pvp', 'psr', 'dy', 'pa', 'pcg', 'pebit', 'pacl', 'evebit', 'evebitda',
+    'mrgebit', 'mrgliq', 'roic', 'roe', 'liqc', 'liq2m', 'patrliq', 'divbpatr', 'c5y',
+]
+
+
+def resultado_fundamentus(n, seed=5):
+    """DataFrame no formato cru de fundamentus.get_resultado()."""
+    rng = np.random.default_rng(seed)
+    dados = {col: np.round(rng.normal(1, 2, n), 4) for col in COLUNAS_RESULTADO}
+    dados.update({
+        'cotacao': np.round(rng.lognormal(2.8, 0.9, n), 2),
+        'pl': np.round(rng.normal(12, 10, n), 2),
+        'pvp': np.round(np.abs(rng.normal(1.4, 1.0, n)), 2),
+        'dy': np.round(np.clip(rng.normal(0.06, 0.04, n), 0, None), 4),
+        'mrgliq': np.round(rng.normal(0.10, 0.15, n), 4),
+        'roic': np.round(rng.normal(0.10, 0.10, n), 4),
+        'roe': np.round(rng.normal(0.14, 0.12, n), 4),
+        'liq2m': np.round(rng.lognormal(14, 2.5, n), 0),
+        'patrliq': np.round(rng.lognormal(21, 2, n), 0),
+        'divbpatr': np.round(np.abs(rng.normal(0.8, 1.2, n)), 2),
+        'c5y': np.round(rng.normal(0.08, 0.15, n), 4),
+    })
+    df = pd.DataFrame(dados, index=pd.Index(tickers_sinteticos(n), name='papel'))
+    df.columns.name = 'Multiples'
+    return df
+
+
+def barras(dias, preco, rng, fim=None):
+    """Barras brutas diárias (OHLCV + proventos trimestrais) terminando hoje."""
+    datas = pd.bdate_range(end=fim or pd.Timestamp.today().normalize(), periods=dias, name='Date')
+    close = np.round(preco * np.exp(np.cumsum(rng.normal(0.0002, 0.015, dias))), 2)
+    dividendos = np.zeros(dias)
+    dividendos[rng.integers(0, 63)::63] = np.round(close[0] * rng.uniform(0.005, 0.03), 4)
+    return pd.DataFrame({
+        'Open': close, 'High': np.round(close * 1.01, 2), 'Low': np.round(close * 0.99, 2), 'Close': close,
+        'Volume': rng.integers(1_000, 1_000_000, dias).astype(float),
+        'Dividends': dividendos, 'Stock Splits': 0.0,
+    }, index=datas)
+
+
+def demonstrativos(patrimonio, roe, rng, anos=4, fim=None):
+    """
+    (DRE, balanço) anuais no formato de get_income_stmt/get_balance_sheet
+    com pretty=False: linhas com as chaves do Yahoo, uma coluna por ano.
+    """
+    fim = fim or pd.Timestamp.today().normalize() - pd.offsets.YearEnd(1)
+    datas = pd.DatetimeIndex([fim - pd.DateOffset(years=k) for k in range(anos)])
+    patrimonio = patrimonio * np.cumprod(np.r_[1, rng.uniform(0.85, 1.05, anos - 1)])
+    lucro = patrimonio * (roe + rng.normal(0, 0.06, anos))
+    ebit = lucro * rng.uniform(1.3, 1.8)
+    divida = patrimonio * abs(rng.normal(0.6, 0.5))
+    dre = pd.DataFrame([lucro, ebit, ebit * rng.uniform(1.1, 1.4)], index=['NetIncome', 'EBIT', 'EBITDA'], columns=datas)
+    balanco = pd.DataFrame([patrimonio, patrimonio + divida, divida, divida * rng.uniform(0.1, 0.8), patrimonio * 0.3, patrimonio * 0.25],
+                           index=['StockholdersEquity', 'InvestedCapital', 'TotalDebt', 'CashAndCashEquivalents',
+                                  'CurrentAssets', 'CurrentLiabilities'], columns=datas)
+    return dre, balanco
+
+
+def gerar(pasta, n_acoes=600, n_fiis=400, n_carteira=13, dias=300, seed=1):
+    """
+    Escreve na pasta: resultado do Fundamentus, página de FIIs, barras de
+    todos os tickers, demonstrativos anuais das ações e .info dos tickers da
+    carteira. Devolve a carteira
+    ({ticker: quantidade}) montada com os primeiros ativos do universo.
+    """
+    rng = np.random.default_rng(seed)
+    resultado = resultado_fundamentus(n_acoes)
+    os.makedirs(pasta, exist_ok=True)
+    resultado.to_pickle(os.path.join(pasta, 'resultado.pkl'))
+
+    pagina = pagina_fiis(n_fiis)
+    caminho = _arquivo_http(pasta, URL_FIIS)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'wb') as f:
+        f.write(pagina)
+
+    fiis = list(np.char.add(np.char.rstrip(tickers_sinteticos(n_fiis), '0123456789'), '11'))
+    precos = dict(zip(resultado.index, resultado['cotacao']))
+    precos.update({t: float(p) for t, p in zip(fiis, rng.lognormal(4, 0.8, n_fiis))})
+
+    os.makedirs(os.path.dirname(_arquivo_precos(pasta, 'X')), exist_ok=True)
+    for t, preco in precos.items():
+        barras(dias, preco, rng).to_pickle(_arquivo_precos(pasta, f"{t}.SA"))
+
+    os.makedirs(os.path.dirname(_arquivo_demonstrativo(pasta, 'X', 'dre')), exist_ok=True)
+    rng_balancos = np.random.default_rng(seed + 1)
+    for t, patrimonio, roe in zip(resultado.index, resultado['patrliq'], resultado['roe']):
+        dre, balanco = demonstrativos(patrimonio, roe, rng_balancos)
+        dre.to_pickle(_arquivo_demonstrativo(pasta, f"{t}.SA", 'dre'))
+        balanco.to_pickle(_arquivo_demonstrativo(pasta, f"{t}.SA", 'balanco'))
+
+    carteira = {}
+    os.makedirs(os.path.dirname(_arquivo_info(pasta, 'X')), exist_ok=True)
+    for i, t in enumerate(list(precos)[::max(1, len(precos) // max(1, n_carteira))][:n_carteira]):
+        carteira[t] = int(rng.integers(1, 50))
+        fii = t in fiis
+        info = {
+            'currentPrice': round(precos[t], 2),
+            'dividendYield': round(float(rng.uniform(2, 14)), 2),
+            'quoteType': 'MUTUALFUND' if fii else 'EQUITY',
+            'sector': 'Real Estate' if fii else str(rng.choice(['Financial Services', 'Utilities', 'Technology', 'Energy'])),
+        }
+        with open(_arquivo_info(pasta, f"{t}.SA"), 'w') as f:
+            json.dump(info, f)
+    return carteira
+
+
+if __name__ == "__main__":
+    pasta, *tamanhos = sys.argv[1:]
+    carteira = gerar(pasta, *[int(x) for x in tamanhos])
+    with open(os.path.join(pasta, 'carteira.json'), 'w') as f:
+        json.dump(carteira, f, indent=4)
+    print(f"Fixtures em {pasta}/ (carteira com {len(carteira)} ativos em {pasta}/carteira.json)")
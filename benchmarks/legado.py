@@ -0,0 +1,240 @@
+"""
+Implementações originais (linha a linha) dos estágios que foram vetorizados.
+Servem de referência de resultado e de linha de base nos benchmarks.
+"""
+import io
+import math
+
+import numpy as np
+import pandas as pd
+
+
+def stage_1_graham_permissivo(df):
+    candidatos = []
+    
+    for ticker, row in df.iterrows():
+        if not row['ignore_solvencia']:
+            patrim = row['patrim_liq']
+            if patrim <= 0 and patrim != 1.0: continue
+            divida = row.get('div_bruta', 0)
+            if patrim > 1 and (divida/patrim) > 3.5: continue
+
+        vi_graham = np.sqrt(22.5 * row['lpa'] * row['vpa']) if (row['lpa']>0 and row['vpa']>0) else 0
+        margem = row['cotacao'] / vi_graham if vi_graham > 0 else 999
+        dy = row.get('dy', 0)
+        pl = row.get('pl', 99)
+
+        # Regras de Entrada (Bazin ou Graham ou Qualidade)
+        if (margem <= 1.0 and pl < 25) or (dy >= 0.06 and pl < 25) or (row.get('roe', 0) > 0.20 and pl < 15):
+            candidatos.append(ticker)
+
+    return df.loc[candidatos].copy()
+
+
+def stage_3_ranking_final(df):
+    resultados = []
+    for ticker, row in df.iterrows():
+        score = 0
+        factors = [] # Lista para guardar as justificativas
+        
+        # --- SISTEMA DE PONTUAÇÃO E JUSTIFICATIVA ---
+        
+        # 1. Qualidade (Buffett)
+        roe = row.get('roe', 0)
+        if roe > 0.15: 
+            score += 10
+            factors.append("ROE>15%")
+        if roe > 0.25: 
+            score += 10
+            factors.append("Rentabilidade Top (ROE>25%)")
+            
+        # 2. Crescimento
+        cagr = row.get('c5y', 0)
+        if cagr > 0.10: 
+            score += 10
+            factors.append(f"Crescimento ({cagr:.0%})")
+            
+        # 3. Preço/Oportunidade (Munger/Bazin)
+        pl = row.get('pl', 0)
+        if pl < 10 and pl > 0: 
+            score += 10
+            factors.append("P/L Baixo")
+            
+        dy = row.get('dy', 0)
+        if dy > 0.06: 
+            score += 10
+            factors.append(f"Dividendos ({dy:.1%})")
+        if dy > 0.10: 
+            score += 5
+            factors.append("Yield Explosivo")
+        
+        # 4. Graham (Segurança)
+        vi = np.sqrt(22.5 * row['lpa'] * row['vpa']) if row['lpa']>0 else 0
+        if vi > 0 and row['cotacao'] < (0.7 * vi): 
+            score += 15
+            factors.append("Desconto Graham (>30%)")
+
+        resultados.append({
+            'Ticker': ticker,
+            'Preco': row['cotacao'],
+            'Score': score,
+            'Motivo': ", ".join(factors) # Junta tudo numa string
+        })
+
+    # Ordena: Maior Score primeiro, depois Menor Preço (para facilitar compras pequenas)
+    return pd.DataFrame(resultados).sort_values(by=['Score', 'Preco'], ascending=[False, True])
+
+
+def refinar_com_yfinance(df_candidatos, historicos, dinheiro):
+    """Laço original do refinar_com_yfinance, com o download já feito."""
+    resultados_finais = []
+
+    for index, row in df_candidatos.iterrows():
+        t = row['ticker']
+        try:
+            hist = historicos.get(t)
+            if hist is None or hist.empty: continue
+
+            # Preço Atual e Validação
+            preco_atual = float(hist['Close'].iloc[-1])
+            if math.isnan(preco_atual) or preco_atual > dinheiro: continue
+
+            # Momentum
+            preco_6m = float(hist['Close'].iloc[0])
+            momentum = (preco_atual / preco_6m) - 1
+            volatilidade = hist['Close'].pct_change().std() * (252**0.5) # Volatilidade Anualizada
+
+            # Score System
+            score = 0
+            analise_tecnica = []
+            premissas_negocio = []
+            
+            # --- ANÁLISE DE DIVIDENDOS ---
+            dy_score = 0
+            if row['dy_base'] > 0.12: 
+                score += 2.5
+                analise_tecnica.append(f"Dividend Yield Excepcional ({row['dy_base']:.1%}) indica forte fluxo de caixa ou desvalorização excessiva.")
+            elif row['dy_base'] >= 0.08: 
+                score += 2
+                analise_tecnica.append(f"Dividend Yield Atrativo ({row['dy_base']:.1%}), acima da Selic real esperada.")
+            elif row['dy_base'] >= 0.06:
+                score += 1
+                analise_tecnica.append(f"Dividend Yield Base ({row['dy_base']:.1%}) compõe renda passiva mínima.")
+
+            # --- ANÁLISE DE VALUATION (P/VP) ---
+            pvp = row.get('p_vp', 0)
+            if pvp > 0:
+                if pvp < 0.85:
+                    score += 2
+                    premissas_negocio.append(f"Desconto Patrimonial Severo (P/VP {pvp:.2f}): O mercado precifica o ativo abaixo do custo de reposição.")
+                elif pvp < 1.0:
+                    score += 1
+                    premissas_negocio.append(f"Negociado Abaixo do Patrimonial (P/VP {pvp:.2f}): Margem de segurança teórica.")
+                elif pvp > 1.20:
+                    score -= 0.5
+                    premissas_negocio.append(f"Ágio sobre Patrimônio (P/VP {pvp:.2f}): Mercado paga prêmio pela qualidade ou crescimento esperado.")
+
+            # --- ANÁLISE DE MOMENTUM E TENDÊNCIA ---
+            if momentum > 0.05: 
+                score += 1.5
+                analise_tecnica.append(f"Tendência de Alta de Curto Prazo (+{momentum:.1%} em 6m): Interesse comprador ativo.")
+            elif momentum < -0.10:
+                score -= 1 
+                analise_tecnica.append(f"Tendência de Baixa (-{abs(momentum):.1%} em 6m): Cuidado com 'faca caindo' (momentum negativo).")
+            
+            # --- FATORES QUALITATIVOS (Setor) ---
+            # Bonus Setor FII
+            if row['tipo'] == 'FII' and isinstance(row['setor'], str):
+                 if any(x in row['setor'] for x in ['Recebíveis', 'Papel']):
+                    if row['dy_base'] > 0.10 and pvp < 1.05:
+                        score += 1
+                        premissas_negocio.append("Setor de Papel/Recebíveis beneficia-se de juros altos, convertendo indexadores em dividendos rápidos.")
+                 elif any(x in row['setor'] for x in ['Logística']):
+                    score += 0.5
+                    premissas_negocio.append("Setor Logístico resiliente com demanda por e-commerce e vacância controlada.")
+
+            # Perfil
+            perfil = "NEUTRO"
+            if score >= 4.5: perfil = "💎 JOIA RARA"
+            elif score >= 3.0: perfil = "✅ COMPRA FORTE"
+            
+            if score >= 2:
+                resultados_finais.append({
+                    'ticker': t.replace('.SA', ''),
+                    'tipo': row['tipo'],
+                    'setor': row['setor'],
+                    'preco': preco_atual,
+                    'dy': row['dy_base'],
+                    'p_vp': pvp,
+                    'momentum': momentum,
+                    'volatilidade': volatilidade,
+                    'score': score,
+                    'perfil': perfil,
+                    'justificativa_tecnica': " ".join(analise_tecnica),
+                    'premissas_negocio': " ".join(premissas_negocio)
+                })
+
+        except Exception:
+            continue
+
+    return pd.DataFrame(resultados_finais).sort_values(by='score', ascending=False)
+
+
+def ler_fiis_read_html(conteudo):
+    """Caminho original do listar_fiis_manual depois do requests.get."""
+    df_list = pd.read_html(io.BytesIO(conteudo), decimal=',', thousands='.')
+    if not df_list:
+        return pd.DataFrame()
+
+    df = df_list[0]
+
+    # Renomeia colunas para facilitar
+    df.columns = [
+        'Papel', 'Segmento', 'Cotacao', 'FFO_Yield', 'DY', 'P_VP',
+        'Valor_Mercado', 'Liquidez', 'Qtd_Imoveis', 'Preco_m2',
+        'Aluguel_m2', 'Cap_Rate', 'Vacancia'
+    ]
+
+    # Limpeza de dados (Converter strings % e R$ para float)
+    # O Pandas read_html com decimal=',' ajuda, mas porcentagens vêm como string "10,5%"
+    def limpar_percentual(x):
+        if isinstance(x, str):
+            return float(x.replace('%', '').replace('.', '').replace(',', '.')) / 100
+        return x
+
+    df['DY'] = df['DY'].apply(limpar_percentual)
+    df['P_VP'] = df['P_VP'] / 100 if df['P_VP'].max() > 100 else df['P_VP'] # Ajuste se vier sem escala
+
+    # Ajusta índice para ser igual ao da biblioteca (Ticker)
+    df.set_index('Papel', inplace=True)
+
+    # Renomeia para padronizar com o código principal
+    df.rename(columns={
+        'Cotacao': 'cotacao',
+        'Liquidez': 'liquidez',
+        'DY': 'dy',
+        'P_VP': 'p_vp',
+        'Segmento': 'segmento'
+    }, inplace=True)
+
+    return df
+
+
+def troco_balanceado(precos, dinheiro):
+    """Modo capital maior original de montar_carteira_real (fatias + troco ação por ação)."""
+    carteira = []
+    saldo = dinheiro
+    alvo = len(precos)
+    fat = dinheiro / alvo
+    for preco in precos:
+        qtd = math.floor(fat / preco)
+        if qtd > 0:
+            saldo -= qtd * preco
+            carteira.append({'Preco': preco, 'Qtd': qtd})
+
+    # Usa o troco para reforçar
+    for item in carteira:
+        while saldo >= item['Preco']:
+            item['Qtd'] += 1
+            saldo -= item['Preco']
+    return carteira, saldo
@@ -0,0 +1,152 @@
+"""
+Geradores de universos sintéticos com o mesmo formato das tabelas reais.
+"""
+import numpy as np
+import pandas as pd
+
+
+def tickers_sinteticos(n):
+    """Tickers no formato B3 (quatro letras + classe), únicos."""
+    letras = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    idx = np.arange(n)
+    base = (
+        letras[idx % 26]
+        + letras[(idx // 26) % 26]
+        + letras[(idx // 676) % 26]
+        + letras[(idx // 17576) % 26]
+    )
+    sufixo = (3 + idx // 456976).astype(str)
+    return np.char.add(base.astype(str), sufixo)
+
+
+def base_acoes(n, seed=42, detalhes=False):
+    """
+    DataFrame no formato de saída de obter_dados_base (colunas normalizadas,
+    lpa/vpa calculados), com distribuições parecidas com as da B3. Com
+    'detalhes', também as métricas de analise/detalhes.py juntadas pelo
+    --detalhes (NaN para quem não tem demonstrativos).
+    """
+    rng = np.random.default_rng(seed)
+    cotacao = np.round(rng.lognormal(2.8, 0.9, n), 2)
+    pl = np.round(rng.normal(12, 10, n), 2)
+    pvp = np.round(np.abs(rng.normal(1.4, 1.0, n)), 2)
+    df = pd.DataFrame({
+        'cotacao': cotacao,
+        'pl': pl,
+        'pvp': pvp,
+        'dy': np.round(np.clip(rng.normal(0.06, 0.04, n), 0, None), 4),
+        'mrgliq': np.round(rng.normal(0.10, 0.15, n), 4),
+        'roic': np.round(rng.normal(0.10, 0.10, n), 4),
+        'roe': np.round(rng.normal(0.14, 0.12, n), 4),
+        'liq2m': np.round(rng.lognormal(15, 2, n), 0),
+        'patrim_liq': np.round(rng.lognormal(21, 2, n) * rng.choice([1, 1, 1, 1, -1], n), 0),
+        'div_bruta_ratio': np.round(np.abs(rng.normal(0.8, 1.2, n)), 2),
+        'c5y': np.round(rng.normal(0.08, 0.15, n), 4),
+    }, index=pd.Index(tickers_sinteticos(n), name='papel'))
+    df['ignore_solvencia'] = rng.random(n) < 0.1
+    df['div_bruta'] = df['div_bruta_ratio'] * df['patrim_liq']
+    df['lpa'] = np.where(df['pl'] > 0, df['cotacao'] / df['pl'].where(df['pl'] > 0, 1), 0)
+    df['vpa'] = np.where(df['pvp'] > 0, df['cotacao'] / df['pvp'].where(df['pvp'] > 0, 1), 0)
+    # Liquidez corrente 0: não informada (bancos e seguradoras)
+    df['liqc'] = np.where(rng.random(n) < 0.1, 0, np.round(np.abs(rng.normal(1.4, 0.6, n)), 2))
+    if detalhes:
+        df = df.join(_detalhes(n, df.index, rng))
+    return df
+
+
+def _detalhes(n, indice, rng):
+    """Métricas de vários anos no formato de DetalhesStore.metricas, com buracos e casos de borda."""
+    balancos = rng.choice([1, 2, 3, 4, 4, 4, 5], n).astype(float)
+    # Anos de lucro seguidos: todo o histórico guardado ou até o primeiro prejuízo
+    anos_lucro = np.where(rng.random(n) < 0.7, balancos, np.floor(rng.random(n) * balancos))
+    detalhes = pd.DataFrame({
+        'roe_medio_5a': np.round(rng.normal(0.13, 0.10, n), 4),
+        'roic_medio_5a': np.where(rng.random(n) < 0.05, 0, np.round(rng.normal(0.11, 0.08, n), 4)),
+        'anos_lucro_consecutivos': anos_lucro,
+        'anos_balancos': balancos,
+        'divida_liquida_ebitda': np.where(rng.random(n) < 0.03, np.inf, np.round(rng.normal(1.8, 1.5, n), 2)),
+        'divida_liquida': np.round(rng.normal(0, 1e9, n), 0),
+        'liquidez_corrente': np.round(np.abs(rng.normal(1.3, 0.6, n)), 2),
+    }, index=indice)
+    # Sem demonstrativos (tudo NaN) e métricas que faltam em parte dos balanços
+    detalhes[rng.random(n) < 0.2] = np.nan
+    for coluna in ('roic_medio_5a', 'divida_liquida_ebitda', 'liquidez_corrente'):
+        detalhes.loc[rng.random(n) < 0.1, coluna] = np.nan
+    return detalhes
+
+
+SEGMENTOS_FII = ['Títulos e Val. Mob.', 'Papel', 'Logística', 'Shoppings', 'Híbrido', 'Lajes Corporativas', 'Recebíveis']
+
+
+def candidatos(n, seed=7):
+    """DataFrame no formato de saída de buscar_candidatos_fundamentus."""
+    rng = np.random.default_rng(seed)
+    tickers = tickers_sinteticos(n)
+    fii = rng.random(n) < 0.4
+    tickers = np.where(fii, np.char.add(np.char.rstrip(tickers, '0123456789'), '11'), tickers)
+    return pd.DataFrame({
+        'ticker': np.char.add(tickers, '.SA'),
+        'tipo': np.where(fii, 'FII', 'ACAO'),
+        'setor': np.where(fii, rng.choice(SEGMENTOS_FII, n), 'Geral'),
+        'preco_base': np.round(rng.lognormal(2.8, 0.8, n), 2),
+        'dy_base': np.round(rng.uniform(0.06, 0.16, n), 4),
+        'p_vp': np.round(rng.uniform(0.5, 1.6, n), 2),
+    })
+
+
+def historicos(tickers, dias=126, seed=11, fim='2026-10-16'):
+    """
+    Um histórico diário por ticker (coluna 'Close'), com alguns pregões
+    faltando para que a matriz alinhada por data tenha buracos.
+    """
+    rng = np.random.default_rng(seed)
+    datas = pd.bdate_range(end=fim, periods=dias, name='Date')
+    retornos = rng.normal(0.0003, 0.015, (dias, len(tickers)))
+    precos = np.round(rng.lognormal(2.8, 0.8, len(tickers)) * np.exp(np.cumsum(retornos, axis=0)), 2)
+    presentes = rng.random((dias, len(tickers))) > 0.02
+    resultado = {}
+    for j, t in enumerate(tickers):
+        resultado[t] = pd.DataFrame({'Close': precos[presentes[:, j], j]}, index=datas[presentes[:, j]])
+    return resultado
+
+
+def _br(valor, casas=2):
+    """Número no formato do Fundamentus: '1.234,56'."""
+    return f"{valor:,.{casas}f}".replace(',', '_').replace('.', ',').replace('_', '.')
+
+
+def pagina_fiis(n, seed=3):
+    """
+    HTML no formato de fii_resultado.php (tabela 'tabelaResultado', 13
+    colunas, números e porcentagens no padrão brasileiro, latin-1).
+    """
+    rng = np.random.default_rng(seed)
+    cabecalho = ''.join(
+        f'<th><span class="tips" title="">{c}</span></th>'
+        for c in ['Papel', 'Segmento', 'Cotação', 'FFO Yield', 'Dividend Yield', 'P/VP', 'Valor de Mercado',
+                  'Liquidez', 'Qtd de imóveis', 'Preço do m2', 'Aluguel por m2', 'Cap Rate', 'Vacância Média']
+    )
+    linhas = []
+    for i, papel in enumerate(np.char.add(np.char.rstrip(tickers_sinteticos(n), '0123456789'), '11')):
+        celulas = [
+            f'<span class="tips" title=""><a href="detalhes.php?papel={papel}">{papel}</a></span>',
+            rng.choice(SEGMENTOS_FII),
+            _br(rng.lognormal(4, 0.8)),
+            _br(rng.uniform(-5, 20)) + '%',
+            _br(rng.uniform(0, 20)) + '%',
+            _br(rng.uniform(0.4, 1.6)),
+            _br(rng.lognormal(19, 1.5), 0),
+            _br(rng.lognormal(12, 2), 0),
+            str(int(rng.integers(0, 40))),
+            _br(rng.lognormal(8, 1)),
+            _br(rng.lognormal(3, 1)),
+            _br(rng.uniform(0, 15)) + '%',
+            _br(rng.uniform(0, 30)) + '%',
+        ]
+        linhas.append('<tr>' + ''.join(f'<td>{c}</td>' for c in celulas) + '</tr>')
+    html = (
+        '<html><head><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1"></head><body>'
+        '<div class="conteudo"><table id="tabelaResultado" class="resultado">'
+        f'<thead><tr>{cabecalho}</tr></thead><tbody>{"".join(linhas)}</tbody></table></div></body></html>'
+    )
+    return html.encode('latin-1')
@@ -1,219 +1,177 @@
-import math
+import argparse
 
-import fundamentus
 import numpy as np
 import pandas as pd
 
+from analise import mudancas, rastro, sensibilidade
+from analise.alocacao import LOTE_FRACIONARIO, MODOS, alocar, alocar_orcamentos
+from analise.backtest import FREQUENCIAS, rodar_backtest
+from analise.compacto import compactar, formatar_bytes
+from analise.detalhes import obter_detalhes
+from analise.fontes import obter_acoes
+from analise.historico import HistoricoStore
+from analise.pipeline import Estagio, Pipeline, adicionar_argumentos as adicionar_argumentos_pipeline, repassar_vazio
+from analise.pontuacao import PL_MAXIMO, ROE_MINIMO, filtrar_graham_permissivo, pontuar_ranking
+from analise.proventos import TTL_PADRAO as TTL_PROVENTOS, com_dy_medido
+from analise.regras import ARQUIVO_PADRAO as SPEC_PADRAO, Estrategia, carregar_spec
+from analise.replay import instalar_pelo_ambiente
+from analise.snapshots import SnapshotStore
+from analise.varredura import adicionar_argumentos as adicionar_argumentos_varredura, apresentar, ler_orcamentos
+from analise.vigia import adicionar_argumentos as adicionar_argumentos_vigia, ranking_lollapalooza, vigiar
+
 # --- CONFIGURAÇÕES ---
 CONFIG = {
     "LIQUIDEZ_MINIMA": 1_000_000,
-    "SETORES_EXCLUIDOS": ['AZUL4', 'GOLL4', 'CVCB3', 'IRBR3', 'OIBR3', 'AMER3']
+    "SCORE_MINIMO": 40,         # pontuação mínima de robustez para entrar na carteira
+    "SETORES_EXCLUIDOS": ['AZUL4', 'GOLL4', 'CVCB3', 'IRBR3', 'OIBR3', 'AMER3'],
+    "MODO_ALOCACAO": 'exato',   # 'exato' ou 'balanceado' (capital >= R$ 1000)
+    "LOTE": LOTE_FRACIONARIO,   # 1 = mercado fracionário, 100 = lote padrão
+    "PESO_POR_SCORE": False,    # alvo proporcional ao Score em vez de peso igual
+    "DETALHES": False,          # Stage 2: demonstrativos anuais (ROE médio, dívida/EBITDA) dos aprovados no Stage 1
+    "PROVENTOS": False,         # DY dos proventos pagos em 12 meses (analise/proventos.py) no lugar do DY do Fundamentus
+    "MUDANCAS": False,          # guarda o ranking e avisa o que mudou desde a execução anterior (analise/mudancas.py)
 }
 
-print("🎸 INICIANDO ALGORITMO: LOLLAPALOOZA TUPINIQUIM (Com Justificativa) 🇧🇷")
-print("==========================================================================")
-
-def limpar_coluna(col_name):
-    return col_name.lower().replace('.', '').replace(' ', '').replace('/', '').replace('_', '')
-
-def obter_dados_base():
+def carregar_acoes():
+    """Tabela de ações do Stage 0 (snapshot local dentro do TTL), ou None se o Fundamentus falhar."""
     print("📥 Stage 0: Baixando dados fundamentais...")
     try:
-        df = fundamentus.get_resultado()
+        # Tabela já normalizada (mapeamento, escala e recuperação de dados),
+        # lida do snapshot local quando ainda está dentro do TTL
+        return obter_acoes()
     except Exception as e:
         print(f"❌ Erro fatal no Fundamentus: {e}")
+        return None
+
+def preparar_base(df, liquidez_minima=CONFIG["LIQUIDEZ_MINIMA"], proventos=CONFIG["PROVENTOS"]):
+    """Filtros e valuation do Stage 0 sobre a tabela de ações (vazia se ela não veio)."""
+    if df is None:
         return pd.DataFrame()
 
-    # Mapeamento
-    mapa = {
-        'cotacao': 'cotacao', 'pl': 'pl', 'pvp': 'pvp',
-        'dy': 'dy', 'divyield': 'dy',
-        'liq2': 'liq2m', 'liq2m': 'liq2m',
-        'patrimliq': 'patrim_liq',
-        'divbrut': 'div_bruta_ratio',
-        'mrgliq': 'mrgliq', 'roe': 'roe', 'roic': 'roic', 'cresc': 'c5y'
-    }
+    with rastro.etapa('stage_0.filtros_base', linhas=len(df)) as e:
+        if 'liq2m' in df.columns and liquidez_minima is not None:
+            df = df[df['liq2m'] > liquidez_minima]
 
-    novos_nomes = {}
-    for col in df.columns:
-        col_limpa = limpar_coluna(col)
-        for chave, valor in mapa.items():
-            if chave in col_limpa:
-                novos_nomes[col] = valor
-                break
-    
-    df.rename(columns=novos_nomes, inplace=True)
+        df = df[~df.index.isin(CONFIG["SETORES_EXCLUIDOS"])]
+        df = df[df['cotacao'] > 0]
     
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-    # Ajuste de Escala
-    for col in ['dy', 'roe', 'roic', 'mrgliq', 'c5y', 'div_bruta_ratio']:
-        if col in df.columns and df[col].mean() > 5.0:
-            df[col] = df[col] / 100
-
-    # Recuperação de Dados
-    if 'patrim_liq' not in df.columns:
-        df['patrim_liq'] = 1.0 
-        df['ignore_solvencia'] = True
-    else:
-        df['ignore_solvencia'] = False
+        # Valuation
+        df['lpa'] = df.apply(lambda row: row['cotacao']/row['pl'] if row['pl'] > 0 else 0, axis=1)
+        df['vpa'] = df.apply(lambda row: row['cotacao']/row['pvp'] if row['pvp'] > 0 else 0, axis=1)
+        e.saida(len(df))
 
-    if 'div_bruta_ratio' in df.columns:
-        df['div_bruta'] = df['div_bruta_ratio'] * df['patrim_liq']
-    else:
-        df['div_bruta'] = 0
-
-    if 'liq2m' in df.columns:
-        df = df[df['liq2m'] > CONFIG["LIQUIDEZ_MINIMA"]]
+    if proventos:
+        print(f"💸 Medindo proventos de {len(df)} ações...")
+        df = com_dy_medido(df)
 
-    df = df[~df.index.isin(CONFIG["SETORES_EXCLUIDOS"])]
-    df = df[df['cotacao'] > 0]
-    
-    # Valuation
-    df['lpa'] = df.apply(lambda row: row['cotacao']/row['pl'] if row['pl'] > 0 else 0, axis=1)
-    df['vpa'] = df.apply(lambda row: row['cotacao']/row['pvp'] if row['pvp'] > 0 else 0, axis=1)
+    # Indicadores em float32 (valores em reais continuam float64); ver analise/compacto.py
+    return compactar(df)
 
-    return df
+def obter_dados_base(liquidez_minima=CONFIG["LIQUIDEZ_MINIMA"], proventos=CONFIG["PROVENTOS"]):
+    """
+    Base do Stage 0 (None em 'liquidez_minima' não corta por liquidez). Com
+    'proventos', o DY vem dos proventos pagos nos últimos 12 meses, com
+    regularidade e volatilidade do yield ao lado (ver analise/proventos.py).
+    """
+    return preparar_base(carregar_acoes(), liquidez_minima, proventos)
 
 def stage_1_graham_permissivo(df):
     print("🛡️ Stage 1: Filtro de Segurança...")
-    candidatos = []
-    
-    for ticker, row in df.iterrows():
-        if not row['ignore_solvencia']:
-            patrim = row['patrim_liq']
-            if patrim <= 0 and patrim != 1.0: continue
-            divida = row.get('div_bruta', 0)
-            if patrim > 1 and (divida/patrim) > 3.5: continue
+    # Solvência + Regras de Entrada (Bazin ou Graham ou Qualidade), coluna a coluna
+    with rastro.etapa('stage_1.graham_permissivo', linhas=len(df)) as e:
+        aprovados = filtrar_graham_permissivo(df)
+        e.saida(len(aprovados))
+    return aprovados
 
-        vi_graham = np.sqrt(22.5 * row['lpa'] * row['vpa']) if (row['lpa']>0 and row['vpa']>0) else 0
-        margem = row['cotacao'] / vi_graham if vi_graham > 0 else 999
-        dy = row.get('dy', 0)
-        pl = row.get('pl', 99)
+def juntar_detalhes(df):
+    """Base com as métricas de vários anos (analise/detalhes.py) de cada ticker, NaN onde faltam."""
+    detalhes = obter_detalhes(df.index)
+    return df.join(detalhes.drop(columns=df.columns.intersection(detalhes.columns)))
 
-        # Regras de Entrada (Bazin ou Graham ou Qualidade)
-        if (margem <= 1.0 and pl < 25) or (dy >= 0.06 and pl < 25) or (row.get('roe', 0) > 0.20 and pl < 15):
-            candidatos.append(ticker)
-
-    return df.loc[candidatos].copy()
+def stage_2_detalhes(df):
+    print(f"📑 Stage 2: Fundamentos detalhados de {len(df)} aprovados...")
+    # ROE médio de 5 anos e dívida líquida/EBITDA no lugar das aproximações
+    # de um período; o Stage 1 é refeito com elas
+    df = juntar_detalhes(df)
+    with rastro.etapa('stage_2.detalhes', linhas=len(df)) as e:
+        aprovados = filtrar_graham_permissivo(df)
+        e.saida(len(aprovados))
+    return aprovados
 
 def stage_3_ranking_final(df):
-    resultados = []
-    for ticker, row in df.iterrows():
-        score = 0
-        factors = [] # Lista para guardar as justificativas
-        
-        # --- SISTEMA DE PONTUAÇÃO E JUSTIFICATIVA ---
-        
-        # 1. Qualidade (Buffett)
-        roe = row.get('roe', 0)
-        if roe > 0.15: 
-            score += 10
-            factors.append("ROE>15%")
-        if roe > 0.25: 
-            score += 10
-            factors.append("Rentabilidade Top (ROE>25%)")
-            
-        # 2. Crescimento
-        cagr = row.get('c5y', 0)
-        if cagr > 0.10: 
-            score += 10
-            factors.append(f"Crescimento ({cagr:.0%})")
-            
-        # 3. Preço/Oportunidade (Munger/Bazin)
-        pl = row.get('pl', 0)
-        if pl < 10 and pl > 0: 
-            score += 10
-            factors.append("P/L Baixo")
-            
-        dy = row.get('dy', 0)
-        if dy > 0.06: 
-            score += 10
-            factors.append(f"Dividendos ({dy:.1%})")
-        if dy > 0.10: 
-            score += 5
-            factors.append("Yield Explosivo")
-        
-        # 4. Graham (Segurança)
-        vi = np.sqrt(22.5 * row['lpa'] * row['vpa']) if row['lpa']>0 else 0
-        if vi > 0 and row['cotacao'] < (0.7 * vi): 
-            score += 15
-            factors.append("Desconto Graham (>30%)")
-
-        resultados.append({
-            'Ticker': ticker,
-            'Preco': row['cotacao'],
-            'Score': score,
-            'Motivo': ", ".join(factors) # Junta tudo numa string
-        })
-
-    # Ordena: Maior Score primeiro, depois Menor Preço (para facilitar compras pequenas)
-    return pd.DataFrame(resultados).sort_values(by=['Score', 'Preco'], ascending=[False, True])
-
-def montar_carteira_real(df_ranking):
-    print("\n" + "="*80)
-    print("💰 CALCULADORA DE CARTEIRA INTELIGENTE")
-    print("="*80)
-    
-    try:
-        dinheiro = float(input(">>> Digite quanto você tem para investir (ex: 100): R$ "))
-    except ValueError:
-        print("Valor inválido.")
-        return
+    # Pontuação e justificativa (Buffett, Crescimento, Munger/Bazin, Graham)
+    # calculadas para todas as linhas de uma vez; ver analise/pontuacao.py
+    with rastro.etapa('stage_3.ranking_final', linhas=len(df)) as e:
+        ranking = pontuar_ranking(df)
+        e.saida(len(ranking))
+    return ranking
 
-    print(f"\n🛒 Calculando a melhor cesta para R$ {dinheiro:.2f}...\n")
+def registrar_mudancas(df_ranking, caminho=None, limite_posicoes=mudancas.LIMITE_POSICOES):
+    """
+    Guarda o ranking do Stage 3 e imprime (ou grava em 'caminho') o que
+    mudou desde a execução anterior; perfil 'TOP PICK' para quem atinge
+    o Score mínimo da carteira, como no modo vigia.
+    """
+    perfil = np.where(df_ranking['Score'] >= CONFIG["SCORE_MINIMO"], 'TOP PICK', '')
+    ranking = mudancas.normalizar(df_ranking['Ticker'], df_ranking['Score'], perfil)
+    delta = mudancas.registrar('lollapalooza', ranking, limite_posicoes=limite_posicoes)
+    mudancas.apresentar(delta, caminho)
+    return delta
 
-    carteira = []
-    total_gasto = 0
-    saldo = dinheiro
-    
-    # Filtra apenas os aprovados (Score >= 40)
-    top_picks = df_ranking[df_ranking['Score'] >= 40].copy()
+def calcular_carteira(df_ranking, dinheiro, modo=None, lote=None):
+    """
+    Carteira de montar_carteira_real sem imprimir nada: (DataFrame com
+    Ticker, Preco, Qtd, Total e Motivo Compra, modo, lote), ou None se
+    nenhum ativo atinge CONFIG["SCORE_MINIMO"].
+    """
+    # Filtra apenas os aprovados (Score >= CONFIG["SCORE_MINIMO"])
+    top_picks = df_ranking[df_ranking['Score'] >= CONFIG["SCORE_MINIMO"]].copy()
     
     if top_picks.empty:
-        print("⚠️ Nenhum ativo atingiu a pontuação mínima de robustez (40 pontos).")
-        return
+        return None
 
-    # LÓGICA DE ALOCAÇÃO
-    # Tenta comprar pelo menos 1 de cada dos melhores, do mais barato ao mais caro
-    if dinheiro < 1000:
+    # LÓGICA DE ALOCAÇÃO (quantidades inteiras calculadas direto; ver analise/alocacao.py)
+    lote = lote or CONFIG["LOTE"]
+    if dinheiro < 1000 and modo is None:
         # Modo Capital Pequeno: Compra gulosa (enche o carrinho com o que dá)
-        for _, row in top_picks.iterrows():
-            if saldo >= row['Preco']:
-                qtd = 1
-                custo = row['Preco']
-                saldo -= custo
-                total_gasto += custo
-                carteira.append({
-                    'Ticker': row['Ticker'], 
-                    'Preco': row['Preco'], 
-                    'Qtd': qtd, 
-                    'Total': custo,
-                    'Motivo Compra': row['Motivo'] # <--- AQUI ENTRA A JUSTIFICATIVA
-                })
+        modo = 'guloso'
     else:
-        # Modo Capital Maior: Tenta balancear
-        alvo = min(15, len(top_picks))
-        fat = dinheiro / alvo
-        for _, row in top_picks.head(alvo).iterrows():
-            qtd = math.floor(fat / row['Preco'])
-            if qtd > 0:
-                custo = qtd * row['Preco']
-                saldo -= custo
-                total_gasto += custo
-                carteira.append({'Ticker': row['Ticker'], 'Preco': row['Preco'], 'Qtd': qtd, 'Total': custo, 'Motivo Compra': row['Motivo']})
-        
-        # Usa o troco para reforçar
-        for item in carteira:
-            while saldo >= item['Preco']:
-                item['Qtd'] += 1
-                item['Total'] += item['Preco']
-                saldo -= item['Preco']
-                total_gasto += item['Preco']
+        # Modo Capital Maior: 'balanceado' (fatias iguais + troco) ou 'exato' (troco mínimo perto do alvo)
+        modo = modo or CONFIG["MODO_ALOCACAO"]
+        top_picks = top_picks.head(min(15, len(top_picks)))
+    pesos = top_picks['Score'] if CONFIG["PESO_POR_SCORE"] else None
+    with rastro.etapa('alocacao', linhas=len(top_picks), modo=modo) as e:
+        qtds = alocar(top_picks['Preco'], dinheiro, modo=modo, lote=lote, pesos=pesos)
+        e.saida(int((qtds > 0).sum()))
+
+    compras = top_picks[qtds > 0]
+    df_cart = pd.DataFrame({
+        'Ticker': compras['Ticker'].to_numpy(),
+        'Preco': compras['Preco'].to_numpy(),
+        'Qtd': qtds[qtds > 0],
+        'Total': compras['Preco'].to_numpy() * qtds[qtds > 0],
+        'Motivo Compra': compras['Motivo'].to_numpy(),  # <--- AQUI ENTRA A JUSTIFICATIVA
+    })
+    return df_cart, modo, lote
+
+def cabecalho_carteira():
+    print("\n" + "="*80)
+    print("💰 CALCULADORA DE CARTEIRA INTELIGENTE")
+    print("="*80)
+
+def imprimir_carteira(carteira, dinheiro):
+    """Relatório de uma carteira de calcular_carteira."""
+    print(f"\n🛒 Calculando a melhor cesta para R$ {dinheiro:.2f}...\n")
+    if carteira is None:
+        print(f"⚠️ Nenhum ativo atingiu a pontuação mínima de robustez ({CONFIG['SCORE_MINIMO']} pontos).")
+        return
+
+    df_cart, modo, lote = carteira
+    total_gasto = df_cart['Total'].sum()
+    saldo = dinheiro - total_gasto
+    print(f"⚙️ Modo de alocação: {modo} (lote de {lote} {'ação' if lote == 1 else 'ações'})\n")
 
     # RELATÓRIO FINAL
-    df_cart = pd.DataFrame(carteira)
     if not df_cart.empty:
         # Exibe formatado
         cols = ['Ticker', 'Preco', 'Qtd', 'Total', 'Motivo Compra']
@@ -230,12 +188,253 @@ def montar_carteira_real(df_ranking):
     else:
         print("Dinheiro insuficiente para comprar até mesmo o ativo mais barato da lista Top Picks.")
 
-if __name__ == "__main__":
-    df = obter_dados_base()
-    if not df.empty:
-        df = stage_1_graham_permissivo(df)
-        if not df.empty:
-            df_final = stage_3_ranking_final(df)
-            montar_carteira_real(df_final)
+def montar_carteira_real(df_ranking, dinheiro=None, modo=None, lote=None):
+    """
+    Monta e imprime a carteira para 'dinheiro' (perguntado se None). 'modo'
+    e 'lote' substituem CONFIG["MODO_ALOCACAO"] e CONFIG["LOTE"].
+    """
+    cabecalho_carteira()
+    
+    if dinheiro is None:
+        try:
+            dinheiro = float(input(">>> Digite quanto você tem para investir (ex: 100): R$ "))
+        except ValueError:
+            print("Valor inválido.")
+            return
+
+    imprimir_carteira(calcular_carteira(df_ranking, dinheiro, modo, lote), dinheiro)
+
+def pipeline_lollapalooza(dinheiro, modo=None, lote=None, detalhes=CONFIG["DETALHES"], proventos=CONFIG["PROVENTOS"]):
+    """
+    Stages 0 a 3 e a carteira como DAG do executor de estágios (ver
+    analise/pipeline.py). A tabela do Fundamentus e os demonstrativos são
+    lidos sempre (servidos pelos caches locais) e a base com proventos vale
+    pelo TTL deles; o resto só é recalculado quando a entrada ou a
+    configuração muda, e um 'dinheiro' novo refaz só a carteira.
+    """
+    aprovados = 'stage_2' if detalhes else 'stage_1'
+    estagios = [
+        Estagio('acoes', carregar_acoes, externo=True),
+        # Com proventos a base também depende do histórico de proventos, que vale pelo TTL dele
+        Estagio('base', preparar_base, ['acoes'], {'liquidez_minima': CONFIG["LIQUIDEZ_MINIMA"], 'proventos': proventos},
+                externo=proventos, validade=TTL_PROVENTOS if proventos else None),
+        Estagio('stage_1', repassar_vazio(stage_1_graham_permissivo), ['base']),
+        Estagio('stage_3', repassar_vazio(stage_3_ranking_final), [aprovados]),
+        Estagio('carteira', repassar_vazio(calcular_carteira), ['stage_3'], {'dinheiro': dinheiro, 'modo': modo, 'lote': lote}),
+    ]
+    if detalhes:
+        estagios.append(Estagio('stage_2', repassar_vazio(stage_2_detalhes), ['stage_1'], externo=True))
+    return Pipeline(estagios, contexto=CONFIG)
+
+def carteira_incremental(dinheiro=None, modo=None, lote=None, detalhes=CONFIG["DETALHES"], proventos=CONFIG["PROVENTOS"]):
+    """
+    Caminho padrão (Stages 0 a 3 e carteira) pelo pipeline_lollapalooza,
+    com os estágios reaproveitados de execuções anteriores quando nada
+    mudou. Devolve (base do Stage 0, ranking do Stage 3 ou None).
+    """
+    if dinheiro is None:
+        try:
+            dinheiro = float(input(">>> Digite quanto você tem para investir (ex: 100): R$ "))
+        except ValueError:
+            print("Valor inválido.")
+            return pd.DataFrame(), None
+
+    resultado = pipeline_lollapalooza(dinheiro, modo, lote, detalhes, proventos).rodar()
+    base, aprovados = resultado['base'], resultado['stage_2' if detalhes else 'stage_1']
+    df_final = None
+    if not base.empty:
+        if aprovados.empty:
+            print("Nenhum ativo passou nos filtros de segurança.")
         else:
-            print("Nenhum ativo passou nos filtros de segurança.")
\ No newline at end of file
+            df_final = resultado['stage_3']
+            cabecalho_carteira()
+            imprimir_carteira(resultado['carteira'], dinheiro)
+    print(f"\n🧩 Estágios: {resultado.resumo()}")
+    return base, df_final
+
+def varrer_carteiras(df_ranking, orcamentos, modo=None, lote=None):
+    """
+    Carteira de montar_carteira_real para cada orçamento, sobre um único
+    ranking: as mesmas regras de modo (guloso abaixo de R$ 1000 sem 'modo',
+    senão os 15 primeiros) e a alocação de cada grupo de orçamentos numa
+    chamada só (ver alocar_orcamentos). Uma linha por orçamento.
+    """
+    orcamentos = np.asarray(orcamentos, dtype=float)
+    top_picks = df_ranking[df_ranking['Score'] >= CONFIG["SCORE_MINIMO"]]
+    lote = lote or CONFIG["LOTE"]
+    grupos = [(orcamentos < 1000, 'guloso', top_picks), (orcamentos >= 1000, modo or CONFIG["MODO_ALOCACAO"], top_picks.head(15))]
+    if modo is not None:
+        grupos = [(np.ones(len(orcamentos), dtype=bool), modo, top_picks.head(15))]
+
+    linhas = {}
+    for mascara, modo_grupo, picks in grupos:
+        if not mascara.any():
+            continue
+        pesos = picks['Score'] if CONFIG["PESO_POR_SCORE"] else None
+        with rastro.etapa('alocacao', linhas=len(picks), modo=modo_grupo, orcamentos=int(mascara.sum())):
+            qtds = alocar_orcamentos(picks['Preco'], orcamentos[mascara], modo=modo_grupo, lote=lote, pesos=pesos)
+        precos = picks['Preco'].to_numpy(dtype=float)
+        tickers = picks['Ticker'].to_numpy()
+        for dinheiro, qtd in zip(orcamentos[mascara], qtds):
+            investido = float(qtd @ precos)
+            linhas[dinheiro] = {
+                'orcamento': float(dinheiro), 'modo': modo_grupo, 'ativos': int((qtd > 0).sum()),
+                'investido': investido, 'troco': float(dinheiro - investido),
+                'compras': [f"{q}x {t}" for t, q in zip(tickers, qtd) if q > 0],
+            }
+    return pd.DataFrame([linhas[d] for d in orcamentos],
+                        columns=['orcamento', 'modo', 'ativos', 'investido', 'troco', 'compras'])
+
+def limites_atuais():
+    """Limites do Stage 0, do Stage 1 e da carteira que a sensibilidade varia, com os valores em uso."""
+    return {
+        'liquidez_minima': CONFIG["LIQUIDEZ_MINIMA"], 'pl_maximo': PL_MAXIMO,
+        'roe_minimo': ROE_MINIMO, 'score_minimo': CONFIG["SCORE_MINIMO"],
+    }
+
+def varrer_sensibilidade(grade=None, top=sensibilidade.TOP_PADRAO, processos=None, caminho=None,
+                         proventos=CONFIG["PROVENTOS"]):
+    """
+    Sensibilidade dos limites de liquidez, P/L e ROE de entrada e Score
+    mínimo (ver analise/sensibilidade.py): a base sem corte de liquidez é
+    pontuada uma vez e cada combinação da grade ('parâmetro -> valores',
+    padrão: grade_padrao) é avaliada sobre ela. Devolve o
+    ResultadoSensibilidade, também impresso ou gravado em 'caminho'.
+    """
+    padroes = limites_atuais()
+    grade = grade or sensibilidade.grade_padrao(padroes)
+    base = obter_dados_base(liquidez_minima=None, proventos=proventos)
+    if base.empty:
+        return None
+    # Liquidez no tipo da tabela de origem, em que o Stage 0 a compara (a base já vem compactada)
+    universo = sensibilidade.universo_lollapalooza(base, obter_acoes()['liq2m'] if 'liq2m' in base.columns else None)
+    with rastro.etapa('sensibilidade', linhas=len(universo)) as e:
+        resultado = sensibilidade.varrer_limites(universo, padroes, grade, top, processos)
+        e.saida(len(resultado.combinacoes) - 1)
+    sensibilidade.apresentar(resultado, caminho)
+    return resultado
+
+def ranking_por_spec(df, caminho=SPEC_PADRAO, detalhes=False):
+    """
+    Ranking pela especificação declarativa (ver analise/regras.py), com
+    quantos tickers cada critério removeu. Com 'detalhes', as métricas de
+    vários anos vêm dos demonstrativos em vez das aproximações.
+    """
+    if detalhes:
+        df = juntar_detalhes(df)
+    estrategia = Estrategia(carregar_spec(caminho))
+    with rastro.etapa('regras.spec', linhas=len(df)) as e:
+        resultado = estrategia.avaliar(df)
+        e.saida(int(resultado.aprovados.sum()))
+    print(f"📐 Especificação: {estrategia.nome} ({len(estrategia.criterios)} critérios)")
+    print(resultado.relatorio.to_string(index=False))
+    print(f"\n🏁 {int(resultado.aprovados.sum())} aprovados; top {len(resultado.ranking)}:")
+    print(resultado.ranking.to_string(index=False, formatters={'Preco': 'R$ {:,.2f}'.format}))
+    return resultado
+
+# --- BACKTEST ---
+def backtest_historico(frequencia='mensal', period='10y'):
+    """
+    Reaplica a estratégia sobre todos os snapshots de ações guardados,
+    com os preços e proventos do cache local (ver analise/backtest.py).
+    """
+    snapshots = SnapshotStore().todos('acoes', compacto=True)
+    if not snapshots:
+        print("⚠️ Nenhum snapshot de ações guardado; rode o ranking pelo menos uma vez.")
+        return None
+
+    tickers = [t + '.SA' for t in sorted(snapshots.tickers.indice)]
+    print(f"⏪ Backtest {frequencia}: {len(snapshots)} snapshots, {len(tickers)} tickers ({formatar_bytes(snapshots.memoria())} em memória)")
+    historico = HistoricoStore()
+    historico.atualizar(tickers, period)
+    with rastro.etapa('backtest', linhas=len(tickers), frequencia=frequencia):
+        resultado = rodar_backtest(
+            snapshots,
+            historico.ler_fechamentos(tickers, period, ajustado=False),
+            historico.ler_dividendos(tickers, period),
+            frequencia=frequencia,
+            peso_por_score=CONFIG["PESO_POR_SCORE"],
+            liquidez_minima=CONFIG["LIQUIDEZ_MINIMA"],
+            excluidos=CONFIG["SETORES_EXCLUIDOS"],
+        )
+
+    resumo = resultado.resumo()
+    if not resumo:
+        print("⚠️ Nenhuma data de rebalanceamento com snapshot disponível.")
+        return resultado
+    print(f"Período:            {resumo['inicio']} a {resumo['fim']} ({resumo['rebalanceamentos']} rebalanceamentos)")
+    print(f"Retorno Total:      {resumo['retorno_total']:.1%} (CAGR {resumo['cagr']:.1%})")
+    print(f"Volatilidade:       {resumo['volatilidade']:.1%} | Max Drawdown: {resumo['max_drawdown']:.1%}")
+    print(f"Turnover Médio:     {resumo['turnover_medio']:.1%} por rebalanceamento")
+    print(f"Dividend Yield:     {resumo['dividend_yield_anual']:.1%} ao ano")
+    return resultado
+
+# --- EXECUÇÃO ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lollapalooza Tupiniquim: ranking de ações da B3 e carteira sugerida.")
+    parser.add_argument('--dinheiro', type=float, help="valor a investir em R$ (perguntado se omitido)")
+    parser.add_argument('--modo', choices=MODOS, help="modo de alocação (padrão: guloso abaixo de R$ 1000, senão CONFIG)")
+    parser.add_argument('--lote', type=int, help="tamanho do lote: 1 (fracionário) ou 100 (lote padrão)")
+    parser.add_argument('--spec', nargs='?', const=SPEC_PADRAO, help=f"ranking pela especificação declarativa (padrão: '{SPEC_PADRAO}')")
+    parser.add_argument('--detalhes', action='store_true', default=CONFIG["DETALHES"],
+                        help="busca os demonstrativos anuais (ROE médio, dívida/EBITDA, anos de lucro) dos aprovados")
+    parser.add_argument('--proventos', action='store_true', default=CONFIG["PROVENTOS"],
+                        help="DY medido nos proventos pagos em 12 meses (histórico local) no lugar do DY do Fundamentus")
+    parser.add_argument('--backtest', choices=FREQUENCIAS, help="reaplica a estratégia sobre os snapshots guardados")
+    parser.add_argument('--periodo', default='10y', help="backtest: janela de preços no formato do Yahoo (padrão: 10y)")
+    adicionar_argumentos_varredura(parser)
+    sensibilidade.adicionar_argumentos(parser)
+    adicionar_argumentos_vigia(parser)
+    mudancas.adicionar_argumentos(parser, CONFIG["MUDANCAS"])
+    adicionar_argumentos_pipeline(parser)
+    rastro.adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    try:
+        orcamentos = ler_orcamentos(args.orcamentos) if args.orcamentos else None
+        grade = sensibilidade.ler_grade(args.sensibilidade, limites_atuais()) if args.sensibilidade is not None else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    instalar_pelo_ambiente()
+    rastro.instalar_pelos_argumentos(args)
+    if args.backtest:
+        backtest_historico(args.backtest, args.periodo)
+        return
+    if grade is not None:
+        varrer_sensibilidade(grade, args.top, args.processos, args.saida, args.proventos)
+        return
+    print("🎸 INICIANDO ALGORITMO: LOLLAPALOOZA TUPINIQUIM (Com Justificativa) 🇧🇷")
+    print("==========================================================================")
+
+    if args.incremental and not args.spec and orcamentos is None:
+        base, df_final = carteira_incremental(args.dinheiro, args.modo, args.lote, args.detalhes, args.proventos)
+        if df_final is not None and (args.mudancas or args.delta):
+            registrar_mudancas(df_final, args.delta, args.posicoes)
+    else:
+        df = base = obter_dados_base(proventos=args.proventos)
+        if args.spec and not df.empty:
+            ranking_por_spec(df, args.spec, args.detalhes)
+        elif not df.empty:
+            df = stage_1_graham_permissivo(df)
+            if args.detalhes and not df.empty:
+                df = stage_2_detalhes(df)
+            if not df.empty:
+                df_final = stage_3_ranking_final(df)
+                if orcamentos is not None:
+                    print(f"\n🛒 Varredura de {len(orcamentos)} orçamentos sobre o mesmo ranking...\n")
+                    apresentar(varrer_carteiras(df_final, orcamentos, args.modo, args.lote), args.saida)
+                else:
+                    montar_carteira_real(df_final, args.dinheiro, args.modo, args.lote)
+                if args.mudancas or args.delta:
+                    registrar_mudancas(df_final, args.delta, args.posicoes)
+            else:
+                print("Nenhum ativo passou nos filtros de segurança.")
+
+    if args.vigiar is not None and not base.empty:
+        # Graham, P/L e DY seguem a cotação; o resto do snapshot fica fixo
+        ranking = ranking_lollapalooza(base, CONFIG["SCORE_MINIMO"])
+        print(f"\n👀 Vigiando {len(ranking.tickers)} ações a cada {args.vigiar:.0f}s (Ctrl+C para sair)...")
+        vigiar({'lollapalooza': ranking}, intervalo=args.vigiar, ciclos=args.ciclos)
+
+if __name__ == "__main__":
+    main()
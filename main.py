@@ -1,14 +1,29 @@
+import argparse
 import json
 import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
-import yfinance as yf
+
+from analise import mudancas, rastro
+from analise.historico import HistoricoStore
+from analise.metadados import MetadadosStore, volateis
+from analise.prazo import Prazo, adicionar_argumentos as adicionar_argumentos_prazo, avisar
+from analise.refino import matriz_fechamentos
+from analise.risco import analisar_risco
+from analise.replay import instalar_pelo_ambiente
+from analise.vigia import adicionar_argumentos as adicionar_argumentos_vigia, vigiar
 
 # --- CONFIGURAÇÕES ---
 CONFIG = {
     'DY_MINIMO': 0.06,
     'ALOCACAO_RENDA': 0.80,      # Meta: 80%
     'ALOCACAO_CRESCIMENTO': 0.20, # Meta: 20%
+    'MAX_CONEXOES': 8,           # Chamadas simultâneas ao Yahoo
+    'PASTA_RELATORIOS': 'relatorios', # Saída do modo lote (um JSON por carteira)
+    'MUDANCAS': False,           # Guarda o diagnóstico e avisa o que mudou desde a execução anterior (analise/mudancas.py)
     'SETORES_BEST': ['Bank', 'Electric', 'Water', 'Insurance', 'Telecom', 'Financial', 'Utility', 'Real Estate', 'Industrials']
 }
 
@@ -18,50 +33,137 @@ class AnaliseFundamentalista:
         self.carteira_qtd = {k.upper().replace('.SA', '') + '.SA': v for k, v in carteira_dict.items()}
         self.tickers = list(self.carteira_qtd.keys())
         self.dados = {}
+        self.latencias = {}
+        self.precos_base = {}  # fechamento de ~6 meses atrás, base do momentum (modo vigia)
+        self.fechamentos = pd.DataFrame()  # datas x tickers do último ano, base do risco (analise/risco.py)
+        self.faltando = []   # com --prazo: tickers sem dados no fim do prazo
+        self.defasados = []  # com --prazo: tickers analisados com o histórico vencido do cache local
 
     def buscar_dados(self):
+        import yfinance as yf
+        rastro.instrumentar_http()
+
         print("🔄 Atualizando cotações e indicadores da sua carteira...")
+        classificacoes, _, erros = MetadadosStore().classificacoes(self.tickers, lambda t: yf.Ticker(t).info)
+        historicos = {}
+        with rastro.etapa('yf.history', linhas=len(self.tickers)) as etapa:
+            for t in self.tickers:
+                if t not in classificacoes:
+                    print(f"❌ Erro em {t}: {erros.get(t)}")
+                    continue
+                try:
+                    historicos[t] = yf.Ticker(t).history(period="1y")
+                    self._registrar(t, classificacoes[t], historicos[t])
+                except Exception as e:
+                    print(f"❌ Erro em {t}: {e}")
+            etapa.saida(len(self.dados))
+        self.fechamentos = matriz_fechamentos(historicos, self.tickers)
+
+    def buscar_dados_concorrente(self, max_conexoes=CONFIG['MAX_CONEXOES'], prazo=None):
+        """
+        Mesma coleta de buscar_dados, mas com os históricos num único
+        yf.download em lote e os .info que faltam no cache de metadados em
+        paralelo (até max_conexoes por vez). Guarda a latência de cada
+        .info buscado em self.latencias. Com 'prazo', o lote é quebrado em
+        downloads menores e, no fim do prazo, vale o histórico do cache
+        local (marcado como defasado) para o que não chegou.
+        """
+        import yfinance as yf
+        rastro.instrumentar_http()
+
+        print(f"🔄 Atualizando cotações e indicadores da sua carteira ({max_conexoes} conexões)...")
+        inicio = time.perf_counter()
+        store = HistoricoStore()
+        try:
+            historicos = store.historicos(self.tickers, period="1y", prazo=prazo)
+            dividendos = store.ler_dividendos(self.tickers, period="1y") if historicos else pd.DataFrame()
+        except Exception as e:
+            print(f"❌ Erro no download do Yahoo: {e}")
+            historicos, dividendos = {}, pd.DataFrame()
+        tempo_lote = time.perf_counter() - inicio
+
+        self.fechamentos = matriz_fechamentos(historicos, self.tickers)
+
+        classificacoes, self.latencias, erros = MetadadosStore().classificacoes(
+            self.tickers, lambda t: yf.Ticker(t).info, max_conexoes, prazo)
+
         for t in self.tickers:
+            if t not in classificacoes:
+                print(f"❌ Erro em {t}: {erros.get(t)}")
+                continue
             try:
-                ticker_obj = yf.Ticker(t)
-                info = ticker_obj.info
-                hist = ticker_obj.history(period="1y")
-                
-                if hist.empty: continue
-
-                # 1. Preço e Valor Atual
-                preco_atual = info.get('currentPrice') or info.get('regularMarketPreviousClose') or hist['Close'].iloc[-1]
-                qtd_atual = self.carteira_qtd[t]
-                valor_posicao = preco_atual * qtd_atual
-                
-                # 2. Tratamento DY
-                raw_dy = info.get('dividendYield', 0)
-                if raw_dy is None: raw_dy = 0
-                dy = raw_dy / 100 if raw_dy > 1.5 else raw_dy
-
-                # 3. Momentum
-                momentum = 0
-                if len(hist) > 126:
-                    momentum = (preco_atual / hist['Close'].iloc[-126]) - 1
-
-                # 4. Classificação
-                tipo = 'FII' if '11' in t and ('EQUITY' not in info.get('quoteType', '') and 'ETF' not in info.get('quoteType', '')) else 'ACAO'
-                setor = info.get('sector', 'Outros').title()
-
-                self.dados[t] = {
-                    'symbol': t.replace('.SA', ''),
-                    'price': preco_atual,
-                    'qtd_atual': qtd_atual,
-                    'valor_posicao': valor_posicao,
-                    'dy': dy,
-                    'momentum': momentum,
-                    'type': tipo,
-                    'sector': setor
-                }
+                self._registrar(t, classificacoes[t], historicos.get(t, pd.DataFrame()), dividendos.get(t))
             except Exception as e:
                 print(f"❌ Erro em {t}: {e}")
 
+        if prazo is not None:
+            self.faltando = [t for t in self.tickers if t not in self.dados]
+            self.defasados = [t for t in store.defasados(self.tickers) if t in self.dados]
+            avisar(prazo, self.faltando, self.defasados)
+
+        em_cache = len(self.tickers) - len(self.latencias)
+        print(f"⏱️ Históricos em lote: {tempo_lote:.2f}s | Total: {time.perf_counter() - inicio:.2f}s"
+              f" | Classificação em cache: {em_cache}/{len(self.tickers)}")
+        for t, latencia in sorted(self.latencias.items(), key=lambda x: x[1], reverse=True):
+            status = "✅" if t in self.dados else "❌"
+            print(f"   {status} {t:<10} {latencia:6.2f}s")
+
+    def _registrar(self, t, classificacao, hist, dividendos=None):
+        if hist.empty: return
+
+        # 1. Preço, DY e Valor Atual (voláteis: do próprio histórico)
+        preco_atual, dy = volateis(hist, dividendos)
+        qtd_atual = self.carteira_qtd[t]
+        valor_posicao = preco_atual * qtd_atual
+
+        # 2. Momentum
+        momentum = 0
+        self.precos_base[t] = None
+        if len(hist) > 126:
+            self.precos_base[t] = hist['Close'].iloc[-126]
+            momentum = (preco_atual / self.precos_base[t]) - 1
+
+        self.dados[t] = {
+            'symbol': t.replace('.SA', ''),
+            'price': preco_atual,
+            'qtd_atual': qtd_atual,
+            'valor_posicao': valor_posicao,
+            'dy': dy,
+            'momentum': momentum,
+            'type': classificacao['tipo'],
+            'sector': classificacao['setor']
+        }
+
+    def analisar_risco(self):
+        """Risco das posições atuais sobre o histórico de um ano (ver risco_da_carteira)."""
+        if not self.dados:
+            return None
+        return risco_da_carteira(self.fechamentos, pd.DataFrame(self.dados.values()))
+
+    def atualizar_precos(self, cotacoes):
+        """
+        Aplica cotações novas (Series ticker -> preço) só nos tickers cujo
+        preço mudou: preço, valor da posição e momentum. Devolve os tickers alterados.
+        """
+        alterados = []
+        for t, d in self.dados.items():
+            preco = cotacoes.get(t)
+            if preco is None or not preco > 0 or preco == d['price']:
+                continue
+            d['price'] = preco
+            d['valor_posicao'] = preco * d['qtd_atual']
+            if self.precos_base.get(t):
+                d['momentum'] = (preco / self.precos_base[t]) - 1
+            alterados.append(t)
+        return alterados
+
     def aplicar_regras(self):
+        with rastro.etapa('aplicar_regras', linhas=len(self.dados)) as e:
+            df = self._aplicar_regras()
+            e.saida(len(df))
+        return df
+
+    def _aplicar_regras(self):
         analise = []
         for t, d in self.dados.items():
             score = 0
@@ -105,12 +207,35 @@ class AnaliseFundamentalista:
         
         return pd.DataFrame(analise).sort_values(by='score', ascending=False)
 
+def risco_da_carteira(fechamentos, df):
+    """
+    Volatilidade, contribuições, correlação e drawdown das posições de 'df'
+    (colunas symbol e valor_posicao) sobre a matriz de fechamentos com
+    tickers .SA; o resultado vem indexado pelo symbol. None sem histórico.
+    """
+    with rastro.etapa('risco', linhas=len(df)):
+        valores = pd.Series(df['valor_posicao'].to_numpy(dtype=float), index=df['symbol'] + '.SA')
+        risco = analisar_risco(fechamentos, valores)
+    if risco is not None:
+        simbolos = risco.posicoes.index.str.replace('.SA', '')
+        risco.posicoes.index = simbolos
+        risco.correlacao.index = risco.correlacao.columns = simbolos
+    return risco
+
 class RebalanceadorCarteira:
     def __init__(self, dinheiro_novo):
         self.caixa = dinheiro_novo
 
-    def diagnosticar_e_sugerir(self, df):
-        if df.empty: return
+    def planejar(self, df, risco=None):
+        """
+        Diagnóstico de alocação e ordens de aporte como dicionário (sem
+        imprimir nada), pronto para virar relatório JSON. None se a carteira
+        estiver vazia. Com 'risco' (RiscoCarteira indexado pelo symbol), o
+        empate de score é desfeito pelo menor beta para a carteira (quem
+        diversifica primeiro) antes do DY, e o relatório ganha a seção de risco.
+        """
+        if df.empty: return None
+        df['beta'] = df['symbol'].map(risco.posicoes['beta']) if risco is not None else float('nan')
 
         # 1. Calcular Patrimônio Total (Ações + Caixa Novo)
         valor_investido = df['valor_posicao'].sum()
@@ -118,45 +243,23 @@ class RebalanceadorCarteira:
 
         # 2. Separar Valor Atual por Categoria
         df['bucket'] = df.apply(lambda x: 'RENDA' if (x['type']=='FII' or x['dy'] >= CONFIG['DY_MINIMO']) else 'CRESCIMENTO', axis=1)
-        
-        atual_renda = df[df['bucket'] == 'RENDA']['valor_posicao'].sum()
-        atual_cresc = df[df['bucket'] == 'CRESCIMENTO']['valor_posicao'].sum()
 
-        # 3. Metas e Diagnóstico
-        meta_renda = patrimonio_total * CONFIG['ALOCACAO_RENDA']
-        meta_cresc = patrimonio_total * CONFIG['ALOCACAO_CRESCIMENTO']
+        alocacao = {}
+        for bucket, meta in (('RENDA', CONFIG['ALOCACAO_RENDA']), ('CRESCIMENTO', CONFIG['ALOCACAO_CRESCIMENTO'])):
+            atual = df[df['bucket'] == bucket]['valor_posicao'].sum()
+            percentual = (atual / patrimonio_total) if patrimonio_total > 0 else 0
+            # Cálculo de Desvio
+            desvio = percentual - meta
+            status = "✅ Na Meta" if abs(desvio) < 0.05 else ("🔻 Sub-alocado" if desvio < 0 else "🔺 Super-alocado")
+            alocacao[bucket] = {
+                'atual': float(atual), 'percentual': float(percentual), 'meta': meta,
+                'meta_valor': float(patrimonio_total * meta), 'desvio': float(desvio), 'status': status,
+            }
 
-        print("\n" + "="*60)
-        print("💼 RELATÓRIO DE GESTÃO DE CARTEIRA E RISCO")
-        print("="*60)
-        
-        print(f"\n📊 DIAGNÓSTICO DE ALOCAÇÃO (Patrimônio: R$ {patrimonio_total:.2f})")
-        print(f"O rebalanceamento visa alinhar a exposição ao risco conforme a estratégia definida.")
-        print("-" * 60)
-        print("CATEGORIA    | ATUAL (%)       | META (%) | DESVIO   | STATUS")
-        
-        p_renda = (atual_renda / patrimonio_total) if patrimonio_total > 0 else 0
-        p_cresc = (atual_cresc / patrimonio_total) if patrimonio_total > 0 else 0
-        
-        # Cálculo de Desvio
-        desvio_renda = p_renda - CONFIG['ALOCACAO_RENDA']
-        desvio_cresc = p_cresc - CONFIG['ALOCACAO_CRESCIMENTO']
-        
-        status_renda = "✅ Na Meta" if abs(desvio_renda) < 0.05 else ("🔻 Sub-alocado" if desvio_renda < 0 else "🔺 Super-alocado")
-        status_cresc = "✅ Na Meta" if abs(desvio_cresc) < 0.05 else ("🔻 Sub-alocado" if desvio_cresc < 0 else "🔺 Super-alocado")
+        # 3. Lógica de Aporte
+        gap_renda = alocacao['RENDA']['meta_valor'] - alocacao['RENDA']['atual']
+        gap_cresc = alocacao['CRESCIMENTO']['meta_valor'] - alocacao['CRESCIMENTO']['atual']
 
-        print(f"Renda        | R$ {atual_renda:,.2f} ({p_renda:.1%}) | {CONFIG['ALOCACAO_RENDA']:.0%}      | {desvio_renda:+.1%}   | {status_renda}")
-        print(f"Crescimento  | R$ {atual_cresc:,.2f} ({p_cresc:.1%}) | {CONFIG['ALOCACAO_CRESCIMENTO']:.0%}      | {desvio_cresc:+.1%}   | {status_cresc}")
-        
-        if abs(desvio_renda) > 0.10:
-            print(f"\n⚠️ ALERTA DE RISCO: Desvio relevante em Renda ({desvio_renda:+.1%}). Ajuste prioritário recomendado.")
-
-        # 4. Lógica de Aporte
-        gap_renda = meta_renda - atual_renda
-        gap_cresc = meta_cresc - atual_cresc
-
-        print(f"\n🛒 PLANEJAMENTO DE APORTE (Disponível: R$ {self.caixa:.2f})")
-        
         saldo = self.caixa
         ativos_qualificados = df[df['score'] >= 2].copy()
         
@@ -172,14 +275,15 @@ class RebalanceadorCarteira:
             justificativa_aporte += " (Sem ativos 'Top Pick' no setor prioritário, buscando melhores oportunidades gerais)"
             ordem_compra = ativos_qualificados
 
-        print(f"👉 Estratégia: {justificativa_aporte}")
-
-        ordem_compra = ordem_compra.sort_values(by=['score', 'dy'], ascending=False)
+        if risco is not None:
+            ordem_compra = ordem_compra.sort_values(by=['score', 'beta', 'dy'], ascending=[False, True, False], na_position='last')
+        else:
+            ordem_compra = ordem_compra.sort_values(by=['score', 'dy'], ascending=False)
         
         total_gasto = 0
         novos_dividendos_ano = 0
+        ordens = []
 
-        print("\n📋 ORDENS SUGERIDAS:")
         for _, ativo in ordem_compra.iterrows():
             if saldo < ativo['price']: continue
             
@@ -190,41 +294,260 @@ class RebalanceadorCarteira:
                 total_gasto += custo
                 div_projetado = custo * ativo['dy']
                 novos_dividendos_ano += div_projetado
-                
-                print(f"   ✅ COMPRAR {qtd}x {ativo['symbol']} a R$ {ativo['price']:.2f}")
-                print(f"      ↳ Motivo: {ativo['justificativa_tecnica']}")
-                print(f"      ↳ Impacto: +R$ {div_projetado:.2f}/ano em dividendos estimados.")
+                ordens.append({
+                    'symbol': ativo['symbol'], 'qtd': int(qtd), 'preco': float(ativo['price']),
+                    'custo': float(custo), 'dividendos_ano': float(div_projetado),
+                    'motivo': ativo['justificativa_tecnica'],
+                    **({'beta': float(ativo['beta'])} if pd.notna(ativo['beta']) else {}),
+                })
 
-        print("\n📈 MÉTRICAS DE IMPACTO DO APORTE")
-        print(f"• Total Alocado:       R$ {total_gasto:.2f}")
-        print(f"• Incremento de Renda: +R$ {novos_dividendos_ano:.2f} / ano (estimado)")
-        if saldo > 0:
-            print(f"• Sobra de Caixa:      R$ {saldo:.2f}")
-        
         # Alerta de Ativos Ruins
         lixo = df[df['perfil'] == 'VENDER/REVISAR']
-        if not lixo.empty:
+
+        return {
+            'patrimonio_total': float(patrimonio_total),
+            'caixa': float(self.caixa),
+            'alocacao': alocacao,
+            'estrategia': justificativa_aporte,
+            'ordens': ordens,
+            'total_alocado': float(total_gasto),
+            'incremento_renda': float(novos_dividendos_ano),
+            'sobra': float(saldo),
+            'revisar': lixo[['symbol', 'score', 'justificativa_tecnica']]
+                .rename(columns={'justificativa_tecnica': 'justificativa'}).to_dict('records'),
+            **({'risco': risco.resumo()} if risco is not None else {}),
+        }
+
+    def diagnosticar_e_sugerir(self, df, risco=None):
+        with rastro.etapa('planejar', linhas=len(df)):
+            plano = self.planejar(df, risco)
+        if plano is None: return
+        renda, cresc = plano['alocacao']['RENDA'], plano['alocacao']['CRESCIMENTO']
+
+        print("\n" + "="*60)
+        print("💼 RELATÓRIO DE GESTÃO DE CARTEIRA E RISCO")
+        print("="*60)
+        
+        print(f"\n📊 DIAGNÓSTICO DE ALOCAÇÃO (Patrimônio: R$ {plano['patrimonio_total']:.2f})")
+        print(f"O rebalanceamento visa alinhar a exposição ao risco conforme a estratégia definida.")
+        print("-" * 60)
+        print("CATEGORIA    | ATUAL (%)       | META (%) | DESVIO   | STATUS")
+        print(f"Renda        | R$ {renda['atual']:,.2f} ({renda['percentual']:.1%}) | {renda['meta']:.0%}      | {renda['desvio']:+.1%}   | {renda['status']}")
+        print(f"Crescimento  | R$ {cresc['atual']:,.2f} ({cresc['percentual']:.1%}) | {cresc['meta']:.0%}      | {cresc['desvio']:+.1%}   | {cresc['status']}")
+        
+        if abs(renda['desvio']) > 0.10:
+            print(f"\n⚠️ ALERTA DE RISCO: Desvio relevante em Renda ({renda['desvio']:+.1%}). Ajuste prioritário recomendado.")
+
+        if risco is not None:
+            print(f"\n📉 RISCO DA CARTEIRA (último ano de pregões)")
+            print(f"• Volatilidade Anual:  {risco.volatilidade:.1%} | Max Drawdown: {risco.max_drawdown:.1%}")
+            print("• Maiores fontes de risco (contribuição x peso):")
+            for symbol, p in risco.posicoes.sort_values('contribuicao_pct', ascending=False).head(3).iterrows():
+                print(f"   {symbol:<8} {p['contribuicao_pct']:>6.1%} do risco com {p['peso']:.1%} do valor (β {p['beta']:.2f})")
+            pares = risco.pares_mais_correlacionados()
+            if pares:
+                print("• Pares mais correlacionados: " + ", ".join(f"{a} x {b} ({c:.2f})" for a, b, c in pares))
+
+        print(f"\n🛒 PLANEJAMENTO DE APORTE (Disponível: R$ {self.caixa:.2f})")
+        print(f"👉 Estratégia: {plano['estrategia']}")
+
+        print("\n📋 ORDENS SUGERIDAS:")
+        for ordem in plano['ordens']:
+            print(f"   ✅ COMPRAR {ordem['qtd']}x {ordem['symbol']} a R$ {ordem['preco']:.2f}")
+            print(f"      ↳ Motivo: {ordem['motivo']}")
+            print(f"      ↳ Impacto: +R$ {ordem['dividendos_ano']:.2f}/ano em dividendos estimados.")
+            if 'beta' in ordem:
+                efeito = "diversifica a carteira" if ordem['beta'] < 1 else "aumenta a volatilidade da carteira"
+                print(f"      ↳ Risco: β {ordem['beta']:.2f} em relação à carteira ({efeito}).")
+
+        print("\n📈 MÉTRICAS DE IMPACTO DO APORTE")
+        print(f"• Total Alocado:       R$ {plano['total_alocado']:.2f}")
+        print(f"• Incremento de Renda: +R$ {plano['incremento_renda']:.2f} / ano (estimado)")
+        if plano['sobra'] > 0:
+            print(f"• Sobra de Caixa:      R$ {plano['sobra']:.2f}")
+        
+        if plano['revisar']:
             print("\n🚨 PONTO DE ATENÇÃO (Revisão Necessária)")
-            for _, row in lixo.iterrows():
-                print(f"   ❌ {row['symbol']}: Score {row['score']}. {row['justificativa_tecnica']}")
+            for item in plano['revisar']:
+                print(f"   ❌ {item['symbol']}: Score {item['score']}. {item['justificativa']}")
+
+# --- MODO VIGIA (diagnóstico ao vivo) ---
+class DiagnosticoAoVivo:
+    """
+    Diagnóstico da carteira para analise.vigia.vigiar: a cada lote de
+    cotações só os ativos com preço novo são atualizados; regras e plano
+    rodam de novo (a carteira tem poucas linhas) e as mudanças de perfil,
+    de status da alocação e de ordens viram eventos.
+    """
+
+    def __init__(self, analista, rebalanceador):
+        self.analista = analista
+        self.rebalanceador = rebalanceador
+        self.tickers = pd.Index(list(analista.dados))
+        self.risco = analista.analisar_risco()  # pesos do início; o beta só desempata as ordens
+        self.df = analista._aplicar_regras()
+        self.plano = rebalanceador.planejar(self.df, self.risco)
+
+    def atualizar(self, cotacoes):
+        if not self.analista.atualizar_precos(cotacoes):
+            return []
+        df = self.analista._aplicar_regras()
+        plano = self.rebalanceador.planejar(df, self.risco)
+
+        eventos = []
+        perfis_antes = dict(zip(self.df['symbol'], self.df['perfil']))
+        for symbol, perfil in zip(df['symbol'], df['perfil']):
+            if perfis_antes.get(symbol) != perfil:
+                eventos.append({'evento': 'perfil', 'texto': f"🔁 {symbol}: {perfis_antes.get(symbol)} -> {perfil}"})
+        for bucket, atual in plano['alocacao'].items():
+            antes = self.plano['alocacao'][bucket]
+            if atual['status'] != antes['status']:
+                eventos.append({'evento': 'alocacao', 'texto': f"📊 {bucket}: {antes['status']} -> {atual['status']} ({atual['percentual']:.1%})"})
+        ordens = [(o['symbol'], o['qtd']) for o in plano['ordens']]
+        if ordens != [(o['symbol'], o['qtd']) for o in self.plano['ordens']]:
+            texto = ", ".join(f"{qtd}x {symbol}" for symbol, qtd in ordens) or "nenhuma"
+            eventos.append({'evento': 'ordens', 'texto': f"🛒 Ordens sugeridas: {texto} (sobra R$ {plano['sobra']:.2f})"})
+
+        self.df, self.plano = df, plano
+        return eventos
+
+# --- MODO LOTE (várias carteiras) ---
+# Os dados de mercado e o score de cada ticker não dependem da carteira:
+# a união dos tickers é buscada e pontuada uma vez só, e cada processo do
+# pool recebe esse universo pontuado (e a matriz de fechamentos, base do
+# risco de cada carteira) uma única vez (initializer).
+_UNIVERSO = None
+_FECHAMENTOS = None
+
+def _iniciar_processo(universo, fechamentos=None):
+    global _UNIVERSO, _FECHAMENTOS
+    _UNIVERSO = universo
+    _FECHAMENTOS = fechamentos
+
+def carteira_do_universo(universo, carteira_dict):
+    """Linhas do universo já pontuado com as quantidades de uma carteira."""
+    qtd = {k.upper().replace('.SA', ''): v for k, v in carteira_dict.items()}
+    df = universo[universo['symbol'].isin(qtd)].copy()
+    df['qtd_atual'] = df['symbol'].map(qtd)
+    df['valor_posicao'] = df['price'] * df['qtd_atual']
+    return df
+
+def _planejar_carteira(tarefa):
+    nome, carteira_dict, aporte, pasta = tarefa
+    df = carteira_do_universo(_UNIVERSO, carteira_dict)
+    risco = risco_da_carteira(_FECHAMENTOS, df) if _FECHAMENTOS is not None and not df.empty else None
+    plano = RebalanceadorCarteira(aporte).planejar(df, risco)
+    relatorio = {
+        'carteira': nome,
+        'aporte': aporte,
+        'ativos_encontrados': len(df),
+        'ativos_sem_dados': sorted(set(k.upper().replace('.SA', '') for k in carteira_dict) - set(df['symbol'])),
+        **(plano or {}),
+    }
+    caminho = os.path.join(pasta, f"{nome}.json")
+    with open(caminho, 'w') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    return nome, caminho, relatorio.get('total_alocado', 0.0), relatorio.get('sobra', aporte)
+
+def rebalancear_lote(carteiras, aportes, pasta=CONFIG['PASTA_RELATORIOS'], processos=None,
+                     max_conexoes=CONFIG['MAX_CONEXOES']):
+    """
+    Rebalanceia várias carteiras (nome -> {ticker: quantidade}) com os
+    aportes de cada uma (nome -> valor). Busca e pontua a união dos tickers
+    uma vez, roda o planejamento de cada carteira num pool de processos
+    (processos=1 roda no próprio processo) e grava um JSON por carteira em
+    'pasta'. Devolve [(nome, caminho, total_alocado, sobra)].
+    """
+    universo_qtd = {t: 0 for carteira in carteiras.values() for t in carteira}
+    print(f"📦 Modo lote: {len(carteiras)} carteiras, {len(universo_qtd)} tickers distintos")
+
+    analista = AnaliseFundamentalista(universo_qtd)
+    analista.buscar_dados_concorrente(max_conexoes)
+    if not analista.dados:
+        print("❌ Nenhum ticker com dados de mercado; nada a rebalancear.")
+        return []
+    universo = analista.aplicar_regras()
+
+    os.makedirs(pasta, exist_ok=True)
+    tarefas = [(nome, carteira, float(aportes[nome]), pasta) for nome, carteira in carteiras.items()]
+    inicio = time.perf_counter()
+    if processos == 1:
+        _iniciar_processo(universo, analista.fechamentos)
+        resultados = [_planejar_carteira(t) for t in tarefas]
+    else:
+        processos = processos or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo, initargs=(universo, analista.fechamentos)) as pool:
+            lote = max(1, len(tarefas) // (4 * processos))
+            resultados = list(pool.map(_planejar_carteira, tarefas, chunksize=lote))
+
+    print(f"⏱️ {len(resultados)} relatórios em {time.perf_counter() - inicio:.2f}s ({processos} processo(s)) -> {pasta}/")
+    return resultados
 
 # --- EXECUÇÃO ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diagnóstico e plano de aporte da sua carteira.")
+    parser.add_argument('--carteira', default='carteira.json', help="JSON ticker -> quantidade (padrão: carteira.json)")
+    parser.add_argument('--aporte', type=float, help="valor do aporte em R$ (perguntado se omitido)")
+    parser.add_argument('--conexoes', type=int, default=CONFIG['MAX_CONEXOES'], help="chamadas simultâneas ao Yahoo")
+    parser.add_argument('--carteiras', nargs='+', metavar='JSON', help="modo lote: várias carteiras, um relatório JSON por carteira")
+    parser.add_argument('--aportes', type=float, nargs='+', help="modo lote: um aporte por carteira, ou um só para todas")
+    parser.add_argument('--saida', default=CONFIG['PASTA_RELATORIOS'], help="modo lote: pasta dos relatórios")
+    parser.add_argument('--processos', type=int, help="modo lote: processos do pool (padrão: núcleos da máquina)")
+    adicionar_argumentos_vigia(parser)
+    mudancas.adicionar_argumentos(parser, CONFIG['MUDANCAS'])
+    adicionar_argumentos_prazo(parser)
+    rastro.adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+    prazo = Prazo(args.prazo) if args.prazo is not None else None
+
+    instalar_pelo_ambiente()
+    rastro.instalar_pelos_argumentos(args)
+
+    if args.carteiras:
+        nomes = [os.path.splitext(os.path.basename(c))[0] for c in args.carteiras]
+        if len(set(nomes)) != len(nomes):
+            parser.error("os arquivos de --carteiras precisam ter nomes distintos")
+        aportes = args.aportes or [float(input("Valor do aporte (para todas as carteiras): "))]
+        if len(aportes) not in (1, len(nomes)):
+            parser.error("--aportes precisa de um valor só ou um por carteira")
+        if len(aportes) == 1:
+            aportes = aportes * len(nomes)
+
+        carteiras = {}
+        for nome, caminho in zip(nomes, args.carteiras):
+            with open(caminho, 'r') as f:
+                carteiras[nome] = json.load(f)
+        rebalancear_lote(carteiras, dict(zip(nomes, aportes)), args.saida, args.processos, args.conexoes)
+        return 0
+
+    # 1. Carregar Carteira
+    try:
+        with open(args.carteira, 'r') as f:
+            carteira_usuario = json.load(f)
+    except FileNotFoundError:
+        print(f"Crie o arquivo '{args.carteira}' antes de rodar!")
+        return 1
+
+    # 2. Quanto dinheiro novo você vai colocar hoje?
+    dinheiro_novo = args.aporte if args.aporte is not None else float(input("Valor do aporte: "))
+
+    # 3. Rodar
+    analista = AnaliseFundamentalista(carteira_usuario)
+    analista.buscar_dados_concorrente(args.conexoes, prazo)
+    df_carteira = analista.aplicar_regras()
 
-# 1. Carregar Carteira
-try:
-    with open('carteira.json', 'r') as f:
-        carteira_usuario = json.load(f)
-except FileNotFoundError:
-    print("Crie o arquivo 'carteira.json' antes de rodar!")
-    exit()
+    rebalanceador = RebalanceadorCarteira(dinheiro_novo)
+    rebalanceador.diagnosticar_e_sugerir(df_carteira, analista.analisar_risco())
 
-# 2. Quanto dinheiro novo você vai colocar hoje?
-dinheiro_novo = float(input("Valor do aporte: "))
+    if (args.mudancas or args.delta) and not df_carteira.empty:
+        # Um histórico por arquivo de carteira: perfis e scores de aplicar_regras entre execuções
+        nome = f"carteira:{os.path.splitext(os.path.basename(args.carteira))[0]}"
+        ranking = mudancas.normalizar(df_carteira['symbol'], df_carteira['score'], df_carteira['perfil'])
+        mudancas.apresentar(mudancas.registrar(nome, ranking, limite_posicoes=args.posicoes), args.delta)
 
-# 3. Rodar
-analista = AnaliseFundamentalista(carteira_usuario)
-analista.buscar_dados()
-df_carteira = analista.aplicar_regras()
+    if args.vigiar is not None and analista.dados:
+        print(f"\n👀 Vigiando a carteira a cada {args.vigiar:.0f}s (Ctrl+C para sair)...")
+        vigiar({'carteira': DiagnosticoAoVivo(analista, rebalanceador)}, intervalo=args.vigiar, ciclos=args.ciclos)
 
-rebalanceador = RebalanceadorCarteira(dinheiro_novo)
-rebalanceador.diagnosticar_e_sugerir(df_carteira)
\ No newline at end of file
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+"""
+O parser dedicado da tabela de FIIs (analise/tabela_fiis.py) contra o caminho
+original pd.read_html + limpar_percentual (benchmarks/legado.py), numa página
+pequena com os formatos que aparecem na real: "10,5%", "1.234,56", célula
+vazia e "-".
+
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from analise.compacto import compactar
+from analise.fontes import ler_fiis
+from benchmarks import legado
+
+CABECALHO = ['Papel', 'Segmento', 'Cotação', 'FFO Yield', 'Dividend Yield', 'P/VP', 'Valor de Mercado',
+             'Liquidez', 'Qtd de imóveis', 'Preço do m2', 'Aluguel por m2', 'Cap Rate', 'Vacância Média']
+LINHAS = [
+    ['ABCD11', 'Logística', '1.234,56', '10,5%', '8,25%', '0,95', '1.234.567.890', '2.345.678', '12',
+     '3.456,78', '45,60', '7,80%', '5,00%'],
+    ['EFGH11', 'Papel', '98,10', '-', '12,10%', '1,02', '987.654.321', '1.000', '0', '', '', '-', ''],
+    ['IJKL11', 'Híbrido', '9,87', '', '', '0,88', '12.345.678', '0', '', '-', '-', '', '-'],
+]
+# Colunas que o read_html devolve como texto ("10,5%") e o parser como fração
+PERCENTUAIS = {'FFO_Yield', 'Cap_Rate', 'Vacancia'}
+
+
+def pagina(linhas=LINHAS):
+    cabecalho = ''.join(f'<th>{c}</th>' for c in CABECALHO)
+    corpo = ''.join('<tr>' + ''.join(f'<td>{c}</td>' for c in linha) + '</tr>' for linha in linhas)
+    return (
+        '<html><head><meta http-equiv="Content-Type" content="text/html; charset=iso-8859-1"></head><body>'
+        f'<table id="tabelaResultado"><thead><tr>{cabecalho}</tr></thead><tbody>{corpo}</tbody></table>'
+        '</body></html>'
+    ).encode('latin-1')
+
+
+def como_read_html(conteudo):
+    """
+    Tabela do caminho original, compactada como a de ler_fiis. As
+    porcentagens que ficaram texto passam pela limpeza do DY
+    (limpar_percentual); numa coluna com "-" o read_html já troca os
+    separadores dos números e só o "-" fica sem converter.
+    """
+    antigo = legado.ler_fiis_read_html(conteudo)
+    for coluna in antigo.columns.drop('segmento'):
+        if pd.api.types.is_numeric_dtype(antigo[coluna]):
+            continue
+        texto = antigo[coluna].astype(str)
+        if coluna in PERCENTUAIS:
+            texto = texto.str.replace('%', '').str.replace('.', '').str.replace(',', '.')
+        antigo[coluna] = pd.to_numeric(texto, errors='coerce') / (100 if coluna in PERCENTUAIS else 1)
+    return compactar(antigo)
+
+
+def test_mesma_tabela_do_read_html():
+    novo = ler_fiis(pagina())
+    antigo = como_read_html(pagina())
+    pd.testing.assert_frame_equal(novo, antigo, check_dtype=False, check_index_type=False, check_categorical=False,
+                                  check_exact=False, rtol=1e-6)
+
+
+def test_formatos_brasileiros():
+    df = ler_fiis(pagina())
+    assert df.index.tolist() == ['ABCD11', 'EFGH11', 'IJKL11']
+    assert df['segmento'].tolist() == ['Logística', 'Papel', 'Híbrido']
+    assert df.loc['ABCD11', 'cotacao'] == pytest.approx(1234.56)
+    assert df.loc['ABCD11', 'FFO_Yield'] == pytest.approx(0.105)
+    assert df.loc['ABCD11', 'Preco_m2'] == pytest.approx(3456.78)
+    assert df.loc['ABCD11', 'Valor_Mercado'] == pytest.approx(1_234_567_890, rel=1e-6)
+    assert df.loc['EFGH11', 'dy'] == pytest.approx(0.121)
+    # Vazio e "-" viram NaN
+    assert np.isnan(df.loc['EFGH11', 'FFO_Yield']) and np.isnan(df.loc['IJKL11', 'FFO_Yield'])
+    assert np.isnan(df.loc['EFGH11', 'Preco_m2']) and np.isnan(df.loc['IJKL11', 'Preco_m2'])
+    assert np.isnan(df.loc['IJKL11', 'dy']) and np.isnan(df.loc['IJKL11', 'Qtd_Imoveis'])
+
+
+def test_pagina_em_pedacos():
+    conteudo = pagina()
+    pedacos = [conteudo[i:i + 97] for i in range(0, len(conteudo), 97)]
+    pd.testing.assert_frame_equal(ler_fiis(pedacos), ler_fiis(conteudo))
+
+
+def test_pagina_sem_tabela():
+    assert ler_fiis(b'<html><body><p>Sem resultados</p></body></html>').empty